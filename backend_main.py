@@ -22,10 +22,17 @@ from src.api.routes import (
     data_terminal,
     ui_state,
     report_generator_api,
-    hot_topics_routes
+    hot_topics_routes,
+    search,
+    content_filter,
+    dictionaries,
+    metrics,
+    traces
 )
 from src.utils.startup import startup_event, shutdown_event
+from src.utils.tracing import TracingMiddleware
 from src.database.manager import init_db
+from src.database.search_index import init_search_index
 from pathlib import Path
 import uuid
 from src.utils.config import UPLOAD_DIR
@@ -55,7 +62,10 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["x-trace-id"],
     )
+    # 请求追踪: 每个 /api 请求一个根 span (响应头 x-trace-id)
+    app.add_middleware(TracingMiddleware)
 
     # Include routers from src.api.routes
     logger.info("Including routers...")
@@ -72,6 +82,11 @@ def create_app() -> FastAPI:
     app.include_router(transfer.router, prefix="/api")
     app.include_router(data_terminal.router, prefix="/api")
     app.include_router(ui_state.router, prefix="/api")
+    app.include_router(search.router, prefix="/api")
+    app.include_router(content_filter.router, prefix="/api")
+    app.include_router(dictionaries.router, prefix="/api")
+    app.include_router(metrics.router)
+    app.include_router(traces.router, prefix="/api")
     app.include_router(report_generator_api.router, prefix="/api/v1/reports", tags=["研报生成"])
     app.include_router(hot_topics_routes.router, prefix="/api/v1", tags=["热点话题"])
 
@@ -157,6 +172,7 @@ def create_app() -> FastAPI:
     async def app_startup():
         await startup_event()  # Call original startup logic
         await init_db()      # Initialize the database
+        await init_search_index()  # Create the full-text search tables
         initialize_handlers()  # Initialize the handler factory
 
     # Add startup/shutdown events
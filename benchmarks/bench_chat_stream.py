@@ -0,0 +1,129 @@
+"""
+Throughput benchmark for streamed chat through ``POST /api/chat``.
+
+Starts a local stub Ollama server (aiohttp) that streams ``--tokens`` NDJSON
+chunks as fast as it can, points a real ``OllamaLocalHandler`` at it and drives
+the chat route in-process through httpx's ASGI transport. Reports tokens per
+second received by the client for:
+
+- stream_trace off (default configuration, no per-chunk logging),
+- stream_trace sampling one chunk in 50,
+- stream_trace logging every chunk (roughly the old always-on per-token logging).
+
+Every run checks that the client received all tokens in order.
+
+Usage:
+    python benchmarks/bench_chat_stream.py [--tokens 20000] [--runs 3]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+import httpx  # noqa: E402
+from aiohttp import web  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+
+from src.api.routes import chat  # noqa: E402
+from src.config.app_config import get_app_config  # noqa: E402
+from src.providers.handlers.ollama_local import OllamaLocalHandler  # noqa: E402
+
+MODEL = "stub-model"
+
+
+def token(i: int) -> str:
+    return f"词{i} "
+
+
+async def start_stub_ollama(tokens: int) -> web.AppRunner:
+    """Stub /api/chat that streams one NDJSON line per token, then the done/stats line"""
+    lines = [
+        json.dumps({"model": MODEL, "message": {"role": "assistant", "content": token(i)}, "done": False},
+                   ensure_ascii=False).encode("utf-8") + b"\n"
+        for i in range(tokens)
+    ]
+    done = json.dumps({"model": MODEL, "done": True, "prompt_eval_count": 10, "eval_count": tokens}).encode() + b"\n"
+
+    async def chat_endpoint(request: web.Request) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        for i in range(0, len(lines), 64):
+            await response.write(b"".join(lines[i:i + 64]))
+        await response.write(done)
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_post("/api/chat", chat_endpoint)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    return runner
+
+
+async def run_once(client: httpx.AsyncClient, tokens: int) -> float:
+    body = {"provider": "ollama_local", "model": MODEL, "stream": True,
+            "messages": [{"role": "user", "content": "你好"}]}
+    start = time.perf_counter()
+    response = await client.post("/api/chat/", json=body)
+    elapsed = time.perf_counter() - start
+    received = []
+    for line in response.text.splitlines():
+        # the route yields preformatted "data: ..." frames, which EventSourceResponse wraps once more
+        while line.startswith("data: "):
+            line = line[len("data: "):]
+        if not line.startswith("{"):
+            continue
+        frame = json.loads(line)
+        try:
+            content = frame["choices"][0]["delta"].get("content")
+        except (KeyError, IndexError, TypeError):
+            continue
+        if content:
+            received.append(content)
+    expected = "".join(token(i) for i in range(tokens))
+    assert "".join(received) == expected, f"received {len(received)} of {tokens} tokens"
+    return tokens / elapsed
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    runner = await start_stub_ollama(args.tokens)
+    port = runner.addresses[0][1]
+    handler = OllamaLocalHandler({"provider_name": "ollama_local", "endpoint": f"http://127.0.0.1:{port}",
+                                  "default_model": MODEL})
+    chat.factory.get_handler = lambda provider_id: handler
+
+    app = FastAPI()
+    app.include_router(chat.聊天路由, prefix="/api")
+    trace_config = get_app_config().stream_trace
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            await run_once(client, args.tokens)  # warm-up
+            print(f"{'mode':<24} {'tokens/s':>12}")
+            for label, enabled, sample_every in (("trace off", False, 50),
+                                                 ("trace 1/50", True, 50),
+                                                 ("trace every chunk", True, 1)):
+                trace_config.enabled = enabled
+                trace_config.sample_every = sample_every
+                rates = [await run_once(client, args.tokens) for _ in range(args.runs)]
+                print(f"{label:<24} {max(rates):12,.0f}")
+    finally:
+        await runner.cleanup()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=20000, help="Tokens streamed per request")
+    parser.add_argument("--runs", type=int, default=3, help="Requests per mode (best is reported)")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Concurrency benchmark for the Gemini handler against a local stub server.
+
+Starts a stub Gemini REST API (aiohttp) whose ``:streamGenerateContent?alt=sse``
+endpoint streams ``--chunks`` SSE events ``--delay-ms`` apart, then opens
+``--concurrency`` streams at once through:
+
+- rest: the real ``GoogleGeminiHandler.stream_chat`` (native async, shared session),
+- threads: the previous design, a blocking HTTP stream consumed inside
+  ``asyncio.to_thread`` (default executor, min(32, CPU count + 4) threads).
+
+Reports wall time for all streams, median / p95 time to first chunk and the peak
+number of threads. Every rest stream is checked to deliver the full text.
+
+Usage:
+    python benchmarks/bench_gemini_concurrency.py [--concurrency 128] [--chunks 20] [--delay-ms 50] [--limit 100]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import urllib.request
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from aiohttp import web  # noqa: E402
+
+from src.config.app_config import get_app_config  # noqa: E402
+from src.providers.handlers.google_gemini import GoogleGeminiHandler  # noqa: E402
+from src.providers.http_client import close_http_sessions  # noqa: E402
+
+MODEL = "stub-gemini"
+
+
+def chunk_text(i: int) -> str:
+    return f"片段{i} "
+
+
+async def start_stub_gemini(chunks: int, delay: float) -> web.AppRunner:
+    """Stub streamGenerateContent (SSE) endpoint"""
+
+    async def stream_endpoint(request: web.Request) -> web.StreamResponse:
+        if not request.match_info["target"].endswith(":streamGenerateContent"):
+            raise web.HTTPNotFound()
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for i in range(chunks):
+            await asyncio.sleep(delay)
+            candidate = {"content": {"role": "model", "parts": [{"text": chunk_text(i)}]}, "index": 0}
+            if i == chunks - 1:
+                candidate["finishReason"] = "STOP"
+            event = json.dumps({"candidates": [candidate]}, ensure_ascii=False)
+            await response.write(f"data: {event}\r\n\r\n".encode("utf-8"))
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_post("/v1beta/models/{target}", stream_endpoint)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0, backlog=1024).start()
+    return runner
+
+
+class ThreadPeak:
+    """Samples threading.active_count() while a benchmark runs"""
+
+    def __init__(self):
+        self.peak = threading.active_count()
+
+    async def run(self) -> None:
+        while True:
+            self.peak = max(self.peak, threading.active_count())
+            await asyncio.sleep(0.005)
+
+
+async def rest_stream(handler: GoogleGeminiHandler, expected: str) -> float:
+    start = time.perf_counter()
+    first = None
+    parts = []
+    async for chunk in handler.stream_chat([{"role": "user", "content": "你好"}], model=MODEL):
+        assert "error" not in chunk, chunk
+        content = chunk.get("choices", [{}])[0].get("delta", {}).get("content") if "choices" in chunk else None
+        if content:
+            first = first or time.perf_counter() - start
+            parts.append(content)
+    assert "".join(parts) == expected, "rest stream returned incomplete text"
+    return first
+
+
+def blocking_stream(url: str, start: float) -> float:
+    """Old design: the whole stream is read by one worker thread (first chunk timed from submission)"""
+    first = None
+    body = json.dumps({"contents": [{"role": "user", "parts": [{"text": "你好"}]}]}).encode()
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request) as response:
+        for line in response:
+            if line.startswith(b"data:"):
+                json.loads(line[5:])
+                first = first or time.perf_counter() - start
+    return first
+
+
+async def measure(label: str, make_streams) -> None:
+    sampler = ThreadPeak()
+    sampler_task = asyncio.create_task(sampler.run())
+    start = time.perf_counter()
+    firsts = await asyncio.gather(*make_streams())
+    wall = time.perf_counter() - start
+    sampler_task.cancel()
+    firsts = sorted(firsts)
+    p95 = firsts[min(len(firsts) - 1, int(len(firsts) * 0.95))]
+    print(f"{label:<10} {wall:9.2f} {statistics.median(firsts) * 1000:14.0f} {p95 * 1000:11.0f} {sampler.peak:13d}")
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    get_app_config().http_client.limit = args.limit
+    runner = await start_stub_gemini(args.chunks, args.delay_ms / 1000)
+    port = runner.addresses[0][1]
+    endpoint = f"http://127.0.0.1:{port}/v1beta"
+    handler = GoogleGeminiHandler({"provider_name": "google_gemini", "GOOGLE_API_KEY": "bench",
+                                   "GOOGLE_ENDPOINT": endpoint, "GOOGLE_DEFAULT_MODEL": MODEL})
+    expected = "".join(chunk_text(i) for i in range(args.chunks))
+    url = f"{endpoint}/models/{MODEL}:streamGenerateContent?alt=sse"
+    single = args.chunks * args.delay_ms / 1000
+
+    print(f"{args.concurrency} concurrent streams, {args.chunks} chunks {args.delay_ms}ms apart "
+          f"(~{single:.1f}s each); connection pool limit {args.limit}, "
+          f"default executor {min(32, (os.cpu_count() or 1) + 4)} threads")
+    print(f"{'mode':<10} {'wall s':>9} {'first p50 ms':>14} {'p95 ms':>11} {'peak threads':>13}")
+    try:
+        await rest_stream(handler, expected)  # warm-up
+        await measure("rest", lambda: [rest_stream(handler, expected) for _ in range(args.concurrency)])
+        await measure("threads", lambda: [asyncio.to_thread(blocking_stream, url, time.perf_counter()) for _ in range(args.concurrency)])
+    finally:
+        await close_http_sessions()
+        await runner.cleanup()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=128, help="Streams opened at once")
+    parser.add_argument("--chunks", type=int, default=20, help="SSE events per stream")
+    parser.add_argument("--delay-ms", type=float, default=50.0, help="Delay between events")
+    parser.add_argument("--limit", type=int, default=100, help="http_client.limit (connection pool size)")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark for parallel jieba segmentation of large documents.
+
+Segments one long text serially (plain ``jieba.cut`` / ``jieba.posseg.cut`` in
+this process) and then with ``segment_text_parallel`` on analysis engines of
+increasing pool size, checking that the merged token stream is identical to the
+serial one.
+
+Pass a full-length novel with --file for representative numbers; without it a
+synthetic corpus is built by repeating the project's Chinese documentation.
+
+Usage:
+    python benchmarks/bench_parallel_segmentation.py --file novel.txt [--workers 1,2,4,8] [--pos]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+import jieba  # noqa: E402
+
+from src.core.analyzers.basic_analyzer import AnalysisContext, segment_text_parallel  # noqa: E402
+from src.core.analyzers.engine import AnalysisEngine  # noqa: E402
+
+SAMPLE_FILES = ["项目说明文档.md", "系统架构与流程图.md", "README.md"]
+
+
+def load_text(path: str, chars: int) -> str:
+    if path:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            return f.read()
+    sample = "\n\n".join(
+        open(os.path.join(PROJECT_ROOT, name), "r", encoding="utf-8").read() for name in SAMPLE_FILES
+    )
+    return (sample * (chars // len(sample) + 1))[:chars]
+
+
+async def bench_parallel(text: str, workers: int, with_pos: bool, chunk_chars: int):
+    engine = AnalysisEngine(pool_size=workers, job_timeout=3600)
+    try:
+        # Start every worker (and load its dictionary) before timing
+        await engine.map(len, [("warm-up",)] * workers)
+        start = time.perf_counter()
+        words, pos_words = await segment_text_parallel(text, with_pos, chunk_chars=chunk_chars, engine=engine)
+        return words, pos_words, time.perf_counter() - start
+    finally:
+        engine.shutdown()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", help="UTF-8 text file to segment (e.g. a full novel)")
+    parser.add_argument("--chars", type=int, default=3_000_000, help="Synthetic corpus size when --file is not given")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated pool sizes to try")
+    parser.add_argument("--chunk-chars", type=int, default=200_000, help="Target chunk size")
+    parser.add_argument("--pos", action="store_true", help="Also run POS tagging (needed for TextRank)")
+    args = parser.parse_args()
+
+    text = load_text(args.file, args.chars)
+    jieba.setLogLevel(60)
+    jieba.initialize()
+    print(f"Text: {len(text):,} chars, cpu_count={os.cpu_count()}, pos={args.pos}")
+
+    start = time.perf_counter()
+    context = AnalysisContext(text)
+    serial_words = context.words
+    serial_pos = context.pos_words if args.pos else None
+    serial = time.perf_counter() - start
+    print(f"  serial          {serial:8.2f}s  {len(serial_words):,} tokens")
+
+    for workers in (int(n) for n in args.workers.split(",")):
+        words, pos_words, elapsed = await bench_parallel(text, workers, args.pos, args.chunk_chars)
+        identical = words == serial_words and pos_words == serial_pos
+        print(f"  {workers:>2} worker(s)    {elapsed:8.2f}s  speedup {serial / elapsed:4.2f}x  identical={identical}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
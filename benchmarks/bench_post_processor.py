@@ -0,0 +1,131 @@
+"""
+Microbenchmark for the response post-processing pipeline.
+
+Builds typical LLM analysis replies ("1. 分析 ... 2. 评分 ... 3. 建议 ...") of
+several sizes and times, per call:
+
+- the previous implementation: three uncompiled ``re.sub`` calls per field and a
+  ``FormatEnforcer`` with lookahead regexes built for every validation,
+- the current ``FormatEnforcer`` + ``PostProcessor``,
+- ``StreamNormalizer`` fed the reply in small chunks, as it would be while streaming.
+
+Every variant is checked to produce the same result as the previous implementation.
+
+Usage:
+    python benchmarks/bench_post_processor.py [--repeat 2000] [--chunk-chars 16]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.core.processing import FormatEnforcer, PostProcessor, StreamNormalizer, normalize_whitespace  # noqa: E402
+
+PARAGRAPH = (
+    "这段文字的风格特点鲜明，  句式短促而富有节奏感。\n\n作者善用比喻与排比，\t营造出紧张的氛围；"
+    "人物对话简洁，   留白较多。\n"
+)
+SUGGESTION = "  - 建议适当增加环境描写，使场景更加立体，\t避免节奏过快。  \n\n"
+
+
+def build_reply(paragraphs: int, suggestions: int, rng: random.Random) -> str:
+    analysis = "".join(PARAGRAPH for _ in range(paragraphs))
+    score = rng.randint(60, 98)
+    return (
+        f"1. 风格分析：\n{analysis}\n\n"
+        f"2. 评分：{score} 分\n\n"
+        f"3. 改进建议：\n" + "".join(SUGGESTION for _ in range(suggestions))
+    )
+
+
+# --- previous implementation, kept here as the baseline ---
+
+def legacy_enforce(text: str) -> dict:
+    analysis_pattern = re.compile(r"1\..*?(?=2\.|$)", re.DOTALL)
+    score_pattern = re.compile(r"2\..*?(?=3\.|$)", re.DOTALL)
+    suggestions_pattern = re.compile(r"3\..*?$", re.DOTALL)
+    analysis_match = analysis_pattern.search(text)
+    analysis = analysis_match.group(0).strip() if analysis_match else ""
+    score_match = score_pattern.search(text)
+    score_text = score_match.group(0).strip() if score_match else ""
+    try:
+        score = float(re.search(r"\d+", score_text).group())
+    except (AttributeError, ValueError):
+        score = 0.0
+    suggestions_match = suggestions_pattern.search(text)
+    suggestions_text = suggestions_match.group(0).strip() if suggestions_match else ""
+    suggestions = [s.strip() for s in suggestions_text.split('\n') if s.strip()]
+    return {"analysis": analysis, "score": score, "suggestions": suggestions}
+
+
+LEGACY_PATTERNS = [(r"\n+", "\n"), (r"\s+", " "), (r"^\s+|\s+$", "")]
+
+
+def legacy_process(result: dict) -> dict:
+    analysis = result["analysis"]
+    for pattern, replacement in LEGACY_PATTERNS:
+        analysis = re.sub(pattern, replacement, analysis)
+    result["analysis"] = analysis.strip()
+    cleaned = []
+    for suggestion in result["suggestions"]:
+        for pattern, replacement in LEGACY_PATTERNS:
+            suggestion = re.sub(pattern, replacement, suggestion)
+        cleaned.append(suggestion.strip())
+    result["suggestions"] = [s for s in cleaned if s]
+    result["score"] = max(0, min(100, result["score"]))
+    return result
+
+
+def timed(func, replies, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for reply in replies:
+            func(reply)
+    return (time.perf_counter() - start) / (repeat * len(replies)) * 1e6
+
+
+def stream_normalize(text: str, chunk_chars: int) -> str:
+    normalizer = StreamNormalizer()
+    parts = [normalizer.feed(text[i:i + chunk_chars]) for i in range(0, len(text), chunk_chars)]
+    parts.append(normalizer.flush())
+    return "".join(parts)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=2000, help="Iterations per reply size")
+    parser.add_argument("--chunk-chars", type=int, default=16, help="Chunk size for the streamed normalizer")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    enforcer, processor = FormatEnforcer(), PostProcessor()
+
+    def current(reply: str) -> dict:
+        return processor.process(enforcer.enforce_format(reply))
+
+    def legacy(reply: str) -> dict:
+        return legacy_process(legacy_enforce(reply))
+
+    print(f"{'reply':>10}  {'legacy':>10}  {'current':>10}  {'speedup':>7}  {'stream':>10}  identical")
+    for paragraphs, suggestions in ((2, 3), (10, 5), (50, 10)):
+        replies = [build_reply(paragraphs, suggestions, rng) for _ in range(10)]
+        identical = all(current(r) == legacy(r) for r in replies) and all(
+            stream_normalize(r, args.chunk_chars) == normalize_whitespace(r) for r in replies
+        )
+        repeat = max(1, args.repeat // paragraphs)
+        legacy_us = timed(legacy, replies, repeat)
+        current_us = timed(current, replies, repeat)
+        stream_us = timed(lambda r: stream_normalize(r, args.chunk_chars), replies, repeat)
+        size = f"{len(replies[0]):,} ch"
+        print(f"{size:>10}  {legacy_us:8.1f}us  {current_us:8.1f}us  {legacy_us / current_us:6.1f}x  "
+              f"{stream_us:8.1f}us  {identical}")
+
+
+if __name__ == "__main__":
+    main()
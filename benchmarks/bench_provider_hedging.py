@@ -0,0 +1,166 @@
+"""
+Tail latency of streamed chat with provider failover and hedged requests.
+
+Two stub providers answer ``POST /api/chat`` (driven in-process via httpx's ASGI
+transport):
+
+- primary: first content after ``--fast-ms`` normally, but ``--slow-ms`` for a
+  ``--slow-rate`` fraction of requests and an error chunk for ``--error-rate``,
+- backup: first content after ``--backup-ms`` every time.
+
+``--requests`` chat streams (``--concurrency`` at a time) are sent per mode:
+
+- direct: no routing policy (previous behaviour),
+- failover: backup configured as fallback of chat_stream,
+- hedged: fallback plus hedging (hedge delay = observed p95 of the primary).
+
+Reports success rate, p50 / p95 / p99 response time and how many backup calls
+were started and cancelled. Every successful response is checked to contain
+the text of exactly one provider.
+
+Usage:
+    python benchmarks/bench_provider_hedging.py [--requests 400] [--slow-rate 0.08] [--error-rate 0.03]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+
+from src.api.routes import chat  # noqa: E402
+from src.config.app_config import EndpointRoutingConfig, RouteTargetConfig, get_app_config  # noqa: E402
+from src.providers.router import provider_router, LatencyTracker  # noqa: E402
+from src.utils import sse  # noqa: E402
+
+TOKENS = 5
+
+
+class StubProvider:
+    """Streams TOKENS deltas after a first-token delay; may fail before answering"""
+
+    def __init__(self, name: str, first_delay, error_rate: float, rng: random.Random):
+        self.name = name
+        self.first_delay = first_delay
+        self.error_rate = error_rate
+        self.rng = rng
+        self.started = 0
+        self.cancelled = 0
+
+    async def stream_chat(self, messages, model=None, **kwargs):
+        self.started += 1
+        try:
+            yield {"choices": [{"delta": {"role": "assistant"}}]}
+            await asyncio.sleep(self.first_delay())
+            if self.rng.random() < self.error_rate:
+                yield {"error": {"message": f"{self.name} unavailable", "type": "stub"}}
+                return
+            for i in range(TOKENS):
+                yield {"choices": [{"delta": {"content": f"{self.name}{i} "}}]}
+                await asyncio.sleep(0.001)
+            yield {"status": "done"}
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+
+def received_text(body: str) -> tuple:
+    parts, error = [], False
+    for line in body.splitlines():
+        while line.startswith("data: "):
+            line = line[len("data: "):]
+        if not line.startswith("{"):
+            continue
+        chunk = json.loads(line)
+        error = error or "error" in chunk
+        content = sse.content_delta(chunk)
+        if content:
+            parts.append(content)
+    return error, "".join(parts)
+
+
+def quantile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run_mode(client: httpx.AsyncClient, stubs: dict, args: argparse.Namespace) -> tuple:
+    semaphore = asyncio.Semaphore(args.concurrency)
+    body = {"provider": "primary", "model": "stub", "stream": True,
+            "messages": [{"role": "user", "content": "你好"}]}
+    expected = {name: "".join(f"{name}{i} " for i in range(TOKENS)) for name in stubs}
+
+    async def one() -> tuple:
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post("/api/chat/", json=body)
+            elapsed = time.perf_counter() - start
+        error, text = received_text(response.text)
+        ok = not error and text in expected.values()
+        assert error or ok, f"mixed or incomplete text: {text!r}"
+        return ok, elapsed
+
+    results = await asyncio.gather(*(one() for _ in range(args.requests)))
+    await asyncio.sleep(0.05)  # let cancelled attempts finish
+    latencies = [elapsed for ok, elapsed in results if ok]
+    return sum(ok for ok, _ in results) / len(results), latencies
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    rng = random.Random(42)
+
+    def primary_delay() -> float:
+        return (args.slow_ms if rng.random() < args.slow_rate else args.fast_ms) / 1000
+
+    routing = get_app_config().provider_routing
+    routing.min_samples = 20
+    modes = [
+        ("direct", None),
+        ("failover", EndpointRoutingConfig(fallbacks=[RouteTargetConfig(provider="backup")])),
+        ("hedged", EndpointRoutingConfig(fallbacks=[RouteTargetConfig(provider="backup")], hedge=True,
+                                         hedge_percentile=0.95, hedge_delay_ms=args.slow_ms / 2)),
+    ]
+    app = FastAPI()
+    app.include_router(chat.聊天路由, prefix="/api")
+
+    print(f"{args.requests} streams ({args.concurrency} concurrent); primary {args.fast_ms:.0f}ms, "
+          f"{args.slow_rate:.0%} at {args.slow_ms:.0f}ms, {args.error_rate:.0%} errors; backup {args.backup_ms:.0f}ms")
+    print(f"{'mode':<10} {'success':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'backup started':>15} {'cancelled':>10}")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        for label, policy in modes:
+            stubs = {
+                "primary": StubProvider("primary", primary_delay, args.error_rate, rng),
+                "backup": StubProvider("backup", lambda: args.backup_ms / 1000, 0.0, rng),
+            }
+            chat.factory.get_handler = stubs.get
+            provider_router.latency = LatencyTracker()
+            routing.endpoints = {"chat_stream": policy} if policy is not None else {}
+            success, latencies = await run_mode(client, stubs, args)
+            cancelled = stubs["primary"].cancelled + stubs["backup"].cancelled
+            print(f"{label:<10} {success:8.1%} {quantile(latencies, 0.5) * 1000:8.0f} "
+                  f"{quantile(latencies, 0.95) * 1000:8.0f} {quantile(latencies, 0.99) * 1000:8.0f} "
+                  f"{stubs['backup'].started:15d} {cancelled:10d}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400, help="Chat streams per mode")
+    parser.add_argument("--concurrency", type=int, default=32, help="Streams in flight at once")
+    parser.add_argument("--fast-ms", type=float, default=50.0, help="Primary first-token delay (normal)")
+    parser.add_argument("--slow-ms", type=float, default=1500.0, help="Primary first-token delay (slow requests)")
+    parser.add_argument("--slow-rate", type=float, default=0.08, help="Fraction of slow primary requests")
+    parser.add_argument("--error-rate", type=float, default=0.03, help="Fraction of primary requests that fail")
+    parser.add_argument("--backup-ms", type=float, default=120.0, help="Backup first-token delay")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
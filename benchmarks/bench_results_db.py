@@ -0,0 +1,113 @@
+"""
+Micro-benchmark for the results metadata database.
+
+Measures insert / list / get throughput of the functions in
+``src.database.manager`` against a throwaway SQLite file, once with the tuned
+engine (pragmas and pool from the ``database`` section of app_config.yaml) and
+once with a plain ``create_async_engine`` for comparison.
+
+Usage:
+    python benchmarks/bench_results_db.py [--rows 2000] [--concurrency 8]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine  # noqa: E402
+
+from src.database.manager import (  # noqa: E402
+    Base,
+    add_result_record,
+    get_result_by_result_id,
+    list_results_page,
+)
+from src.database.sqlite_config import create_tuned_async_engine  # noqa: E402
+
+
+async def _run_concurrent(session_factory, items, concurrency, work):
+    """Runs ``work(session, item)`` over items with up to ``concurrency`` sessions at once."""
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in items:
+        queue.put_nowait(item)
+
+    async def worker():
+        async with session_factory() as session:
+            while not queue.empty():
+                await work(session, queue.get_nowait())
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def bench(label: str, engine, rows: int, concurrency: int) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+
+    result_ids = [uuid.uuid4().hex for _ in range(rows)]
+    types = ["text_analysis", "literature_analysis", "style_transfer"]
+
+    async def insert_one(session, result_id):
+        await add_result_record(
+            session,
+            result_id=result_id,
+            name=f"bench {result_id[:8]}",
+            type=random.choice(types),
+            model_info="bench/model",
+            file_path=f"data/results/{result_id}.json",
+        )
+
+    async def list_all(session, _):
+        cursor = None
+        while True:
+            _, cursor = await list_results_page(session, limit=50, cursor=cursor, type=types[0])
+            if not cursor:
+                break
+
+    async def get_one(session, result_id):
+        await get_result_by_result_id(session, result_id)
+
+    timings = {}
+    start = time.perf_counter()
+    await _run_concurrent(session_factory, result_ids, concurrency, insert_one)
+    timings["insert"] = (rows, time.perf_counter() - start)
+
+    list_rounds = max(concurrency * 2, 10)
+    start = time.perf_counter()
+    await _run_concurrent(session_factory, range(list_rounds), concurrency, list_all)
+    timings["list (full keyset scan)"] = (list_rounds, time.perf_counter() - start)
+
+    lookups = random.choices(result_ids, k=rows)
+    start = time.perf_counter()
+    await _run_concurrent(session_factory, lookups, concurrency, get_one)
+    timings["get"] = (rows, time.perf_counter() - start)
+
+    await engine.dispose()
+
+    print(f"\n[{label}]")
+    for name, (count, elapsed) in timings.items():
+        print(f"  {name:<24} {count:>6} ops  {elapsed:7.3f}s  {count / elapsed:10.1f} ops/s")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000, help="Number of result records to insert and fetch")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent sessions")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        default_url = f"sqlite+aiosqlite:///{os.path.join(tmp_dir, 'default.db')}"
+        tuned_url = f"sqlite+aiosqlite:///{os.path.join(tmp_dir, 'tuned.db')}"
+        await bench("default engine", create_async_engine(default_url), args.rows, args.concurrency)
+        await bench("tuned engine", create_tuned_async_engine(tuned_url), args.rows, args.concurrency)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
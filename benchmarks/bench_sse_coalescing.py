@@ -0,0 +1,116 @@
+"""
+CPU cost per streamed chat response with and without SSE frame coalescing.
+
+A stub provider yields ``--tokens`` OpenAI-style delta chunks in bursts of
+``--burst`` (as a fast local model delivers them per network read), with an
+optional pause between bursts. Each response is driven through ``POST /api/chat``
+in-process via httpx's ASGI transport, and the process CPU time, frame count
+and wall time are reported per response for:
+
+- coalescing off (one frame per token, json.dumps),
+- coalesce_ms / coalesce_bytes set per request (merged frames, orjson when installed).
+
+Every mode is checked to deliver exactly the same text.
+
+Usage:
+    python benchmarks/bench_sse_coalescing.py [--tokens 5000] [--burst 32] [--pause-ms 1] [--runs 5]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+
+from src.api.routes import chat  # noqa: E402
+from src.utils import sse  # noqa: E402
+
+
+class StubHandler:
+    """Provider stub: role chunk, token deltas in bursts, then a done marker"""
+
+    def __init__(self, tokens: int, burst: int, pause: float):
+        self.tokens = tokens
+        self.burst = burst
+        self.pause = pause
+
+    async def stream_chat(self, messages, model=None, **kwargs):
+        yield {"choices": [{"delta": {"role": "assistant"}}]}
+        for i in range(self.tokens):
+            if i % self.burst == 0:
+                await asyncio.sleep(self.pause)
+            yield {"choices": [{"delta": {"content": f"词{i} "}}]}
+        yield {"done": True}
+
+
+def received_text(body: str) -> tuple:
+    frames, parts = 0, []
+    for line in body.splitlines():
+        # the route yields preformatted "data: ..." frames, which EventSourceResponse wraps once more
+        while line.startswith("data: "):
+            line = line[len("data: "):]
+        if not line.startswith("{"):
+            continue
+        frames += 1
+        content = sse.content_delta(json.loads(line))
+        if content:
+            parts.append(content)
+    return frames, "".join(parts)
+
+
+async def measure(client: httpx.AsyncClient, options: dict, runs: int) -> tuple:
+    body = {"provider": "stub", "model": "stub", "stream": True,
+            "messages": [{"role": "user", "content": "你好"}], **options}
+    cpu, wall = [], []
+    for _ in range(runs):
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        response = await client.post("/api/chat/", json=body)
+        cpu.append(time.process_time() - cpu_start)
+        wall.append(time.perf_counter() - wall_start)
+    frames, text = received_text(response.text)
+    return min(cpu), min(wall), frames, text
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    handler = StubHandler(args.tokens, args.burst, args.pause_ms / 1000)
+    chat.factory.get_handler = lambda provider_id: handler
+    app = FastAPI()
+    app.include_router(chat.聊天路由, prefix="/api")
+
+    modes = [
+        ("off", {"coalesce_ms": 0}),
+        ("5ms / 256B", {"coalesce_ms": 5, "coalesce_bytes": 256}),
+        ("15ms / 512B", {"coalesce_ms": 15, "coalesce_bytes": 512}),
+        ("50ms / 4KB", {"coalesce_ms": 50, "coalesce_bytes": 4096}),
+    ]
+    print(f"encoder: {'orjson' if sse.orjson is not None else 'json'}; "
+          f"{args.tokens} tokens in bursts of {args.burst}, {args.pause_ms}ms apart")
+    print(f"{'mode':<14} {'frames':>7} {'CPU ms/resp':>12} {'wall ms/resp':>13}")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        await measure(client, {}, 1)  # warm-up
+        reference = None
+        for label, options in modes:
+            cpu, wall, frames, text = await measure(client, options, args.runs)
+            reference = reference if reference is not None else text
+            assert text == reference, f"{label}: streamed text differs"
+            print(f"{label:<14} {frames:7d} {cpu * 1000:12.1f} {wall * 1000:13.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=5000, help="Tokens per response")
+    parser.add_argument("--burst", type=int, default=32, help="Tokens delivered together per provider read")
+    parser.add_argument("--pause-ms", type=float, default=1.0, help="Pause between bursts")
+    parser.add_argument("--runs", type=int, default=5, help="Responses per mode (best is reported)")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
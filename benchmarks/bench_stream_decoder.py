@@ -0,0 +1,194 @@
+"""
+Conformance and throughput checks for the shared provider stream decoder.
+
+Conformance: every recording in ``benchmarks/recorded_streams`` (``*.sse`` /
+``*.ndjson`` with the decoded payloads in ``*.expected.json``) is replayed through
+``src.providers.stream_decoder`` split into chunks in many ways — whole body,
+every two-way split point, one byte at a time (splitting UTF-8 sequences and
+``\\r\\n`` pairs) and ``--random-splits`` random chunkings — both from a plain
+async byte iterator and from a real aiohttp ``StreamReader``. Each replay must
+produce exactly the expected payloads and ``[DONE]`` state.
+
+Throughput: a synthetic OpenAI-style SSE stream (and an Ollama-style NDJSON
+stream) of ``--events`` events is fed to an aiohttp ``StreamReader`` in
+``--chunk-size`` byte network reads and decoded with:
+
+- the old per-handler loop (``async for line in response.content`` + strip + json.loads),
+- the shared decoder with json,
+- the shared decoder with orjson (when installed).
+
+Usage:
+    python benchmarks/bench_stream_decoder.py [--events 50000] [--chunk-size 16384] [--random-splits 200]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from aiohttp.base_protocol import BaseProtocol  # noqa: E402
+from aiohttp.streams import StreamReader  # noqa: E402
+
+from src.providers import stream_decoder  # noqa: E402
+from src.providers.stream_decoder import SSEJsonStream, iter_lines, loads_json  # noqa: E402
+
+RECORDINGS = Path(__file__).parent / "recorded_streams"
+
+
+async def iterate(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def stream_reader(chunks) -> StreamReader:
+    """aiohttp StreamReader pre-filled with the given network reads (limit raised so it never pauses)"""
+    loop = asyncio.get_running_loop()
+    reader = StreamReader(BaseProtocol(loop), max(2 ** 16, sum(map(len, chunks))), loop=loop)
+    for chunk in chunks:
+        reader.feed_data(chunk)
+    reader.feed_eof()
+    return reader
+
+
+async def decode(body, fmt: str) -> tuple:
+    if fmt == "ndjson":
+        return [loads_json(line) async for line in iter_lines(body) if line.strip()], False
+    stream = SSEJsonStream(body, "conformance")
+    return [item async for item in stream], stream.done
+
+
+def chunkings(data: bytes, random_splits: int, rng: random.Random):
+    yield "whole", [data]
+    for i in range(1, len(data)):
+        yield f"split@{i}", [data[:i], data[i:]]
+    yield "1-byte", [data[i:i + 1] for i in range(len(data))]
+    for n in range(random_splits):
+        chunks, pos = [], 0
+        while pos < len(data):
+            size = rng.randint(1, 64)
+            chunks.append(data[pos:pos + size])
+            pos += size
+        yield f"random#{n}", chunks
+
+
+async def check_recordings(random_splits: int) -> bool:
+    rng = random.Random(1234)
+    ok = True
+    print(f"{'recording':<28} {'replays':>8}  result")
+    for path in sorted(RECORDINGS.glob("*.expected.json")):
+        spec = json.loads(path.read_text(encoding="utf-8"))
+        name = path.name[:-len(".expected.json")]
+        data = (RECORDINGS / f"{name}.{spec['format']}").read_bytes()
+        expected = (spec["events"], spec["done"])
+        replays, failure = 0, None
+        for label, chunks in chunkings(data, random_splits, rng):
+            sources = [iterate(chunks)]
+            if label in ("whole", "1-byte") or label.startswith("random#1"):
+                sources.append(stream_reader(chunks))
+            for source in sources:
+                replays += 1
+                if await decode(source, spec["format"]) != expected and failure is None:
+                    failure = f"{label} ({type(source).__name__})"
+        ok = ok and failure is None
+        print(f"{name:<28} {replays:8d}  {'ok' if failure is None else 'FAILED at ' + failure}")
+    return ok
+
+
+def synthetic_sse(events: int) -> bytes:
+    base = {"id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": 1718000000, "model": "bench"}
+    lines = [
+        f"data: {json.dumps({**base, 'choices': [{'index': 0, 'delta': {'content': f'词{i} '}, 'finish_reason': None}]}, ensure_ascii=False)}\n\n"
+        for i in range(events)
+    ]
+    return ("".join(lines) + "data: [DONE]\n\n").encode("utf-8")
+
+
+def synthetic_ndjson(events: int) -> bytes:
+    lines = [json.dumps({"model": "bench", "message": {"role": "assistant", "content": f"词{i} "}, "done": False},
+                        ensure_ascii=False) for i in range(events)]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+async def old_sse_loop(reader: StreamReader) -> int:
+    """The loop every handler used to carry"""
+    count = 0
+    async for line in reader:
+        if not line:
+            continue
+        line_str = line.decode('utf-8').strip()
+        if not line_str:
+            continue
+        if line_str.startswith("data: "):
+            data_str = line_str[len("data: "):].strip()
+            if data_str == "[DONE]":
+                break
+            json.loads(data_str)
+            count += 1
+    return count
+
+
+async def old_ndjson_loop(reader: StreamReader) -> int:
+    count = 0
+    async for line in reader:
+        line_str = line.decode('utf-8').strip()
+        if line_str:
+            json.loads(line_str)
+            count += 1
+    return count
+
+
+async def new_sse(reader: StreamReader) -> int:
+    return sum([1 async for _ in SSEJsonStream(reader, "bench")])
+
+
+async def new_ndjson(reader: StreamReader) -> int:
+    return sum([1 async for line in iter_lines(reader) if loads_json(line)])
+
+
+async def throughput(events: int, chunk_size: int, runs: int) -> None:
+    orjson_module = stream_decoder.orjson
+    print(f"\n{events} events per stream, {chunk_size} B network reads (best of {runs})")
+    print(f"{'stream':<8} {'decoder':<22} {'MB/s':>8} {'events/s':>12}")
+    for fmt, data, old, new in (("sse", synthetic_sse(events), old_sse_loop, new_sse),
+                                ("ndjson", synthetic_ndjson(events), old_ndjson_loop, new_ndjson)):
+        chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+        modes = [("line loop (old)", old, None), ("shared decoder, json", new, None)]
+        if orjson_module is not None:
+            modes.append(("shared decoder, orjson", new, orjson_module))
+        for label, fn, json_impl in modes:
+            stream_decoder.orjson = json_impl
+            best = float("inf")
+            for _ in range(runs):
+                reader = stream_reader(chunks)
+                start = time.perf_counter()
+                count = await fn(reader)
+                best = min(best, time.perf_counter() - start)
+                assert count == events, f"{label}: decoded {count} of {events} events"
+            print(f"{fmt:<8} {label:<22} {len(data) / best / 1e6:8.1f} {events / best:12,.0f}")
+    stream_decoder.orjson = orjson_module
+
+
+async def main_async(args: argparse.Namespace) -> int:
+    ok = await check_recordings(args.random_splits)
+    await throughput(args.events, args.chunk_size, args.runs)
+    return 0 if ok else 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=50000, help="Events in the synthetic throughput streams")
+    parser.add_argument("--chunk-size", type=int, default=16384, help="Bytes per simulated network read")
+    parser.add_argument("--random-splits", type=int, default=200, help="Random chunkings per recording")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per decoder (best is reported)")
+    sys.exit(asyncio.run(main_async(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -109,6 +109,13 @@ export async function getProviderStatus(providerName) {
   }
 }
 
+// 批量获取提供商状态：后端读取缓存，过期项并发探测（每个探测有独立超时）
+export function getProviderStatuses(providerNames = null, refresh = false) {
+  const params = { refresh };
+  if (providerNames && providerNames.length) params.providers = providerNames.join(',');
+  return apiClient.get('/api/provider-status', { params });
+}
+
 export async function pingBackend() {
   try {
     const endpoints = ['/api/status', '/status', '/api/providers', '/providers'];
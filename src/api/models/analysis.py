@@ -14,8 +14,27 @@ class AnalysisRequest(BaseModel):
     api_provider: Optional[str] = Field(None, description="深度分析时选择的 API 提供商")
     model: Optional[str] = Field(None, description="深度分析时选择的模型")
     template: Optional[str] = Field(None, description="深度分析时选择的模板 ID")
+    summary_length: int = Field(3, ge=1, le=50, description="基础分析摘要的句子数")
+    summary_method: str = Field("textrank", pattern="^(textrank|tfidf)$", description="基础分析摘要的句子打分方法")
     # uploadedFilePath: Optional[str] = Field(None, description="Path of the uploaded file on the server (internal use)")
 
+class CorpusDocument(BaseModel):
+    id: Optional[str] = Field(None, description="文档标识（默认使用文件名或序号）")
+    text: Optional[str] = Field(None, description="文档文本")
+    file_path: Optional[str] = Field(None, description="已上传文件的路径（text 为空时读取）")
+
+class CorpusAnalysisRequest(BaseModel):
+    documents: List[CorpusDocument] = Field(..., min_length=1, max_length=1000, description="待分析的文档列表")
+    options: List[str] = Field(["statistics", "keywords", "word_frequency"], description="每篇文档的基础分析选项")
+    summary_length: int = Field(3, ge=1, le=50, description="摘要的句子数")
+    summary_method: str = Field("textrank", pattern="^(textrank|tfidf)$", description="摘要的句子打分方法")
+    top_terms: int = Field(50, ge=1, le=1000, description="语料汇总中返回的高 TF-IDF 词数")
+
+class IncrementalFileAnalysisRequest(BaseModel):
+    file_path: str = Field(..., description="已上传文件的路径（PDF 逐页、EPUB 逐章节读取）")
+    top_n: int = Field(20, ge=1, le=1000, description="返回的高频词数")
+    emit_every_chars: int = Field(100_000, ge=1_000, description="每处理约多少字符输出一次中间结果")
+
 class AnalysisResponse(BaseModel):
     # Define fields based on what your analysis returns
     # Example for basic analysis:
@@ -1,13 +1,15 @@
 """
 Analysis-related API routes.
 """
+import asyncio
 import os
 import yaml
 import json
 from fastapi import APIRouter, HTTPException, status, Body
+from fastapi.responses import StreamingResponse
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, Field
-from src.api.models.analysis import AnalysisRequest, AnalysisResponse, AnalysisTemplate
+from src.api.models.analysis import AnalysisRequest, AnalysisResponse, AnalysisTemplate, CorpusAnalysisRequest, IncrementalFileAnalysisRequest
 from src.core.tasks.manager import task_manager
 from src.core.tasks.models import TaskStatus
 from src.providers.factory import get_handler
@@ -337,7 +339,9 @@ async def start_analysis_async(request: AnalysisRequest):
         "options": request.options, # 确保模型包含 options
         "template": request.template,
         "api_provider": request.api_provider,
-        "model": request.model
+        "model": request.model,
+        "summary_length": request.summary_length,
+        "summary_method": request.summary_method
         # 可以根据需要添加其他参数
     }
 
@@ -358,6 +362,81 @@ async def start_analysis_async(request: AnalysisRequest):
     # 返回任务ID
     return {"task_id": task.id}
 
+@router.post("/analyze/batch", summary="语料批量基础分析 (NDJSON 流式返回)")
+async def analyze_corpus(request: CorpusAnalysisRequest):
+    """
+    并行分析多篇文本或已上传文件，每完成一篇输出一行 JSON
+    ({"type": "document" | "document_error", ...})，最后一行为语料汇总 ({"type": "corpus", ...})，
+    包含文档频率和语料级 TF-IDF。
+    """
+    from src.core.analyzers.corpus import iter_corpus_analysis, load_corpus_documents
+    try:
+        documents = await load_corpus_documents([doc.model_dump() for doc in request.documents])
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    logger.info(f"开始语料批量分析: {len(documents)} 篇文档, 选项: {request.options}")
+
+    async def ndjson_lines():
+        async for event in iter_corpus_analysis(
+            documents, request.options,
+            summary_length=request.summary_length, summary_method=request.summary_method,
+            top_terms=request.top_terms,
+        ):
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+@router.post("/analyze/file/stream", summary="大文件增量统计 (NDJSON 流式返回中间结果)")
+async def analyze_file_incrementally(request: IncrementalFileAnalysisRequest):
+    """
+    逐页/逐章节读取已上传文件并增量统计字数、句段数和词频，每处理约 emit_every_chars 个字符
+    输出一行中间结果 ({"type": "partial", ...})，最后一行为最终结果 ({"type": "final", ...})。
+    读取中途出错时输出 {"type": "error", "detail": ...} 并结束。
+    """
+    from src.core.analyzers.corpus import resolve_uploaded_file
+    from src.core.analyzers.incremental import iter_file_results
+    try:
+        full_path = resolve_uploaded_file(request.file_path)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    logger.info(f"开始增量文件分析: {request.file_path}")
+
+    async def ndjson_lines():
+        results = iter_file_results(full_path, top_n=request.top_n, emit_every_chars=request.emit_every_chars)
+        while True:
+            try:
+                # 解析和分词都是同步的 CPU 工作，每一步放到线程中执行
+                snapshot = await asyncio.to_thread(next, results, None)
+            except Exception as e:
+                logger.error(f"增量文件分析失败 ({request.file_path}): {e}", exc_info=True)
+                yield json.dumps({"type": "error", "detail": str(e)}, ensure_ascii=False) + "\n"
+                return
+            if snapshot is None:
+                return
+            event = {"type": "final" if snapshot["final"] else "partial", **snapshot}
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+@router.post("/analyze/batch/async", response_model=dict, summary="开始异步语料批量基础分析任务")
+async def start_corpus_analysis_async(request: CorpusAnalysisRequest):
+    """创建 analysis_type 为 corpus 的任务，进度按已完成文档数更新，结果包含逐篇结果与语料汇总"""
+    task_payload = {
+        "analysis_type": "corpus",
+        "documents": [doc.model_dump() for doc in request.documents],
+        "options": request.options,
+        "summary_length": request.summary_length,
+        "summary_method": request.summary_method,
+        "top_terms": request.top_terms,
+    }
+    try:
+        task = await task_manager.create_task(task_payload)
+        logger.info(f"Created corpus analysis task {task.id} with {len(request.documents)} document(s).")
+    except Exception as e:
+        logger.error(f"Failed to create corpus analysis task: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to create analysis task: {str(e)}")
+    return {"task_id": task.id}
+
 @router.post("/analyze", response_model=dict, summary="执行同步文本分析")
 async def analyze_text(request: AnalysisRequest):
     """
@@ -392,10 +471,17 @@ async def analyze_text(request: AnalysisRequest):
         try:
             # Keep using async if the basic analyzer is async
             from src.core.analyzers.basic_analyzer import perform_basic_analysis
-            result = await perform_basic_analysis(text_to_analyze, request.options)
+            from src.core.analyzers.engine import AnalysisTimeoutError
+            result = await perform_basic_analysis(
+                text_to_analyze, request.options,
+                summary_length=request.summary_length, summary_method=request.summary_method
+            )
         except ImportError:
              logger.error("Basic analyzer not found or import failed.")
              raise HTTPException(status_code=501, detail="Basic analysis is not available.")
+        except AnalysisTimeoutError as e:
+            logger.warning(f"基础分析超时: {e}")
+            raise HTTPException(status_code=504, detail="基础分析超时，请缩短文本或使用异步任务接口")
         except Exception as e:
             logger.error(f"基础分析失败: {e}", exc_info=True)
             raise HTTPException(status_code=500, detail=f"基础分析处理失败: {str(e)}")
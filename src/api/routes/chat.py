@@ -2,6 +2,7 @@
 
 import json
 import logging
+from functools import partial
 from typing import List, Optional, Dict, Any, AsyncGenerator
 import uuid
 import os
@@ -13,8 +14,13 @@ from sse_starlette.sse import EventSourceResponse
 from pydantic import BaseModel, Field
 
 from src.providers import factory
+from src.providers.router import provider_router
 from src.utils.error_handler import handle_error, raise_http_error, APIError
 from src.api import auth
+from src.utils.content_filter import ContentBlockedError, StreamOutputFilter, content_filter
+from src.utils.sse import CoalesceSettings, coalesce_deltas, dumps_json
+from src.utils.stream_trace import StreamTrace
+from src.config.app_config import get_app_config
 
 日志记录器 = logging.getLogger(__name__)
 
@@ -67,6 +73,12 @@ class ChatRequest(BaseModel):
     stop: Optional[List[str]] = Field(
         None, description="停止生成的标记列表"
     )
+    coalesce_ms: Optional[float] = Field(
+        None, ge=0, le=1000, description="流式响应中相邻文本增量合并下发的最长等待毫秒数，0 表示不合并；未设置时使用服务端配置"
+    )
+    coalesce_bytes: Optional[int] = Field(
+        None, ge=1, description="合并缓存达到该字节数时立即下发；未设置时使用服务端配置"
+    )
     # Can add other parameters like top_p as needed
 
 
@@ -84,13 +96,135 @@ class ChatResponse(BaseModel):
 )
 
 
+# --- 敏感词过滤 ---
+
+
+def _filter_user_messages(request_id: str, messages: List[ChatMessage]) -> None:
+    """检查用户消息中的敏感词：block 抛出 ContentBlockedError，mask 就地替换消息内容，report 只记录日志"""
+    if not content_filter.enabled:
+        return
+    action = content_filter.action
+    for index, message in enumerate(messages):
+        if message.role != "user" or not message.content:
+            continue
+        if action == "mask":
+            masked, matches = content_filter.mask(message.content)
+        else:
+            masked, matches = message.content, content_filter.scan(message.content)
+        if not matches:
+            continue
+        日志记录器.warning(
+            f"请求ID {request_id} - 用户消息 #{index} 命中敏感词 ({action}): {[m.to_dict() for m in matches]}"
+        )
+        if action == "block":
+            raise ContentBlockedError(matches, f"user message #{index}")
+        message.content = masked
+
+
+def _filter_stream_chunk(
+    output_filter: Optional[StreamOutputFilter], chunk: Any
+) -> Optional[Any]:
+    """
+    把流式块中的文本增量 (choices[0].delta.content) 交给输出过滤器，其余块原样返回。
+
+    只扫描新到的增量，自动机状态在过滤器中跨块保留。mask 模式下内容可能被暂存，
+    此时返回 None 表示本块无需下发；block 模式命中时抛出 ContentBlockedError。
+    """
+    if output_filter is None or not isinstance(chunk, dict):
+        return chunk
+    try:
+        choice = chunk["choices"][0]
+        delta = choice["delta"]
+        content = delta["content"]
+    except (KeyError, IndexError, TypeError):
+        return chunk
+    if not isinstance(content, str) or not content:
+        return chunk
+    filtered = output_filter.feed(content)
+    if filtered == content:
+        return chunk
+    if not filtered and len(delta) == 1:
+        return None
+    return {**chunk, "choices": [{**choice, "delta": {**delta, "content": filtered}}, *chunk["choices"][1:]]}
+
+
+def _flush_stream_filter(output_filter: Optional[StreamOutputFilter]) -> Optional[str]:
+    """取出 mask 模式下暂存的尾部文本，格式化为最后一个内容块"""
+    rest = output_filter.flush() if output_filter is not None else ""
+    if not rest:
+        return None
+    return f"data: {json.dumps({'choices': [{'delta': {'content': rest}}]}, ensure_ascii=False)}\n\n"
+
+
+def _blocked_error_frame(err: ContentBlockedError) -> str:
+    error_data = {
+        "error": {
+            "message": "模型输出包含敏感词，已停止生成",
+            "type": type(err).__name__,
+            "matches": [m.to_dict() for m in err.matches],
+        }
+    }
+    return f"data: {json.dumps(error_data, ensure_ascii=False)}\n\n"
+
+
+def _filter_completion(request_id: str, completion: Dict[str, Any]) -> None:
+    """非流式响应的敏感词处理，命中时在响应中附加 content_filter 字段"""
+    if not content_filter.enabled or not isinstance(completion, dict):
+        return
+    target, key = completion, "content"
+    if not isinstance(completion.get("content"), str):
+        try:
+            target = completion["choices"][0]["message"]
+        except (KeyError, IndexError, TypeError):
+            return
+    text = target.get(key) if isinstance(target, dict) else None
+    if not isinstance(text, str) or not text:
+        return
+    action = content_filter.action
+    if action == "mask":
+        masked, matches = content_filter.mask(text)
+    else:
+        masked, matches = text, content_filter.scan(text)
+    if not matches:
+        return
+    日志记录器.warning(f"请求ID {request_id} - 模型输出命中敏感词 ({action}): {[m.to_dict() for m in matches]}")
+    if action == "block":
+        raise ContentBlockedError(matches, "model output")
+    target[key] = masked
+    completion["content_filter"] = {"action": action, "matches": [m.to_dict() for m in matches]}
+
+
+def _coalesce_settings(
+    coalesce_ms: Optional[float] = None, coalesce_bytes: Optional[int] = None
+) -> Optional[CoalesceSettings]:
+    """请求参数优先，其次服务端 stream_coalesce 配置；返回 None 表示逐块下发"""
+    config = get_app_config().stream_coalesce
+    if coalesce_ms is None:
+        if not config.enabled:
+            return None
+        coalesce_ms = config.max_delay_ms
+    if coalesce_ms <= 0:
+        return None
+    return CoalesceSettings(max_delay_ms=coalesce_ms, max_bytes=coalesce_bytes or config.max_bytes)
+
+
 async def stream_generator(
-    handler: Any, payload: Dict[str, Any]
+    handler: Any, payload: Dict[str, Any], coalesce: Optional[CoalesceSettings] = None
 ) -> AsyncGenerator[str, None]:
-    """异步生成器，用于处理流式响应并格式化为 SSE。"""
+    """异步生成器，用于处理流式响应并格式化为 SSE；coalesce 不为空时合并相邻的文本增量。"""
+    output_filter = content_filter.output_filter("stream output")
+    # 逐块路径不写日志；需要排查时打开 stream_trace 采样记录
+    trace = StreamTrace("chat stream_generator")
+    chunk_count = 0
+    chunks = handler.stream_chat(**payload)
+    encode = partial(json.dumps, ensure_ascii=False)
+    if coalesce is not None:
+        chunks = coalesce_deltas(chunks, coalesce)
+        encode = dumps_json
     try:
         # Assume handler.stream_chat is an async generator
-        async for chunk in handler.stream_chat(**payload):
+        async for chunk in chunks:
+            chunk_count += 1
             sse_data = None  # Initialize sse_data for each chunk
             if isinstance(chunk, dict):
                 # ADDED: Check if this is a statistics block yielded from the handler
@@ -98,6 +232,10 @@ async def stream_generator(
                    "prompt_eval_count" in chunk and \
                    "eval_count" in chunk:
                     日志记录器.info(f"Chat route: Received stats block from handler: {json.dumps(chunk, ensure_ascii=False)}")
+                    # 统计块标志着内容结束，先下发打码模式下暂存的尾部
+                    rest = _flush_stream_filter(output_filter)
+                    if rest:
+                        yield rest
                     # Pass the stats block as is. The frontend's streamChat function
                     # is designed to parse this specific structure for stats.
                     sse_data = chunk
@@ -124,8 +262,6 @@ async def stream_generator(
                         )
                 # Check for direct content or error keys as fallback
                 elif "content" in chunk:
-                    # 日志记录内容块
-                    日志记录器.debug(f"处理内容块: {chunk['content'][:100]}...")
                     # Format into standard structure
                     sse_data = {"choices": [{"delta": {"content": chunk["content"]}}]}
                 elif "error" in chunk:
@@ -139,15 +275,23 @@ async def stream_generator(
                 # If the handler yields raw strings, wrap them
                 sse_data = {"choices": [{"delta": {"content": chunk}}]}
 
+            sse_data = _filter_stream_chunk(output_filter, sse_data)
             if sse_data is not None:
                 # Format as SSE: data: <json_string>\n\n
-                sse_formatted = f"data: {json.dumps(sse_data, ensure_ascii=False)}\n\n"
-                日志记录器.debug(f"发送 SSE 块: {sse_formatted.strip()}")
+                sse_formatted = f"data: {encode(sse_data)}\n\n"
+                if trace.enabled:
+                    trace.record(chunk_count, "sse", sse_formatted)
                 yield sse_formatted
-            else:
-                # Log if a chunk was received but couldn't be processed
-                日志记录器.debug(f"跳过无法处理的流式块: {chunk}")
+            elif trace.enabled:
+                trace.record(chunk_count, "skipped", chunk)
+
+        rest = _flush_stream_filter(output_filter)
+        if rest:
+            yield rest
 
+    except ContentBlockedError as e:
+        日志记录器.warning(f"流式输出因敏感词被中断: {e}")
+        yield _blocked_error_frame(e)
     except APIError as e:  # 捕获自定义API错误
         日志记录器.error(f"流式处理中 API 错误: {e.message} - {getattr(e, 'details', '')}")
         error_data = {
@@ -164,6 +308,7 @@ async def stream_generator(
         error_data = {"error": {"message": "流式处理时发生内部错误", "detail": str(e)}}
         yield f"data: {json.dumps(error_data, ensure_ascii=False)}\n\n"
     finally:
+        trace.finish(chunk_count)
         # 确保总是发送[DONE]标记，以便前端知道流已结束
         日志记录器.info("流式响应生成结束，发送[DONE]标记")
         yield "data: [DONE]\n\n"
@@ -195,6 +340,9 @@ async def handle_chat(
         except ValueError as handler_err:
             日志记录器.error(f"无法获取处理器: {handler_err}")
             raise HTTPException(status_code=400, detail=f"无法获取API处理器: {str(handler_err)}")
+
+        # 检查用户输入中的敏感词
+        _filter_user_messages(request_id, request.messages)
         
         # 添加调试日志
         日志记录器.debug(f"请求ID {request_id} - 消息列表: {[type(m).__name__ for m in request.messages]}")
@@ -210,6 +358,12 @@ async def handle_chat(
             # 创建事件生成器
             async def event_generator():
                 full_response_content = "" # 初始化用于累积响应内容的变量
+                output_filter = content_filter.output_filter(f"request {request_id} output")
+                # 逐块路径不写日志；需要排查时打开 stream_trace 采样记录
+                trace = StreamTrace(f"chat request {request_id}")
+                chunk_count = 0
+                coalesce = _coalesce_settings(request.coalesce_ms, request.coalesce_bytes)
+                encode = dumps_json if coalesce is not None else partial(json.dumps, ensure_ascii=False)
                 try:
                     # 初始化聊天历史
                     chat_history = request.messages
@@ -218,14 +372,32 @@ async def handle_chat(
                     日志记录器.debug(f"请求ID {request_id} - 开始流式处理聊天请求, 消息数量: {len(chat_history)}")
                     
                     # 处理流式响应
-                    async for chunk in handler.stream_chat(
-                        messages=chat_history, 
-                        model=request.model,  # 直接使用完整的模型名称
-                        temperature=request.temperature,
-                        max_tokens=request.max_tokens,
-                        top_p=request.top_p,
-                        stop=request.stop
-                    ):
+                    # 配置了 provider_routing.endpoints.chat_stream 时按策略故障转移/对冲
+                    chunks = provider_router.stream(
+                        "chat_stream", provider_id, request.model,
+                        lambda target_handler, model: target_handler.stream_chat(
+                            messages=chat_history,
+                            model=model,  # 直接使用完整的模型名称
+                            temperature=request.temperature,
+                            max_tokens=request.max_tokens,
+                            top_p=request.top_p,
+                            stop=request.stop
+                        ),
+                        handler=handler,
+                    )
+                    if coalesce is not None:
+                        # 合并相邻的文本增量，减少帧数
+                        chunks = coalesce_deltas(chunks, coalesce)
+                    async for chunk in chunks:
+                        chunk_count += 1
+                        if isinstance(chunk, dict) and chunk.get("done") is True and "eval_count" in chunk:
+                            # 统计块标志着内容结束，先下发打码模式下暂存的尾部
+                            rest = _flush_stream_filter(output_filter)
+                            if rest:
+                                yield rest
+                        chunk = _filter_stream_chunk(output_filter, chunk)
+                        if chunk is None:
+                            continue
                         # 累积响应内容
                         # 注意：这里的 chunk 结构依赖于具体的 handler.stream_chat 实现
                         # 假设 chunk 是一个字典，且包含 'choices' -> list -> dict -> 'delta' -> 'content'
@@ -236,15 +408,19 @@ async def handle_chat(
                         except (IndexError, AttributeError, TypeError) as e:
                              日志记录器.warning(f"请求ID {request_id} - 解析流式块中的内容时出错: {e}, 块: {chunk}")
 
-                        # 添加调试日志
-                        日志记录器.debug(f"请求ID {request_id} - 收到流式数据块: {json.dumps(chunk, ensure_ascii=False)[:200]}")
-                        
                         # 确保数据被正确JSON序列化，添加所需的SSE行格式
-                        json_str = json.dumps(chunk, ensure_ascii=False)
-                        sse_formatted = f"data: {json_str}\n\n"
-                        日志记录器.debug(f"请求ID {request_id} - 发送SSE格式数据: {sse_formatted.strip()}")
+                        sse_formatted = f"data: {encode(chunk)}\n\n"
+                        if trace.enabled:
+                            trace.record(chunk_count, "sse", sse_formatted)
                         yield sse_formatted
+
+                    rest = _flush_stream_filter(output_filter)
+                    if rest:
+                        yield rest
                         
+                except ContentBlockedError as blocked_err:
+                    日志记录器.warning(f"请求ID {request_id} - 流式输出因敏感词被中断: {blocked_err}")
+                    yield _blocked_error_frame(blocked_err)
                 except APIError as api_err:
                     # 处理API错误
                     error_response = {
@@ -271,6 +447,7 @@ async def handle_chat(
                     日志记录器.debug(f"请求ID {request_id} - 发送错误SSE: {error_sse.strip()}")
                     yield error_sse
                 finally:
+                    trace.finish(chunk_count)
                     # 确保发送DONE标记
                     yield "data: [DONE]\n\n"
                     日志记录器.info(f"请求ID {request_id} - 流式处理完成，累积内容长度: {len(full_response_content)}")
@@ -291,15 +468,22 @@ async def handle_chat(
             chat_history = request.messages
             
             # 处理非流式响应
-            completion_response = await handler.chat(
-                messages=chat_history,
-                model=request.model,
-                temperature=request.temperature,
-                max_tokens=request.max_tokens,
-                top_p=request.top_p,
-                stop=request.stop
+            completion_response = await provider_router.call(
+                "chat", provider_id, request.model,
+                lambda target_handler, model: target_handler.chat(
+                    messages=chat_history,
+                    model=model,
+                    temperature=request.temperature,
+                    max_tokens=request.max_tokens,
+                    top_p=request.top_p,
+                    stop=request.stop
+                ),
+                handler=handler,
             )
             
+            # 检查模型输出中的敏感词
+            _filter_completion(request_id, completion_response)
+
             # 合并响应
             response_data.update(completion_response)
             
@@ -321,10 +505,12 @@ async def handle_chat(
                 "code": None
             }
         }
+        if isinstance(e, ContentBlockedError):
+            error_response["error"]["matches"] = [m.to_dict() for m in e.matches]
         
         # 根据异常类型设置响应状态码
         status_code = 500
-        if isinstance(e, ValueError):
+        if isinstance(e, (ValueError, ContentBlockedError)):
             status_code = 400
         elif isinstance(e, NotImplementedError):
             status_code = 501
@@ -8,6 +8,10 @@ from datetime import datetime
 import uuid
 import re
 
+from src.database.manager import async_session_factory
+from src.database import search_index
+from src.utils.logging import logger
+
 # Define the base data directory relative to this file's location or using environment variables
 # Assuming this file is in src/routers/, DATA_DIR should point to G:\Aigc\test\​GlyphMind\data
 # Adjust the path resolution as needed based on your project structure
@@ -109,7 +113,7 @@ async def get_chat_logs_list():
             )
             summaries.append(summary)
         except Exception as e:
-            print(f"Error processing log file {log_file.name}: {e}") # Log error for debugging
+            logger.error(f"Error processing log file {log_file.name}: {e}")
             # Optionally skip corrupted files or add an error indicator
             continue
             
@@ -165,21 +169,21 @@ async def get_chat_log_detail(chat_id: str):
                                  timestamp_in_seconds = msg_timestamp_raw / 1000.0
                              parsed_msg_timestamp = datetime.fromtimestamp(timestamp_in_seconds)
                          except (ValueError, OSError) as e: # Added OSError for Errno 22
-                             print(f"Warning: Could not convert numeric timestamp {msg_timestamp_raw} (seconds: {timestamp_in_seconds if 'timestamp_in_seconds' in locals() else 'N/A'}) to datetime: {e}")
+                             logger.warning(f"Could not convert numeric timestamp {msg_timestamp_raw} (seconds: {timestamp_in_seconds}) to datetime: {e}")
                              pass # Keep as None
                      elif isinstance(msg_timestamp_raw, str):
                          try:
                              parsed_msg_timestamp = datetime.fromisoformat(msg_timestamp_raw.replace('Z', '+00:00'))
                          except ValueError:
-                             print(f"Warning: Could not parse ISO string timestamp {msg_timestamp_raw}.")
+                             logger.warning(f"Could not parse ISO string timestamp {msg_timestamp_raw}.")
                              pass # Keep as None
                      else:
-                         print(f"Warning: Unexpected type for timestamp {msg_timestamp_raw}: {type(msg_timestamp_raw)}")
+                         logger.warning(f"Unexpected type for timestamp {msg_timestamp_raw}: {type(msg_timestamp_raw)}")
 
                  # Ensure content is a string
                  msg_content = msg.get("content")
                  if not isinstance(msg_content, str):
-                     print(f"Warning: Message content is not a string (type: {type(msg_content)}), converting to string. Value: {msg_content}")
+                     logger.warning(f"Message content is not a string (type: {type(msg_content)}), converting to string.")
                      msg_content = str(msg_content)
 
                  parsed_messages.append(ChatMessage(
@@ -189,7 +193,7 @@ async def get_chat_log_detail(chat_id: str):
                  ))
             else:
                  # Handle potentially malformed message entries
-                 print(f"Skipping malformed message in {chat_id}.json: {msg}")
+                 logger.warning(f"Skipping malformed message in {chat_id}.json: {msg}")
 
 
         return ChatLogDetail(
@@ -202,7 +206,7 @@ async def get_chat_log_detail(chat_id: str):
     except json.JSONDecodeError:
         raise HTTPException(status_code=500, detail=f"Error decoding JSON from chat log file: {chat_id}.json")
     except Exception as e:
-        print(f"Error reading chat log file {log_file.name}: {e}")
+        logger.error(f"Error reading chat log file {log_file.name}: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to read chat log details: {e}") 
 
 # 新增：保存聊天记录端点
@@ -241,7 +245,25 @@ async def save_chat_log(chat_log: SaveChatLogRequest):
         with open(file_path, 'w', encoding='utf-8') as f:
             json.dump(save_data, f, ensure_ascii=False, indent=2)
             
-        print(f"Chat log saved successfully to {file_path}")
+        logger.info(f"Chat log saved successfully to {file_path}")
+
+        # 更新全文搜索索引（以文件名作为ID，与详情接口一致；失败不影响保存）
+        try:
+            first_user_msg = next(
+                (str(msg.get("content")) for msg in chat_log.messages if msg.get("role") == "user"),
+                f"{chat_log.provider}/{chat_log.model}"
+            )
+            async with async_session_factory() as db:
+                await search_index.index_document(
+                    db,
+                    search_index.KIND_CHAT,
+                    file_path.stem,
+                    first_user_msg[:100],
+                    search_index.chat_search_text(chat_log.messages),
+                )
+                await db.commit()
+        except Exception as index_err:
+            logger.warning(f"Failed to index chat log {file_path.stem}: {index_err}")
         
         return SaveChatLogResponse(
             id=chat_id,
@@ -249,5 +271,5 @@ async def save_chat_log(chat_log: SaveChatLogRequest):
             message=f"Chat log saved successfully with ID: {chat_id}"
         )
     except Exception as e:
-        print(f"Error saving chat log: {e}")
+        logger.error(f"Error saving chat log: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to save chat log: {str(e)}") 
\ No newline at end of file
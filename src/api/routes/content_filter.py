@@ -0,0 +1,44 @@
+"""
+API routes for the sensitive-word content filter.
+"""
+from typing import List
+
+from fastapi import APIRouter
+from pydantic import BaseModel, Field
+
+from src.utils.content_filter import content_filter
+from src.utils.logging import logger
+
+# --- Pydantic Models ---
+
+class ScanRequest(BaseModel):
+    text: str = Field(..., description="待检查的文本")
+
+class MatchItem(BaseModel):
+    word: str
+    start: int
+    end: int
+
+class ScanResponse(BaseModel):
+    enabled: bool
+    action: str
+    matches: List[MatchItem]
+    masked_text: str
+    word_count: int = Field(..., description="当前词表中的词数")
+
+# --- Router Definition ---
+router = APIRouter(prefix="/content-filter", tags=["content-filter"])
+
+@router.post("/scan", response_model=ScanResponse, summary="检查文本中的敏感词")
+async def scan_text(request: ScanRequest):
+    """返回所有命中 (含字符偏移) 以及打码后的文本，不受 action 配置影响"""
+    masked_text, matches = content_filter.mask(request.text)
+    if matches:
+        logger.debug(f"Content filter scan found {len(matches)} match(es) in {len(request.text)} chars.")
+    return ScanResponse(
+        enabled=content_filter.enabled,
+        action=content_filter.action,
+        matches=[MatchItem(**m.to_dict()) for m in matches],
+        masked_text=masked_text,
+        word_count=len(content_filter.automaton.words),
+    )
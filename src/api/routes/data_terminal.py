@@ -2,19 +2,22 @@
 API routes for managing and viewing results (Data Terminal).
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from typing import List, Optional, Dict, Any
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, desc
+from sqlalchemy import select, func, desc, delete as sa_delete
 import os
 from pathlib import Path
 import json
 from pydantic import BaseModel, Field
 from datetime import datetime
 
-from src.database.manager import get_db, list_results, Result as DbResult, update_result_name
-from src.utils.cache import get_analysis_result
+from src.database.manager import get_db, list_results_page, Result as DbResult, update_result_name
+from src.database.manager import ResultPayload, is_db_stored, update_result_payload
+from src.utils.cache import get_analysis_result, encode_result_payload, PAYLOAD_ENCODING
+from src.database import search_index
 from src.utils.logging import logger
+from src.api.routes.results import result_filters
 
 # --- Pydantic Models --- 
 
@@ -55,16 +58,23 @@ except NameError:
 
 @router.get("/", response_model=List[ResultResponse], summary="List all result metadata")
 async def get_all_results(
+    response: Response,
     db: AsyncSession = Depends(get_db),
-    limit: int = 100, # Add pagination parameters
-    offset: int = 0
+    limit: int = Query(100, ge=1, le=1000), # Add pagination parameters
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Keyset cursor from the X-Next-Cursor header of the previous page"),
+    filters: Dict[str, Any] = Depends(result_filters)
 ):
-    """Retrieve a list of all stored result metadata, ordered by most recent first."""
-    logger.info(f"Received request to list results (limit={limit}, offset={offset})")
+    """Retrieve a page of stored result metadata, ordered by most recent first, filtered on the server."""
+    logger.info(f"Received request to list results (limit={limit}, offset={offset}, cursor={bool(cursor)})")
     try:
-        results_db = await list_results(db, limit=limit, offset=offset)
+        results_db, next_cursor = await list_results_page(db, limit=limit, offset=offset, cursor=cursor, **filters)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
         # Pydantic models will automatically convert the list of DbResult objects
         return results_db 
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.exception(f"Error fetching results: {e}")
         raise HTTPException(
@@ -114,6 +124,12 @@ async def rename_result(
         success = await update_result_name(db, result_id, new_name)
         if not success:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Result not found")
+        try:
+            await search_index.update_document_title(db, search_index.KIND_RESULT, result_id, new_name)
+            await db.commit()
+        except Exception as index_err:
+            await db.rollback()
+            logger.warning(f"Failed to update search index title for result {result_id}: {index_err}")
         return {"status": "success", "message": "Result renamed successfully."}
     except Exception as e:
         logger.exception(f"Error renaming result {result_id}: {e}")
@@ -143,9 +159,11 @@ async def delete_result(
     file_path_relative = record.file_path
     record_name = record.name # For logging
 
-    # 2. Delete the database record
+    # 2. Delete the database record, its stored payload (if any) and its search index entry in one transaction
     try:
         await db.delete(record)
+        await db.execute(sa_delete(ResultPayload).where(ResultPayload.result_id == result_id))
+        await search_index.remove_document(db, search_index.KIND_RESULT, result_id)
         await db.commit()
         logger.info(f"Successfully deleted database record for {result_id} ('{record_name}')")
     except Exception as db_err:
@@ -154,7 +172,9 @@ async def delete_result(
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error during deletion")
 
     # 3. Delete the associated file
-    if file_path_relative:
+    if is_db_stored(record):
+        pass # Payload was stored in the database and is already gone
+    elif file_path_relative:
         try:
             absolute_file_path = PROJECT_ROOT_DIR / file_path_relative
             if absolute_file_path.is_file():
@@ -172,6 +192,30 @@ async def delete_result(
 
     return {"status": "success", "message": "Result deleted successfully.", "id": result_id}
 
+def _apply_content_update(data: Dict[str, Any], new_content: str, result_id: str) -> bool:
+    """
+    Replaces the main text of a result payload.
+    Tries the common fields where the main text might reside and updates all that exist.
+    """
+    updated = False
+    potential_keys = ['result', 'content', 'text', 'analysis_result', 'output', 'output_text', 'summary', 'generated_text']
+    for key in potential_keys:
+        if key in data:
+            logger.debug(f"Updating key '{key}' in {result_id}")
+            data[key] = new_content
+            updated = True
+    return updated
+
+async def _reindex_result(db: AsyncSession, result_id: str, name: Optional[str], data: Dict[str, Any]) -> None:
+    try:
+        await search_index.index_document(
+            db, search_index.KIND_RESULT, result_id, name, search_index.result_search_text(data)
+        )
+        await db.commit()
+    except Exception as index_err:
+        await db.rollback()
+        logger.warning(f"Failed to re-index updated result {result_id}: {index_err}")
+
 # --- Add PUT Endpoint for updating content --- 
 @router.put("/{result_id}/content", status_code=status.HTTP_200_OK, summary="Update the content of a result file")
 async def update_result_content(
@@ -192,6 +236,22 @@ async def update_result_content(
         logger.warning(f"Result record with ID '{result_id}' not found for content update.")
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Result record not found")
 
+    # Database-stored payload: decode, update and re-encode in place
+    if is_db_stored(record):
+        data = await get_analysis_result(result_id, db)
+        if data is None:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to read existing result content")
+        if not _apply_content_update(data, new_content, result_id):
+            logger.warning(f"No standard content key found in {result_id} to update. Content not modified.")
+        try:
+            payload_data, payload_size = encode_result_payload(data)
+            await update_result_payload(db, result_id, payload_data, PAYLOAD_ENCODING, payload_size)
+        except Exception as write_err:
+            logger.error(f"Failed to store updated content for result {result_id}: {write_err}", exc_info=True)
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to save updated result content")
+        await _reindex_result(db, result_id, record.name, data)
+        return {"status": "success", "message": "Result content updated successfully.", "id": result_id}
+
     if not record.file_path:
         logger.error(f"Result record {result_id} found, but file_path is missing. Cannot update content.")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="File path missing for result")
@@ -215,18 +275,7 @@ async def update_result_content(
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to read existing result file")
 
     # 3. Update the relevant field(s) with the new content
-    #    Try updating common fields where the main text might reside.
-    updated = False
-    potential_keys = ['result', 'content', 'text', 'analysis_result', 'output', 'output_text', 'summary', 'generated_text']
-    for key in potential_keys:
-        if key in data:
-            logger.debug(f"Updating key '{key}' in {result_id}")
-            data[key] = new_content
-            updated = True
-            # break # Option: Stop after updating the first found key?
-                     # Let's update all found keys for now.
-
-    if not updated:
+    if not _apply_content_update(data, new_content, result_id):
         logger.warning(f"No standard content key found in {result_id} to update. File not modified.")
         # Decide if this is an error or just a warning. Let's return success but log a warning.
         # Alternatively, could raise an HTTPException here.
@@ -241,6 +290,8 @@ async def update_result_content(
         logger.error(f"Failed to write updated content to file {absolute_file_path}: {write_err}", exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to save updated result file")
 
+    await _reindex_result(db, result_id, record.name, data)
+
     return {"status": "success", "message": "Result content updated successfully.", "id": result_id}
 
 # --- Placeholder for future endpoints --- 
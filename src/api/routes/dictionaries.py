@@ -0,0 +1,32 @@
+"""
+API routes for analysis dictionaries (jieba user dictionaries and IDF tables).
+"""
+from typing import Any, Dict
+
+from fastapi import APIRouter, HTTPException, status
+
+from src.config.app_config import get_app_config
+from src.core.analyzers.dictionaries import build_corpus_idf, ensure_dictionaries_loaded, get_dictionary_status
+from src.core.analyzers.engine import AnalysisTimeoutError, analysis_engine
+from src.utils.logging import logger
+
+# --- Router Definition ---
+router = APIRouter(prefix="/dictionaries", tags=["dictionaries"])
+
+@router.get("", response_model=Dict[str, Any], summary="查看当前生效的用户词典与 IDF 表")
+async def dictionary_status():
+    return get_dictionary_status()
+
+@router.post("/corpus-idf/rebuild", response_model=Dict[str, Any], summary="用已上传文档重建语料 IDF 表")
+async def rebuild_corpus_idf():
+    """在分析进程池中重建；各进程在下一次分析时检测到新表并自动加载"""
+    timeout = get_app_config().dictionaries.build_timeout_seconds
+    try:
+        summary = await analysis_engine.run(build_corpus_idf, timeout=timeout)
+    except AnalysisTimeoutError as e:
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to rebuild corpus IDF table: {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"重建语料 IDF 表失败: {e}")
+    ensure_dictionaries_loaded(force=True)
+    return {"build": summary, "status": get_dictionary_status()}
@@ -0,0 +1,26 @@
+"""
+API routes for provider call metrics (Prometheus exposition and JSON summary).
+"""
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Query
+from fastapi.responses import PlainTextResponse
+
+from src.providers.instrumentation import summary
+from src.utils.metrics import registry
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# --- Router Definition ---
+# /metrics 按 Prometheus 惯例挂在根路径，汇总接口在 /api 下
+router = APIRouter(tags=["metrics"])
+
+@router.get("/metrics", response_class=PlainTextResponse, summary="Prometheus 格式的提供商调用指标")
+async def prometheus_metrics():
+    """Counters and histograms of provider calls in the Prometheus text format"""
+    return PlainTextResponse(registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+@router.get("/api/metrics/summary", summary="按提供商/模型汇总的延迟、首字延迟、吞吐与错误率")
+async def metrics_summary(provider: Optional[str] = Query(None, description="只返回该提供商 (标准名称)")) -> Dict[str, Any]:
+    """Per provider/model request counts, error rate, retries, latency / TTFT quantiles (ms) and tokens per second"""
+    return {"providers": summary(provider)}
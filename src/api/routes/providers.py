@@ -31,6 +31,7 @@ from src.config.api_manager import api_manager
 
 from src.utils.logging import logger as 日志记录器
 from src.utils.cache import cache as 缓存管理器
+from src.providers.health import provider_health
 from src.validation.error_handler import APIError, ConfigurationError
 
 # --- Schema Definitions ---
@@ -522,6 +523,8 @@ async def 保存所有设置(
         success, message = api_manager_instance.save_settings_to_env(env_vars_to_update)
         if success:
             日志记录器.info(f"设置成功保存: {message}")
+            # 配置已变化，缓存的提供商状态作废
+            provider_health.invalidate()
             # NOTE: No need to call reload_configs on api_manager anymore.
             # Factory reads .env in real-time.
             return JSONResponse(content={"status": "success", "message": message})
@@ -1039,174 +1042,31 @@ async def 获取模型列表(provider_name: str): # No dependency needed
         return JSONResponse(content=response_data, status_code=500)
 
 
-# --- Provider Status Endpoint ---
-@提供商路由.get("/provider-status/{provider_name}", summary="获取指定提供商的状态信息")
-async def 获取提供商状态(provider_name: str): # No dependency needed
+# --- Provider Status Endpoints ---
+@提供商路由.get("/provider-status", summary="批量获取提供商状态 (读取缓存，过期项并发探测)")
+async def 批量获取提供商状态(
+    providers: Optional[str] = Query(None, description="逗号分隔的提供商名称；默认所有已配置的提供商"),
+    refresh: bool = Query(False, description="忽略缓存，立即并发探测")
+):
     """
-    Checks the status of a provider.
-    Attempts to instantiate the handler (which reads .env).
-    Success implies basic configuration might be present.
-    Includes a specific online check for Ollama.
+    Status of several providers in one call. Cached statuses are returned as is;
+    missing or stale ones (and all of them with refresh=true) are probed concurrently,
+    each with its own timeout.
     """
-    # 安全初始化变量，防止未定义错误
-    model = "unknown"  # 默认值
-    provider = "unknown"  # 默认值
-    start_time = None  # 初始化为None
+    names = [name.strip() for name in providers.split(",") if name.strip()] if providers else None
+    return {"providers": await provider_health.statuses(names, refresh=refresh)}
 
-    日志记录器.info(f"获取提供商状态: {provider_name}")
-    status = "error" # Default status
-    message = "未知错误"
-    standard_name = "" # Initialize
-    ollama_endpoint = None
 
-    try:
-        # 1. Standardize name first
-        standard_name = standardize_provider_name(provider_name)
-
-        # 2. Attempt to get the handler. This implicitly checks:
-        #    - Provider is known (metadata exists)
-        #    - Handler class can be imported
-        #    - Basic .env config reading works
-        #    - Handler __init__ succeeds
-        日志记录器.info(f"尝试创建提供商 '{standard_name}' 的处理器实例，从 .env 读取最新配置")
-        
-        # 读取.env文件以确保获取最新的配置
-        dotenv_path = dotenv.find_dotenv(filename='.env', raise_error_if_not_found=False, usecwd=True)
-        if dotenv_path:
-            dotenv.load_dotenv(dotenv_path=dotenv_path, override=True)
-            日志记录器.debug(f"已从路径读取最新的.env文件: {dotenv_path}")
-        
-        # 对于Ollama，尝试直接读取endpoint配置
-        if standard_name == "ollama_local":
-            ollama_endpoint = os.environ.get("OLLAMA_ENDPOINT") or os.environ.get("OLLAMA_BASE_URL")
-            if not ollama_endpoint:
-                ollama_endpoint = "http://localhost:11434"  # 使用默认值
-                日志记录器.info(f"未找到Ollama端点配置，使用默认值: {ollama_endpoint}")
-        
-        handler = get_handler(standard_name)  # 尝试获取处理器实例
-        if handler:
-            日志记录器.info(f"Provider '{standard_name}' Handler instantiated successfully. Basic config likely present.")
-            status = "ok"  # Initial status if handler creation succeeds
-            message = "基本配置有效且 Handler 实例化成功。"
-        else:
-            status = "error"
-            message = "无法创建处理器实例，请检查配置"
-            日志记录器.warning(f"无法为提供商 '{standard_name}' 创建处理器实例")
-            return {"provider": standard_name, "status": status, "message": message}
-
-        # --- 3. Specific check for Ollama ---
-        if standard_name == "ollama_local":
-            日志记录器.debug("为 Ollama 执行额外的在线检查")
-            # Ensure we have the endpoint
-            if not ollama_endpoint:
-                ollama_endpoint = handler.endpoint if hasattr(handler, 'endpoint') else "http://localhost:11434"
-                日志记录器.debug(f"从处理器获取Ollama端点: {ollama_endpoint}")
-            
-            # 使用处理器的内置方法检查服务状态
-            try:
-                # 直接使用handler的check_service_status方法
-                if hasattr(handler, 'check_service_status'):
-                    status_result = await handler.check_service_status()
-                    if status_result["status"] == "available":
-                        status = "ok"
-                        message = f"Ollama服务在线且可访问：{status_result.get('message', '')}"
-                    else:
-                        status = "error"
-                        message = status_result.get('message', "Ollama服务不可用")
-                    
-                    日志记录器.info(f"Ollama服务状态检查结果: {status} - {message}")
-                    return {"provider": standard_name, "status": status, "message": message}
-                
-                # 备选方案：使用handler的get_available_models方法
-                if hasattr(handler, 'get_available_models'):
-                    models = await handler.get_available_models()
-                    if models and len(models) > 0:
-                        status = "ok"
-                        message = f"Ollama服务在线且可访问，发现 {len(models)} 个模型"
-                    else:
-                        status = "warning"
-                        message = "Ollama服务可能在线，但未发现任何模型"
-                    
-                    日志记录器.info(f"Ollama模型列表检查结果: {status} - {message}")
-                    return {"provider": standard_name, "status": status, "message": message}
-                
-                # 如果前两种方法都不可用，回退到aiohttp直接检查
-                日志记录器.debug("回退到直接HTTP检查Ollama状态")
-                
-                # 定义检查函数
-                async def check_ollama_direct(endpoint_url):
-                    try:
-                        async with aiohttp.ClientSession() as session:
-                            # Use a short timeout
-                            # Check /api/tags or just / for basic reachability
-                            check_url = f"{endpoint_url.rstrip('/')}/api/tags" # More reliable than root
-                            日志记录器.debug(f"正在检查Ollama可达性: {check_url}")
-                            async with session.get(check_url, timeout=3.0) as response:
-                                if response.status == 200:
-                                    try:
-                                        # 尝试解析响应以验证内容
-                                        data = await response.json()
-                                        if 'models' in data:
-                                            models_count = len(data['models'])
-                                            日志记录器.info(f"Ollama服务在 {endpoint_url} 检测活跃，找到 {models_count} 个模型")
-                                            return True, f"Ollama服务在线且可访问，发现 {models_count} 个模型。"
-                                        else:
-                                            日志记录器.info(f"Ollama服务在 {endpoint_url} 检测活跃，但未找到模型列表")
-                                            return True, "Ollama服务在线且可访问，但未找到模型列表。"
-                                    except Exception as json_err:
-                                        日志记录器.warning(f"Ollama响应解析失败: {json_err}")
-                                        return True, "Ollama服务在线但响应格式异常。"
-                                else:
-                                    日志记录器.warning(f"Ollama服务在 {endpoint_url} 响应状态 {response.status} (GET {check_url})")
-                                    return False, f"Ollama服务响应异常 (状态: {response.status})。"
-                    except asyncio.TimeoutError:
-                        日志记录器.warning(f"连接Ollama服务 {endpoint_url} 超时")
-                        return False, "连接Ollama服务超时。请确认Ollama服务已启动并监听正确端口。"
-                    except aiohttp.ClientConnectorError as conn_err:
-                        日志记录器.warning(f"无法连接到Ollama服务 {endpoint_url}: {conn_err}")
-                        return False, f"无法连接到Ollama服务地址 ({conn_err})。请检查Ollama是否运行及端口配置是否正确。"
-                    except Exception as e:
-                        日志记录器.error(f"检查Ollama服务 {endpoint_url} 时发生未知错误: {e}", exc_info=True)
-                        return False, f"检查Ollama服务时出错: {e}"
-                
-                # 运行检查（不需要nest_asyncio，因为我们在异步函数中运行）
-                is_running, running_message = await check_ollama_direct(ollama_endpoint)
-                
-                # 更新状态和消息
-                if is_running:
-                    status = "ok" # Confirm status is ok
-                    message = running_message
-                else:
-                    status = "error" # Service configured but not reachable/responding correctly
-                    message = running_message
-            except ImportError as ie:
-                日志记录器.warning(f"所需模块未安装，无法执行Ollama在线检查: {ie}")
-                status = "warning" # Status is uncertain
-                message += f" (无法执行在线检查，缺少必要模块: {ie})"
-            except Exception as e:
-                日志记录器.error(f"Ollama状态检查时发生意外错误: {e}", exc_info=True)
-                status = "error"
-                message = "无法检查Ollama状态"
-        # --- End Ollama Specific Check ---
-
-        # For other providers, successful handler instantiation is the main check for now.
-        # TODO: Implement specific connection tests for other providers if desired.
-
-        return {"provider": standard_name, "status": status, "message": message}
-
-    except ValueError as ve: # Catch errors from get_handler or standardize_provider_name
-        日志记录器.warning(f"获取提供商 '{provider_name}' 状态失败: {ve}")
-        # If standardization failed, standard_name might be empty
-        provider_key = standard_name if standard_name else provider_name
-        return {"provider": provider_key, "status": "error", "message": str(ve)}
-    except FileNotFoundError as fnf_err: # Catch if metadata or .env is missing critically
-        日志记录器.error(f"获取提供商 '{provider_name}' 状态失败 (文件未找到): {fnf_err}")
-        provider_key = standard_name if standard_name else provider_name
-        return {"provider": provider_key, "status": "error", "message": f"配置错误: {fnf_err}"}
-    except Exception as e:
-        日志记录器.exception(f"获取提供商 '{provider_name}' 状态时发生意外错误: {e}")
-        provider_key = standard_name if standard_name else provider_name
-        return {"provider": provider_key, "status": "error", "message": f"检查状态时发生意外错误: {e}"}
+@提供商路由.get("/provider-status/{provider_name}", summary="获取指定提供商的状态信息")
+async def 获取提供商状态(
+    provider_name: str,
+    refresh: bool = Query(False, description="忽略缓存，立即探测")
+):
+    """
+    Provider status (cached, see provider_health in config/app_config.yaml) plus its
+    circuit breaker / rate limiter state ("resilience").
+    """
+    return await provider_health.status(provider_name, refresh=refresh)
 
 
 # --- Debug Endpoint ---
@@ -4,18 +4,19 @@ API routes for managing and saving analysis results.
 import json
 import datetime
 from pathlib import Path
-from fastapi import APIRouter, HTTPException, status, Body, Depends
+from fastapi import APIRouter, HTTPException, status, Body, Depends, Query, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Dict, Any, Optional, List
 import os
 
 from src.utils.logging import logger
 from src.utils.error_handler import handle_error, raise_http_error
-from src.utils.cache import save_analysis_result, get_analysis_result, get_cache_dir
+from src.utils.cache import save_analysis_result, get_analysis_result, get_cache_dir, iter_result_exports
 from sqlalchemy.ext.asyncio import AsyncSession
-from src.database.manager import get_db, list_results, get_result_by_result_id, delete_result_record
-from src.database.manager import Result as DBResult
+from src.database.manager import get_db, get_result_by_result_id, delete_result_record
 from src.database import manager # Ensure manager is imported
+from src.database import search_index
 
 # --- Define Cache Directory --- 
 # Note: We're keeping this for backward compatibility, but new results will use the unified cache system
@@ -65,20 +66,101 @@ class ResultResponse(BaseModel):
 # --- Router Definition ---
 router = APIRouter(prefix="/results", tags=["results"])
 
+# --- 服务端过滤参数 (列表、计数接口共用) ---
+def result_filters(
+    type: Optional[str] = Query(None, description="Result type, e.g. 'text', 'literature', 'style'"),
+    model_info: Optional[str] = Query(None, description="Exact 'provider/model' value"),
+    provider: Optional[str] = Query(None, description="Provider part of model_info"),
+    tags: Optional[List[str]] = Query(None, description="Results must carry all of these tags"),
+    date_from: Optional[datetime.datetime] = Query(None, description="Earliest timestamp (inclusive)"),
+    date_to: Optional[datetime.datetime] = Query(None, description="Latest timestamp (inclusive)"),
+) -> Dict[str, Any]:
+    return {
+        "type": type,
+        "model_info": model_info,
+        "provider": provider,
+        "tags": tags,
+        "date_from": date_from,
+        "date_to": date_to,
+    }
+
 # --- 正确添加 GET / 路由 --- 
 @router.get("", response_model=List[ResultResponse], summary="Get list of all analysis results metadata")
-async def get_results_list(limit: int = 100, offset: int = 0, db: AsyncSession = Depends(get_db)):
+async def get_results_list(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Keyset cursor from the X-Next-Cursor header of the previous page"),
+    filters: Dict[str, Any] = Depends(result_filters),
+    db: AsyncSession = Depends(get_db)
+):
     """
-    Retrieves a list of analysis results metadata from the database using the function from manager.py.
+    Retrieves a page of analysis results metadata, newest first, filtered on the server.
+    The cursor for the next page is returned in the X-Next-Cursor response header.
     """
-    logger.info(f"Request received to list analysis results (limit={limit}, offset={offset})")
+    logger.info(f"Request received to list analysis results (limit={limit}, offset={offset}, cursor={bool(cursor)})")
     try:
-        db_results: List[DBResult] = await list_results(db, limit=limit, offset=offset)
-        # 直接使用 Pydantic 模型的 orm_mode 进行转换
-        return db_results # FastAPI 会自动处理转换
+        db_results, next_cursor = await manager.list_results_page(db, limit=limit, offset=offset, cursor=cursor, **filters)
+    except ValueError as e:
+        raise_http_error(status.HTTP_400_BAD_REQUEST, str(e))
     except Exception as e:
         logger.error(f"Error listing analysis results: {e}", exc_info=True)
         raise_http_error(status.HTTP_500_INTERNAL_SERVER_ERROR, f"Failed to list analysis results: {str(e)}")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    # 直接使用 Pydantic 模型的 orm_mode 进行转换
+    return db_results # FastAPI 会自动处理转换
+
+@router.get("/count", summary="Count analysis results matching the filters")
+async def get_results_count(
+    filters: Dict[str, Any] = Depends(result_filters),
+    db: AsyncSession = Depends(get_db)
+):
+    """Returns the number of results matching the same filters as the list endpoint."""
+    try:
+        total = await manager.count_results(db, **filters)
+    except Exception as e:
+        logger.error(f"Error counting analysis results: {e}", exc_info=True)
+        raise_http_error(status.HTTP_500_INTERNAL_SERVER_ERROR, f"Failed to count analysis results: {str(e)}")
+    return {"count": total}
+
+# --- 批量导出 (NDJSON，每行一个结果) ---
+@router.get("/export", summary="Batch export analysis results as NDJSON")
+async def export_results(
+    ids: Optional[List[str]] = Query(None, description="Result IDs to export (default: all)"),
+    type: Optional[str] = Query(None, description="Only export results of this type")
+):
+    """
+    Streams metadata and content of many results, one JSON object per line.
+    Works for both file-backed and database-stored results.
+    """
+    logger.info(f"Request received to export analysis results (ids={len(ids) if ids else 'all'}, type={type})")
+
+    async def ndjson_lines():
+        exported = 0
+        # The stream outlives the request dependencies, so it uses its own session
+        async with manager.async_session_factory() as db:
+            async for record, content in iter_result_exports(db, result_ids=ids, module_type=type):
+                line = {
+                    "result_id": record.result_id,
+                    "name": record.name,
+                    "type": record.type,
+                    "timestamp": record.timestamp.isoformat() if record.timestamp else None,
+                    "source_info": record.source_info,
+                    "model_info": record.model_info,
+                    "tags": record.tags,
+                    "content": content,
+                }
+                exported += 1
+                yield json.dumps(line, ensure_ascii=False) + "\n"
+        logger.info(f"Exported {exported} analysis results.")
+
+    filename = f"results_export_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.ndjson"
+    return StreamingResponse(
+        ndjson_lines(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 # --- 添加 Ping 测试路由 ---
 @router.get("/ping", status_code=status.HTTP_200_OK, include_in_schema=False)
@@ -333,7 +415,10 @@ async def delete_analysis_result(result_id: str, db: AsyncSession = Depends(get_
         # 假设 file_path 存储的是相对于 cache 目录的路径或完整路径
         # 我们需要更可靠地确定文件路径。save_analysis_result 使用 get_cache_dir
         cache_dir = get_cache_dir(module_type) # 获取对应模块的缓存根目录
-        if cache_dir:
+        if manager.is_db_stored(record):
+            # 内容存储在数据库中，随记录一起删除，无需处理文件
+            file_deleted = True
+        elif cache_dir:
              # result_id 通常就是文件名（不含扩展名）
             file_path_to_delete = cache_dir / f"{result_id}.json"
         else:
@@ -355,8 +440,14 @@ async def delete_analysis_result(result_id: str, db: AsyncSession = Depends(get_
              # 文件本就不存在，也算作文件删除"成功"（或无需操作）
              file_deleted = True # Consider it done if not found
 
-        # 3. 删除数据库记录
-        db_record_deleted = await delete_result_record(db, result_id)
+        # 3. 在同一事务中删除数据库记录及其全文搜索索引条目
+        try:
+            db_record_deleted = await delete_result_record(db, result_id, commit=False)
+            await search_index.remove_document(db, search_index.KIND_RESULT, result_id)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
         
         # 根据删除结果返回 (204 NO CONTENT 表示成功，无需响应体)
         if db_record_deleted:
@@ -374,10 +465,6 @@ async def delete_analysis_result(result_id: str, db: AsyncSession = Depends(get_
         # 根据错误类型判断是否需要回滚文件删除？(通常不需要)
         raise_http_error(status.HTTP_500_INTERNAL_SERVER_ERROR, f"Failed to delete analysis result: {str(e)}") 
 
-# --- Add this section in src/api/routes/results.py ---
-# (Make sure necessary imports like Depends, Body, manager are present)
-from src.database import manager # Ensure manager is imported
-
 class RenamePayload(BaseModel):
     new_name: str = Field(..., min_length=1, description="The new name for the result record")
 
@@ -395,6 +482,12 @@ async def rename_analysis_result(
         success = await manager.update_result_name(db, result_id, payload.new_name)
         if success:
             logger.info(f"Successfully renamed result {result_id}")
+            try:
+                await search_index.update_document_title(db, search_index.KIND_RESULT, result_id, payload.new_name)
+                await db.commit()
+            except Exception as index_err:
+                await db.rollback()
+                logger.warning(f"Failed to update search index title for result {result_id}: {index_err}")
             return {"status": "success", "message": "Result renamed successfully."}
         else:
             # manager.update_result_name returns False if record not found
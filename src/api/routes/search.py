@@ -0,0 +1,114 @@
+"""
+API routes for full-text search over chat logs and saved analysis results.
+"""
+import json
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.api.routes.chat_history import LOGS_DIR
+from src.database import search_index
+from src.database.manager import get_db, Result as DBResult
+from src.utils.cache import get_analysis_result
+from src.utils.logging import logger
+
+# --- Pydantic Models ---
+
+class SearchHit(BaseModel):
+    kind: str
+    doc_id: str
+    title: Optional[str] = None
+    snippet: Optional[str] = None
+    score: float
+    updated_at: Optional[str] = None
+
+class SearchResponse(BaseModel):
+    query: str
+    results: List[SearchHit]
+
+class ReindexResponse(BaseModel):
+    status: str = "success"
+    chat_logs: int = 0
+    results: int = 0
+    failed: int = 0
+
+# --- Router Definition ---
+router = APIRouter(prefix="/search", tags=["search"])
+
+@router.get("", response_model=SearchResponse, summary="Full-text search over chat logs and analysis results")
+async def search(
+    q: str = Query(..., min_length=1, description="Search query (Chinese is segmented with jieba)"),
+    kind: Optional[str] = Query(None, description="Restrict to 'chat' or 'result'"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_db)
+):
+    """Returns ranked matches with highlighted snippets (<mark>...</mark>)."""
+    if kind and kind not in search_index.VALID_KINDS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid kind '{kind}'.")
+    try:
+        hits = await search_index.search_documents(db, q, kind=kind, limit=limit, offset=offset)
+    except OperationalError as e:
+        logger.warning(f"Search query '{q}' rejected by FTS engine: {e}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid search query.")
+    except Exception as e:
+        logger.exception(f"Error running search query '{q}': {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Search failed: {str(e)}")
+    return SearchResponse(query=q, results=hits)
+
+@router.post("/reindex", response_model=ReindexResponse, summary="Rebuild the search index from existing data")
+async def reindex(db: AsyncSession = Depends(get_db)):
+    """
+    Indexes every saved chat log and analysis result. Only needed once for data
+    saved before the index existed, or after the user dictionaries change;
+    new saves/deletes keep the index up to date.
+    """
+    response = ReindexResponse()
+
+    for log_file in sorted(LOGS_DIR.glob("*.json")):
+        try:
+            with open(log_file, 'r', encoding='utf-8') as f:
+                log_data = json.load(f)
+            messages = log_data.get("messages", [])
+            first_user_msg = next(
+                (str(msg.get("content")) for msg in messages if isinstance(msg, dict) and msg.get("role") == "user"),
+                f"{log_data.get('provider', 'Unknown')}/{log_data.get('model', 'Unknown')}"
+            )
+            await search_index.index_document(
+                db, search_index.KIND_CHAT, log_file.stem, first_user_msg[:100],
+                search_index.chat_search_text(messages)
+            )
+            await db.commit()
+            response.chat_logs += 1
+        except Exception as e:
+            await db.rollback()
+            logger.warning(f"Failed to index chat log {log_file.name}: {e}")
+            response.failed += 1
+
+    records = (await db.execute(select(DBResult.result_id, DBResult.name))).all()
+    for result_id, name in records:
+        try:
+            content = await get_analysis_result(result_id, db)
+            if content is None:
+                response.failed += 1
+                continue
+            await search_index.index_document(
+                db, search_index.KIND_RESULT, result_id, name, search_index.result_search_text(content)
+            )
+            await db.commit()
+            response.results += 1
+        except Exception as e:
+            await db.rollback()
+            logger.warning(f"Failed to index result {result_id}: {e}")
+            response.failed += 1
+
+    if not response.failed:
+        await search_index.record_segmentation(db)
+        await db.commit()
+
+    logger.info(f"Search reindex finished: {response.chat_logs} chat logs, {response.results} results, {response.failed} failed.")
+    return response
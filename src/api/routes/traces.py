@@ -0,0 +1,31 @@
+"""
+API routes for request traces (span trees of recent /api requests and background tasks).
+"""
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from src.utils.tracing import tracer
+
+# --- Router Definition ---
+router = APIRouter(prefix="/traces", tags=["traces"])
+
+@router.get("", summary="最近的请求追踪")
+async def list_traces(
+    limit: int = Query(50, ge=1, le=500, description="最多返回的追踪数 (最新的在前)"),
+    min_duration_ms: float = Query(0.0, ge=0, description="只返回耗时不低于该值的追踪"),
+    name: Optional[str] = Query(None, description="只返回根 span 名称包含该文本的追踪 (如 /api/transfer 或 task.process)"),
+) -> Dict[str, Any]:
+    """Summaries (root name, duration, span and error counts) of the traces kept in memory"""
+    return {"traces": tracer.recent(limit, min_duration_ms, name)}
+
+@router.get("/{trace_id}", summary="单个追踪的 span 树")
+async def get_trace(trace_id: str) -> Dict[str, Any]:
+    """
+    Span tree of one trace; offset_ms is the start of each span relative to the root.
+    roots lists every local root (requests that continued the same traceparent each add one).
+    """
+    result = tracer.tree(trace_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Trace '{trace_id}' not found (it may have been evicted).")
+    return result
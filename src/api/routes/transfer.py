@@ -17,6 +17,7 @@ from src.core.processing.style_transfer import StyleTransfer
 from src.utils.logging import logger
 from src.utils.error_handler import handle_error, raise_http_error
 from src.utils.cache import get_analysis_result
+from src.utils.tracing import span, traced
 from src.providers.factory import get_handler # Import the handler factory
 import json
 import re # Import re for potential splitting
@@ -24,6 +25,7 @@ import re # Import re for potential splitting
 # --- Template Loading ---
 TEMPLATE_DIR = Path(__file__).resolve().parent.parent.parent / "config" / "prompt_templates"
 
+@traced("transfer.load_template")
 def load_style_extraction_template(template_name: str = "creative_style_extraction") -> Optional[Dict[str, Any]]:
     """Load style extraction template from YAML file."""
     template_path = TEMPLATE_DIR / f"{template_name}.yaml"
@@ -78,6 +80,7 @@ router = APIRouter(
 style_transfer_processor = StyleTransfer()
 
 # --- Helper function for Stage 1: Extracting Style Guidance ---
+@traced("transfer.extract_style")
 async def _extract_style_guidance(
     text: str, 
     provider: str, 
@@ -290,12 +293,14 @@ async def perform_style_transfer(request: TransferRequest = Body(...), db: Async
                 try:
                     # Call the core style transfer function for the current segment's prompt
                     # Note: We pass the *full* context-aware prompt as 'new_content_prompt' now
-                    generated_segment = await style_transfer_processor.transfer_style(
-                        style_guidance=style_guidance, 
-                        new_content_prompt=current_call_prompt, # This contains the context + current segment goal
-                        api_provider=request.provider,
-                        model=request.model
-                    )
+                    async with span("transfer.segment", index=i + 1, segments=len(prompt_segments),
+                                    prompt_length=len(current_call_prompt)):
+                        generated_segment = await style_transfer_processor.transfer_style(
+                            style_guidance=style_guidance, 
+                            new_content_prompt=current_call_prompt, # This contains the context + current segment goal
+                            api_provider=request.provider,
+                            model=request.model
+                        )
                     
                     # Basic cleaning of the generated segment (optional)
                     cleaned_segment = generated_segment.strip()
@@ -316,12 +321,13 @@ async def perform_style_transfer(request: TransferRequest = Body(...), db: Async
         else:
             # Theme is short enough, generate in one go (existing logic)
             logger.info("Theme length is within threshold. Generating text in a single call.")
-            generated_text = await style_transfer_processor.transfer_style(
-                style_guidance=style_guidance, 
-                new_content_prompt=request.new_theme,
-                api_provider=request.provider,
-                model=request.model
-            )
+            async with span("transfer.generate", prompt_length=len(request.new_theme)):
+                generated_text = await style_transfer_processor.transfer_style(
+                    style_guidance=style_guidance, 
+                    new_content_prompt=request.new_theme,
+                    api_provider=request.provider,
+                    model=request.model
+                )
         # === End of Stage 2 ===
 
         logger.info(f"Style transfer successful. Final result length: {len(generated_text)}")
@@ -1,9 +1,10 @@
 # src/config/app_config.py
 import yaml
-from pydantic import BaseModel, Field, ValidationError
+from pydantic import BaseModel, Field, ValidationError, field_validator
 from pathlib import Path
 import logging
-from typing import Optional
+import re
+from typing import Dict, List, Optional
 
 # 尝试导入全局错误类型，如果失败则定义局部类型
 try:
@@ -15,9 +16,166 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Default location of the application configuration file (project_root/config/app_config.yaml)
+APP_CONFIG_PATH = Path(__file__).resolve().parent.parent.parent / "config" / "app_config.yaml"
+
+class DatabaseConfig(BaseModel):
+    """SQLite settings applied to every connection of glyphmind_data.db and tasks.db"""
+    journal_mode: str = Field("WAL", pattern="^(?i:WAL|DELETE|TRUNCATE|PERSIST|MEMORY)$", description="PRAGMA journal_mode")
+    synchronous: str = Field("NORMAL", pattern="^(?i:OFF|NORMAL|FULL|EXTRA)$", description="PRAGMA synchronous (NORMAL is safe with WAL)")
+    cache_size_kib: int = Field(16384, ge=0, description="Page cache per connection in KiB (PRAGMA cache_size = -N)")
+    mmap_size_mb: int = Field(128, ge=0, description="Memory-mapped I/O size in MB (0 disables)")
+    busy_timeout_ms: int = Field(5000, ge=0, description="How long a connection waits for a lock before failing")
+    pool_size: int = Field(5, ge=1, description="Connections kept open by the results database pool")
+    max_overflow: int = Field(10, ge=0, description="Extra connections allowed above pool_size under load")
+    pool_timeout: float = Field(30.0, gt=0, description="Seconds to wait for a free pooled connection")
+
+class AnalysisEngineConfig(BaseModel):
+    """Process pool used for CPU-bound local analysis (jieba segmentation, TextRank, ...)"""
+    pool_size: int = Field(0, ge=0, description="Worker processes; 0 picks min(4, CPU count)")
+    job_timeout_seconds: float = Field(300.0, gt=0, description="Maximum time a caller waits for one analysis job")
+    parallel_segment_threshold_chars: int = Field(500_000, ge=0, description="Texts at least this long are segmented in parallel chunks (0 disables)")
+    segment_chunk_chars: int = Field(200_000, ge=10_000, description="Target chunk size for parallel segmentation; chunks end on paragraph boundaries")
+
+class DictionaryConfig(BaseModel):
+    """User dictionaries and IDF tables used by jieba-based analyzers"""
+    user_dict_dir: str = Field("config/dictionaries", description="Directory with user dictionaries (*.txt, jieba format) and IDF overrides (idf*.txt)")
+    compiled_dir: str = Field("data/dictionaries", description="Directory for compiled binary tables and the corpus IDF table")
+    use_corpus_idf: bool = Field(True, description="Replace jieba's built-in IDF with the corpus IDF table once it has been built")
+    min_corpus_documents: int = Field(10, ge=1, description="Minimum number of documents for the corpus IDF table to be used")
+    build_timeout_seconds: float = Field(1800.0, gt=0, description="Maximum time for rebuilding the corpus IDF table")
+
+class ContentFilterConfig(BaseModel):
+    """Sensitive-word filtering of chat input and model output"""
+    enabled: bool = Field(True, description="Scan chat input and model output against the word list")
+    action: str = Field("report", pattern="^(report|mask|block)$", description="report: log matches; mask: replace matched characters; block: reject input / stop output")
+    words_file: str = Field("data/sensitive_words.txt", description="Word list, one entry per line (relative to project root)")
+    mask_char: str = Field("*", min_length=1, max_length=1, description="Replacement character used by the mask action")
+    reload_check_seconds: float = Field(2.0, ge=0, description="How often the word list file is checked for changes")
+
+LOG_LEVEL_PATTERN = "^(?i:DEBUG|INFO|WARNING|ERROR|CRITICAL)$"
+
+class LoggingConfig(BaseModel):
+    """Log handlers, output format and per-module levels"""
+    async_handlers: bool = Field(True, description="Hand records to a background thread through a queue so file I/O never runs on the event loop")
+    queue_size: int = Field(10000, ge=0, description="Maximum records waiting for the writer thread; further records are dropped (0 = unbounded)")
+    format: str = Field("text", pattern="^(text|json)$", description="text: one formatted line per record; json: one JSON object per line")
+    file_name: str = Field("glyphmind.log", description="Log file name inside the logs directory")
+    max_bytes: int = Field(10 * 1024 * 1024, ge=0, description="Rotate the log file at this size (0 disables rotation)")
+    backup_count: int = Field(5, ge=0, description="Rotated log files to keep")
+    capture_module_loggers: bool = Field(True, description="Also write records of module loggers (logging.getLogger(__name__)) to the log file")
+    modules: Dict[str, str] = Field(default_factory=dict, description="Per-logger levels, e.g. {'src.api.routes.chat': 'INFO'}")
+
+    @field_validator("modules")
+    @classmethod
+    def _check_module_levels(cls, modules: Dict[str, str]) -> Dict[str, str]:
+        levels = {}
+        for name, level in modules.items():
+            if not re.match(LOG_LEVEL_PATTERN, str(level)):
+                raise ValueError(f"invalid level {level!r} for logger {name!r}")
+            levels[name] = str(level).upper()
+        return levels
+
+class StreamTraceConfig(BaseModel):
+    """Sampled per-chunk debug logging of streamed chat responses"""
+    enabled: bool = Field(False, description="Log sampled stream chunks at DEBUG level (off: streaming paths do no per-chunk logging)")
+    sample_every: int = Field(50, ge=1, description="Log one chunk out of every N (1 logs every chunk)")
+    max_chars: int = Field(200, ge=16, description="Chunk previews are truncated to this many characters")
+
+class StreamCoalesceConfig(BaseModel):
+    """Default merging of consecutive text deltas into fewer SSE frames (chat requests may override)"""
+    enabled: bool = Field(False, description="Merge consecutive text deltas of streamed chat responses")
+    max_delay_ms: float = Field(15.0, gt=0, le=1000, description="Longest time a delta is held before its frame is sent")
+    max_bytes: int = Field(512, ge=1, description="Send the merged frame once this many UTF-8 bytes of text are buffered")
+
+class HttpClientConfig(BaseModel):
+    """Shared aiohttp session used by provider handlers that stream over REST"""
+    limit: int = Field(100, ge=0, description="Maximum open connections across all hosts (0 = unlimited)")
+    limit_per_host: int = Field(0, ge=0, description="Maximum open connections to one host (0 = unlimited)")
+    keepalive_timeout: float = Field(30.0, gt=0, description="Seconds an idle connection is kept for reuse")
+    connect_timeout: float = Field(10.0, gt=0, description="Seconds allowed for establishing a connection")
+    dns_cache_ttl: int = Field(300, ge=0, description="Seconds resolved host addresses are cached")
+
+class RouteTargetConfig(BaseModel):
+    """A provider (and optionally a model) that a routed call may use"""
+    provider: str = Field(..., min_length=1, description="Provider name or alias")
+    model: Optional[str] = Field(None, description="Model to request; None uses the provider's default model")
+
+class EndpointRoutingConfig(BaseModel):
+    """Fallback and hedging policy of one endpoint (e.g. chat, chat_stream)"""
+    fallbacks: List[RouteTargetConfig] = Field(default_factory=list, description="Providers tried in order after the requested one fails")
+    hedge: bool = Field(False, description="Start the next provider if the current one has not answered after the hedge delay")
+    hedge_percentile: float = Field(0.95, gt=0, lt=1, description="Hedge delay is this latency percentile of the provider being hedged")
+    hedge_delay_ms: float = Field(3000.0, gt=0, description="Hedge delay used until min_samples latencies have been recorded")
+    min_hedge_delay_ms: float = Field(200.0, ge=0, description="Lower bound of the percentile-based hedge delay")
+    attempt_timeout_seconds: Optional[float] = Field(None, gt=0, description="Abandon one provider after this long (streams: until its first content); None waits for the handler's own timeout")
+
+class ProviderRoutingConfig(BaseModel):
+    """Multi-provider failover and request hedging, per endpoint"""
+    latency_window: int = Field(200, ge=10, description="Recent latencies kept per endpoint/provider/model for the hedge percentile")
+    min_samples: int = Field(20, ge=1, description="Latencies needed before the percentile replaces hedge_delay_ms")
+    endpoints: Dict[str, EndpointRoutingConfig] = Field(default_factory=dict, description="Policies by endpoint name; endpoints without one call the requested provider directly")
+
+class ProviderRateLimitConfig(BaseModel):
+    """Request and token budgets of one provider (0 = unlimited)"""
+    requests_per_minute: float = Field(0.0, ge=0, description="Calls allowed per minute")
+    tokens_per_minute: float = Field(0.0, ge=0, description="Estimated prompt + completion tokens allowed per minute")
+
+class ProviderLimitsConfig(BaseModel):
+    """Per-provider circuit breaker and adaptive rate limiter shared by all handler calls"""
+    enabled: bool = Field(True, description="Guard handler calls with the circuit breaker and rate limiter")
+    failure_threshold: int = Field(5, ge=1, description="Consecutive failures that open a provider's circuit")
+    open_seconds: float = Field(30.0, gt=0, description="Seconds an opened circuit rejects calls before letting a probe through")
+    max_open_seconds: float = Field(300.0, gt=0, description="Upper bound of the open period, which doubles each time a probe fails")
+    half_open_max_calls: int = Field(1, ge=1, description="Probe calls allowed at once while the circuit is half-open")
+    max_wait_seconds: float = Field(30.0, ge=0, description="Longest a call waits for rate-limit budget before failing with a rate-limit error")
+    default_retry_after_seconds: float = Field(5.0, ge=0, description="Cool-down after a 429 response without a Retry-After header")
+    adaptive_decrease: float = Field(0.5, gt=0, le=1, description="Factor applied to the configured rates after each 429 response")
+    adaptive_recovery: float = Field(0.05, ge=0, le=1, description="Rate factor regained per successful call (up to 1)")
+    min_rate_factor: float = Field(0.1, gt=0, le=1, description="Lowest fraction of the configured rates after repeated 429s")
+    default_completion_tokens: int = Field(512, ge=0, description="Completion tokens assumed for the token budget when a call sets no max_tokens")
+    default: ProviderRateLimitConfig = Field(default_factory=ProviderRateLimitConfig, description="Budgets of providers not listed in providers")
+    providers: Dict[str, ProviderRateLimitConfig] = Field(default_factory=dict, description="Budgets by standard provider name")
+
+class MetricsConfig(BaseModel):
+    """Provider call metrics served by /metrics and /api/metrics/summary"""
+    enabled: bool = Field(True, description="Record latency, time-to-first-token, throughput, error and retry metrics of provider calls")
+
+class TracingConfig(BaseModel):
+    """Request tracing served by /api/traces, optionally exported to an OpenTelemetry collector"""
+    enabled: bool = Field(True, description="Record a span tree for each /api request and background task")
+    max_traces: int = Field(200, ge=1, description="Most recent traces kept in memory")
+    max_spans_per_trace: int = Field(1000, ge=1, description="Spans recorded per trace before further spans are dropped")
+    otlp_endpoint: Optional[str] = Field(None, description="OTLP/HTTP traces URL of a collector (e.g. http://localhost:4318/v1/traces); None disables export")
+    otlp_service_name: str = Field("glyphmind", description="service.name resource attribute of exported spans")
+    otlp_timeout_seconds: float = Field(5.0, gt=0, description="Timeout of one export request")
+    export_interval_seconds: float = Field(5.0, gt=0, description="Seconds finished traces are batched before export")
+
+class ProviderHealthConfig(BaseModel):
+    """Cached provider status served by /api/provider-status, refreshed in the background"""
+    enabled: bool = Field(True, description="Refresh the status of configured providers in the background")
+    interval_seconds: float = Field(60.0, ge=5, description="Seconds between background status refreshes")
+    max_age_seconds: float = Field(120.0, gt=0, description="Cached statuses older than this are probed again when read")
+    probe_timeout_seconds: float = Field(5.0, gt=0, description="Timeout of one provider status probe")
+    max_concurrency: int = Field(8, ge=1, description="Provider probes run at the same time")
+
 class AppConfig(BaseModel):
     """Application Configuration Model"""
-    logging_level: str = Field("INFO", description="Logging level (e.g., DEBUG, INFO, WARNING, ERROR)")
+    logging_level: str = Field("INFO", pattern=LOG_LEVEL_PATTERN, description="Logging level (e.g., DEBUG, INFO, WARNING, ERROR)")
+    logging: LoggingConfig = Field(default_factory=LoggingConfig, description="Log handler, format and per-module level settings")
+    result_storage: str = Field("file", pattern="^(file|database)$", description="Where analysis result payloads are stored: 'file' (one JSON file each) or 'database' (compressed, in glyphmind_data.db)")
+    database: DatabaseConfig = Field(default_factory=DatabaseConfig, description="SQLite tuning and connection pool settings")
+    analysis_engine: AnalysisEngineConfig = Field(default_factory=AnalysisEngineConfig, description="Local analysis process pool settings")
+    dictionaries: DictionaryConfig = Field(default_factory=DictionaryConfig, description="User dictionary and IDF settings")
+    content_filter: ContentFilterConfig = Field(default_factory=ContentFilterConfig, description="Sensitive-word filter settings")
+    stream_coalesce: StreamCoalesceConfig = Field(default_factory=StreamCoalesceConfig, description="SSE frame coalescing for streamed chat")
+    stream_trace: StreamTraceConfig = Field(default_factory=StreamTraceConfig, description="Sampled stream chunk logging for debugging")
+    http_client: HttpClientConfig = Field(default_factory=HttpClientConfig, description="Connection pool of the shared provider HTTP session")
+    provider_routing: ProviderRoutingConfig = Field(default_factory=ProviderRoutingConfig, description="Provider failover and hedging per endpoint")
+    provider_limits: ProviderLimitsConfig = Field(default_factory=ProviderLimitsConfig, description="Per-provider circuit breaker and rate limiter")
+    metrics: MetricsConfig = Field(default_factory=MetricsConfig, description="Provider call metrics")
+    tracing: TracingConfig = Field(default_factory=TracingConfig, description="Request tracing")
+    provider_health: ProviderHealthConfig = Field(default_factory=ProviderHealthConfig, description="Background provider status checks")
     # Add other configuration fields here as your application needs them
     # Example:
     # upload_dir: str = Field("data/uploads", description="Directory for file uploads")
@@ -61,4 +219,17 @@ def load_config(config_path: Path) -> AppConfig:
         logger.error(f"Failed to load configuration from {config_path}: {e}", exc_info=True)
         # Fallback to Pydantic defaults in case of unexpected errors
         logger.warning("Falling back to default configuration due to loading error.")
-        return AppConfig() 
\ No newline at end of file
+        return AppConfig() 
+
+_app_config: Optional[AppConfig] = None
+
+def get_app_config() -> AppConfig:
+    """Returns the application configuration, loading config/app_config.yaml on first use."""
+    global _app_config
+    if _app_config is None:
+        try:
+            _app_config = load_config(APP_CONFIG_PATH)
+        except ConfigurationError as e:
+            logger.error(f"Invalid application configuration, using defaults: {e}")
+            _app_config = AppConfig()
+    return _app_config
@@ -2,15 +2,228 @@
 基础文本分析器模块 - 提供不依赖外部API的简单文本分析功能
 """
 import re
-from typing import List, Dict, Any
+from functools import cached_property
+from operator import itemgetter
+from typing import List, Dict, Any, Optional, Tuple
 import jieba
 import jieba.analyse
-from collections import Counter
+import jieba.posseg
+from jieba.analyse.textrank import UndirectWeightedGraph
+from collections import Counter, defaultdict
+from src.config.app_config import get_app_config
+from src.core.analyzers.dictionaries import ensure_dictionaries_loaded
+from src.core.analyzers.engine import AnalysisEngine, analysis_engine
+from src.core.analyzers.sentiment import analyze_sentiment
+from src.core.analyzers.summarizer import DEFAULT_SUMMARY_METHOD, summarize
 from src.utils.logging import logger
 
-async def perform_basic_analysis(text: str, options: List[str]) -> Dict[str, Any]:
+SENTENCE_SPLIT_PATTERN = re.compile(r'[。！？.!?]+')
+WORD_PATTERN = re.compile(r'\b\w+\b')
+
+# 词频分析时过滤的停用词
+FREQUENCY_STOPWORDS = frozenset(["的", "了", "和", "是", "在", "我", "有", "这", "你", "也", "都", "就", "不", "与", "之", "着"])
+
+# 与 jieba.analyse.textrank 的默认参数一致
+TEXTRANK_ALLOW_POS = frozenset(('ns', 'n', 'vn', 'v'))
+TEXTRANK_SPAN = 5
+
+# 需要词性标注（关键词 TextRank）的选项
+POS_OPTIONS = frozenset(("keywords",))
+
+
+
+class AnalysisContext:
+    """
+    一段文本的共享分析上下文。
+
+    分词、词性标注、分句和关键词候选在第一次用到时计算并缓存，
+    同一次基础分析中的各个选项（统计、关键词、摘要、情感、词频）共用这些结果，
+    整段文本最多只做一次普通分词和一次词性标注。
+    """
+
+    def __init__(self, text: str, words: Optional[List[str]] = None,
+                 pos_words: Optional[List[Tuple[str, str]]] = None):
+        ensure_dictionaries_loaded()  # 用户词典与 IDF 表（见 dictionaries.py）
+        self.text = text
+        # 已经在别处（如并行分词）得到的结果直接放入缓存
+        if words is not None:
+            self.__dict__["words"] = words
+        if pos_words is not None:
+            self.__dict__["pos_words"] = pos_words
+
+    @cached_property
+    def words(self) -> List[str]:
+        """jieba 精确模式分词结果"""
+        return list(jieba.cut(self.text))
+
+    @cached_property
+    def pos_words(self) -> List[Tuple[str, str]]:
+        """(词, 词性) 列表，仅 TextRank 需要"""
+        return [(pair.word, pair.flag) for pair in jieba.posseg.cut(self.text)]
+
+    @cached_property
+    def sentence_spans(self) -> List[Tuple[int, int]]:
+        """非空句子（去掉首尾空白）在原文中的 (起, 止) 字符偏移"""
+        spans: List[Tuple[int, int]] = []
+        position = 0
+        for match in [*SENTENCE_SPLIT_PATTERN.finditer(self.text), None]:
+            end = match.start() if match else len(self.text)
+            segment = self.text[position:end]
+            stripped = segment.strip()
+            if stripped:
+                start = position + len(segment) - len(segment.lstrip())
+                spans.append((start, start + len(stripped)))
+            if match:
+                position = match.end()
+        return spans
+
+    @cached_property
+    def sentences(self) -> List[str]:
+        """去掉空白后的非空句子"""
+        return [self.text[start:end] for start, end in self.sentence_spans]
+
+    @cached_property
+    def paragraph_spans(self) -> List[Tuple[int, int]]:
+        """按空行分隔的非空段落在原文中的 (起, 止) 字符偏移"""
+        spans: List[Tuple[int, int]] = []
+        position = 0
+        for paragraph in self.text.split('\n\n'):
+            if paragraph.strip():
+                spans.append((position, position + len(paragraph)))
+            position += len(paragraph) + 2
+        return spans
+
+    @cached_property
+    def paragraphs(self) -> List[str]:
+        return [self.text[start:end] for start, end in self.paragraph_spans]
+
+    @cached_property
+    def tfidf_keywords(self) -> List[Tuple[str, float]]:
+        """按权重降序的全部 TF-IDF 关键词，等价于 jieba.analyse.extract_tags(topK=None, withWeight=True)"""
+        extractor = jieba.analyse.default_tfidf
+        freq: Dict[str, float] = {}
+        for word in self.words:
+            if len(word.strip()) < 2 or word.lower() in extractor.stop_words:
+                continue
+            freq[word] = freq.get(word, 0.0) + 1.0
+        total = sum(freq.values())
+        for word in freq:
+            freq[word] *= extractor.idf_freq.get(word, extractor.median_idf) / total
+        return sorted(freq.items(), key=itemgetter(1), reverse=True)
+
+    @cached_property
+    def textrank_keywords(self) -> List[Tuple[str, float]]:
+        """按权重降序的全部 TextRank 关键词，等价于 jieba.analyse.textrank(topK=None, withWeight=True)"""
+        stop_words = jieba.analyse.default_textrank.stop_words
+        words = self.pos_words
+        candidates = [
+            flag in TEXTRANK_ALLOW_POS and len(word.strip()) >= 2 and word.lower() not in stop_words
+            for word, flag in words
+        ]
+        co_occurrence: Dict[Tuple[str, str], int] = defaultdict(int)
+        for i, (word, _) in enumerate(words):
+            if not candidates[i]:
+                continue
+            for j in range(i + 1, min(i + TEXTRANK_SPAN, len(words))):
+                if candidates[j]:
+                    co_occurrence[(word, words[j][0])] += 1
+
+        graph = UndirectWeightedGraph()
+        for (start, end), weight in co_occurrence.items():
+            graph.addEdge(start, end, weight)
+        nodes_rank = graph.rank()
+        return sorted(nodes_rank.items(), key=itemgetter(1), reverse=True)
+
+
+# --- 并行分词 ---
+
+def split_paragraph_chunks(text: str, chunk_chars: int) -> List[str]:
+    """
+    把文本切成约 chunk_chars 字的块，切点总在换行符之后（优先段落空行）。
+
+    jieba 的分词块不会跨越空白字符，所以在换行后切开再按顺序拼接各块的分词结果，
+    与对整段文本分词的结果完全一致。
+    """
+    chunks: List[str] = []
+    start, length = 0, len(text)
+    while start < length:
+        end = start + chunk_chars
+        if end >= length:
+            chunks.append(text[start:])
+            break
+        cut = text.rfind('\n\n', start + 1, end)
+        if cut == -1:
+            cut = text.rfind('\n', start + 1, end)
+        if cut == -1:
+            # 窗口内没有换行（超长段落），延伸到下一个换行
+            cut = text.find('\n', end)
+        if cut == -1:
+            chunks.append(text[start:])
+            break
+        chunks.append(text[start:cut + 1])
+        start = cut + 1
+    return chunks
+
+def segment_chunk(chunk: str, with_pos: bool) -> Tuple[List[str], Optional[List[Tuple[str, str]]]]:
+    """对一个文本块分词（在分析进程池中执行）"""
+    context = AnalysisContext(chunk)
+    return context.words, (context.pos_words if with_pos else None)
+
+async def segment_text_parallel(
+    text: str,
+    with_pos: bool,
+    chunk_chars: Optional[int] = None,
+    timeout: Optional[float] = None,
+    engine: Optional[AnalysisEngine] = None,
+) -> Tuple[List[str], Optional[List[Tuple[str, str]]]]:
+    """按段落切块，在进程池中并行分词，再按原顺序合并词序列"""
+    chunk_chars = chunk_chars or get_app_config().analysis_engine.segment_chunk_chars
+    chunks = split_paragraph_chunks(text, chunk_chars)
+    results = await (engine or analysis_engine).map(segment_chunk, [(chunk, with_pos) for chunk in chunks], timeout=timeout)
+    words: List[str] = []
+    pos_words: Optional[List[Tuple[str, str]]] = [] if with_pos else None
+    for chunk_words, chunk_pos in results:
+        words.extend(chunk_words)
+        if pos_words is not None:
+            pos_words.extend(chunk_pos)
+    logger.info(f"并行分词完成: {len(text)} 字, {len(chunks)} 块, {len(words)} 个词")
+    return words, pos_words
+
+
+async def perform_basic_analysis(
+    text: str,
+    options: List[str],
+    timeout: Optional[float] = None,
+    summary_length: int = 3,
+    summary_method: str = DEFAULT_SUMMARY_METHOD,
+) -> Dict[str, Any]:
     """
     执行基础文本分析，不依赖外部API
+
+    实际计算在分析进程池中进行（见 engine.py），不会阻塞事件循环。
+    超过 timeout（默认取 app_config 中的 job_timeout_seconds）抛出 AnalysisTimeoutError。
+    summary_length / summary_method 控制摘要的句数和打分方法（见 summarizer.py）。
+    """
+    words = pos_words = None
+    settings = get_app_config().analysis_engine
+    if (settings.parallel_segment_threshold_chars and len(text) >= settings.parallel_segment_threshold_chars
+            and analysis_engine.pool_size > 1):
+        # 大文本先在多个工作进程中分块分词，其余分析复用合并后的词序列
+        words, pos_words = await segment_text_parallel(text, with_pos=bool(POS_OPTIONS & set(options)), timeout=timeout)
+    return await analysis_engine.run(
+        run_basic_analysis, text, options, words, pos_words, summary_length, summary_method, timeout=timeout
+    )
+
+def run_basic_analysis(
+    text: str,
+    options: List[str],
+    words: Optional[List[str]] = None,
+    pos_words: Optional[List[Tuple[str, str]]] = None,
+    summary_length: int = 3,
+    summary_method: str = DEFAULT_SUMMARY_METHOD,
+) -> Dict[str, Any]:
+    """
+    执行基础文本分析（同步版本，在分析进程池的工作进程中运行）
     
     参数:
         text: 要分析的文本内容
@@ -26,35 +239,38 @@ async def perform_basic_analysis(text: str, options: List[str]) -> Dict[str, Any
         return {"error": "文本内容为空"}
     
     result = {}
+    # 各选项共享一次分词/分句的结果
+    context = AnalysisContext(text, words=words, pos_words=pos_words)
     
     # 基本文本统计
     if "statistics" in options or "basic_stats" in options:
         logger.info("执行基础统计分析")
-        stats = analyze_text_statistics(text)
+        stats = analyze_text_statistics(text, context=context)
         result["statistics"] = stats
     
     # 关键词提取
     if "keywords" in options:
         logger.info("执行关键词提取")
-        keywords = extract_keywords(text)
+        keywords = extract_keywords(text, context=context)
         result["keywords"] = keywords
     
     # 简单摘要（提取重要句子）
     if "summary" in options:
         logger.info("执行文本摘要")
-        summary = generate_summary(text)
-        result["summary"] = summary
+        summary_sentences = summarize(text, context.words, context.sentence_spans, summary_length, summary_method)
+        result["summary"] = _join_summary(text, summary_sentences, len(context.sentence_spans), summary_length)
+        result["summary_sentences"] = summary_sentences
     
     # 简单的情感分析
     if "sentiment" in options:
         logger.info("执行简单情感分析")
-        sentiment = simple_sentiment_analysis(text)
+        sentiment = simple_sentiment_analysis(text, context=context)
         result["sentiment"] = sentiment
     
     # 词频分析
     if "word_frequency" in options:
         logger.info("执行词频分析")
-        word_freq = analyze_word_frequency(text)
+        word_freq = analyze_word_frequency(text, context=context)
         result["word_frequency"] = word_freq
     
     # 记录完成的分析种类
@@ -64,22 +280,20 @@ async def perform_basic_analysis(text: str, options: List[str]) -> Dict[str, Any
     logger.info("基础文本分析完成")
     return result
 
-def analyze_text_statistics(text: str) -> Dict[str, Any]:
+def analyze_text_statistics(text: str, context: Optional[AnalysisContext] = None) -> Dict[str, Any]:
     """分析文本的基本统计信息"""
+    context = context or AnalysisContext(text)
     char_count = len(text)
-    word_count = len(re.findall(r'\b\w+\b', text))
+    word_count = len(WORD_PATTERN.findall(text))
     
     # 计算中文词数（使用jieba分词）
-    chinese_words = list(jieba.cut(text))
-    chinese_word_count = len(chinese_words)
+    chinese_word_count = len(context.words)
     
     # 句子数
-    sentences = re.split(r'[。！？.!?]+', text)
-    sentence_count = len([s for s in sentences if len(s.strip()) > 0])
+    sentence_count = len(context.sentences)
     
     # 段落数
-    paragraphs = text.split('\n\n')
-    paragraph_count = len([p for p in paragraphs if len(p.strip()) > 0])
+    paragraph_count = len(context.paragraphs)
     
     return {
         "character_count": char_count,
@@ -90,13 +304,14 @@ def analyze_text_statistics(text: str) -> Dict[str, Any]:
         "average_paragraph_length": round(char_count / max(paragraph_count, 1), 2)
     }
 
-def extract_keywords(text: str, topk: int = 10) -> List[Dict[str, Any]]:
+def extract_keywords(text: str, topk: int = 10, context: Optional[AnalysisContext] = None) -> List[Dict[str, Any]]:
     """提取文本中的关键词"""
+    context = context or AnalysisContext(text)
     # 使用jieba的TextRank算法提取关键词
-    keywords_textrank = jieba.analyse.textrank(text, topK=topk, withWeight=True)
+    keywords_textrank = context.textrank_keywords[:topk]
     
     # 使用TF-IDF算法提取关键词
-    keywords_tfidf = jieba.analyse.extract_tags(text, topK=topk, withWeight=True)
+    keywords_tfidf = context.tfidf_keywords[:topk]
     
     # 合并结果（取权重较高的）
     keywords_dict = {}
@@ -118,91 +333,34 @@ def extract_keywords(text: str, topk: int = 10) -> List[Dict[str, Any]]:
     # 只返回前topk个
     return keywords_list[:topk]
 
-def generate_summary(text: str, sentence_count: int = 3) -> str:
-    """生成文本摘要（提取重要句子）"""
-    # 分句
-    sentences = re.split(r'[。！？.!?]+', text)
-    sentences = [s.strip() for s in sentences if len(s.strip()) > 0]
-    
-    if len(sentences) <= sentence_count:
+def _join_summary(text: str, summary_sentences: List[Dict[str, Any]], total_sentences: int, sentence_count: int) -> str:
+    # 句子总数不超过要求的句数时直接返回原文（与旧版行为一致）
+    if total_sentences <= sentence_count:
         return text
-    
-    # 为每个句子计算重要性得分（基于关键词的简单方法）
-    keywords = [kw["word"] for kw in extract_keywords(text, topk=20)]
-    
-    sentence_scores = []
-    for sentence in sentences:
-        score = 0
-        for keyword in keywords:
-            if keyword in sentence:
-                score += 1
-        # 偏好中等长度的句子
-        length_factor = min(1.0, len(sentence) / 100)  # 句子长度影响因子
-        score *= length_factor
-        sentence_scores.append((sentence, score))
-    
-    # 选择得分最高的句子
-    sentence_scores.sort(key=lambda x: x[1], reverse=True)
-    summary_sentences = [s[0] for s in sentence_scores[:sentence_count]]
-    
-    # 按原文顺序排列
-    ordered_summary = []
-    for sentence in sentences:
-        if sentence in summary_sentences:
-            ordered_summary.append(sentence)
-            if len(ordered_summary) >= sentence_count:
-                break
-    
-    return "。".join(ordered_summary) + "。"
-
-def simple_sentiment_analysis(text: str) -> Dict[str, Any]:
-    """进行简单的情感分析（基于关键词匹配）"""
-    # 简单的情感词典（示例）
-    positive_words = ["喜欢", "好", "优秀", "出色", "精彩", "美好", "快乐", "优质", 
-                     "卓越", "精彩", "满意", "开心", "高兴", "成功", "美妙"]
-    negative_words = ["糟糕", "失望", "差", "坏", "不满", "痛苦", "悲伤", "遗憾", 
-                     "失败", "苦恼", "困难", "反对", "厌恶", "不好", "讨厌"]
-    
-    # 分词
-    words = list(jieba.cut(text))
-    
-    # 计算积极和消极词的出现次数
-    positive_count = sum(1 for word in words if word in positive_words)
-    negative_count = sum(1 for word in words if word in negative_words)
-    
-    # 确定主导情感
-    total = positive_count + negative_count
-    if total == 0:
-        sentiment = "neutral"
-        confidence = 0.5
-    else:
-        positive_ratio = positive_count / total
-        if positive_ratio > 0.6:
-            sentiment = "positive"
-            confidence = positive_ratio
-        elif positive_ratio < 0.4:
-            sentiment = "negative"
-            confidence = 1 - positive_ratio
-        else:
-            sentiment = "neutral"
-            confidence = 0.5
-    
-    return {
-        "sentiment": sentiment,
-        "confidence": round(confidence, 2),
-        "positive_count": positive_count,
-        "negative_count": negative_count,
-        "method": "basic_keyword_matching"  # 说明使用的方法
-    }
+    return "。".join(item["text"] for item in summary_sentences) + "。"
+
+def generate_summary(
+    text: str,
+    sentence_count: int = 3,
+    context: Optional[AnalysisContext] = None,
+    method: str = DEFAULT_SUMMARY_METHOD,
+) -> str:
+    """生成文本摘要（提取重要句子，按原文顺序拼接）"""
+    context = context or AnalysisContext(text)
+    summary_sentences = summarize(text, context.words, context.sentence_spans, sentence_count, method)
+    return _join_summary(text, summary_sentences, len(context.sentence_spans), sentence_count)
+
+def simple_sentiment_analysis(text: str, context: Optional[AnalysisContext] = None) -> Dict[str, Any]:
+    """进行情感分析（基于 config/sentiment 下的情感词典，见 sentiment.py）"""
+    context = context or AnalysisContext(text)
+    return analyze_sentiment(text, context.words, context.sentence_spans, context.paragraph_spans)
 
-def analyze_word_frequency(text: str, top_n: int = 20) -> List[Dict[str, Any]]:
+def analyze_word_frequency(text: str, top_n: int = 20, context: Optional[AnalysisContext] = None) -> List[Dict[str, Any]]:
     """分析词频"""
-    # 分词
-    words = list(jieba.cut(text))
+    context = context or AnalysisContext(text)
     
     # 过滤掉停用词和标点符号
-    stopwords = set(["的", "了", "和", "是", "在", "我", "有", "这", "你", "也", "都", "就", "不", "与", "之", "着"])
-    filtered_words = [word for word in words if len(word) > 1 and word not in stopwords]
+    filtered_words = [word for word in context.words if len(word) > 1 and word not in FREQUENCY_STOPWORDS]
     
     # 统计词频
     word_counter = Counter(filtered_words)
@@ -210,4 +368,4 @@ def analyze_word_frequency(text: str, top_n: int = 20) -> List[Dict[str, Any]]:
     # 转换为列表
     word_freq_list = [{"word": word, "count": count} for word, count in word_counter.most_common(top_n)]
     
-    return word_freq_list 
\ No newline at end of file
+    return word_freq_list
@@ -0,0 +1,212 @@
+"""
+语料级批量基础分析 - 多篇文档并行分析，并汇总全语料的词项统计
+
+每篇文档作为一个任务提交到分析进程池（见 engine.py），在工作进程中完成分词、
+run_basic_analysis 以及关键词候选词的计数；主进程只负责按完成顺序产出结果和累加计数。
+所有文档完成后计算：
+
+- 文档频率 df：出现某词的文档数
+- 语料 IDF：log((1 + N) / (1 + df)) + 1（平滑，N 为文档数）
+- 语料 TF-IDF：全语料词频 × IDF，以及每篇文档相对于整个语料的特征词
+
+关键词候选与 TF-IDF 关键词提取一致：长度 ≥2 且不在 jieba 停用词表中。
+"""
+import asyncio
+import math
+from collections import Counter
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+import jieba.analyse
+
+from src.core.analyzers.basic_analyzer import POS_OPTIONS, AnalysisContext, run_basic_analysis
+from src.core.analyzers.engine import AnalysisEngine, analysis_engine
+from src.core.analyzers.summarizer import DEFAULT_SUMMARY_METHOD
+from src.utils import file_utils
+from src.utils.config import UPLOAD_DIR
+from src.utils.logging import logger
+
+DEFAULT_TOP_TERMS = 50
+DOCUMENT_KEYWORDS = 10
+
+
+def resolve_uploaded_file(file_path: str) -> Path:
+    """把 UPLOAD_DIR 下的相对路径解析为绝对路径；越出上传目录或文件不存在时抛出 ValueError"""
+    upload_root = UPLOAD_DIR.resolve()
+    full_path = (upload_root / file_path).resolve()
+    if upload_root not in full_path.parents or not full_path.is_file():
+        raise ValueError(f"File not found at path: {file_path}")
+    return full_path
+
+
+def _load_uploaded_file(file_path: str) -> str:
+    """读取已上传文件（UPLOAD_DIR 下的相对路径）的文本"""
+    text = file_utils.load_file_content(resolve_uploaded_file(file_path), logger)
+    if text.startswith("错误:"):
+        raise ValueError(text)
+    return text
+
+
+async def load_corpus_documents(documents: Sequence[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """
+    把 {"id", "text", "file_path"} 形式的文档描述解析为 (文档 ID, 文本) 列表。
+
+    text 为空时读取 file_path 指向的已上传文件；未给出 id 时使用文件名或 "doc-<序号>"。
+    任一文档无法读取或内容为空时抛出 ValueError。
+    """
+    loaded: List[Tuple[str, str]] = []
+    seen_ids = set()
+    for index, document in enumerate(documents):
+        text = document.get("text") or ""
+        file_path = document.get("file_path")
+        if not text and file_path:
+            text = await asyncio.to_thread(_load_uploaded_file, file_path)
+        if not text.strip():
+            raise ValueError(f"Document #{index + 1} has no text content")
+        doc_id = str(document.get("id") or (Path(file_path).name if file_path else f"doc-{index + 1}"))
+        if doc_id in seen_ids:
+            doc_id = f"{doc_id}#{index + 1}"
+        seen_ids.add(doc_id)
+        loaded.append((doc_id, text))
+    return loaded
+
+
+def analyze_document(
+    text: str,
+    options: List[str],
+    summary_length: int = 3,
+    summary_method: str = DEFAULT_SUMMARY_METHOD,
+) -> Dict[str, Any]:
+    """
+    单篇文档的基础分析（在工作进程中运行）。
+
+    返回 {"result": run_basic_analysis 的结果, "term_counts": 关键词候选词频}。
+    """
+    context = AnalysisContext(text)
+    pos_words = context.pos_words if POS_OPTIONS & set(options) else None
+    result = run_basic_analysis(text, options, context.words, pos_words, summary_length, summary_method)
+    stop_words = jieba.analyse.default_tfidf.stop_words
+    term_counts = Counter(
+        word for word in context.words if len(word.strip()) >= 2 and word.lower() not in stop_words
+    )
+    return {"result": result, "term_counts": dict(term_counts)}
+
+
+class CorpusStatistics:
+    """累加各文档的词频，计算文档频率与语料级 TF-IDF"""
+
+    def __init__(self):
+        self.document_terms: Dict[str, Counter] = {}
+        self.document_frequency: Counter = Counter()
+        self.term_frequency: Counter = Counter()
+
+    @property
+    def document_count(self) -> int:
+        return len(self.document_terms)
+
+    def add(self, doc_id: str, term_counts: Dict[str, int]) -> None:
+        counts = Counter(term_counts)
+        self.document_terms[doc_id] = counts
+        self.document_frequency.update(counts.keys())
+        self.term_frequency.update(counts)
+
+    def idf(self, term: str) -> float:
+        n = self.document_count
+        return math.log((1 + n) / (1 + self.document_frequency[term])) + 1
+
+    def top_terms(self, top_n: int = DEFAULT_TOP_TERMS) -> List[Dict[str, Any]]:
+        """按语料 TF-IDF（全语料词频 × IDF）排序的词项"""
+        scored = [(term, tf * self.idf(term)) for term, tf in self.term_frequency.items()]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return [
+            {
+                "word": term,
+                "term_frequency": self.term_frequency[term],
+                "document_frequency": self.document_frequency[term],
+                "idf": round(self.idf(term), 4),
+                "tfidf": round(score, 4),
+            }
+            for term, score in scored[:top_n]
+        ]
+
+    def document_keywords(self, doc_id: str, top_n: int = DOCUMENT_KEYWORDS) -> List[Dict[str, Any]]:
+        """某篇文档相对于整个语料的特征词（文档内词频占比 × 语料 IDF）"""
+        counts = self.document_terms.get(doc_id)
+        if not counts:
+            return []
+        total = sum(counts.values())
+        scored = sorted(
+            ((term, count / total * self.idf(term)) for term, count in counts.items()),
+            key=lambda item: item[1], reverse=True,
+        )
+        return [{"word": term, "tfidf": round(score, 6)} for term, score in scored[:top_n]]
+
+    def summary(self, top_n: int = DEFAULT_TOP_TERMS) -> Dict[str, Any]:
+        return {
+            "document_count": self.document_count,
+            "vocabulary_size": len(self.term_frequency),
+            "total_terms": sum(self.term_frequency.values()),
+            "top_terms": self.top_terms(top_n),
+            "document_keywords": {doc_id: self.document_keywords(doc_id) for doc_id in self.document_terms},
+        }
+
+
+async def iter_corpus_analysis(
+    documents: Sequence[Tuple[str, str]],
+    options: List[str],
+    summary_length: int = 3,
+    summary_method: str = DEFAULT_SUMMARY_METHOD,
+    top_terms: int = DEFAULT_TOP_TERMS,
+    timeout: Optional[float] = None,
+    engine: Optional[AnalysisEngine] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    并行分析 (文档 ID, 文本) 列表，按完成顺序逐篇产出结果，最后产出语料汇总。
+
+    产出的事件：
+        {"type": "document", "index", "id", "result"}        单篇完成
+        {"type": "document_error", "index", "id", "error"}   单篇失败（不影响其他文档）
+        {"type": "corpus", "completed", "failed", ...}        全部结束后的语料统计
+    每篇文档单独计算超时（timeout，默认 job_timeout_seconds）。
+    """
+    engine = engine or analysis_engine
+    # 同时在进程池中排队的文档数，避免一次把全部文本序列化进任务队列
+    limit = asyncio.Semaphore(engine.pool_size * 2)
+
+    async def run_one(index: int, doc_id: str, text: str) -> Tuple[int, str, Any]:
+        async with limit:
+            try:
+                payload = await engine.run(
+                    analyze_document, text, options, summary_length, summary_method, timeout=timeout
+                )
+                return index, doc_id, payload
+            except Exception as e:  # 包括 AnalysisTimeoutError
+                logger.warning(f"Corpus analysis of document '{doc_id}' failed: {e}")
+                return index, doc_id, e
+
+    statistics = CorpusStatistics()
+    failed = 0
+    tasks = [asyncio.ensure_future(run_one(i, doc_id, text)) for i, (doc_id, text) in enumerate(documents)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            index, doc_id, payload = await next_done
+            if isinstance(payload, Exception):
+                failed += 1
+                yield {"type": "document_error", "index": index, "id": doc_id,
+                       "error": str(payload) or type(payload).__name__}
+                continue
+            result = payload["result"]
+            if "error" in result:
+                failed += 1
+                yield {"type": "document_error", "index": index, "id": doc_id, "error": result["error"]}
+                continue
+            statistics.add(doc_id, payload["term_counts"])
+            yield {"type": "document", "index": index, "id": doc_id, "result": result}
+    finally:
+        # 调用方提前停止迭代（如客户端断开）时取消尚未开始的文档
+        for task in tasks:
+            task.cancel()
+
+    logger.info(f"语料分析完成: {statistics.document_count} 篇成功, {failed} 篇失败")
+    yield {"type": "corpus", "completed": statistics.document_count, "failed": failed,
+           **statistics.summary(top_terms)}
@@ -0,0 +1,307 @@
+"""
+分词词典与 IDF 表管理 - 所有基于 jieba 的基础分析共用
+
+来源（目录见 app_config 的 dictionaries 配置）：
+    config/dictionaries/*.txt      用户词典，jieba 格式：词 [词频] [词性]，# 开头为注释
+    config/dictionaries/idf*.txt   IDF 覆盖表：词 IDF
+    data/dictionaries/corpus_idf.bin
+                                   由已上传文档构建的语料 IDF 表（build_corpus_idf）
+
+文本来源首次使用时编译为紧凑的二进制表（词用一个 UTF-8 块保存，数值用 float32 数组），
+并记录来源文件的修改时间；来源未变时直接读取二进制表，启动时无需重新解析文本。
+
+生效方式与 jieba 自身的扩展点一致：用户词通过 jieba.add_word 加入分词词典；
+IDF 表整体替换 jieba.analyse.default_tfidf 的 idf_freq / median_idf（等同 set_idf_path），
+覆盖表中的词再逐个覆盖。每个进程（主进程与分析进程池的工作进程）在分词前调用
+ensure_dictionaries_loaded()，来源文件变化后会在下一次调用时重新加载。
+"""
+import hashlib
+import json
+import math
+import os
+import statistics
+import struct
+import threading
+import time
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import jieba
+import jieba.analyse
+
+from src.config.app_config import DictionaryConfig, get_app_config
+from src.utils.logging import logger
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent.parent
+
+USER_DICT_TABLE = "user_dict.bin"
+IDF_OVERRIDES_TABLE = "idf_overrides.bin"
+CORPUS_IDF_TABLE = "corpus_idf.bin"
+
+# 两次检查来源文件是否变化的最短间隔 (秒)
+RELOAD_CHECK_SECONDS = 2.0
+
+CORPUS_FILE_SUFFIXES = frozenset((".txt", ".md", ".pdf", ".docx", ".epub"))
+
+# --- 二进制表格式 ---
+# 头部: 魔数, 版本, 条目数, 元数据长度, 词块长度, 词性块长度
+# 之后依次为: float32 数值数组, JSON 元数据, "\n" 连接的词, "\n" 连接的词性 (可为空)
+_MAGIC = b"QLDT"
+_VERSION = 1
+_HEADER = struct.Struct("<4sBxxxIIII")
+
+
+def write_table(path: Path, words: Sequence[str], values: Sequence[float],
+                tags: Optional[Sequence[str]] = None, meta: Optional[Dict[str, Any]] = None) -> None:
+    """把 (词, 数值[, 词性]) 表写成二进制文件（先写临时文件再替换）"""
+    value_bytes = array("f", values).tobytes()
+    meta_bytes = json.dumps(meta or {}, ensure_ascii=False).encode("utf-8")
+    word_bytes = "\n".join(words).encode("utf-8")
+    tag_bytes = "\n".join(tags).encode("utf-8") if tags is not None else b""
+    header = _HEADER.pack(_MAGIC, _VERSION, len(words), len(meta_bytes), len(word_bytes), len(tag_bytes))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")  # 多个工作进程可能同时编译
+    with open(tmp_path, "wb") as f:
+        f.write(header + value_bytes + meta_bytes + word_bytes + tag_bytes)
+    os.replace(tmp_path, path)
+
+
+def read_table(path: Path) -> Tuple[List[str], array, Optional[List[str]], Dict[str, Any]]:
+    """读取 write_table 写出的文件，返回 (词列表, 数值数组, 词性列表或 None, 元数据)"""
+    data = path.read_bytes()
+    magic, version, count, meta_len, words_len, tags_len = _HEADER.unpack_from(data)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError(f"Unsupported dictionary table format: {path}")
+    offset = _HEADER.size
+    values = array("f")
+    values.frombytes(data[offset:offset + 4 * count])
+    offset += 4 * count
+    meta = json.loads(data[offset:offset + meta_len].decode("utf-8"))
+    offset += meta_len
+    words = data[offset:offset + words_len].decode("utf-8").split("\n") if count else []
+    offset += words_len
+    tags = data[offset:offset + tags_len].decode("utf-8").split("\n") if tags_len else None
+    if len(words) != count or len(values) != count:
+        raise ValueError(f"Corrupt dictionary table: {path}")
+    return words, values, tags, meta
+
+
+# --- 文本来源解析 ---
+
+def _iter_entries(path: Path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield line_no, line.split()
+
+
+def parse_user_dict(paths: Sequence[Path]) -> Tuple[List[str], List[float], List[str]]:
+    """解析 jieba 格式的用户词典；未给出词频时记为 NaN（加载时由 jieba 推算）"""
+    entries: Dict[str, Tuple[float, str]] = {}
+    for path in paths:
+        for line_no, parts in _iter_entries(path):
+            freq, tag = math.nan, ""
+            for part in parts[1:]:
+                if part.isdigit():
+                    freq = float(part)
+                else:
+                    tag = part
+            entries[parts[0]] = (freq, tag)
+    words = list(entries)
+    return words, [entries[w][0] for w in words], [entries[w][1] for w in words]
+
+
+def parse_idf_overrides(paths: Sequence[Path]) -> Tuple[List[str], List[float]]:
+    entries: Dict[str, float] = {}
+    for path in paths:
+        for line_no, parts in _iter_entries(path):
+            try:
+                entries[parts[0]] = float(parts[1])
+            except (IndexError, ValueError):
+                logger.warning(f"Invalid IDF entry in {path.name}:{line_no}: {' '.join(parts)!r}")
+    return list(entries), list(entries.values())
+
+
+# --- 语料 IDF 构建 ---
+
+def _resolve(path: str) -> Path:
+    resolved = Path(path)
+    return resolved if resolved.is_absolute() else PROJECT_ROOT / resolved
+
+
+def build_corpus_idf(source_dir: Optional[str] = None, config: Optional[DictionaryConfig] = None) -> Dict[str, Any]:
+    """
+    用 source_dir（默认 UPLOAD_DIR）下的全部文档构建语料 IDF 表并写入 compiled_dir。
+
+    IDF = log((1 + N) / (1 + df)) + 1，只统计关键词候选（长度 ≥2 且不在停用词表中）。
+    可能耗时较长，应在分析进程池中调用。返回构建摘要。
+    """
+    from src.utils import file_utils
+    from src.utils.config import UPLOAD_DIR
+
+    config = config or get_app_config().dictionaries
+    ensure_dictionaries_loaded(force=True)  # 按当前用户词典分词
+    root = Path(source_dir) if source_dir else UPLOAD_DIR
+    stop_words = jieba.analyse.default_tfidf.stop_words
+    document_frequency: Counter = Counter()
+    documents = skipped = 0
+    started = time.perf_counter()
+    for path in sorted(p for p in root.rglob("*") if p.is_file() and p.suffix.lower() in CORPUS_FILE_SUFFIXES):
+        text = file_utils.load_file_content(path, logger)
+        if not text.strip() or text.startswith("错误:"):
+            skipped += 1
+            continue
+        document_frequency.update(
+            {word for word in jieba.cut(text) if len(word.strip()) >= 2 and word.lower() not in stop_words}
+        )
+        documents += 1
+
+    words = list(document_frequency)
+    values = [math.log((1 + documents) / (1 + document_frequency[w])) + 1 for w in words]
+    meta = {"documents": documents, "skipped": skipped, "source": str(root), "built_at": time.time()}
+    write_table(_resolve(config.compiled_dir) / CORPUS_IDF_TABLE, words, values, meta=meta)
+    summary = {**meta, "terms": len(words), "seconds": round(time.perf_counter() - started, 2)}
+    logger.info(f"Built corpus IDF table: {summary}")
+    return summary
+
+
+# --- 加载与生效 ---
+
+class DictionaryManager:
+    """记录本进程已生效的词典与 IDF 表，来源变化时重新加载"""
+
+    def __init__(self, config: Optional[DictionaryConfig] = None):
+        self._config = config
+        self._signature: Optional[Tuple] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._base_idf: Optional[Tuple[Dict[str, float], float]] = None  # jieba 内置 IDF
+        self._user_words: Dict[str, Tuple[float, str]] = {}
+        self.user_dict_signature = ""  # 用户词典内容的摘要，变化意味着分词结果可能变化
+        self.status: Dict[str, Any] = {}
+
+    @property
+    def config(self) -> DictionaryConfig:
+        return self._config or get_app_config().dictionaries
+
+    def _sources(self) -> Tuple[List[Path], List[Path], Path]:
+        source_dir = _resolve(self.config.user_dict_dir)
+        files = sorted(source_dir.glob("*.txt")) if source_dir.is_dir() else []
+        idf_files = [p for p in files if p.name.startswith("idf")]
+        dict_files = [p for p in files if not p.name.startswith("idf")]
+        return dict_files, idf_files, _resolve(self.config.compiled_dir) / CORPUS_IDF_TABLE
+
+    @staticmethod
+    def _file_signature(paths: Sequence[Path]) -> List[List[Any]]:
+        signature = []
+        for path in paths:
+            try:
+                stat = path.stat()
+                signature.append([path.name, stat.st_mtime_ns, stat.st_size])
+            except OSError:
+                continue
+        return signature
+
+    def _compiled(self, name: str, sources: Sequence[Path], parse) -> Tuple[List[str], array, Optional[List[str]]]:
+        """来源未变时读取二进制表，否则解析文本来源并重新编译"""
+        table_path = _resolve(self.config.compiled_dir) / name
+        signature = self._file_signature(sources)
+        if table_path.exists():
+            try:
+                words, values, tags, meta = read_table(table_path)
+                if meta.get("sources") == signature:
+                    return words, values, tags
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable dictionary table {table_path}: {e}")
+        parsed = parse(sources)
+        words, values, tags = parsed[0], parsed[1], parsed[2] if len(parsed) > 2 else None
+        try:
+            write_table(table_path, words, values, tags, meta={"sources": signature})
+        except OSError as e:
+            logger.warning(f"Could not write compiled dictionary table {table_path}: {e}")
+        return words, array("f", values), tags
+
+    def ensure_loaded(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and self._signature is not None and now - self._checked_at < RELOAD_CHECK_SECONDS:
+            return
+        with self._lock:
+            self._checked_at = now
+            dict_files, idf_files, corpus_table = self._sources()
+            config = self.config
+            signature = (
+                tuple(map(tuple, self._file_signature(dict_files))),
+                tuple(map(tuple, self._file_signature(idf_files))),
+                tuple(map(tuple, self._file_signature([corpus_table]))),
+                config.use_corpus_idf, config.min_corpus_documents,
+            )
+            if signature == self._signature and not force:
+                return
+            started = time.perf_counter()
+            try:
+                self._apply_user_dict(*self._compiled(USER_DICT_TABLE, dict_files, parse_user_dict))
+                override_words, override_values, _ = self._compiled(IDF_OVERRIDES_TABLE, idf_files, parse_idf_overrides)
+                self._apply_idf(corpus_table, override_words, override_values)
+            except Exception as e:
+                logger.error(f"Failed to load analysis dictionaries: {e}", exc_info=True)
+            self._signature = signature
+            self.status["load_seconds"] = round(time.perf_counter() - started, 3)
+            logger.info(f"Analysis dictionaries loaded: {self.status}")
+
+    def _apply_user_dict(self, words: List[str], freqs: array, tags: Optional[List[str]]) -> None:
+        tags = tags or [""] * len(words)
+        entries = {w: (f, t) for w, f, t in zip(words, freqs, tags)}
+        for word in self._user_words.keys() - entries.keys():
+            jieba.del_word(word)  # 从词典文件中删除的词
+        for word, (freq, tag) in entries.items():
+            if self._user_words.get(word) != (freq, tag):
+                jieba.add_word(word, None if math.isnan(freq) else int(freq), tag or None)
+        self._user_words = entries
+        self.user_dict_signature = hashlib.sha1(repr(sorted(entries.items())).encode("utf-8")).hexdigest()
+        self.status["user_words"] = len(entries)
+
+    def _apply_idf(self, corpus_table: Path, override_words: List[str], override_values: array) -> None:
+        extractor = jieba.analyse.default_tfidf
+        if self._base_idf is None:
+            self._base_idf = (extractor.idf_freq, extractor.median_idf)
+        idf_freq, median_idf = self._base_idf
+        source = "jieba"
+        self.status.pop("corpus", None)
+        if self.config.use_corpus_idf and corpus_table.exists():
+            words, values, _, meta = read_table(corpus_table)
+            if meta.get("documents", 0) >= self.config.min_corpus_documents:
+                idf_freq = dict(zip(words, values.tolist()))
+                median_idf = statistics.median(idf_freq.values()) if idf_freq else median_idf
+                source = "corpus"
+                self.status["corpus"] = {k: meta.get(k) for k in ("documents", "built_at")}
+            else:
+                logger.info(
+                    f"Corpus IDF table has {meta.get('documents', 0)} document(s), fewer than "
+                    f"min_corpus_documents={self.config.min_corpus_documents}; using jieba's IDF."
+                )
+        if override_words:
+            idf_freq = {**idf_freq, **dict(zip(override_words, override_values.tolist()))}
+        extractor.idf_freq, extractor.median_idf = idf_freq, median_idf
+        self.status.update({"idf_source": source, "idf_terms": len(idf_freq), "idf_overrides": len(override_words)})
+
+
+dictionary_manager = DictionaryManager()
+
+
+def ensure_dictionaries_loaded(force: bool = False) -> None:
+    """分词前调用：确保本进程已加载最新的用户词典与 IDF 表"""
+    dictionary_manager.ensure_loaded(force)
+
+
+def get_dictionary_status() -> Dict[str, Any]:
+    ensure_dictionaries_loaded()
+    dict_files, idf_files, corpus_table = dictionary_manager._sources()
+    return {
+        **dictionary_manager.status,
+        "user_dict_files": [p.name for p in dict_files],
+        "idf_override_files": [p.name for p in idf_files],
+        "corpus_idf_table": str(corpus_table) if corpus_table.exists() else None,
+    }
@@ -0,0 +1,125 @@
+"""
+本地分析执行引擎 - 在独立进程池中运行 CPU 密集的分析函数
+
+jieba 分词、TextRank 等纯 Python 计算会长时间占用 GIL，直接在事件循环中执行会阻塞
+同一 uvicorn 进程上的所有请求。AnalysisEngine 把这类函数提交到进程池，每个工作进程
+启动时预先加载 jieba 词典，调用方只需 await 结果。
+
+提交的函数及其参数、返回值都必须可 pickle（模块级函数 + 普通数据）。
+"""
+import asyncio
+import concurrent.futures
+import multiprocessing
+import os
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+from src.config.app_config import get_app_config
+from src.utils.logging import forward_worker_logs, logger, start_worker_log_listener
+
+
+class AnalysisTimeoutError(TimeoutError):
+    """分析任务超过 job_timeout_seconds 仍未完成"""
+    pass
+
+
+def _warm_up_worker(log_queue=None) -> None:
+    """工作进程初始化：日志转交主进程写入，提前加载 jieba 词典、用户词典与 IDF 表和情感词典"""
+    if log_queue is not None:
+        forward_worker_logs(log_queue)
+    import jieba
+    import jieba.analyse  # noqa: F401  (导入即加载默认 IDF 与停用词)
+    from src.core.analyzers.dictionaries import ensure_dictionaries_loaded
+    from src.core.analyzers.sentiment import get_sentiment_lexicon
+    jieba.setLogLevel(60)  # 每个进程都会打印词典加载信息，这里关闭
+    jieba.initialize()
+    ensure_dictionaries_loaded()
+    get_sentiment_lexicon()
+
+
+class AnalysisEngine:
+    """进程池封装：懒创建、每任务超时、工作进程崩溃后自动重建"""
+
+    def __init__(self, pool_size: Optional[int] = None, job_timeout: Optional[float] = None):
+        self._pool_size = pool_size
+        self._job_timeout = job_timeout
+        self._executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        # 工作进程日志经此队列由主进程写入 (进程池重建时沿用)
+        self._log_queue = None
+        self._log_listener = None
+
+    @property
+    def pool_size(self) -> int:
+        if self._pool_size:
+            return self._pool_size
+        configured = get_app_config().analysis_engine.pool_size
+        return configured or min(4, os.cpu_count() or 1)
+
+    @property
+    def job_timeout(self) -> float:
+        return self._job_timeout or get_app_config().analysis_engine.job_timeout_seconds
+
+    def _get_executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: 父进程中有事件循环和数据库线程，fork 后的子进程可能继承到被占用的锁
+                context = multiprocessing.get_context("spawn")
+                if self._log_queue is None:
+                    self._log_queue, self._log_listener = start_worker_log_listener(context)
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.pool_size,
+                    mp_context=context,
+                    initializer=_warm_up_worker,
+                    initargs=(self._log_queue,),
+                )
+                logger.info(f"Analysis engine started with {self.pool_size} worker process(es).")
+            return self._executor
+
+    def _discard_executor(self, executor: concurrent.futures.ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, func: Callable[..., Any], *args: Any, timeout: Optional[float] = None) -> Any:
+        """
+        在进程池中执行 func(*args) 并等待结果。
+
+        超时会抛出 AnalysisTimeoutError。注意已开始执行的任务无法从外部中断，
+        它会在工作进程中继续运行到结束，只是调用方不再等待。
+        """
+        timeout = timeout or self.job_timeout
+        executor = self._get_executor()
+        future = executor.submit(func, *args)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout)
+        except asyncio.TimeoutError:
+            future.cancel()  # 仍在排队时可以直接取消
+            logger.warning(f"Analysis job {getattr(func, '__name__', func)} timed out after {timeout}s.")
+            raise AnalysisTimeoutError(f"Analysis did not finish within {timeout} seconds")
+        except BrokenProcessPool:
+            # 工作进程异常退出（如内存不足被杀），丢弃进程池，下次调用时重建
+            logger.error("Analysis worker process died unexpectedly; the pool will be recreated.")
+            self._discard_executor(executor)
+            raise
+
+    async def map(self, func: Callable[..., Any], args_list: Iterable[Tuple[Any, ...]],
+                  timeout: Optional[float] = None) -> List[Any]:
+        """并行执行 func(*args)（每组参数一个任务），按输入顺序返回结果"""
+        return list(await asyncio.gather(*(self.run(func, *args, timeout=timeout) for args in args_list)))
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+            logger.info("Analysis engine stopped.")
+        if self._log_listener is not None and wait:
+            # 不等待工作进程退出时保留监听线程，仍在运行的任务的日志照常写入
+            self._log_listener.stop()
+            self._log_listener = self._log_queue = None
+
+
+analysis_engine = AnalysisEngine()
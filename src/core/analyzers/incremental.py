@@ -0,0 +1,299 @@
+"""
+增量文本统计 - 按块接收文本（如逐页提取的文档），维护运行中的计数并可随时输出中间结果
+
+统计口径与 basic_analyzer 中的 analyze_text_statistics / analyze_word_frequency 一致：
+整段文本分块送入后，最终结果与一次性分析相同（词表超过上限转入近似模式时，词频为估计值）。
+
+- 分词只在块内的换行处切开（jieba 本身也在换行处断开），切点之后的残余文本暂存到下一块，
+  因此跨块的词、句子和段落不会被切断。
+- 词频先用精确的 Counter 统计；不同词数超过 exact_vocabulary_limit 后改用
+  Count-Min Sketch 估计计数，另用一个小顶堆维护计数最高的 top_k_capacity 个候选词，
+  内存与词表大小无关。
+"""
+import heapq
+from pathlib import Path
+from array import array
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import jieba
+
+from src.core.analyzers.basic_analyzer import FREQUENCY_STOPWORDS, SENTENCE_SPLIT_PATTERN, WORD_PATTERN
+from src.core.analyzers.dictionaries import ensure_dictionaries_loaded
+from src.utils import file_utils
+from src.utils.logging import logger
+
+# 精确计数的最大不同词数，超过后转入近似模式
+DEFAULT_EXACT_VOCABULARY_LIMIT = 200_000
+# 近似模式下保留的候选高频词数
+DEFAULT_TOP_K_CAPACITY = 1_000
+# 暂存文本中一直没有换行时，超过该长度在最后一个句末标点处（或直接）切开
+MAX_PENDING_CHARS = 20_000
+
+SKETCH_WIDTH = 1 << 18
+SKETCH_DEPTH = 4
+
+
+class CountMinSketch:
+    """
+    Count-Min Sketch：depth 行 × width 列的计数表，估计值只会偏大不会偏小。
+
+    使用保守更新（只增加等于当前最小值的那些格子），减少高频词之间的相互干扰。
+    行哈希基于内置 hash()，结果只在同一进程内有效，不做持久化。
+    """
+
+    def __init__(self, width: int = SKETCH_WIDTH, depth: int = SKETCH_DEPTH):
+        self.width = width
+        self.depth = depth
+        self._rows = [array("q", bytes(8 * width)) for _ in range(depth)]
+
+    def _indexes(self, item: str) -> List[int]:
+        return [hash((row, item)) % self.width for row in range(self.depth)]
+
+    def add(self, item: str, count: int = 1) -> int:
+        """计数加 count，返回更新后的估计值"""
+        indexes = self._indexes(item)
+        estimate = min(row[i] for row, i in zip(self._rows, indexes)) + count
+        for row, i in zip(self._rows, indexes):
+            if row[i] < estimate:
+                row[i] = estimate
+        return estimate
+
+    def estimate(self, item: str) -> int:
+        return min(row[i] for row, i in zip(self._rows, self._indexes(item)))
+
+    @property
+    def memory_bytes(self) -> int:
+        return sum(row.itemsize * len(row) for row in self._rows)
+
+
+class TopKTracker:
+    """
+    在近似计数上维护计数最高的 capacity 个候选词。
+
+    小顶堆采用惰性删除：计数更新时压入新条目，旧条目在弹出时与当前计数比对后丢弃。
+    """
+
+    def __init__(self, capacity: int = DEFAULT_TOP_K_CAPACITY):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self._heap: List[Tuple[int, str]] = []
+
+    def offer(self, item: str, count: int) -> None:
+        if item in self.counts:
+            self.counts[item] = count
+            heapq.heappush(self._heap, (count, item))
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = count
+            heapq.heappush(self._heap, (count, item))
+        else:
+            smallest = self._peek_min()
+            if count <= smallest[0]:
+                return
+            heapq.heappop(self._heap)
+            del self.counts[smallest[1]]
+            self.counts[item] = count
+            heapq.heappush(self._heap, (count, item))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(count, item) for item, count in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def _peek_min(self) -> Tuple[int, str]:
+        heap = self._heap
+        while self.counts.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+        return heap[0]
+
+    def most_common(self, n: int) -> List[Tuple[str, int]]:
+        return sorted(self.counts.items(), key=lambda pair: pair[1], reverse=True)[:n]
+
+
+class IncrementalTextAnalyzer:
+    """
+    增量计算字符数、词数、句数、段落数和词频。
+
+    用法：
+        analyzer = IncrementalTextAnalyzer()
+        for page in pages:
+            analyzer.feed(page)
+            partial = analyzer.snapshot()   # 可选，随时获取中间结果
+        result = analyzer.finish()
+    """
+
+    def __init__(self, top_n: int = 20,
+                 exact_vocabulary_limit: int = DEFAULT_EXACT_VOCABULARY_LIMIT,
+                 top_k_capacity: int = DEFAULT_TOP_K_CAPACITY,
+                 max_pending_chars: int = MAX_PENDING_CHARS):
+        ensure_dictionaries_loaded()
+        self.top_n = top_n
+        self.exact_vocabulary_limit = exact_vocabulary_limit
+        self.top_k_capacity = max(top_k_capacity, top_n)
+        self.max_pending_chars = max_pending_chars
+
+        self.chunk_count = 0
+        self.character_count = 0
+        self.latin_word_count = 0   # WORD_PATTERN 匹配数
+        self.token_count = 0        # jieba 分词数
+        self.sentence_count = 0     # 已结束的句子数
+        self.paragraph_count = 0    # 已结束的段落数
+        self.finished = False
+
+        self._pending = ""
+        self._sentence_open = False   # 当前句子是否已有非空白内容
+        self._paragraph_open = False  # 当前段落是否已有非空白内容
+        self._newline_carry = False   # 上一段以单个 "\n" 结尾，可能与下一块开头组成段落分隔
+
+        self._counter: Optional[Counter] = Counter()
+        self._sketch: Optional[CountMinSketch] = None
+        self._top_k: Optional[TopKTracker] = None
+
+    @property
+    def approximate(self) -> bool:
+        return self._counter is None
+
+    @property
+    def pending_characters(self) -> int:
+        return len(self._pending)
+
+    def feed(self, chunk: str) -> None:
+        """追加一块文本；块可以在任意位置切开"""
+        if self.finished:
+            raise RuntimeError("IncrementalTextAnalyzer.feed() called after finish()")
+        if not chunk:
+            return
+        self.chunk_count += 1
+        pending = self._pending + chunk
+        cut = pending.rfind("\n") + 1
+        if not cut and len(pending) >= self.max_pending_chars:
+            last_stop = max(pending.rfind(mark) for mark in "。！？!?")
+            cut = last_stop + 1 if last_stop >= 0 else len(pending)
+        if cut:
+            self._consume(pending[:cut])
+            pending = pending[cut:]
+        self._pending = pending
+
+    def finish(self) -> Dict[str, Any]:
+        """处理暂存的残余文本并返回最终结果；之后不能再 feed"""
+        if not self.finished:
+            if self._pending:
+                self._consume(self._pending)
+                self._pending = ""
+            self.finished = True
+        return self.snapshot()
+
+    def _consume(self, segment: str) -> None:
+        self.character_count += len(segment)
+        self.latin_word_count += len(WORD_PATTERN.findall(segment))
+        words = list(jieba.cut(segment))
+        self.token_count += len(words)
+        self._count_terms([word for word in words if len(word) > 1 and word not in FREQUENCY_STOPWORDS])
+        self._count_sentences(segment)
+        self._count_paragraphs(segment)
+
+    def _count_sentences(self, segment: str) -> None:
+        # 与 AnalysisContext.sentence_spans 一致：句末标点之间有非空白内容才算一句
+        position = 0
+        for match in SENTENCE_SPLIT_PATTERN.finditer(segment):
+            if self._sentence_open or segment[position:match.start()].strip():
+                self.sentence_count += 1
+            self._sentence_open = False
+            position = match.end()
+        if segment[position:].strip():
+            self._sentence_open = True
+
+    def _count_paragraphs(self, segment: str) -> None:
+        # 与 text.split('\n\n') 一致；末尾单独的 "\n" 留给下一块，可能组成分隔符
+        if self._newline_carry:
+            segment = "\n" + segment
+        parts = segment.split("\n\n")
+        for part in parts[:-1]:
+            if self._paragraph_open or part.strip():
+                self.paragraph_count += 1
+            self._paragraph_open = False
+        last = parts[-1]
+        self._newline_carry = last.endswith("\n")
+        if last.strip():
+            self._paragraph_open = True
+
+    def _count_terms(self, terms: List[str]) -> None:
+        if self._counter is not None:
+            self._counter.update(terms)
+            if len(self._counter) > self.exact_vocabulary_limit:
+                self._switch_to_sketch()
+            return
+        sketch, top_k = self._sketch, self._top_k
+        for term, count in Counter(terms).items():
+            top_k.offer(term, sketch.add(term, count))
+
+    def _switch_to_sketch(self) -> None:
+        """词表超出上限：把精确计数导入 sketch，只保留最高的候选词"""
+        self._sketch = CountMinSketch()
+        self._top_k = TopKTracker(self.top_k_capacity)
+        for term, count in self._counter.items():
+            self._sketch.add(term, count)
+        for term, count in self._counter.most_common(self.top_k_capacity):
+            self._top_k.offer(term, count)
+        self._counter = None
+
+    def word_frequency(self, top_n: Optional[int] = None) -> List[Dict[str, Any]]:
+        top_n = top_n or self.top_n
+        if self._counter is not None:
+            pairs = self._counter.most_common(top_n)
+        else:
+            pairs = self._top_k.most_common(top_n)
+        return [{"word": word, "count": count} for word, count in pairs]
+
+    def statistics(self) -> Dict[str, Any]:
+        """与 analyze_text_statistics 相同的字段，按目前已处理的文本计算（未结束的句子/段落计入）"""
+        sentence_count = self.sentence_count + int(self._sentence_open)
+        paragraph_count = self.paragraph_count + int(self._paragraph_open)
+        return {
+            "character_count": self.character_count,
+            "word_count": max(self.latin_word_count, self.token_count),
+            "sentence_count": sentence_count,
+            "paragraph_count": paragraph_count,
+            "average_sentence_length": round(self.character_count / max(sentence_count, 1), 2),
+            "average_paragraph_length": round(self.character_count / max(paragraph_count, 1), 2),
+        }
+
+    def snapshot(self, top_n: Optional[int] = None) -> Dict[str, Any]:
+        """当前结果；暂存中尚未处理的残余文本（pending_characters）不计入"""
+        return {
+            "statistics": self.statistics(),
+            "word_frequency": self.word_frequency(top_n),
+            "chunks": self.chunk_count,
+            "pending_characters": self.pending_characters,
+            "approximate": self.approximate,
+            "final": self.finished,
+        }
+
+
+def iter_incremental_results(
+    chunks: Iterable[str],
+    top_n: int = 20,
+    emit_every_chars: int = 100_000,
+    **analyzer_kwargs: Any,
+) -> Iterator[Dict[str, Any]]:
+    """
+    逐块分析，每处理约 emit_every_chars 个字符产出一次中间结果，最后产出 final=True 的最终结果。
+    """
+    analyzer = IncrementalTextAnalyzer(top_n=top_n, **analyzer_kwargs)
+    next_emit = emit_every_chars
+    received = 0
+    for chunk in chunks:
+        analyzer.feed(chunk)
+        received += len(chunk)
+        if received >= next_emit:
+            next_emit = received + emit_every_chars
+            yield analyzer.snapshot()
+    yield analyzer.finish()
+
+
+def iter_file_results(path: Path, top_n: int = 20, emit_every_chars: int = 100_000) -> Iterator[Dict[str, Any]]:
+    """
+    边解析边分析文件（PDF 逐页、EPUB 逐章节，见 file_utils.iter_file_chunks），
+    大文件无需先拼出全文即可得到中间结果。
+    """
+    return iter_incremental_results(
+        file_utils.iter_file_chunks(path, logger), top_n=top_n, emit_every_chars=emit_every_chars
+    )
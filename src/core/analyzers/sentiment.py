@@ -0,0 +1,199 @@
+"""
+基于情感词典的情感分析引擎
+
+词典放在 config/sentiment/ 下（每行一个词，可带强度/倍数）：
+    positive.txt   积极词及强度
+    negative.txt   消极词及强度
+    negation.txt   否定词，可带强度倍数（"不太" 这类被 jieba 切成一个词的复合否定词）
+    degree.txt     程度副词及倍数
+
+词典在首次使用时编译为一个 词 -> 权重 的哈希表，之后每个词只需一次字典查找。
+打分规则：同一分句内，情感词之前的否定词反转极性（奇数次），程度副词按倍数放大/减弱；
+否定词之后的程度副词只减弱（"不太喜欢" 弱于 "不喜欢"，"太不喜欢" 强于 "不喜欢"）；
+复合否定词（"不太"、"不怎么"）按其倍数同时反转并减弱。
+遇到分句标点或情感词后修饰状态清零。句子得分为其中情感词得分之和，段落得分为其中
+句子得分之和；整体、段落与句子的结论都按积极/消极得分占比判定（_label）。
+"""
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from src.utils.logging import logger
+
+SENTIMENT_LEXICON_DIR = Path(__file__).resolve().parent.parent.parent.parent / "config" / "sentiment"
+
+# 分句内重置否定/程度修饰的标点
+CLAUSE_BREAKS = frozenset("，,；;：:、。！？!?…\n")
+
+# 结果中最多列出的逐句明细（按原文顺序，仅包含非零得分的句子）和逐段明细条数
+MAX_SENTENCE_DETAILS = 200
+MAX_PARAGRAPH_DETAILS = 500
+
+_NEGATION = "negation"
+_DEGREE = "degree"
+_SENTIMENT = "sentiment"
+
+
+def _read_lexicon(path: Path, default_weight: float = 1.0) -> Dict[str, float]:
+    entries: Dict[str, float] = {}
+    if not path.is_file():
+        logger.warning(f"Sentiment lexicon not found: {path}")
+        return entries
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            parts = line.split()
+            try:
+                entries[parts[0]] = float(parts[1]) if len(parts) > 1 else default_weight
+            except ValueError:
+                logger.warning(f"Invalid weight in {path.name}:{line_no}: {line!r}")
+    return entries
+
+
+class SentimentLexicon:
+    """编译后的情感词典：一个 词 -> (类别, 权重) 的哈希表"""
+
+    def __init__(self, positive: Dict[str, float], negative: Dict[str, float],
+                 negations: Dict[str, float], degrees: Dict[str, float]):
+        self.entries: Dict[str, Tuple[str, float]] = {}
+        for word, factor in negations.items():
+            # 否定词的权重是反转后附加的强度倍数（默认 1.0，复合否定词如 "不太" 小于 1）
+            self.entries[word] = (_NEGATION, factor)
+        for word, factor in degrees.items():
+            self.entries[word] = (_DEGREE, factor)
+        # 情感词优先于修饰词（同一个词同时出现在两类词典中时）
+        for word, weight in positive.items():
+            self.entries[word] = (_SENTIMENT, abs(weight))
+        for word, weight in negative.items():
+            self.entries[word] = (_SENTIMENT, -abs(weight))
+        self.sizes = {
+            "positive": len(positive), "negative": len(negative),
+            "negation": len(negations), "degree": len(degrees),
+        }
+
+    @classmethod
+    def load(cls, lexicon_dir: Path = SENTIMENT_LEXICON_DIR) -> "SentimentLexicon":
+        lexicon = cls(
+            positive=_read_lexicon(lexicon_dir / "positive.txt"),
+            negative=_read_lexicon(lexicon_dir / "negative.txt"),
+            negations=_read_lexicon(lexicon_dir / "negation.txt"),
+            degrees=_read_lexicon(lexicon_dir / "degree.txt"),
+        )
+        logger.info(f"Loaded sentiment lexicon from {lexicon_dir}: {lexicon.sizes}")
+        return lexicon
+
+
+@lru_cache(maxsize=1)
+def get_sentiment_lexicon() -> SentimentLexicon:
+    """进程内只加载一次的默认词典"""
+    return SentimentLexicon.load()
+
+
+def _label(positive: float, negative: float) -> Tuple[str, float]:
+    """与旧版关键词匹配相同的判定阈值：积极占比 >0.6 为积极，<0.4 为消极"""
+    total = positive + negative
+    if total == 0:
+        return "neutral", 0.5
+    positive_ratio = positive / total
+    if positive_ratio > 0.6:
+        return "positive", positive_ratio
+    if positive_ratio < 0.4:
+        return "negative", 1 - positive_ratio
+    return "neutral", 0.5
+
+
+def analyze_sentiment(
+    text: str,
+    words: Sequence[str],
+    sentence_spans: Sequence[Tuple[int, int]],
+    paragraph_spans: Sequence[Tuple[int, int]],
+    lexicon: Optional[SentimentLexicon] = None,
+) -> Dict[str, Any]:
+    """
+    对分好词的文本做情感打分，返回整体结论以及逐段、逐句（非零得分）的得分。
+
+    words 依次拼接应等于 text（jieba 分词结果满足这一点），据此把词映射到句子。
+    """
+    entries = (lexicon or get_sentiment_lexicon()).entries
+    # 每句的 [积极得分, 消极得分]
+    sentence_scores = [[0.0, 0.0] for _ in sentence_spans]
+    positive_total = negative_total = 0.0
+    positive_count = negative_count = 0
+
+    sentence_index = 0
+    position = 0
+    negated = False
+    degree = 1.0
+    for word in words:
+        start = position
+        position += len(word)
+        entry = entries.get(word)
+        if entry is None:
+            if word in CLAUSE_BREAKS or (len(word) == 1 and word.strip() == ""):
+                negated, degree = False, 1.0
+            continue
+        kind, weight = entry
+        if kind == _NEGATION:
+            negated = not negated
+            degree *= weight
+            continue
+        if kind == _DEGREE:
+            # 否定范围内的程度副词 ("不太"、"不很") 减弱否定后的强度，而不是放大
+            degree *= min(weight, 1.0 / weight) if negated and weight > 0 else weight
+            continue
+
+        value = weight * degree * (-1.0 if negated else 1.0)
+        negated, degree = False, 1.0
+        if value > 0:
+            positive_total += value
+            positive_count += 1
+        else:
+            negative_total -= value
+            negative_count += 1
+        while sentence_index < len(sentence_spans) and sentence_spans[sentence_index][1] <= start:
+            sentence_index += 1
+        if sentence_index < len(sentence_spans) and sentence_spans[sentence_index][0] <= start:
+            sentence_scores[sentence_index][0 if value > 0 else 1] += abs(value)
+
+    paragraph_scores = [[0.0, 0.0] for _ in paragraph_spans]
+    paragraph_index = 0
+    for (start, _), (positive, negative) in zip(sentence_spans, sentence_scores):
+        while paragraph_index < len(paragraph_spans) - 1 and paragraph_spans[paragraph_index][1] <= start:
+            paragraph_index += 1
+        if paragraph_spans:
+            paragraph_scores[paragraph_index][0] += positive
+            paragraph_scores[paragraph_index][1] += negative
+
+    sentiment, confidence = _label(positive_total, negative_total)
+    scored_sentences = [i for i, (positive, negative) in enumerate(sentence_scores) if positive or negative]
+
+    def span_detail(index: int, spans: Sequence[Tuple[int, int]], scores: Sequence[float], with_text: bool) -> Dict[str, Any]:
+        positive, negative = scores
+        detail = {"index": index, "start": spans[index][0], "end": spans[index][1],
+                  "score": round(positive - negative, 3), "label": _label(positive, negative)[0]}
+        if with_text:
+            detail["text"] = text[spans[index][0]:spans[index][1]]
+        return detail
+
+    return {
+        "sentiment": sentiment,
+        "confidence": round(confidence, 2),
+        "positive_count": positive_count,
+        "negative_count": negative_count,
+        "score": round(positive_total - negative_total, 3),
+        "positive_score": round(positive_total, 3),
+        "negative_score": round(negative_total, 3),
+        "paragraphs": [
+            span_detail(i, paragraph_spans, paragraph_scores[i], with_text=False)
+            for i in range(min(len(paragraph_scores), MAX_PARAGRAPH_DETAILS))
+        ],
+        "paragraphs_truncated": len(paragraph_scores) > MAX_PARAGRAPH_DETAILS,
+        "sentences": [
+            span_detail(i, sentence_spans, sentence_scores[i], with_text=True)
+            for i in scored_sentences[:MAX_SENTENCE_DETAILS]
+        ],
+        "sentences_truncated": len(scored_sentences) > MAX_SENTENCE_DETAILS,
+        "method": "lexicon",  # 说明使用的方法
+    }
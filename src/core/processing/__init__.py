@@ -7,11 +7,14 @@ from .format_enforcer import FormatEnforcer
 from .chunk_splitter import ChunkSplitter
 from .style_validator import StyleValidator
 from .post_processor import PostProcessor
+from .normalizer import StreamNormalizer, normalize_whitespace
 
 __all__ = [
     'StyleTransfer',
     'FormatEnforcer',
     'ChunkSplitter',
     'StyleValidator',
-    'PostProcessor'
+    'PostProcessor',
+    'StreamNormalizer',
+    'normalize_whitespace'
 ] 
\ No newline at end of file
@@ -5,30 +5,38 @@ import re
 from typing import Dict, Any
 from src.utils.logging import logger
 
+SCORE_NUMBER_PATTERN = re.compile(r"\d+")
+
 class FormatEnforcer:
-    def __init__(self):
-        self.analysis_pattern = re.compile(r"1\..*?(?=2\.|$)", re.DOTALL)
-        self.score_pattern = re.compile(r"2\..*?(?=3\.|$)", re.DOTALL)
-        self.suggestions_pattern = re.compile(r"3\..*?$", re.DOTALL)
+    """
+    把 "1. 分析 2. 分数 3. 建议" 形式的回复拆成结构化结果。
+
+    各部分的边界用 str.find 定位（与原先的 1\\..*?(?=2\\.|$) 等正则含义相同：
+    分析从第一个 "1." 到其后第一个 "2."，分数从第一个 "2." 到其后第一个 "3."，建议从第一个 "3." 到结尾），
+    实例无状态，可以复用。
+    """
+
+    @staticmethod
+    def _section(text: str, start_marker: str, end_marker: str = "") -> str:
+        start = text.find(start_marker)
+        if start == -1:
+            return ""
+        end = text.find(end_marker, start + len(start_marker)) if end_marker else -1
+        return text[start:end if end != -1 else len(text)].strip()
 
     def enforce_format(self, text: str) -> Dict[str, Any]:
         """Enforce consistent format on the response text."""
         try:
             # 提取分析部分
-            analysis_match = self.analysis_pattern.search(text)
-            analysis = analysis_match.group(0).strip() if analysis_match else ""
+            analysis = self._section(text, "1.", "2.")
 
             # 提取分数部分
-            score_match = self.score_pattern.search(text)
-            score_text = score_match.group(0).strip() if score_match else ""
-            try:
-                score = float(re.search(r"\d+", score_text).group())
-            except (AttributeError, ValueError):
-                score = 0.0
+            score_text = self._section(text, "2.", "3.")
+            score_match = SCORE_NUMBER_PATTERN.search(score_text)
+            score = float(score_match.group()) if score_match else 0.0
 
             # 提取建议部分
-            suggestions_match = self.suggestions_pattern.search(text)
-            suggestions_text = suggestions_match.group(0).strip() if suggestions_match else ""
+            suggestions_text = self._section(text, "3.")
             suggestions = [s.strip() for s in suggestions_text.split('\n') if s.strip()]
 
             return {
@@ -39,4 +47,4 @@ class FormatEnforcer:
 
         except Exception as e:
             logger.error(f"Error enforcing format: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
@@ -0,0 +1,52 @@
+"""
+Whitespace normalizer shared by the post-processing pipeline.
+
+Collapses every run of whitespace (newlines included) into a single space and
+trims both ends in one pass. StreamNormalizer produces the same output for text
+that arrives in chunks, e.g. streamed LLM output, without buffering the whole text.
+"""
+from typing import Iterable, List
+
+
+def normalize_whitespace(text: str) -> str:
+    """Collapse whitespace runs to one space and trim; same result as re.sub(r"\\s+", " ", text).strip()"""
+    # str.split() without arguments splits on exactly the characters matched by \s
+    return " ".join(text.split())
+
+
+def normalize_all(texts: Iterable[str]) -> List[str]:
+    """Normalize each text and drop the ones that end up empty"""
+    return [normalized for normalized in map(normalize_whitespace, texts) if normalized]
+
+
+class StreamNormalizer:
+    """
+    Incremental normalize_whitespace.
+
+    A whitespace run may span chunk boundaries, so trailing whitespace of a chunk is
+    remembered and emitted as a single space only once more text follows; leading
+    whitespace of the stream and trailing whitespace at its end are dropped.
+    """
+
+    def __init__(self):
+        self._started = False        # any non-whitespace emitted yet
+        self._pending_space = False  # whitespace seen after the last emitted character
+
+    def feed(self, chunk: str) -> str:
+        if not chunk:
+            return ""
+        words = chunk.split()
+        if not words:
+            self._pending_space = self._started
+            return ""
+        text = " ".join(words)
+        if self._started and (self._pending_space or chunk[0].isspace()):
+            text = " " + text
+        self._started = True
+        self._pending_space = chunk[-1].isspace()
+        return text
+
+    def flush(self) -> str:
+        """End of stream; trailing whitespace is dropped so nothing is left to emit"""
+        self._pending_space = False
+        return ""
@@ -27,13 +27,15 @@ class StyleValidator:
                 "max_length": 200
             }
         }
+        # 格式强制器无状态，预编译的分数格式与强制器在各次校验间复用
+        self.format_enforcer = FormatEnforcer()
+        self.score_format = re.compile(self.style_rules["score"]["format"])
 
     def validate_response(self, response: str) -> Dict[str, Any]:
         """Validate the response format and style."""
         try:
             # 使用格式强制器确保基本格式
-            format_enforcer = FormatEnforcer()
-            formatted_response = format_enforcer.enforce_format(response)
+            formatted_response = self.format_enforcer.enforce_format(response)
 
             # 验证分析部分
             analysis = formatted_response["analysis"]
@@ -49,7 +51,7 @@ class StyleValidator:
             score = formatted_response["score"]
             if not self.style_rules["score"]["min_value"] <= score <= self.style_rules["score"]["max_value"]:
                 raise ValueError("Score is out of valid range")
-            if not re.match(self.style_rules["score"]["format"], str(score)):
+            if not self.score_format.match(str(score)):
                 raise ValueError("Invalid score format")
 
             # 验证建议部分
@@ -13,7 +13,9 @@ import logging
 from logging.handlers import RotatingFileHandler
 
 from .models import Task, TaskStatus
+from src.database.sqlite_config import connect_sqlite
 from src.utils.logging import logger
+from src.utils.tracing import traced
 
 # --- Database Configuration ---
 # Ensure the data directory exists
@@ -29,14 +31,8 @@ class TaskManager:
     async def initialize_db(self):
         """Create the tasks table if it doesn't exist."""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                # Attempt to enable WAL mode for better concurrency
-                try:
-                    await db.execute("PRAGMA journal_mode=WAL;")
-                    logger.info("SQLite journal_mode set to WAL for initialization.")
-                except Exception as wal_e:
-                    logger.warning(f"Failed to set SQLite journal_mode to WAL during initialization: {wal_e}.")
-
+            # WAL and the other pragmas are applied by connect_sqlite on every connection
+            async with connect_sqlite(self.db_path) as db:
                 async with db.cursor() as cursor:
                     await cursor.execute("""
                         CREATE TABLE IF NOT EXISTS tasks (
@@ -118,6 +114,7 @@ class TaskManager:
              logger.error(f"[CONVERSION_ERROR] Failed during row conversion for task ID '{task_id_from_row}': {e}", exc_info=True)
              return None
 
+    @traced("task_manager.create_task")
     async def create_task(self, metadata: Optional[Dict[str, Any]] = None) -> Task:
         """Create a new task and store it in the SQLite database."""
         task_id = str(uuid.uuid4())
@@ -134,7 +131,7 @@ class TaskManager:
         )
 
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with connect_sqlite(self.db_path) as db:
                 db.row_factory = aiosqlite.Row # Ensure row factory is set
                 logger.info(f"[CREATE_TASK {task_id}] Attempting to insert into DB.")
                 async with db.cursor() as cursor:
@@ -159,10 +156,8 @@ class TaskManager:
     async def get_task(self, task_id: str) -> Optional[Task]:
         """Get a task by ID from the SQLite database."""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with connect_sqlite(self.db_path) as db:
                 db.row_factory = aiosqlite.Row
-                # Optional: Try WAL mode again, though might not be needed per-query
-                # await db.execute("PRAGMA journal_mode=WAL;")
 
                 async with db.cursor() as cursor:
                     logger.debug(f"[GET_TASK {task_id}] Executing SELECT query.")
@@ -187,6 +182,7 @@ class TaskManager:
             logger.error(f"[GET_TASK {task_id}] Exception during execution: {e}", exc_info=True)
             return None # Return None on error
 
+    @traced("task_manager.update_task")
     async def update_task(
         self,
         task_id: str,
@@ -227,7 +223,7 @@ class TaskManager:
         params_list.append(task_id) # Add task_id for WHERE clause
 
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with connect_sqlite(self.db_path) as db:
                 db.row_factory = aiosqlite.Row
                 async with db.cursor() as cursor:
                     logger.debug(f"[UPDATE_TASK {task_id}] Executing UPDATE with params: {params_list}")
@@ -264,7 +260,7 @@ class TaskManager:
         """Get a list of pending tasks from SQLite."""
         tasks = []
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with connect_sqlite(self.db_path) as db:
                 db.row_factory = aiosqlite.Row
                 async with db.cursor() as cursor:
                     # 降低查询日志级别，仅在DEBUG级别和开发模式下记录
@@ -19,6 +19,8 @@ from src.config.api_manager import api_manager
 from src.providers.factory import get_handler
 from src.utils.config import UPLOAD_DIR # <--- 1. 导入 UPLOAD_DIR
 from src.utils import file_utils # <--- 导入 file_utils
+from src.core.analyzers.basic_analyzer import perform_basic_analysis
+from src.utils.tracing import span, traced
 
 # --- Define template directory path (similar to analysis.py) ---
 try:
@@ -37,6 +39,7 @@ except Exception as path_e:
 # ----------------------------------------------------------------
 
 # --- Helper function to load template content ---
+@traced("task.load_template")
 def _load_template_content(template_id: str) -> Optional[Dict[str, Any]]:
     """Loads the full content of a single template file by its ID."""
     if not TEMPLATE_DIR:
@@ -176,6 +179,12 @@ class TaskWorker:
             await asyncio.sleep(10)
     
     async def _process_task(self, task_id: str, metadata: Optional[Dict[str, Any]]):
+        """Process a single task (traced as one root span, see /api/traces)."""
+        async with span("task.process", root=True, task_id=task_id,
+                        analysis_type=(metadata or {}).get("analysis_type", "unknown")):
+            await self._run_task(task_id, metadata)
+
+    async def _run_task(self, task_id: str, metadata: Optional[Dict[str, Any]]):
         """Process a single task."""
         if not metadata:
             await self.task_manager.update_task(
@@ -207,6 +216,10 @@ class TaskWorker:
             else:
                 logger.debug(f"[TASK_DEBUG {task_id}] Found 'params' key in metadata.")
 
+            if task_params_dict.get("analysis_type") == "corpus":
+                await self._process_corpus_task(task_id, task_params_dict)
+                return
+
             text_from_direct_input = task_params_dict.get("text", "")
             file_path_relative = task_params_dict.get("file_path")
 
@@ -275,9 +288,17 @@ class TaskWorker:
             
             # --- Actual Analysis Logic --- 
             if analysis_type == "basic":
-                # Basic analysis logic remains the same
+                # CPU-bound work runs in the analysis process pool, not on the event loop
                 logger.debug(f"Performing basic analysis for task {task_id}")
-                result_data = { "status": "success", "message": "Basic analysis completed." } # Placeholder
+                await self.task_manager.update_task(task_id, progress=0.5)
+                async with span("task.basic_analysis", text_length=len(actual_text_to_analyze)):
+                    result_data = await perform_basic_analysis(
+                        actual_text_to_analyze, options,
+                        summary_length=task_params_dict.get("summary_length") or 3,
+                        summary_method=task_params_dict.get("summary_method") or "textrank"
+                    )
+                if "error" in result_data:
+                    raise ValueError(result_data["error"])
                 await self.task_manager.update_task(task_id, progress=0.9)
 
             elif analysis_type == "literature" or analysis_type == "deep":
@@ -490,6 +511,44 @@ class TaskWorker:
                 error=f"Unhandled exception: {str(e)}"
             )
 
+    @traced("task.corpus")
+    async def _process_corpus_task(self, task_id: str, params: Dict[str, Any]):
+        """语料批量基础分析：逐篇完成时更新进度，全部结束后保存逐篇结果与语料汇总"""
+        from src.core.analyzers.corpus import iter_corpus_analysis, load_corpus_documents
+
+        documents = await load_corpus_documents(params.get("documents") or [])
+        if not documents:
+            raise ValueError("Corpus analysis task has no documents")
+        options = params.get("options") or []
+        if not options:
+            raise ValueError("Analysis options are missing")
+
+        await self.task_manager.update_task(task_id, progress=0.2)
+        results: list = [None] * len(documents)
+        corpus_summary: Dict[str, Any] = {}
+        finished = 0
+        async for event in iter_corpus_analysis(
+            documents, options,
+            summary_length=params.get("summary_length") or 3,
+            summary_method=params.get("summary_method") or "textrank",
+            top_terms=params.get("top_terms") or 50,
+        ):
+            if event["type"] == "corpus":
+                corpus_summary = event
+                continue
+            results[event["index"]] = event
+            finished += 1
+            await self.task_manager.update_task(task_id, progress=0.2 + 0.7 * finished / len(documents))
+
+        logger.info(f"[WORKER_PROCESS {task_id}] Corpus analysis finished: "
+                    f"{corpus_summary.get('completed', 0)} completed, {corpus_summary.get('failed', 0)} failed.")
+        await self.task_manager.update_task(
+            task_id=task_id,
+            status=TaskStatus.COMPLETED,
+            progress=100.0,
+            result={"analysis_type": "corpus", "documents": results, "corpus": corpus_summary}
+        )
+
 # --- Create a global worker instance ---
 # Now initialized in startup after manager connects
 task_worker = None # Initialize as None
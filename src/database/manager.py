@@ -2,15 +2,18 @@
 Database management using SQLAlchemy for storing result metadata.
 """
 
+import base64
+import json
 import os
 from datetime import datetime, timezone
-from typing import AsyncGenerator, List, Optional
+from typing import AsyncGenerator, List, Optional, Tuple
 
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, select, MetaData, Table, Text, UniqueConstraint, Index
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, select, delete, tuple_, Select, MetaData, Table, Text, UniqueConstraint, Index, LargeBinary
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base, Mapped, mapped_column
 from sqlalchemy.sql import func
 
+from src.database.sqlite_config import create_tuned_async_engine
 from src.utils.logging import logger
 
 # --- Configuration ---
@@ -23,7 +26,8 @@ logger.info(f"Database directory: {DATABASE_DIR}")
 logger.info(f"Database URL: {DATABASE_URL}")
 
 # --- SQLAlchemy Setup (Async) ---
-engine = create_async_engine(DATABASE_URL, echo=False) # Set echo=True for SQL query debugging
+# Pragmas (WAL, synchronous, cache/mmap size, busy timeout) and pool sizing come from app_config.yaml
+engine = create_tuned_async_engine(DATABASE_URL, echo=False) # Set echo=True for SQL query debugging
 
 async_session_factory = async_sessionmaker(
     bind=engine,
@@ -53,11 +57,34 @@ class Result(Base):
     # Add unique constraint and index explicitly if needed beyond single column flags
     __table_args__ = (
         Index('ix_results_timestamp', 'timestamp'), # Index timestamp for sorting
+        # Composite indexes for filtered, keyset-paginated listing (newest first, id breaks ties)
+        Index('ix_results_timestamp_id', 'timestamp', 'id'),
+        Index('ix_results_type_timestamp_id', 'type', 'timestamp', 'id'),
+        Index('ix_results_model_timestamp_id', 'model_info', 'timestamp', 'id'),
     )
 
     def __repr__(self):
         return f"<Result(id={self.id}, result_id='{self.result_id}', name='{self.name}', type='{self.type}', timestamp={self.timestamp})>"
 
+# file_path value used for results whose payload is stored in the result_payloads table
+DB_PAYLOAD_PATH_PREFIX = "db://"
+
+class ResultPayload(Base):
+    """Result content stored in the database (used when result_storage is 'database')."""
+    __tablename__ = 'result_payloads'
+
+    result_id: Mapped[str] = mapped_column(String, primary_key=True) # Same value as Result.result_id
+    encoding: Mapped[str] = mapped_column(String, nullable=False) # e.g., 'json+zlib'
+    data: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    size: Mapped[int] = mapped_column(Integer, nullable=False) # Uncompressed size in bytes
+
+    def __repr__(self):
+        return f"<ResultPayload(result_id='{self.result_id}', encoding='{self.encoding}', size={self.size}, stored={len(self.data)})>"
+
+def is_db_stored(record: Result) -> bool:
+    """Whether the record's payload lives in the result_payloads table instead of a JSON file."""
+    return bool(record.file_path) and record.file_path.startswith(DB_PAYLOAD_PATH_PREFIX)
+
 # --- Database Initialization ---
 
 async def init_db():
@@ -66,6 +93,9 @@ async def init_db():
         logger.info("Initializing database and creating tables if they don't exist...")
         # Base.metadata.create_all will create tables based on models inheriting from Base
         await conn.run_sync(Base.metadata.create_all)
+        # create_all skips indexes of tables that already exist; add any new ones explicitly
+        for index in Result.__table__.indexes:
+            await conn.run_sync(lambda sync_conn, idx=index: idx.create(sync_conn, checkfirst=True))
         logger.info("Database initialization complete.")
 
 # --- Dependency for FastAPI Routes ---
@@ -108,6 +138,45 @@ async def add_result_record(db: AsyncSession, **kwargs):
         logger.error(f"Failed to add result record for {kwargs.get('result_id')}: {e}")
         raise
 
+async def add_result_with_payload(db: AsyncSession, data: bytes, encoding: str, size: int, **kwargs) -> Result:
+    """Adds a result record together with its stored payload in a single transaction."""
+    if not kwargs.get('result_id') or not kwargs.get('type'):
+        raise ValueError("Missing required field for result record: result_id/type")
+    kwargs['file_path'] = f"{DB_PAYLOAD_PATH_PREFIX}{kwargs['result_id']}"
+    if 'timestamp' not in kwargs:
+        kwargs['timestamp'] = datetime.now()
+
+    new_result = Result(**kwargs)
+    try:
+        db.add(new_result)
+        db.add(ResultPayload(result_id=new_result.result_id, encoding=encoding, data=data, size=size))
+        await db.commit()
+        await db.refresh(new_result)
+        logger.info(f"Added result record with stored payload: {new_result.result_id} ({new_result.type}, {size} -> {len(data)} bytes)")
+        return new_result
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Failed to add result record with payload for {kwargs.get('result_id')}: {e}")
+        raise
+
+async def update_result_payload(db: AsyncSession, result_id: str, data: bytes, encoding: str, size: int) -> bool:
+    """Replaces the stored payload of a result. Returns False if the result has no stored payload."""
+    try:
+        payload = await db.get(ResultPayload, result_id)
+        if not payload:
+            logger.warning(f"Stored payload for result {result_id} not found for update.")
+            return False
+        payload.data = data
+        payload.encoding = encoding
+        payload.size = size
+        await db.commit()
+        logger.info(f"Updated stored payload for result {result_id} ({size} -> {len(data)} bytes)")
+        return True
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Failed to update stored payload for result {result_id}: {e}")
+        raise
+
 async def list_results(db: AsyncSession, limit: int = 100, offset: int = 0) -> List[Result]:
     """Lists result records from the database, ordered by timestamp descending."""
     try:
@@ -120,6 +189,83 @@ async def list_results(db: AsyncSession, limit: int = 100, offset: int = 0) -> L
         logger.error(f"Failed to list result records: {e}")
         raise
 
+# --- Filtered listing with keyset pagination ---
+
+def encode_results_cursor(record: Result) -> str:
+    """Builds an opaque cursor pointing just after the given record in timestamp-desc order."""
+    raw = json.dumps([record.timestamp.isoformat(), record.id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_results_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_results_cursor. Raises ValueError for malformed cursors."""
+    try:
+        timestamp_str, record_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(timestamp_str), int(record_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def _apply_result_filters(
+    stmt: Select,
+    type: Optional[str] = None,
+    model_info: Optional[str] = None,
+    provider: Optional[str] = None,
+    tags: Optional[List[str]] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+) -> Select:
+    """Adds WHERE clauses for the server-side result filters."""
+    if type:
+        stmt = stmt.where(Result.type == type)
+    if model_info:
+        stmt = stmt.where(Result.model_info == model_info)
+    if provider:
+        # model_info is "provider/model"; a range instead of LIKE keeps the index usable
+        stmt = stmt.where(Result.model_info >= f"{provider}/", Result.model_info < f"{provider}0")
+    for tag in tags or []:
+        # tags is a comma-separated string; match whole entries only
+        stmt = stmt.where(("," + func.replace(Result.tags, " ", "") + ",").contains(f",{tag.strip()},", autoescape=True))
+    if date_from:
+        stmt = stmt.where(Result.timestamp >= date_from)
+    if date_to:
+        stmt = stmt.where(Result.timestamp <= date_to)
+    return stmt
+
+async def list_results_page(
+    db: AsyncSession,
+    limit: int = 100,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    **filters,
+) -> Tuple[List[Result], Optional[str]]:
+    """
+    Lists result records newest first with optional filters.
+
+    When a cursor (from a previous page) is given, keyset pagination is used and
+    offset is ignored. Returns the records and the cursor for the next page
+    (None when there are no more records).
+    """
+    stmt = _apply_result_filters(select(Result), **filters)
+    if cursor:
+        cursor_timestamp, cursor_id = decode_results_cursor(cursor)
+        stmt = stmt.where(tuple_(Result.timestamp, Result.id) < tuple_(cursor_timestamp, cursor_id))
+    else:
+        stmt = stmt.offset(offset)
+    # Fetch one extra row to know whether another page exists
+    stmt = stmt.order_by(Result.timestamp.desc(), Result.id.desc()).limit(limit + 1)
+    try:
+        records = list((await db.execute(stmt)).scalars().all())
+    except Exception as e:
+        logger.error(f"Failed to list result records page: {e}")
+        raise
+    next_cursor = encode_results_cursor(records[limit - 1]) if len(records) > limit else None
+    logger.debug(f"Fetched {min(len(records), limit)} result records (limit={limit}, cursor={bool(cursor)}, filters={filters}).")
+    return records[:limit], next_cursor
+
+async def count_results(db: AsyncSession, **filters) -> int:
+    """Counts result records matching the same filters as list_results_page."""
+    stmt = _apply_result_filters(select(func.count(Result.id)), **filters)
+    return (await db.execute(stmt)).scalar_one()
+
 # --- Add other CRUD operations as needed (get_result_by_id, update_result, delete_result) ---
 
 async def get_result_by_result_id(db: AsyncSession, result_id: str) -> Optional[Result]:
@@ -137,8 +283,11 @@ async def get_result_by_result_id(db: AsyncSession, result_id: str) -> Optional[
         logger.error(f"Failed to get result record by result_id {result_id}: {e}")
         raise # Re-raise
 
-async def delete_result_record(db: AsyncSession, result_id: str) -> bool:
-    """Deletes a specific result record by its unique result_id. Returns True if deleted, False otherwise."""
+async def delete_result_record(db: AsyncSession, result_id: str, commit: bool = True) -> bool:
+    """
+    Deletes a specific result record by its unique result_id. Returns True if deleted, False otherwise.
+    With commit=False the caller owns the transaction (e.g. to remove the search index entry with it).
+    """
     try:
         stmt = select(Result).where(Result.result_id == result_id)
         result = await db.execute(stmt)
@@ -146,14 +295,18 @@ async def delete_result_record(db: AsyncSession, result_id: str) -> bool:
 
         if record_to_delete:
             await db.delete(record_to_delete)
-            await db.commit()
+            # Stored payload (if any) goes in the same transaction
+            await db.execute(delete(ResultPayload).where(ResultPayload.result_id == result_id))
+            if commit:
+                await db.commit()
             logger.info(f"Deleted result record with result_id: {result_id}")
             return True
         else:
             logger.warning(f"Result record with result_id {result_id} not found for deletion.")
             return False
     except Exception as e:
-        await db.rollback()
+        if commit:
+            await db.rollback()
         logger.error(f"Failed to delete result record with result_id {result_id}: {e}")
         raise # Re-raise
 
@@ -0,0 +1,374 @@
+"""
+Full-text search index for chat logs and saved analysis results.
+
+The index lives in the same SQLite database as the result metadata and uses an
+FTS5 virtual table. SQLite's built-in tokenizers do not segment Chinese, so text
+is segmented with jieba before it is written: a zero-width space is inserted at
+every word boundary the ``unicode61`` tokenizer would not otherwise see. The
+stored text is therefore the original text plus invisible separators, which
+keeps snippets readable.
+
+Precise-mode segmentation keeps long words whole ("北京大学" is one token), so
+the shorter words jieba's search mode finds inside them ("北京", "大学") are
+stored in the hidden title_terms / body_terms columns. Queries are segmented in
+precise mode and match either the words or these sub-words.
+
+The index functions do not commit; the caller's save/delete path owns the
+transaction.
+
+Segmentation uses the jieba user dictionaries (see
+src/core/analyzers/dictionaries.py). The dictionary signature the index was
+built with is kept in search_meta; a changed dictionary re-segments the index
+on startup, and a change at runtime is logged until POST /search/reindex runs.
+"""
+
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import jieba
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.analyzers.dictionaries import dictionary_manager, ensure_dictionaries_loaded
+from src.database.manager import engine
+from src.utils.logging import logger
+
+# --- Configuration ---
+MAX_INDEXED_CHARS = 200_000  # Upper bound on body text segmented per document
+SNIPPET_TOKENS = 24          # Approximate number of tokens shown in a snippet
+SNIPPET_OPEN, SNIPPET_CLOSE = "<mark>", "</mark>"
+
+KIND_CHAT = "chat"
+KIND_RESULT = "result"
+VALID_KINDS = {KIND_CHAT, KIND_RESULT}
+
+# Payload keys that carry metadata rather than searchable content
+_SKIP_PAYLOAD_KEYS = {"timestamp", "provider", "model", "id", "analysis_type", "format", "template_id"}
+
+# Word separator inserted by segmentation; unicode61 treats it as a token boundary
+_SEPARATOR = "\u200b"
+
+_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS search_documents (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        doc_id TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        UNIQUE (kind, doc_id)
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        title,
+        body,
+        title_terms,
+        body_terms,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS search_meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    )
+    """,
+]
+_COLUMNS = ["title", "body", "title_terms", "body_terms"]
+# bm25 weights per column: sub-word matches rank below whole-word matches
+_RANK_WEIGHTS = "5.0, 1.0, 2.5, 0.5"
+_SEGMENTATION_KEY = "segmentation"
+
+# User dictionary signature the stored documents were segmented with
+_indexed_segmentation: Optional[str] = None
+_stale_segmentation_logged: Optional[str] = None
+
+
+async def init_search_index():
+    """
+    Creates the search tables if they don't exist, upgrading an index built
+    without sub-words and re-segmenting one built with other user dictionaries.
+    """
+    global _indexed_segmentation
+    signature = await asyncio.to_thread(_segmentation_signature)
+    async with engine.begin() as conn:
+        columns = [row[1] for row in (await conn.execute(text("PRAGMA table_info(search_index)"))).all()]
+        rows = []
+        if columns and columns != _COLUMNS:
+            rows = (await conn.execute(text("SELECT rowid, title, body FROM search_index"))).all()
+            await conn.execute(text("DROP TABLE search_index"))
+        for statement in _DDL:
+            await conn.execute(text(statement))
+        if rows:
+            await _rewrite_rows(conn, rows)
+            logger.info(f"Search index upgraded: re-segmented {len(rows)} document(s) with sub-words.")
+        else:
+            stored = (await conn.execute(
+                text("SELECT value FROM search_meta WHERE key = :key"), {"key": _SEGMENTATION_KEY}
+            )).scalar()
+            if stored != signature:
+                rows = (await conn.execute(text("SELECT rowid, title, body FROM search_index"))).all()
+                if rows:
+                    await _rewrite_rows(conn, rows)
+                    logger.info(f"User dictionaries changed: re-segmented {len(rows)} indexed document(s).")
+        await _store_segmentation(conn, signature)
+    _indexed_segmentation = signature
+    logger.info("Full-text search index initialized.")
+
+
+async def record_segmentation(db: AsyncSession) -> None:
+    """Marks the index as segmented with the current user dictionaries (after a full reindex; the caller commits)."""
+    global _indexed_segmentation
+    signature = await asyncio.to_thread(_segmentation_signature)
+    await _store_segmentation(db, signature)
+    _indexed_segmentation = signature
+
+
+async def _store_segmentation(conn: Union[AsyncConnection, AsyncSession], signature: str) -> None:
+    await conn.execute(
+        text("INSERT OR REPLACE INTO search_meta (key, value) VALUES (:key, :value)"),
+        {"key": _SEGMENTATION_KEY, "value": signature},
+    )
+
+
+def _segmentation_signature() -> str:
+    ensure_dictionaries_loaded()
+    return dictionary_manager.user_dict_signature
+
+
+def _check_segmentation() -> None:
+    """Logs once per dictionary change when stored documents were segmented with other user dictionaries."""
+    global _stale_segmentation_logged
+    signature = dictionary_manager.user_dict_signature
+    if _indexed_segmentation is None or signature == _indexed_segmentation or signature == _stale_segmentation_logged:
+        return
+    _stale_segmentation_logged = signature
+    logger.warning(
+        "User dictionaries changed since the search index was built; words added to or removed from "
+        "the dictionaries may not match older documents until POST /api/search/reindex is run."
+    )
+
+
+async def _rewrite_rows(conn: AsyncConnection, rows: List[Any]) -> None:
+    """Re-segments stored documents (the stored text minus separators is the original text)."""
+    for rowid, title, body in rows:
+        title_tokens, title_terms = await asyncio.to_thread(segment_text, _compact_snippet(title))
+        body_tokens, body_terms = await asyncio.to_thread(segment_text, _compact_snippet(body))
+        await conn.execute(text("DELETE FROM search_index WHERE rowid = :rowid"), {"rowid": rowid})
+        await conn.execute(
+            text(
+                "INSERT INTO search_index (rowid, title, body, title_terms, body_terms) "
+                "VALUES (:rowid, :title, :body, :title_terms, :body_terms)"
+            ),
+            {"rowid": rowid, "title": title_tokens, "body": body_tokens,
+             "title_terms": title_terms, "body_terms": body_terms},
+        )
+
+
+# --- Segmentation helpers ---
+
+def segment_text(content: str) -> Tuple[str, str]:
+    """
+    Segments text with jieba.
+
+    Returns the text with word boundaries marked by zero-width spaces, and the
+    space-separated sub-words search mode finds inside longer words.
+    """
+    if not content:
+        return "", ""
+    ensure_dictionaries_loaded()
+    # Search mode yields the sub-words of each word right before the word itself;
+    # a token that starts inside the next token's span is one of its sub-words.
+    words: List[Tuple[str, int]] = []
+    sub_words: List[str] = []
+    for token, start, end in jieba.tokenize(content[:MAX_INDEXED_CHARS], mode="search"):
+        while words and words[-1][1] >= start:
+            sub_words.append(words.pop()[0])
+        words.append((token, start))
+    parts: List[str] = []
+    previous = ""
+    for token, _ in words:
+        if not token:
+            continue
+        # Only adjacent letter/number runs need an explicit boundary
+        if previous and previous[-1].isalnum() and token[0].isalnum():
+            parts.append(_SEPARATOR)
+        parts.append(token)
+        previous = token
+    return "".join(parts), " ".join(sub_words)
+
+
+def build_match_query(query: str) -> str:
+    """Turns a user query into an FTS5 MATCH expression (all terms must match)."""
+    ensure_dictionaries_loaded()
+    terms = []
+    for token in jieba.cut(query):
+        token = token.strip()
+        # Skip pure punctuation: unicode61 would drop it from the index anyway
+        if not token or not any(ch.isalnum() for ch in token):
+            continue
+        terms.append('"' + token.replace('"', '""') + '"')
+    return " ".join(terms)
+
+
+def _compact_snippet(snippet: str) -> str:
+    return (snippet or "").replace(_SEPARATOR, "")
+
+
+def _collect_text(value: Any, parts: List[str]) -> None:
+    if isinstance(value, str):
+        if value.strip():
+            parts.append(value)
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            if key not in _SKIP_PAYLOAD_KEYS:
+                _collect_text(item, parts)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _collect_text(item, parts)
+
+
+def result_search_text(payload: Dict[str, Any]) -> str:
+    """Flattens every string value of a result payload into one searchable body."""
+    parts: List[str] = []
+    _collect_text(payload, parts)
+    return "\n".join(parts)
+
+
+def chat_search_text(messages: Iterable[Dict[str, Any]]) -> str:
+    """Concatenates the message contents of a chat log."""
+    return "\n".join(str(msg.get("content", "")) for msg in messages if isinstance(msg, dict))
+
+
+# --- Index maintenance ---
+
+async def index_document(db: AsyncSession, kind: str, doc_id: str, title: Optional[str], body: str) -> None:
+    """Adds or replaces a document in the index (the caller commits)."""
+    (title_tokens, title_terms), (body_tokens, body_terms) = await asyncio.to_thread(
+        lambda: (segment_text(title or ""), segment_text(body))
+    )
+    now_iso = datetime.now(timezone.utc).isoformat()
+    try:
+        row = (await db.execute(
+            text("SELECT id FROM search_documents WHERE kind = :kind AND doc_id = :doc_id"),
+            {"kind": kind, "doc_id": doc_id},
+        )).first()
+        if row:
+            rowid = row[0]
+            await db.execute(text("DELETE FROM search_index WHERE rowid = :rowid"), {"rowid": rowid})
+            await db.execute(
+                text("UPDATE search_documents SET updated_at = :updated_at WHERE id = :rowid"),
+                {"updated_at": now_iso, "rowid": rowid},
+            )
+        else:
+            rowid = (await db.execute(
+                text("INSERT INTO search_documents (kind, doc_id, updated_at) VALUES (:kind, :doc_id, :updated_at)"),
+                {"kind": kind, "doc_id": doc_id, "updated_at": now_iso},
+            )).lastrowid
+        await db.execute(
+            text(
+                "INSERT INTO search_index (rowid, title, body, title_terms, body_terms) "
+                "VALUES (:rowid, :title, :body, :title_terms, :body_terms)"
+            ),
+            {"rowid": rowid, "title": title_tokens, "body": body_tokens,
+             "title_terms": title_terms, "body_terms": body_terms},
+        )
+        logger.debug(f"Indexed {kind} document {doc_id} ({len(body)} chars).")
+    except Exception as e:
+        logger.error(f"Failed to index {kind} document {doc_id}: {e}")
+        raise
+
+
+async def update_document_title(db: AsyncSession, kind: str, doc_id: str, title: str) -> bool:
+    """Re-indexes only the title of an existing document (the caller commits). Returns False if it is not indexed."""
+    title_tokens, title_terms = await asyncio.to_thread(segment_text, title)
+    try:
+        result = await db.execute(
+            text(
+                "UPDATE search_index SET title = :title, title_terms = :title_terms WHERE rowid = "
+                "(SELECT id FROM search_documents WHERE kind = :kind AND doc_id = :doc_id)"
+            ),
+            {"title": title_tokens, "title_terms": title_terms, "kind": kind, "doc_id": doc_id},
+        )
+        return result.rowcount > 0
+    except Exception as e:
+        logger.error(f"Failed to update indexed title for {kind} document {doc_id}: {e}")
+        raise
+
+
+async def remove_document(db: AsyncSession, kind: str, doc_id: str) -> bool:
+    """Removes a document from the index (the caller commits). Returns False if it was not indexed."""
+    try:
+        row = (await db.execute(
+            text("SELECT id FROM search_documents WHERE kind = :kind AND doc_id = :doc_id"),
+            {"kind": kind, "doc_id": doc_id},
+        )).first()
+        if not row:
+            return False
+        await db.execute(text("DELETE FROM search_index WHERE rowid = :rowid"), {"rowid": row[0]})
+        await db.execute(text("DELETE FROM search_documents WHERE id = :rowid"), {"rowid": row[0]})
+        logger.debug(f"Removed {kind} document {doc_id} from search index.")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to remove {kind} document {doc_id} from search index: {e}")
+        raise
+
+
+# --- Querying ---
+
+async def search_documents(
+    db: AsyncSession,
+    query: str,
+    kind: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> List[Dict[str, Any]]:
+    """
+    Runs a ranked full-text query.
+
+    Returns a list of dicts with kind, doc_id, title, snippet, score (higher is
+    better) and updated_at. An empty list is returned when the query has no
+    searchable terms.
+    """
+    match_query = build_match_query(query)
+    if not match_query:
+        return []
+    _check_segmentation()
+
+    sql = (
+        "SELECT d.kind, d.doc_id, d.updated_at, "
+        "       snippet(search_index, 0, :open, :close, '…', :tokens) AS title_snippet, "
+        "       snippet(search_index, 1, :open, :close, '…', :tokens) AS body_snippet, "
+        f"       bm25(search_index, {_RANK_WEIGHTS}) AS rank "
+        "FROM search_index JOIN search_documents d ON d.id = search_index.rowid "
+        "WHERE search_index MATCH :match"
+    )
+    params: Dict[str, Any] = {
+        "open": SNIPPET_OPEN,
+        "close": SNIPPET_CLOSE,
+        "tokens": SNIPPET_TOKENS,
+        "match": match_query,
+        "limit": limit,
+        "offset": offset,
+    }
+    if kind:
+        sql += " AND d.kind = :kind"
+        params["kind"] = kind
+    sql += " ORDER BY rank LIMIT :limit OFFSET :offset"
+
+    rows = (await db.execute(text(sql), params)).all()
+    hits = []
+    for row in rows:
+        hits.append({
+            "kind": row.kind,
+            "doc_id": row.doc_id,
+            "title": _compact_snippet(row.title_snippet),
+            "snippet": _compact_snippet(row.body_snippet),
+            # bm25() is negative with better matches being smaller; flip it for the API
+            "score": -row.rank,
+            "updated_at": row.updated_at,
+        })
+    logger.debug(f"Search '{query}' ({match_query}) returned {len(hits)} hits.")
+    return hits
@@ -0,0 +1,96 @@
+"""
+Shared SQLite connection settings.
+
+Both databases in ``data/`` go through this module: ``glyphmind_data.db`` via the
+SQLAlchemy async engine and ``tasks.db`` via raw aiosqlite connections in the
+task manager. Every new connection gets the same pragmas from the ``database``
+section of ``config/app_config.yaml``, so the two connection strategies can no
+longer drift apart (e.g. one using WAL and a busy timeout, the other not).
+"""
+
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, List, Optional, Union
+
+import aiosqlite
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from src.config.app_config import DatabaseConfig, get_app_config
+from src.utils.logging import logger
+
+
+def get_database_config() -> DatabaseConfig:
+    """Returns the ``database`` section of the application config."""
+    return get_app_config().database
+
+
+def pragma_statements(config: Optional[DatabaseConfig] = None) -> List[str]:
+    """Builds the PRAGMA statements run on every new connection."""
+    config = config or get_database_config()
+    # Values are validated by DatabaseConfig (patterns / ints), so formatting them in is safe
+    return [
+        f"PRAGMA journal_mode={config.journal_mode.upper()}",
+        f"PRAGMA synchronous={config.synchronous.upper()}",
+        f"PRAGMA cache_size=-{config.cache_size_kib}",  # Negative value means KiB instead of pages
+        f"PRAGMA mmap_size={config.mmap_size_mb * 1024 * 1024}",
+        f"PRAGMA busy_timeout={config.busy_timeout_ms}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+
+def _is_memory_url(url: str) -> bool:
+    return make_url(url).database in (None, "", ":memory:")
+
+
+def create_tuned_async_engine(url: str, config: Optional[DatabaseConfig] = None, **kwargs: Any) -> AsyncEngine:
+    """
+    Creates an async SQLAlchemy engine for a SQLite URL with pool sizing and
+    connect-time pragmas applied. Extra kwargs are passed to ``create_async_engine``.
+    """
+    config = config or get_database_config()
+    engine_kwargs: dict = {
+        # sqlite3's own lock wait, in seconds; busy_timeout below covers the same case per connection
+        "connect_args": {"timeout": config.busy_timeout_ms / 1000},
+    }
+    if not _is_memory_url(url):
+        # In-memory databases use a StaticPool, which takes no sizing arguments
+        engine_kwargs.update(
+            pool_size=config.pool_size,
+            max_overflow=config.max_overflow,
+            pool_timeout=config.pool_timeout,
+        )
+    engine_kwargs.update(kwargs)
+    async_engine = create_async_engine(url, **engine_kwargs)
+
+    statements = pragma_statements(config)
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+    logger.info(
+        f"SQLite engine configured: journal_mode={config.journal_mode}, synchronous={config.synchronous}, "
+        f"cache={config.cache_size_kib}KiB, mmap={config.mmap_size_mb}MB, busy_timeout={config.busy_timeout_ms}ms, "
+        f"pool_size={config.pool_size}, max_overflow={config.max_overflow}"
+    )
+    return async_engine
+
+
+@asynccontextmanager
+async def connect_sqlite(
+    db_path: Union[str, Path],
+    config: Optional[DatabaseConfig] = None,
+) -> AsyncIterator[aiosqlite.Connection]:
+    """``aiosqlite.connect`` with the shared pragmas applied; use in place of it."""
+    config = config or get_database_config()
+    async with aiosqlite.connect(db_path, timeout=config.busy_timeout_ms / 1000) as db:
+        for statement in pragma_statements(config):
+            await db.execute(statement)
+        yield db
@@ -6,10 +6,21 @@ from typing import List, Optional, Dict, Any, Union
 import dotenv
 import logging
 from src.utils.logging import logger
+from src.providers.resilience import GUARDED_METHODS, guard_method
+from src.providers.instrumentation import instrument_method
 # 延迟导入，避免循环依赖
 # from src.config.api_manager import api_manager
 
 class BaseAPIHandler(ABC):
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # 子类实现的调用方法统一经过提供商熔断与限流 (见 src/providers/resilience.py)，
+        # 外层再记录延迟、首字延迟、吞吐与错误指标 (见 src/providers/instrumentation.py)
+        for name in GUARDED_METHODS:
+            method = cls.__dict__.get(name)
+            if method is not None and not getattr(method, "__provider_guarded__", False):
+                setattr(cls, name, instrument_method(guard_method(method)))
+
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.provider_name = config.get("provider_name", "unknown")
@@ -9,8 +9,10 @@ from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_excep
 
 from src.utils.logging import logger
 from src.providers.base import BaseAPIHandler
+from src.providers.stream_decoder import SSEJsonStream
 from src.validation.error_handler import ConfigurationError as ConfigError, APIError, APIResponseError, APIResponseFormatError, APIConnectionError, APITimeoutError
 from src.utils.retry import is_retryable_exception
+from src.providers.resilience import provider_trace_configs
 
 class 002Handler(BaseAPIHandler):
     """Template class for handling OpenAI-compatible API interactions.
@@ -104,7 +106,7 @@ class 002Handler(BaseAPIHandler):
         request_url = f"{self.endpoint}{models_endpoint_path}"
         logger.info(f"Attempting to fetch models from: {request_url} for provider {self.provider_name}")
         try:
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 async with session.get(
                     request_url,
                     headers=self._get_headers(),
@@ -157,7 +159,7 @@ class 002Handler(BaseAPIHandler):
         request_url = f"{self.endpoint}{endpoint_path}"
         logger.debug(f"Sending {method} request to endpoint: {request_url} for provider {self.provider_name}")
         try:
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 async with session.request(
                     method,
                     request_url,
@@ -352,7 +354,7 @@ class 002Handler(BaseAPIHandler):
             request_url = f"{self.endpoint}/chat/completions"
             logger.debug(f"Streaming request to: {request_url} for provider {self.provider_name}")
             
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 async with session.post( 
                     request_url,
                     headers=self._get_headers(),
@@ -371,29 +373,14 @@ class 002Handler(BaseAPIHandler):
                             details=f"Stream chat error: HTTP {response.status}"
                         )
 
-                    async for line in response.content:
-                        if not line:
-                            continue
-
-                        line_str = line.decode('utf-8').strip()
-                        if not line_str:
-                            continue
-
-                        if line_str.startswith("data: "):
-                            data_str = line_str[len("data: "):].strip()
-                            if data_str == "[DONE]":
-                                logger.info(f"Stream chat completed for {self.provider_name}")
-                                yield {"status": "done"} # Yield completion marker
-                                break
-
-                            try:
-                                data = json.loads(data_str)
-                                # Yield OpenAI compatible chunks directly
-                                yield data
-
-                            except json.JSONDecodeError as e:
-                                logger.warning(f"Failed to parse stream chunk for {self.provider_name}: {e}, Raw: {data_str[:100]}...")
-                                # Optionally yield warning or skip
+                    # 共享的增量 SSE 解码器：跨 TCP 分块的半行会被拼接，无法解析的事件记录警告后跳过
+                    stream = SSEJsonStream(response.content, self.provider_name)
+                    async for data in stream:
+                        # Yield OpenAI compatible chunks directly
+                        yield data
+                    if stream.done:
+                        logger.info(f"Stream chat completed for {self.provider_name}")
+                        yield {"status": "done"} # Yield completion marker
 
         # 修正异常处理中的参数顺序和字段名称
         except aiohttp.ClientConnectorError as e:
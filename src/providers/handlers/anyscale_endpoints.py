@@ -9,8 +9,10 @@ from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_excep
 
 from src.utils.logging import logger
 from src.providers.base import BaseAPIHandler
+from src.providers.stream_decoder import SSEJsonStream
 from src.validation.error_handler import ConfigurationError as ConfigError, APIError, APIResponseError, APIResponseFormatError, APIConnectionError, APITimeoutError
 from src.utils.retry import is_retryable_exception
+from src.providers.resilience import provider_trace_configs
 
 class AnyscaleEndpointsHandler(BaseAPIHandler):
     """Handles interaction with Anyscale Endpoints API (OpenAI Compatible)."""
@@ -65,7 +67,7 @@ class AnyscaleEndpointsHandler(BaseAPIHandler):
         logger.info(f"Attempting to fetch Anyscale models from: {self.models_endpoint}")
         try:
             headers = self._get_headers()
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 async with session.get(self.models_endpoint, headers=headers, timeout=aiohttp.ClientTimeout(total=15)) as response:
                     response_text = await response.text()
                     if response.status != 200:
@@ -117,7 +119,7 @@ class AnyscaleEndpointsHandler(BaseAPIHandler):
             
         logger.debug(f"Sending request to Anyscale Endpoints endpoint: {self.chat_endpoint}")
         try:
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 async with session.post(
                     self.chat_endpoint,
                     headers=self._get_headers(),
@@ -245,7 +247,7 @@ class AnyscaleEndpointsHandler(BaseAPIHandler):
 
         logger.debug(f"Anyscale stream_chat payload: { {k:v for k,v in payload.items() if k != 'messages'} }")
         try:
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 async with session.post(
                     self.chat_endpoint,
                     headers=self._get_headers(),
@@ -257,23 +259,13 @@ class AnyscaleEndpointsHandler(BaseAPIHandler):
                         logger.error(f"Anyscale Endpoints Stream API error: {response.status}, {error_text[:200]}...")
                         raise APIResponseError(message=f"HTTP {response.status}", status_code=response.status, response_body={"error": error_text}, provider=self.provider_name)
 
-                    async for line in response.content:
-                        if not line:
-                            continue
-                        line_str = line.decode('utf-8').strip()
-                        if not line_str:
-                            continue
-                        if line_str.startswith("data: "):
-                            data_str = line_str[len("data: "):].strip()
-                            if data_str == "[DONE]":
-                                logger.info("Anyscale Endpoints Stream chat completed")
-                                yield {"status": "done"}
-                                break
-                            try:
-                                data = json.loads(data_str)
-                                yield data 
-                            except json.JSONDecodeError as e:
-                                logger.warning(f"Failed to parse Anyscale Endpoints stream chunk: {e}, data: '{data_str[:100]}...'")
+                    # 共享的增量 SSE 解码器：跨 TCP 分块的半行会被拼接，无法解析的事件记录警告后跳过
+                    stream = SSEJsonStream(response.content, self.provider_name)
+                    async for data in stream:
+                        yield data
+                    if stream.done:
+                        logger.info("Anyscale Endpoints Stream chat completed")
+                        yield {"status": "done"}
         except aiohttp.ClientConnectorError as e:
             logger.error(f"Anyscale stream connection error: {str(e)}", exc_info=True)
             raise APIConnectionError(message=f"Network error during streaming: {e}", detail=str(e), provider=self.provider_name) from e
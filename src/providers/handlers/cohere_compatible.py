@@ -10,8 +10,10 @@ from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_excep
 
 from src.utils.logging import logger
 from src.providers.base import BaseAPIHandler
+from src.providers.stream_decoder import SSEJsonStream
 from src.validation.error_handler import ConfigurationError as ConfigError, APIError, APIResponseError, APIResponseFormatError, APIConnectionError, APITimeoutError
 from src.utils.retry import is_retryable_exception
+from src.providers.resilience import provider_trace_configs
 
 class CohereCompatibleHandler(BaseAPIHandler):
     """Handles interaction with Cohere API via its OpenAI Compatible endpoint."""
@@ -84,7 +86,7 @@ class CohereCompatibleHandler(BaseAPIHandler):
         request_url = f"{self.endpoint}{models_endpoint_path}"
         logger.info(f"Attempting to fetch models from: {request_url}")
         try:
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 async with session.get(
                     request_url, 
                     headers=self._get_headers(), 
@@ -135,7 +137,7 @@ class CohereCompatibleHandler(BaseAPIHandler):
         request_url = f"{self.endpoint}{endpoint_path}"
         logger.debug(f"Sending {method} request to Cohere compatible endpoint: {request_url}")
         try:
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 async with session.request(
                     method,
                     request_url,
@@ -274,7 +276,7 @@ class CohereCompatibleHandler(BaseAPIHandler):
             request_url = f"{self.endpoint}/chat/completions"
             logger.debug(f"Streaming request to: {request_url} for {self.provider_name}")
 
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 async with session.post(
                     request_url,
                     headers=self._get_headers(),
@@ -286,23 +288,13 @@ class CohereCompatibleHandler(BaseAPIHandler):
                         logger.error(f"Cohere Compatible Stream API error for {self.provider_name}: {response.status}, {error_text[:200]}...")
                         raise APIResponseError(message=f"HTTP {response.status}", status_code=response.status, response_body={"error": error_text}, provider=self.provider_name)
 
-                    async for line in response.content:
-                        if not line:
-                            continue
-                        line_str = line.decode('utf-8').strip()
-                        if not line_str:
-                            continue
-                        if line_str.startswith("data: "):
-                            data_str = line_str[len("data: "):].strip()
-                            if data_str == "[DONE]":
-                                logger.info(f"Cohere Compatible Stream chat completed for {self.provider_name}")
-                                yield {"status": "done"}
-                                break
-                            try:
-                                data = json.loads(data_str)
-                                yield data
-                            except json.JSONDecodeError as e:
-                                logger.warning(f"Failed to parse Cohere Compatible stream chunk for {self.provider_name}: {e}, data: '{data_str[:100]}...'")
+                    # 共享的增量 SSE 解码器：跨 TCP 分块的半行会被拼接，无法解析的事件记录警告后跳过
+                    stream = SSEJsonStream(response.content, self.provider_name)
+                    async for data in stream:
+                        yield data
+                    if stream.done:
+                        logger.info(f"Cohere Compatible Stream chat completed for {self.provider_name}")
+                        yield {"status": "done"}
                                 
         except aiohttp.ClientConnectorError as e:
             logger.error(f"Cohere Compatible stream chat connection error for {self.provider_name}: {str(e)}", exc_info=True)
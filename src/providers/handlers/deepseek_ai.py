@@ -9,8 +9,10 @@ from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_excep
 import asyncio
 from src.utils.logging import logger
 from src.providers.base import BaseAPIHandler
+from src.providers.stream_decoder import SSEJsonStream
 from src.validation.error_handler import ConfigurationError as ConfigError, APIError, APIResponseError, APIResponseFormatError, APIConnectionError, APITimeoutError
 from src.utils.retry import is_retryable_exception
+from src.providers.resilience import provider_trace_configs
 
 class DeepseekAIHandler(BaseAPIHandler):
     """Handles interaction with Deepseek AI API."""
@@ -62,7 +64,7 @@ class DeepseekAIHandler(BaseAPIHandler):
         try:
             headers = self._get_headers()
             
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 async with session.get(
                     models_list_endpoint,
                     headers=headers,
@@ -122,7 +124,7 @@ class DeepseekAIHandler(BaseAPIHandler):
         request_url = f"{self.endpoint}{endpoint_path if endpoint_path.startswith('/') else '/' + endpoint_path}"
         logger.debug(f"Sending {method} request to DeepSeek AI endpoint: {request_url}")
         try:
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 async with session.request(
                     method,
                     request_url,
@@ -276,7 +278,7 @@ class DeepseekAIHandler(BaseAPIHandler):
         logger.debug(f"Deepseek streaming chat parameters: { {k:v for k,v in payload.items() if k != 'messages'} }")
 
         try:
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 async with session.post(
                     f"{self.endpoint}/chat/completions",
                     headers=self._get_headers(),
@@ -293,21 +295,9 @@ class DeepseekAIHandler(BaseAPIHandler):
                             details=f"Stream chat error: HTTP {response.status}"
                         )
                     
-                    # Process the streaming response line by line
-                    async for line in response.content:
-                        if not line:
-                            continue
-                            
-                        line = line.decode('utf-8').strip()
-                        if not line or line == "data: [DONE]" or not line.startswith("data:"):
-                            continue
-                            
-                        try:
-                            data = json.loads(line[5:].strip())  # Strip the "data: " prefix
-                            yield data
-                        except json.JSONDecodeError as e:
-                            logger.warning(f"Failed to decode JSON from stream: {e}, line: {line}")
-                            continue
+                    # 共享的增量 SSE 解码器：跨 TCP 分块的半行会被拼接，无法解析的事件记录警告后跳过
+                    async for data in SSEJsonStream(response.content, self.provider_name):
+                        yield data
         except aiohttp.ClientConnectorError as e:
             logger.error(f"Deepseek AI Stream chat connection error: {e}")
             raise APIConnectionError(
@@ -1,27 +1,47 @@
 """
 Google Gemini API handler implementation.
+
+Talks to the Gemini REST API (generativelanguage.googleapis.com) directly over the
+shared aiohttp session instead of wrapping the synchronous SDK in asyncio.to_thread,
+so concurrent Gemini requests are bounded by the connection pool, not by the default
+thread pool. Streaming uses ``:streamGenerateContent?alt=sse``.
 """
 import json
 import aiohttp
-import os
-# --- Add asyncio --- 
-import asyncio 
-# -------------------
+import asyncio
+import base64
 from typing import Optional, Dict, Any, List, AsyncGenerator
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type, RetryError
-import google.generativeai as genai
-from google.generativeai.types import content_types
-from google.generativeai.types.generation_types import GenerateContentResponse, GenerationConfig
-# --- FIX: Import specific Google API errors --- 
-from google.api_core import exceptions as google_exceptions
-# --------------------------------------------
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception
 
 from src.utils.logging import logger
 from src.providers.base import BaseAPIHandler
-# --- Use correct exception names from error_handler.py --- 
+from src.providers.http_client import client_timeout, get_http_session
+from src.providers.resilience import provider_limits
+from src.providers.stream_decoder import SSEJsonStream
+# --- Use correct exception names from error_handler.py ---
 from src.validation.error_handler import ConfigurationError as ConfigError, APIError, APIResponseError, APIResponseFormatError, APIConnectionError, APITimeoutError # Use updated names
 # ---------------------------------------------------------
-from src.utils.retry import is_retryable_exception
+from src.utils.retry import RETRY_STATUS_CODES
+
+DEFAULT_ENDPOINT = "https://generativelanguage.googleapis.com/v1beta"
+
+# finishReason 值中表示内容被拦截的几种
+BLOCKED_FINISH_REASONS = {"SAFETY", "RECITATION", "BLOCKLIST", "PROHIBITED_CONTENT", "SPII", "IMAGE_SAFETY"}
+
+
+def _is_retryable(exception: BaseException) -> bool:
+    """连接失败、超时以及 408/429/5xx 响应可以重试"""
+    if isinstance(exception, (APIConnectionError, APITimeoutError)):
+        return True
+    return isinstance(exception, APIResponseError) and exception.status_code in RETRY_STATUS_CODES
+
+
+def _error_message(status: int, body: Any) -> str:
+    """从 Gemini 错误响应 ({"error": {"code", "message", "status"}}) 中取出错误信息"""
+    if isinstance(body, dict) and isinstance(body.get("error"), dict):
+        return body["error"].get("message") or body["error"].get("status") or f"HTTP {status}"
+    return str(body)[:500] if body else f"HTTP {status}"
+
 
 class GoogleGeminiHandler(BaseAPIHandler):
     """Handles interaction with Google Gemini API."""
@@ -30,109 +50,137 @@ class GoogleGeminiHandler(BaseAPIHandler):
         super().__init__(config)
         self.provider_name = config.get('provider_name', 'google_gemini')
         env_prefix = "GOOGLE_" # Define prefix
-        
-        # --- 修改：读取带前缀的扁平化配置 --- 
+
+        # --- 修改：读取带前缀的扁平化配置 ---
         # credentials = config.get('credentials', {})
         # self.api_key = credentials.get('api_key')
         self.api_key = config.get(f'{env_prefix}API_KEY')
-        
-        # Endpoint might not be directly used by SDK, but keep for potential future use/consistency
-        self.endpoint = config.get(f'{env_prefix}ENDPOINT') 
+
+        # REST base URL including the API version, e.g. https://generativelanguage.googleapis.com/v1beta
+        self.endpoint = (config.get(f'{env_prefix}ENDPOINT') or DEFAULT_ENDPOINT).rstrip('/')
         self.default_model = config.get(f'{env_prefix}DEFAULT_MODEL')
-        self.project_id = config.get(f'{env_prefix}PROJECT_ID') # Keep project_id if relevant for some SDK features
-        
-        # --- 修改：读取带前缀的参数 --- 
+        self.project_id = config.get(f'{env_prefix}PROJECT_ID') # Keep project_id for consistency with other handlers
+
+        # --- 修改：读取带前缀的参数 ---
         self.default_api_params = {
             'temperature': config.get(f'{env_prefix}TEMPERATURE', 0.7),
             'top_p': config.get(f'{env_prefix}TOP_P', 1.0),
             'top_k': config.get(f'{env_prefix}TOP_K', 40),
-            'max_tokens': config.get(f'{env_prefix}MAX_TOKENS', 2048) # Maps to max_output_tokens
+            'max_tokens': config.get(f'{env_prefix}MAX_TOKENS', 2048) # Maps to maxOutputTokens
         }
-        
-        # self.request_timeout = config.get('request_timeout', 120)
-        # Timeout might be handled differently by SDK, but read for consistency
-        self.request_timeout = config.get(f'{env_prefix}REQUEST_TIMEOUT', 120) 
+
+        # Streaming requests use this as the read timeout between chunks, other requests as the total timeout
+        self.request_timeout = float(config.get(f'{env_prefix}REQUEST_TIMEOUT', 120))
 
         if not self.api_key:
-            # --- 修改：更新错误信息 --- 
+            # --- 修改：更新错误信息 ---
             raise ConfigError(f"Provider '{self.provider_name}' is missing required '{env_prefix}API_KEY'.")
             # -------------------------
 
-        try:
-            genai.configure(api_key=self.api_key)
-            logger.info(f"Google Gemini SDK configured successfully for provider '{self.provider_name}'.")
-        except Exception as e:
-             logger.error(f"Failed to configure Google Gemini SDK for '{self.provider_name}': {e}", exc_info=True)
-             # --- Use ConfigError --- 
-             raise ConfigError(f"Failed to configure Google Gemini SDK for '{self.provider_name}' with provided API Key: {e}")
-             # -------------------------
-        
-        logger.info(f"Google Gemini Handler Initialized: Name='{self.provider_name}', DefaultModel='{self.default_model}', ProjectID='{self.project_id}'")
+        logger.info(f"Google Gemini Handler Initialized: Name='{self.provider_name}', Endpoint='{self.endpoint}', DefaultModel='{self.default_model}', ProjectID='{self.project_id}'")
 
     def get_required_config_fields(self) -> List[str]:
         """Get the list of required configuration fields (prefixed env vars)."""
-        # --- 修改：返回带前缀的环境变量名 --- 
+        # --- 修改：返回带前缀的环境变量名 ---
         # return ['credentials']
         env_prefix = "GOOGLE_"
-        return [f'{env_prefix}API_KEY'] 
+        return [f'{env_prefix}API_KEY']
         # ----------------------------------
 
+    def _get_headers(self) -> Dict[str, str]:
+        """Request headers; the API key is sent as a header rather than in the query string (keeps it out of logs)."""
+        return {"x-goog-api-key": self.api_key, "Content-Type": "application/json"}
+
+    def _model_path(self, model: str) -> str:
+        """Resource name of a model: 'gemini-1.5-flash' -> 'models/gemini-1.5-flash' (tunedModels/... kept as is)."""
+        return model if '/' in model else f'models/{model}'
+
+    async def _check_response(self, response: aiohttp.ClientResponse, action: str) -> None:
+        """Raise APIResponseError for a non-200 response, with the message from the Gemini error body."""
+        if response.status == 200:
+            return
+        provider_limits.note_response(self.provider_name, response.status, response.headers)
+        text = await response.text()
+        try:
+            body = json.loads(text)
+        except ValueError:
+            body = text
+        message = _error_message(response.status, body)
+        logger.error(f"Google Gemini {action} failed for '{self.provider_name}': HTTP {response.status}, {message}")
+        raise APIResponseError(
+            provider_name=self.provider_name,
+            status_code=response.status,
+            response_body=body,
+            details=message
+        )
+
+    async def _post_json(self, url: str, payload: Dict[str, Any], action: str) -> Dict[str, Any]:
+        """POST a JSON request and return the decoded response, mapping transport errors to API errors."""
+        session = get_http_session()
+        try:
+            async with session.post(
+                url,
+                headers=self._get_headers(),
+                json=payload,
+                timeout=client_timeout(total=self.request_timeout)
+            ) as response:
+                await self._check_response(response, action)
+                return await response.json(content_type=None)
+        except asyncio.TimeoutError as e:
+            raise APITimeoutError(provider_name=self.provider_name, timeout_seconds=self.request_timeout, details=action) from e
+        except aiohttp.ClientError as e:
+            raise APIConnectionError(provider_name=self.provider_name, details=f"{action}: {e}") from e
+
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=2, max=10),
-        # --- Use updated retry logic/exceptions --- 
-        retry=is_retryable_exception, # Check if this covers google_exceptions.GoogleAPIError subtypes
-        # retry=retry_if_exception_type((google_exceptions.GoogleAPIError, APIError)), # Be explicit if needed
-        # -----------------------------------------
+        retry=retry_if_exception(_is_retryable),
         reraise=True,
         before_sleep=lambda retry_state: logger.warning(
              f"Gemini models fetch failed (attempt {retry_state.attempt_number}), retrying. Reason: {retry_state.outcome.exception()}"
          )
     )
     async def get_available_models(self) -> List[str]:
-        """Get available models using the Google Gemini SDK."""
-        logger.info(f"Attempting to fetch Google Gemini models using SDK for '{self.provider_name}'...")
+        """Get available generative models from the Gemini REST API (all pages)."""
+        logger.info(f"Attempting to fetch Google Gemini models for '{self.provider_name}'...")
+        session = get_http_session()
+        available_model_names = []
+        page_token = None
         try:
-            # --- Use asyncio.to_thread for SDK calls --- 
-            # available_model_names = []
-            # for model_info in genai.list_models():
-            #      if 'generateContent' in model_info.supported_generation_methods:
-            #           model_id = model_info.name.split('models/', 1)[-1]
-            #           available_model_names.append(model_id)
-            def list_sync_models():
-                models = []
-                for model_info in genai.list_models():
-                    if 'generateContent' in model_info.supported_generation_methods:
-                        model_id = model_info.name.split('models/', 1)[-1]
-                        models.append(model_id)
-                return models
-            
-            available_model_names = await asyncio.to_thread(list_sync_models)
-            # ---------------------------------------------
-                      
-            logger.info(f"Available Google Gemini generative models for '{self.provider_name}': {available_model_names}")
-            return available_model_names
-        except google_exceptions.PermissionDenied as e:
-            logger.error(f"Google API permission denied fetching models for '{self.provider_name}': {str(e)}. Check API Key and permissions.")
-            raise APIError(message="API Permission Denied", detail=str(e), provider=self.provider_name) from e
-        except google_exceptions.Unauthenticated as e:
-            logger.error(f"Google API authentication failed fetching models for '{self.provider_name}': {str(e)}. Check API Key.")
-            raise ConfigError(message="API Authentication Failed", detail=str(e), provider=self.provider_name) from e # Treat as config error
-        except google_exceptions.GoogleAPIError as e:
-            logger.error(f"Google API error getting models for '{self.provider_name}': {str(e)}", exc_info=True)
-            # --- Use specific errors if possible --- 
-            if isinstance(e, google_exceptions.ServiceUnavailable):
-                 raise APIConnectionError(message="Google API Service Unavailable", detail=str(e), provider=self.provider_name) from e
-            elif isinstance(e, google_exceptions.ResourceExhausted):
-                 raise APIResponseError(message="Google API Resource Exhausted (Quota?)", status_code=429, response_body={"error": str(e)}, provider=self.provider_name) from e
-            else:
-                 raise APIError(message=f"Google API error fetching models: {str(e)}", detail=str(e), provider=self.provider_name) from e
-            # ---------------------------------------
+            while True:
+                params = {"pageSize": 1000}
+                if page_token:
+                    params["pageToken"] = page_token
+                async with session.get(
+                    f"{self.endpoint}/models",
+                    headers=self._get_headers(),
+                    params=params,
+                    timeout=client_timeout(total=self.request_timeout)
+                ) as response:
+                    await self._check_response(response, "models fetch")
+                    data = await response.json(content_type=None)
+                for model_info in data.get("models", []):
+                    if 'generateContent' in model_info.get("supportedGenerationMethods", []):
+                        model_id = model_info.get("name", "").split('models/', 1)[-1]
+                        if model_id:
+                            available_model_names.append(model_id)
+                page_token = data.get("nextPageToken")
+                if not page_token:
+                    break
+        except (APIResponseError, APIError):
+            raise
+        except asyncio.TimeoutError as e:
+            logger.error(f"Timed out fetching Google Gemini models for '{self.provider_name}' after {self.request_timeout}s")
+            raise APITimeoutError(provider_name=self.provider_name, timeout_seconds=self.request_timeout, details="models fetch") from e
+        except aiohttp.ClientError as e:
+            logger.error(f"Connection error fetching Google Gemini models for '{self.provider_name}': {e}")
+            raise APIConnectionError(provider_name=self.provider_name, details=str(e)) from e
         except Exception as e:
             logger.error(f"Generic error getting Google Gemini models for '{self.provider_name}': {str(e)}", exc_info=True)
-            # --- Use APIError --- 
-            raise APIError(message=f"Failed to fetch models: {str(e)}", detail=str(e), provider=self.provider_name) from e
-            # -------------------------
+            raise APIError(message=f"Failed to fetch models: {str(e)}", provider_name=self.provider_name, details=str(e)) from e
+
+        logger.info(f"Available Google Gemini generative models for '{self.provider_name}': {available_model_names}")
+        return available_model_names
 
     async def generate(
         self,
@@ -141,10 +189,9 @@ class GoogleGeminiHandler(BaseAPIHandler):
         **kwargs
     ) -> str:
         """Generate text using the API."""
-        # Adapt simple prompt to message format for consistency 
+        # Adapt simple prompt to message format for consistency
         messages = [{"role": "user", "content": prompt}]
-        # --- Use stream_chat internally and collect result --- 
-        # return await self.generate_text(prompt, model, **kwargs)
+        # --- Use stream_chat internally and collect result ---
         full_response = ""
         try:
              async for chunk in self.stream_chat(messages=messages, model=model, **kwargs):
@@ -155,18 +202,17 @@ class GoogleGeminiHandler(BaseAPIHandler):
                            full_response += content
                  elif "error" in chunk:
                       logger.error(f"Error received during generate (via stream_chat) for '{self.provider_name}': {chunk['error']}")
-                      # Re-raise a standard error for generate?
                       detail = chunk.get('detail', chunk['error'])
-                      raise APIResponseError(message=f"Error generating text: {detail}", response_body=chunk, provider=self.provider_name)
+                      raise APIResponseError(provider_name=self.provider_name, status_code=chunk.get("status_code"), response_body=chunk, details=f"Error generating text: {detail}")
                  elif chunk.get("status") == "done":
                       break # Stream finished
              return full_response.strip()
-        except APIError as e:
+        except (APIError, APIResponseError, ConfigError):
              # Logged in stream_chat, re-raise
-             raise e
+             raise
         except Exception as e:
              logger.exception(f"Unexpected error in generate (via stream_chat) for '{self.provider_name}': {e}")
-             raise APIError(message=f"Unexpected error generating text: {e}", provider=self.provider_name) from e
+             raise APIError(message=f"Unexpected error generating text: {e}", provider_name=self.provider_name) from e
         # --------------------------------------------------
 
     def _convert_to_gemini_messages(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -176,11 +222,12 @@ class GoogleGeminiHandler(BaseAPIHandler):
         system_prompt = None
 
         for msg in messages:
-            role = msg["role"]
-            content = msg["content"]
+            # dict 或带 get 方法的 ChatMessage 均可
+            role = msg.get("role")
+            content = msg.get("content")
 
             if role == "system":
-                system_prompt = content 
+                system_prompt = content
             elif role == "user":
                 current_user_content.append(content)
             elif role == "assistant":
@@ -188,10 +235,10 @@ class GoogleGeminiHandler(BaseAPIHandler):
                     full_user_content = "\n".join(current_user_content)
                     if system_prompt and not any(m['role'] == 'user' for m in gemini_messages):
                         full_user_content = f"{system_prompt}\n\n{full_user_content}"
-                        system_prompt = None 
+                        system_prompt = None
                     gemini_messages.append({"role": "user", "content": full_user_content})
                     current_user_content = []
-                gemini_messages.append({"role": "model", "content": content}) 
+                gemini_messages.append({"role": "model", "content": content})
             else:
                 logger.warning(f"Unsupported message role '{role}' for Gemini in provider '{self.provider_name}', skipping")
 
@@ -205,200 +252,162 @@ class GoogleGeminiHandler(BaseAPIHandler):
              gemini_messages.insert(0, {"role": "user", "content": system_prompt})
         elif not gemini_messages and system_prompt:
              gemini_messages.append({"role": "user", "content": system_prompt})
-             
+
         last_role = None
         for i, msg in enumerate(gemini_messages):
             if msg['role'] == last_role:
-                logger.warning(f"Gemini message sequence for '{self.provider_name}' has non-alternating roles at index {i}. SDK might raise error.")
+                logger.warning(f"Gemini message sequence for '{self.provider_name}' has non-alternating roles at index {i}. API might reject it.")
             last_role = msg['role']
-            
+
         return gemini_messages
 
-    def _create_generation_config(self, params: Dict[str, Any]) -> GenerationConfig:
-        """Create Gemini generation config from parameters, filtering None values."""
+    def _to_contents(self, gemini_messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """REST 请求体的 contents 字段"""
+        return [{"role": m["role"], "parts": [{"text": m["content"]}]} for m in gemini_messages]
+
+    def _create_generation_config(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Create the REST generationConfig from parameters, filtering None values."""
         config_params = {
             "temperature": params.get("temperature"),
-            "top_p": params.get("top_p"),
-            "top_k": params.get("top_k"),
-            "max_output_tokens": params.get("max_tokens"),
-            "stop_sequences": [params["stop"]] if isinstance(params.get("stop"), str) else params.get("stop")
+            "topP": params.get("top_p"),
+            "topK": params.get("top_k"),
+            "maxOutputTokens": params.get("max_tokens"),
+            "stopSequences": [params["stop"]] if isinstance(params.get("stop"), str) else params.get("stop")
         }
         filtered_config = {k: v for k, v in config_params.items() if v is not None}
-        if "stop_sequences" in filtered_config and not isinstance(filtered_config["stop_sequences"], list):
-            logger.warning(f"Gemini stop sequences for '{self.provider_name}' should be a list, got {type(filtered_config['stop_sequences'])}. Attempting to wrap.")
-            filtered_config["stop_sequences"] = [str(filtered_config["stop_sequences"])]
-            
-        return GenerationConfig(**filtered_config)
+        if "stopSequences" in filtered_config and not isinstance(filtered_config["stopSequences"], list):
+            logger.warning(f"Gemini stop sequences for '{self.provider_name}' should be a list, got {type(filtered_config['stopSequences'])}. Attempting to wrap.")
+            filtered_config["stopSequences"] = [str(filtered_config["stopSequences"])]
 
-    # --- stream_chat --- 
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10),
-        # --- Retry on retryable Google API errors --- 
-        retry=retry_if_exception_type((google_exceptions.ServiceUnavailable, google_exceptions.ResourceExhausted)),
-        # ---------------------------------------------
-        reraise=True,
-        before_sleep=lambda retry_state: logger.warning(
-             f"Gemini stream_chat call failed (attempt {retry_state.attempt_number}), retrying. Reason: {retry_state.outcome.exception()}"
-         )
-    )
+        return filtered_config
+
+    def _current_api_params(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """使用 get_current_param 读取最新参数，再合并未覆盖的 kwargs"""
+        final_api_params = {
+            "temperature": self.get_current_param("temperature", "float", self.default_api_params.get('temperature')),
+            "max_tokens": self.get_current_param("max_tokens", "int", self.default_api_params.get('max_tokens')),
+            "top_p": self.get_current_param("top_p", "float", self.default_api_params.get('top_p')),
+            "top_k": self.get_current_param("top_k", "int", self.default_api_params.get('top_k')),
+            "stop": self.get_current_param("stop", "str_or_list", None) # Handle string or list
+        }
+        # Merge remaining kwargs, respecting those already set
+        final_api_params.update({k: v for k, v in kwargs.items() if k not in final_api_params})
+        return final_api_params
+
+    # --- stream_chat ---
     async def stream_chat(
         self,
         messages: List[Dict[str, Any]],
         model: Optional[str] = None,
         **kwargs
     ) -> AsyncGenerator[Dict[str, Any], None]:
-        """Generate response using Google Gemini API (streaming chat)."""
+        """Generate response using Google Gemini API (streaming chat over REST SSE)."""
         target_model = model or self.default_model
         if not target_model:
             raise ConfigError(f"Provider '{self.provider_name}' has no model specified and no default model configured")
 
-        env_prefix = "GOOGLE_"
-        # --- 修改：使用 get_current_param 读取最新参数 --- 
-        temperature = self.get_current_param("temperature", "float", self.default_api_params.get('temperature'))
-        max_tokens = self.get_current_param("max_tokens", "int", self.default_api_params.get('max_tokens'))
-        top_p = self.get_current_param("top_p", "float", self.default_api_params.get('top_p'))
-        top_k = self.get_current_param("top_k", "int", self.default_api_params.get('top_k'))
-        stop = self.get_current_param("stop", "str_or_list", None) # Handle string or list
-        
-        final_api_params = {
-            "temperature": temperature,
-            "max_tokens": max_tokens,
-            "top_p": top_p,
-            "top_k": top_k,
-            "stop": stop
-        }
-        # Merge remaining kwargs, respecting those already set
-        final_api_params.update({k: v for k, v in kwargs.items() if k not in final_api_params})
-        # -------------------------------------------------
-        
-        generation_config = self._create_generation_config(final_api_params)
+        generation_config = self._create_generation_config(self._current_api_params(kwargs))
         gemini_messages = self._convert_to_gemini_messages(messages)
 
         if not gemini_messages or gemini_messages[0]['role'] != 'user':
-             # Gemini SDK requires the first message to be from the user
+             # Gemini requires the first message to be from the user
              logger.error(f"Gemini message list must start with a user role for '{self.provider_name}'. Messages: {gemini_messages}")
              yield {"error": "Invalid message sequence: Must start with user role.", "provider": self.provider_name}
              return
 
+        model_path = self._model_path(target_model)
+        payload = {"contents": self._to_contents(gemini_messages), "generationConfig": generation_config}
+        logger.info(f"Calling Google Gemini API (stream_chat): Model='{model_path}' for '{self.provider_name}'")
+        logger.debug(f"Google Gemini API stream_chat effective params for '{self.provider_name}': {generation_config}")
+
+        session = get_http_session()
+        finish_reason = "stop"
         try:
-            # --- Ensure model name includes 'models/' prefix --- 
-            if not target_model.startswith('models/'):
-                 sdk_model_name = f'models/{target_model}'
-            else:
-                 sdk_model_name = target_model
-            # ---------------------------------------------------
-                 
-            model_instance = genai.GenerativeModel(sdk_model_name)
-            
-            logger.info(f"Calling Google Gemini API (stream_chat): Model='{sdk_model_name}' for '{self.provider_name}'")
-            logger.debug(f"Google Gemini API stream_chat effective params for '{self.provider_name}': {generation_config}")
-            logger.debug(f"Google Gemini API stream_chat messages for '{self.provider_name}': {gemini_messages}")
-
-            # --- Use asyncio.to_thread for blocking SDK stream call --- 
-            # response_stream = await model_instance.generate_content_async(
-            #     gemini_messages,
-            #     generation_config=generation_config,
-            #     stream=True
-            # )
-            def generate_sync_stream():
-                # This will block the thread until the stream is consumed
-                return model_instance.generate_content(
-                    gemini_messages,
-                    generation_config=generation_config,
-                    stream=True
-                )
-            
-            response_stream = await asyncio.to_thread(generate_sync_stream)
-            # ---------------------------------------------------------
-
-            # Yield assistant role start? OpenAI format expects this.
-            yield {"choices": [{"index": 0, "delta": {"role": "assistant"}}]}
-
-            # --- Process stream --- 
-            async for chunk in response_stream:
-                try:
-                    # Check for blocked content
-                    if not chunk.parts:
-                         if chunk.prompt_feedback and chunk.prompt_feedback.block_reason:
-                              block_reason = chunk.prompt_feedback.block_reason.name
-                              logger.warning(f"Gemini stream chunk blocked for '{self.provider_name}'. Reason: {block_reason}")
-                              yield {"error": f"Content blocked by API during streaming. Reason: {block_reason}", "provider": self.provider_name}
-                              # Should we stop here or continue?
-                              break # Stop yielding on block
-                         else:
-                              # Empty parts but no block reason? Log and skip
-                              logger.warning(f"Gemini stream chunk has no parts and no block reason for '{self.provider_name}'. Chunk: {chunk}")
-                              continue 
-                              
-                    chunk_text = chunk.text
+            async with session.post(
+                f"{self.endpoint}/{model_path}:streamGenerateContent",
+                params={"alt": "sse"},
+                headers=self._get_headers(),
+                json=payload,
+                # 流式响应没有总时长限制，只限制两块之间的等待时间
+                timeout=client_timeout(sock_read=self.request_timeout)
+            ) as response:
+                await self._check_response(response, "stream_chat")
+
+                # Yield assistant role start - OpenAI format expects this.
+                yield {"choices": [{"index": 0, "delta": {"role": "assistant"}}]}
+
+                # --- Process SSE stream: one GenerateContentResponse per event ---
+                async for chunk in SSEJsonStream(response.content, self.provider_name):
+                    block_reason = (chunk.get("promptFeedback") or {}).get("blockReason")
+                    if block_reason:
+                        logger.warning(f"Gemini prompt blocked for '{self.provider_name}'. Reason: {block_reason}")
+                        yield {"error": f"Content blocked by API during streaming. Reason: {block_reason}", "provider": self.provider_name}
+                        return
+
+                    candidates = chunk.get("candidates") or []
+                    if not candidates:
+                        continue
+                    candidate = candidates[0]
+                    parts = (candidate.get("content") or {}).get("parts") or []
+                    chunk_text = "".join(part.get("text", "") for part in parts if not part.get("thought"))
                     if chunk_text:
                         yield {
                              "choices": [
                                  {
                                      "index": 0,
                                      "delta": {"content": chunk_text},
-                                     "finish_reason": None # Gemini stream doesn't typically provide this per chunk
+                                     "finish_reason": None
                                  }
                              ]
                          }
-                except ValueError as e:
-                     # Handle cases where chunk.text raises ValueError (e.g., safety settings)
-                     logger.error(f"Gemini stream chunk text access error (likely blocked) for '{self.provider_name}': {e}")
-                     block_reason = "SafetySettings/Unknown"
-                     if chunk.prompt_feedback and chunk.prompt_feedback.block_reason:
-                         block_reason = chunk.prompt_feedback.block_reason.name
-                     yield {"error": f"Content blocked by API during streaming (ValueError). Reason: {block_reason}", "provider": self.provider_name}
-                     break # Stop yielding on block
-                except Exception as e:
-                     logger.exception(f"Error processing Gemini stream chunk for '{self.provider_name}': {e}")
-                     # Don't yield raw exception, maybe a generic error message
-                     yield {"error": f"Internal error processing stream chunk: {str(e)[:100]}...", "provider": self.provider_name}
-                     # Continue or break? Let's break to be safe.
-                     break
-            # ---------------------
-                     
+
+                    reason = candidate.get("finishReason")
+                    if reason in BLOCKED_FINISH_REASONS:
+                        logger.warning(f"Gemini stream stopped by content filter for '{self.provider_name}'. Reason: {reason}")
+                        yield {"error": f"Content blocked by API during streaming. Reason: {reason}", "provider": self.provider_name}
+                        return
+                    if reason == "MAX_TOKENS":
+                        finish_reason = "length"
+                # ---------------------
+
             # Indicate stream completion - OpenAI format
-            yield {"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]} # Assume stop
+            yield {"choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}]}
             yield {"status": "done"}
             logger.info(f"Google Gemini stream chat completed for '{self.provider_name}'.")
 
-        # --- Map specific Google API errors --- 
-        except google_exceptions.InvalidArgument as e:
-             logger.error(f"Google API Invalid Argument error during stream_chat for '{self.provider_name}': {str(e)}. Check messages/params.", exc_info=True)
-             yield {"error": f"Invalid Argument: {str(e)}", "detail": str(e), "provider": self.provider_name}
-        except google_exceptions.PermissionDenied as e:
-            logger.error(f"Google API permission denied during stream_chat for '{self.provider_name}': {str(e)}. Check API Key.")
-            yield {"error": "API Permission Denied", "detail": str(e), "provider": self.provider_name}
-        except google_exceptions.Unauthenticated as e:
-            logger.error(f"Google API authentication failed during stream_chat for '{self.provider_name}': {str(e)}. Check API Key.")
-            yield {"error": "API Authentication Failed", "detail": str(e), "provider": self.provider_name}
-        except google_exceptions.ResourceExhausted as e: 
-             logger.error(f"Google API Resource Exhausted during stream_chat for '{self.provider_name}': {str(e)}. (Quota?)")
-             yield {"error": "API Resource Exhausted (Quota?) (Code: 429)", "detail": str(e), "status_code": 429, "provider": self.provider_name}
-        except google_exceptions.ServiceUnavailable as e:
-             logger.error(f"Google API Service Unavailable during stream_chat for '{self.provider_name}': {str(e)}")
-             yield {"error": "API Service Unavailable", "detail": str(e), "provider": self.provider_name}
-        except google_exceptions.GoogleAPIError as e:
-             logger.error(f"Google API error during stream_chat for '{self.provider_name}': {str(e)}", exc_info=True)
-             yield {"error": f"Google API Error: {str(e)}", "detail": str(e), "provider": self.provider_name}
+        # --- Map HTTP errors to error chunks ---
+        except APIResponseError as e:
+            detail = e.details or str(e)
+            if e.status_code == 400:
+                yield {"error": f"Invalid Argument: {detail}", "detail": detail, "status_code": 400, "provider": self.provider_name}
+            elif e.status_code == 401:
+                yield {"error": "API Authentication Failed", "detail": detail, "status_code": 401, "provider": self.provider_name}
+            elif e.status_code == 403:
+                yield {"error": "API Permission Denied", "detail": detail, "status_code": 403, "provider": self.provider_name}
+            elif e.status_code == 429:
+                yield {"error": "API Resource Exhausted (Quota?) (Code: 429)", "detail": detail, "status_code": 429, "provider": self.provider_name}
+            elif e.status_code == 503:
+                yield {"error": "API Service Unavailable", "detail": detail, "status_code": 503, "provider": self.provider_name}
+            else:
+                yield {"error": f"Google API Error: {detail}", "detail": detail, "status_code": e.status_code, "provider": self.provider_name}
         # ---------------------------------------
-        except RetryError as e:
-             logger.critical(f"Google Gemini SDK call failed after retries for '{self.provider_name}' (stream_chat): {e}")
-             yield {"error": f"API request failed after retries: {str(e.last_attempt.exception())[:100]}...", "detail": str(e.last_attempt.exception()), "provider": self.provider_name}
+        except asyncio.TimeoutError:
+            logger.error(f"Google Gemini stream_chat timed out for '{self.provider_name}' after {self.request_timeout}s")
+            yield {"error": f"Request timed out after {self.request_timeout}s", "provider": self.provider_name}
+        except aiohttp.ClientError as e:
+            logger.error(f"Google Gemini stream_chat connection error for '{self.provider_name}': {e}")
+            yield {"error": "API Connection Error", "detail": str(e), "provider": self.provider_name}
         except Exception as e:
             logger.exception(f"Unexpected error during Google Gemini stream_chat for '{self.provider_name}': {e}")
             yield {"error": f"Unexpected internal error during streaming: {str(e)[:100]}...", "provider": self.provider_name}
         finally:
              logger.info(f"Gemini stream processing ended for {self.provider_name}.")
 
-    # --- analyze_image --- 
+    # --- analyze_image ---
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=2, max=10),
-        # --- Retry on specific Google errors --- 
-        retry=retry_if_exception_type((google_exceptions.ServiceUnavailable, google_exceptions.ResourceExhausted)),
-        # ---------------------------------------
+        retry=retry_if_exception(_is_retryable),
         reraise=True,
         before_sleep=lambda retry_state: logger.warning(
              f"Gemini analyze_image call failed (attempt {retry_state.attempt_number}), retrying. Reason: {retry_state.outcome.exception()}"
@@ -415,116 +424,67 @@ class GoogleGeminiHandler(BaseAPIHandler):
         target_model = model or self.default_model
         if not target_model:
             raise ConfigError(f"Provider '{self.provider_name}' has no model specified for image analysis")
-            
-        # --- Ensure model is vision capable (simple check) --- 
+
+        # --- Ensure model is vision capable (simple check) ---
         if "vision" not in target_model and "gemini-1.5-pro" not in target_model and "gemini-pro-vision" not in target_model:
              logger.warning(f"Model '{target_model}' selected for image analysis in '{self.provider_name}' does not seem to be a vision model. Trying anyway.")
         # -----------------------------------------------------
-        
-        env_prefix = "GOOGLE_"
-        # --- 修改：使用 get_current_param 读取最新参数 --- 
-        # Reuse text generation params where applicable
-        temperature = self.get_current_param("temperature", "float", self.default_api_params.get('temperature'))
-        max_tokens = self.get_current_param("max_tokens", "int", self.default_api_params.get('max_tokens'))
-        top_p = self.get_current_param("top_p", "float", self.default_api_params.get('top_p'))
-        top_k = self.get_current_param("top_k", "int", self.default_api_params.get('top_k'))
-        stop = self.get_current_param("stop", "str_or_list", None)
-        
-        final_api_params = {
-            "temperature": temperature,
-            "max_tokens": max_tokens,
-            "top_p": top_p,
-            "top_k": top_k,
-            "stop": stop
+
+        generation_config = self._create_generation_config(self._current_api_params(kwargs))
+
+        # --- Prepare inline image data ---
+        # Basic image type detection (can be improved)
+        mime_type = "image/jpeg" # Default
+        if image_data.startswith(b'\x89PNG\r\n\x1a\n'):
+            mime_type = "image/png"
+        elif image_data.startswith(b'\xff\xd8\xff'):
+             mime_type = "image/jpeg"
+        elif image_data.startswith(b'GIF87a') or image_data.startswith(b'GIF89a'):
+             mime_type = "image/gif"
+        elif image_data.startswith(b'RIFF') and image_data[8:12] == b'WEBP':
+             mime_type = "image/webp"
+
+        logger.info(f"Detected image mime-type as {mime_type} for '{self.provider_name}'")
+        payload = {
+            "contents": [{
+                "role": "user",
+                "parts": [
+                    {"text": prompt},
+                    {"inline_data": {"mime_type": mime_type, "data": base64.b64encode(image_data).decode("ascii")}}
+                ]
+            }],
+            "generationConfig": generation_config
         }
-        final_api_params.update({k: v for k, v in kwargs.items() if k not in final_api_params})
-        # -------------------------------------------------
-        
-        generation_config = self._create_generation_config(final_api_params)
-        
+        # -------------------------------------
+
+        model_path = self._model_path(target_model)
+        logger.info(f"Calling Google Gemini API (analyze_image): Model='{model_path}' for '{self.provider_name}'")
+        logger.debug(f"Google Gemini API analyze_image effective params for '{self.provider_name}': {generation_config}")
+
         try:
-            # --- Prepare image content for SDK --- 
-            # Assuming image_data is bytes. Need to determine mime type if not provided.
-            # Basic image type detection (can be improved)
-            mime_type = "image/jpeg" # Default
-            if image_data.startswith(b'\x89PNG\r\n\x1a\n'):
-                mime_type = "image/png"
-            elif image_data.startswith(b'\xff\xd8\xff'):
-                 mime_type = "image/jpeg"
-            elif image_data.startswith(b'GIF87a') or image_data.startswith(b'GIF89a'):
-                 mime_type = "image/gif"
-            elif image_data.startswith(b'RIFF') and image_data[8:12] == b'WEBP':
-                 mime_type = "image/webp"
-                 
-            logger.info(f"Detected image mime-type as {mime_type} for '{self.provider_name}'")
-            image_part = {"mime_type": mime_type, "data": image_data}
-            # -------------------------------------
-
-            # --- Ensure model name includes 'models/' prefix --- 
-            if not target_model.startswith('models/'):
-                 sdk_model_name = f'models/{target_model}'
-            else:
-                 sdk_model_name = target_model
-            # ---------------------------------------------------
-            model_instance = genai.GenerativeModel(sdk_model_name)
-
-            logger.info(f"Calling Google Gemini API (analyze_image): Model='{sdk_model_name}' for '{self.provider_name}'")
-            logger.debug(f"Google Gemini API analyze_image effective params for '{self.provider_name}': {generation_config}")
-
-            # --- Use asyncio.to_thread for blocking SDK call --- 
-            # response = await model_instance.generate_content_async(
-            #     [prompt, image_part],
-            #     generation_config=generation_config
-            # )
-            def analyze_sync():
-                return model_instance.generate_content(
-                    [prompt, image_part], 
-                    generation_config=generation_config
-                )
-            
-            response = await asyncio.to_thread(analyze_sync)
-            # -------------------------------------------------
-
-            # --- Check response for content and potential blocks --- 
-            try:
-                generated_text = response.text
-            except ValueError as e:
-                 logger.error(f"Gemini image analysis response blocked or invalid for '{self.provider_name}'. Prompt: '{prompt[:100]}...'. Error: {e}")
-                 block_reason = "Unknown"
-                 if response.prompt_feedback and response.prompt_feedback.block_reason:
-                      block_reason = response.prompt_feedback.block_reason.name
-                 raise APIResponseError(message=f"Content blocked by API. Reason: {block_reason}", response_body={"error": str(e), "block_reason": block_reason}, provider=self.provider_name) from e
-            # ---------------------------------------------------------
-                 
-            if not generated_text:
-                 logger.warning(f"Empty response text from Gemini image analysis for '{self.provider_name}'. Prompt: '{prompt[:100]}...'")
-                 return ""
-            
-            return generated_text.strip()
-
-        # --- Map specific Google API errors --- 
-        except google_exceptions.InvalidArgument as e:
-             logger.error(f"Google API Invalid Argument error during analyze_image for '{self.provider_name}': {str(e)}. Check prompt/image/params.", exc_info=True)
-             raise APIError(message=f"Invalid Argument: {str(e)}", detail=str(e), provider=self.provider_name) from e
-        except google_exceptions.PermissionDenied as e:
-            logger.error(f"Google API permission denied during analyze_image for '{self.provider_name}': {str(e)}. Check API Key.")
-            raise APIError(message="API Permission Denied", detail=str(e), provider=self.provider_name) from e
-        except google_exceptions.Unauthenticated as e:
-            logger.error(f"Google API authentication failed during analyze_image for '{self.provider_name}': {str(e)}. Check API Key.")
-            raise ConfigError(message="API Authentication Failed", detail=str(e), provider=self.provider_name) from e
-        except google_exceptions.ResourceExhausted as e: 
-             logger.error(f"Google API Resource Exhausted during analyze_image for '{self.provider_name}': {str(e)}. (Quota?)")
-             raise APIResponseError(message="API Resource Exhausted (Quota?)", status_code=429, response_body={"error": str(e)}, provider=self.provider_name) from e
-        except google_exceptions.ServiceUnavailable as e:
-             logger.error(f"Google API Service Unavailable during analyze_image for '{self.provider_name}': {str(e)}")
-             raise APIConnectionError(message="Google API Service Unavailable", detail=str(e), provider=self.provider_name) from e
-        except google_exceptions.GoogleAPIError as e:
-             logger.error(f"Google API error during analyze_image for '{self.provider_name}': {str(e)}", exc_info=True)
-             raise APIError(message=f"Google API Error: {str(e)}", detail=str(e), provider=self.provider_name) from e
-        # ---------------------------------------
-        except RetryError as e:
-             logger.critical(f"Google Gemini SDK call failed after retries for '{self.provider_name}' (analyze_image): {e}")
-             raise APIError(f"API request failed after retries: {str(e.last_attempt.exception())[:100]}...", detail=str(e.last_attempt.exception()), provider=self.provider_name) from e
+            response = await self._post_json(f"{self.endpoint}/{model_path}:generateContent", payload, "analyze_image")
+        except (APIResponseError, APIConnectionError, APITimeoutError):
+            raise
         except Exception as e:
             logger.exception(f"Unexpected error during Google Gemini analyze_image for '{self.provider_name}': {e}")
-            raise APIError(message=f"Unexpected internal error during image analysis: {str(e)[:100]}...", provider=self.provider_name) from e
\ No newline at end of file
+            raise APIError(message=f"Unexpected internal error during image analysis: {str(e)[:100]}...", provider_name=self.provider_name, details=str(e)) from e
+
+        # --- Check response for content and potential blocks ---
+        if not isinstance(response, dict):
+            raise APIResponseFormatError(provider_name=self.provider_name, details=f"Unexpected analyze_image response: {str(response)[:200]}")
+        block_reason = (response.get("promptFeedback") or {}).get("blockReason")
+        candidates = response.get("candidates") or []
+        if not block_reason and candidates and candidates[0].get("finishReason") in BLOCKED_FINISH_REASONS:
+            block_reason = candidates[0]["finishReason"]
+        if block_reason:
+            logger.error(f"Gemini image analysis response blocked for '{self.provider_name}'. Prompt: '{prompt[:100]}...'. Reason: {block_reason}")
+            raise APIResponseError(provider_name=self.provider_name, status_code=200, response_body={"block_reason": block_reason}, details=f"Content blocked by API. Reason: {block_reason}")
+        # ---------------------------------------------------------
+
+        parts = ((candidates[0].get("content") or {}).get("parts") or []) if candidates else []
+        generated_text = "".join(part.get("text", "") for part in parts if not part.get("thought"))
+        if not generated_text:
+             logger.warning(f"Empty response text from Gemini image analysis for '{self.provider_name}'. Prompt: '{prompt[:100]}...'")
+             return ""
+
+        return generated_text.strip()
@@ -8,8 +8,10 @@ from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_excep
 
 from src.utils.logging import logger
 from src.providers.base import BaseAPIHandler
+from src.providers.stream_decoder import SSEJsonStream
 from src.utils.error_handler import ConfigError, APIError, APIResponseError
 from src.utils.retry import is_retryable_exception
+from src.providers.resilience import provider_trace_configs
 
 class GroqApiHandler(BaseAPIHandler):
     """Handles interaction with Groq API (OpenAI Compatible)."""
@@ -62,7 +64,7 @@ class GroqApiHandler(BaseAPIHandler):
                 'Content-Type': 'application/json'
             }
             
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 async with session.get(
                     self.models_endpoint, 
                     headers=headers,
@@ -95,7 +97,7 @@ class GroqApiHandler(BaseAPIHandler):
         """Make an HTTP POST request to the API with retry logic."""
         logger.debug(f"Sending request to Groq endpoint: {self.chat_endpoint}")
         try:
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 async with session.post(
                     self.chat_endpoint,
                     headers=headers,
@@ -191,7 +193,7 @@ class GroqApiHandler(BaseAPIHandler):
             # First yield the assistant role for compatibility
             yield {"choices": [{"delta": {"role": "assistant"}}]}
 
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 async with session.post(
                     self.chat_endpoint,
                     headers=headers,
@@ -204,26 +206,12 @@ class GroqApiHandler(BaseAPIHandler):
                         yield {"error": f"API error: HTTP {response.status}"}
                         return
 
-                    async for line in response.content:
-                        if not line:
-                            continue
-
-                        line_str = line.decode('utf-8').strip()
-                        if not line_str:
-                            continue
-
-                        if line_str.startswith("data: "):
-                            data_str = line_str[6:].strip()
-                            if data_str == "[DONE]":
-                                logger.info("Groq Stream chat completed")
-                                break
-                            try:
-                                data = json.loads(data_str)
-                                yield data # Yield the parsed JSON chunk directly
-                            except json.JSONDecodeError as e:
-                                logger.error(f"Failed to parse Groq stream response: {e}, data: '{data_str}'")
-                                # Optionally yield raw content on error, but might break frontend
-                                # yield {"choices": [{"delta": {"content": data_str}}]}
+                    # 共享的增量 SSE 解码器：跨 TCP 分块的半行会被拼接，无法解析的事件记录警告后跳过
+                    stream = SSEJsonStream(response.content, self.provider_name)
+                    async for data in stream:
+                        yield data
+                    if stream.done:
+                        logger.info("Groq Stream chat completed")
 
         except Exception as e:
             logger.error(f"Groq stream chat error: {str(e)}")
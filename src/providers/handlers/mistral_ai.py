@@ -8,8 +8,10 @@ from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_excep
 
 from src.utils.logging import logger
 from src.providers.base import BaseAPIHandler
+from src.providers.stream_decoder import SSEJsonStream
 from src.utils.error_handler import ConfigError, APIError, APIResponseError
 from src.utils.retry import is_retryable_exception
+from src.providers.resilience import provider_trace_configs
 
 class MistralAiHandler(BaseAPIHandler):
     """Handles interaction with Mistral AI API (OpenAI Compatible)."""
@@ -57,7 +59,7 @@ class MistralAiHandler(BaseAPIHandler):
                 'Authorization': f'Bearer {self.api_key}',
                 'Content-Type': 'application/json'
             }
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 async with session.get(self.models_endpoint, headers=headers, timeout=10) as response:
                     if response.status != 200:
                         error_text = await response.text()
@@ -84,7 +86,7 @@ class MistralAiHandler(BaseAPIHandler):
     async def _make_request(self, headers: Dict[str, str], payload: Dict[str, Any]) -> Dict[str, Any]:
         logger.debug(f"Sending request to Mistral AI endpoint: {self.chat_endpoint}")
         try:
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 async with session.post(
                     self.chat_endpoint,
                     headers=headers,
@@ -168,7 +170,7 @@ class MistralAiHandler(BaseAPIHandler):
 
         try:
             yield {"choices": [{"delta": {"role": "assistant"}}]}
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 async with session.post(
                     self.chat_endpoint,
                     headers=headers,
@@ -181,22 +183,12 @@ class MistralAiHandler(BaseAPIHandler):
                         yield {"error": f"API error: HTTP {response.status}"}
                         return
 
-                    async for line in response.content:
-                        if not line:
-                            continue
-                        line_str = line.decode('utf-8').strip()
-                        if not line_str:
-                            continue
-                        if line_str.startswith("data: "):
-                            data_str = line_str[6:].strip()
-                            if data_str == "[DONE]":
-                                logger.info("Mistral AI Stream chat completed")
-                                break
-                            try:
-                                data = json.loads(data_str)
-                                yield data 
-                            except json.JSONDecodeError as e:
-                                logger.error(f"Failed to parse Mistral AI stream response: {e}, data: '{data_str}'")
+                    # 共享的增量 SSE 解码器：跨 TCP 分块的半行会被拼接，无法解析的事件记录警告后跳过
+                    stream = SSEJsonStream(response.content, self.provider_name)
+                    async for data in stream:
+                        yield data
+                    if stream.done:
+                        logger.info("Mistral AI Stream chat completed")
         except Exception as e:
             logger.error(f"Mistral AI stream chat error: {str(e)}")
             yield {"error": str(e)} 
\ No newline at end of file
@@ -11,9 +11,12 @@ import asyncio
 from dotenv import dotenv_values
 
 from src.utils.logging import logger
+from src.utils.stream_trace import StreamTrace
 from src.providers.base import BaseAPIHandler
+from src.providers.stream_decoder import iter_lines, loads_json
 from src.validation.error_handler import ConfigurationError, APIConnectionError, APIResponseError, APIResponseFormatError, APITimeoutError, APIError
 from src.utils.retry import is_retryable_exception
+from src.providers.resilience import provider_trace_configs
 
 class OllamaLocalHandler(BaseAPIHandler):
     """Handles interaction with Ollama Local API."""
@@ -164,7 +167,7 @@ class OllamaLocalHandler(BaseAPIHandler):
             payload = {}
         
         try:
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 request_kwargs = {"timeout": request_timeout}
                 if method.upper() in ["POST", "PUT", "PATCH"]:
                     request_kwargs["json"] = payload
@@ -232,7 +235,7 @@ class OllamaLocalHandler(BaseAPIHandler):
         # 1. Basic connection test (check if service is reachable)
         try:
             # Use a lightweight endpoint like /api/version or just /
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 # Set a short timeout for basic connectivity check
                 test_timeout = aiohttp.ClientTimeout(total=5.0) 
                 async with session.get(f"{self.endpoint}/", timeout=test_timeout) as response:
@@ -479,7 +482,7 @@ class OllamaLocalHandler(BaseAPIHandler):
             # 首先返回角色信息
             yield {"choices": [{"delta": {"role": "assistant"}}]}
             
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 # 增加流式请求的超时时间，避免大模型响应超时
                 # 连接超时: 10秒, 总请求超时: 10分钟
                 timeout = aiohttp.ClientTimeout(total=600, connect=10)
@@ -496,28 +499,20 @@ class OllamaLocalHandler(BaseAPIHandler):
                         yield {"error": f"Ollama API错误: HTTP {response.status}"}
                         return
                     
-                    logger.debug(f"收到HTTP 200响应，开始处理流数据")
-                    # 处理流式响应
+                    logger.debug("收到HTTP 200响应，开始处理流数据")
+                    # 逐块路径不写日志；需要排查时打开 stream_trace 采样记录
+                    trace = StreamTrace(f"ollama stream_chat {target_model}")
                     chunk_count = 0 # 添加计数器
-                    async for line in response.content:
+                    # 共享的增量行解码器：跨 TCP 分块的半行会被拼接，每次网络读取只切分一次
+                    async for line in iter_lines(response.content):
                         chunk_count += 1
-                        logger.debug(f"流块 #{chunk_count}: 收到原始字节串 (长度 {len(line)})")
-                        if not line:
-                             logger.debug(f"流块 #{chunk_count}: 空行，跳过")
-                             continue
-                            
-                        line_str = line.decode('utf-8').strip()
-                        logger.debug(f"流块 #{chunk_count}: 解码后的字符串: {line_str[:150]}...")
-                        if not line_str:
-                            logger.debug(f"流块 #{chunk_count}: 解码后为空字符串，跳过")
+                        if not line.strip():
                             continue
-                        
-                        # logger.debug(f"收到原始流响应: {line_str[:100]}...") # 已被上面更详细的日志替代
+                        if trace.enabled:
+                            trace.record(chunk_count, "line", line)
                         
                         try:
-                            logger.debug(f"流块 #{chunk_count}: 尝试解析JSON...")
-                            data = json.loads(line_str)
-                            logger.debug(f"流块 #{chunk_count}: JSON解析成功: {data}")
+                            data = loads_json(line)
                             
                             # 检查错误
                             if "error" in data:
@@ -525,41 +520,32 @@ class OllamaLocalHandler(BaseAPIHandler):
                                 yield {"error": data["error"]}
                                 continue
                             
-                            # 提取内容
+                            # 提取内容，转换为OpenAI兼容格式
                             if "message" in data and "content" in data["message"]:
-                                content = data["message"]["content"]
-                                
-                                # 记录流式响应内容
-                                logger.debug(f"流式响应内容: {content}")
-                                
-                                # 转换为OpenAI兼容格式
-                                openai_format = {"choices": [{"delta": {"content": content}}]}
-                                logger.debug(f"转换为OpenAI格式: {openai_format}")
-                                
-                                # 返回OpenAI兼容格式的内容块
-                                yield openai_format
+                                yield {"choices": [{"delta": {"content": data["message"]["content"]}}]}
                             elif "done" in data and data["done"]:
                                 # 处理完成消息
-                                logger.debug(f"Ollama流式响应完成")
+                                logger.debug("Ollama流式响应完成")
                                 yield {"done": True}
                                 continue
                             else:
-                                logger.debug(f"意外的Ollama响应格式: {data}")
+                                logger.debug("意外的Ollama响应格式: %s", data)
                                 # 尝试从数据中提取有用信息
                                 if isinstance(data, dict) and any(data.values()):
                                     for key, value in data.items():
                                         if isinstance(value, str) and value:
-                                            logger.debug(f"尝试从键'{key}'提取内容: {value[:50]}...")
                                             yield {"choices": [{"delta": {"content": value}}]}
                                             break
                             
-                        except json.JSONDecodeError as e:
+                        except ValueError as e:
+                            line_str = line.decode('utf-8', errors='replace').strip()
                             logger.error(f"流块 #{chunk_count}: 解析Ollama流式响应JSON时出错: {e}, 原始数据: {line_str[:100]}...")
                             # 如果解析失败且非空，尝试返回原始行
                             if line_str:
                                 logger.warning(f"流块 #{chunk_count}: 由于JSON解析失败，将返回原始字符串作为内容")
                                 yield {"choices": [{"delta": {"content": line_str}}]}
                                 
+                    trace.finish(chunk_count)
                     logger.info(f"Ollama 响应流处理完成，共处理 {chunk_count} 个块")
                                 
         except aiohttp.ClientError as e:
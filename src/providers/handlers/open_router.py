@@ -9,8 +9,10 @@ from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_excep
 
 from src.utils.logging import logger
 from src.providers.base import BaseAPIHandler
+from src.providers.stream_decoder import SSEJsonStream
 from src.validation.error_handler import ConfigurationError as ConfigError, APIError, APIResponseError, APIResponseFormatError, APIConnectionError, APITimeoutError
 from src.utils.retry import is_retryable_exception
+from src.providers.resilience import provider_trace_configs
 
 class OpenRouterHandler(BaseAPIHandler):
     """Template class for handling OpenAI-compatible API interactions.
@@ -104,7 +106,7 @@ class OpenRouterHandler(BaseAPIHandler):
         request_url = f"{self.endpoint}{models_endpoint_path}"
         logger.info(f"Attempting to fetch models from: {request_url} for provider {self.provider_name}")
         try:
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 async with session.get(
                     request_url,
                     headers=self._get_headers(),
@@ -160,7 +162,7 @@ class OpenRouterHandler(BaseAPIHandler):
         request_url = f"{self.endpoint}{endpoint_path}"
         logger.debug(f"Sending {method} request to endpoint: {request_url} for provider {self.provider_name}")
         try:
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 async with session.request(
                     method,
                     request_url,
@@ -363,7 +365,7 @@ class OpenRouterHandler(BaseAPIHandler):
             # yield {"choices": [{"delta": {"role": "assistant"}}]}
             request_url = f"{self.endpoint}/chat/completions"
             logger.debug(f"Streaming request to: {request_url} for provider {self.provider_name}")
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 async with session.post( 
                     request_url,
                     headers=self._get_headers(),
@@ -383,47 +385,38 @@ class OpenRouterHandler(BaseAPIHandler):
                         )
 
                     # 修复：与 volc_engine 一致，直接 yield chunk
-                    async for line in response.content:
-                        if not line:
+                    # 共享的增量 SSE 解码器 (OpenRouter 的 ": OPENROUTER PROCESSING" 注释行会被跳过)
+                    stream = SSEJsonStream(response.content, self.provider_name)
+                    async for chunk in stream:
+                        # 兼容 OpenAI/火山格式，自动转换
+                        if "choices" in chunk and isinstance(chunk["choices"], list):
+                            yield chunk
+                        elif "message" in chunk and "content" in chunk["message"]:
+                            yield {
+                                "choices": [
+                                    {"delta": {"content": chunk["message"]["content"]}}
+                                ]
+                            }
+                        elif "content" in chunk and chunk["content"]:
+                            yield {
+                                "choices": [
+                                    {"delta": {"content": chunk["content"]}}
+                                ]
+                            }
+                        elif "error" in chunk and "message" in chunk["error"]:
+                            # 兼容 OpenAI error 格式，前端可弹窗
+                            yield {
+                                "error": chunk["error"]["message"],
+                                "code": chunk["error"].get("code", None)
+                            }
+                            logger.warning(f"Yielded error chunk to frontend: {chunk['error']['message']}")
+                            break  # 出错后直接结束流
+                        else:
+                            logger.warning(f"Unknown or empty stream chunk format, skipping: {chunk}")
                             continue
-                        line_str = line.decode('utf-8').strip()
-                        if not line_str or not line_str.startswith("data:"):
-                            continue
-                        data_str = line_str[len("data:"):].strip()
-                        if data_str == "[DONE]":
-                            logger.info(f"Stream chat completed for {self.provider_name}")
-                            yield {"status": "done"}
-                            break
-                        try:
-                            chunk = json.loads(data_str)
-                            # 兼容 OpenAI/火山格式，自动转换
-                            if "choices" in chunk and isinstance(chunk["choices"], list):
-                                yield chunk
-                            elif "message" in chunk and "content" in chunk["message"]:
-                                yield {
-                                    "choices": [
-                                        {"delta": {"content": chunk["message"]["content"]}}
-                                    ]
-                                }
-                            elif "content" in chunk and chunk["content"]:
-                                yield {
-                                    "choices": [
-                                        {"delta": {"content": chunk["content"]}}
-                                    ]
-                                }
-                            elif "error" in chunk and "message" in chunk["error"]:
-                                # 兼容 OpenAI error 格式，前端可弹窗
-                                yield {
-                                    "error": chunk["error"]["message"],
-                                    "code": chunk["error"].get("code", None)
-                                }
-                                logger.warning(f"Yielded error chunk to frontend: {chunk['error']['message']}")
-                                break  # 出错后直接结束流
-                            else:
-                                logger.warning(f"Unknown or empty stream chunk format, skipping: {chunk}")
-                                continue
-                        except json.JSONDecodeError as e:
-                            logger.warning(f"Failed to parse stream chunk for {self.provider_name}: {e}, Raw: {data_str[:100]}...")
+                    if stream.done:
+                        logger.info(f"Stream chat completed for {self.provider_name}")
+                        yield {"status": "done"}
 
         except aiohttp.ClientConnectorError as e:
             logger.error(f"Stream chat connection error for {self.provider_name}: {str(e)}", exc_info=True)
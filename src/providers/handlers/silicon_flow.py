@@ -11,8 +11,10 @@ import asyncio
 
 from src.utils.logging import logger
 from src.providers.base import BaseAPIHandler
+from src.providers.stream_decoder import SSEJsonStream
 from src.validation.error_handler import ConfigurationError as ConfigError, APIError, APIResponseError, APIResponseFormatError, APIConnectionError, APITimeoutError
 from src.utils.retry import is_retryable_exception
+from src.providers.resilience import provider_trace_configs
 
 class SiliconFlowHandler(BaseAPIHandler):
     """Handles interaction with Silicon Flow API."""
@@ -56,7 +58,7 @@ class SiliconFlowHandler(BaseAPIHandler):
         try:
             headers = self._get_headers()
             
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 async with session.get(
                     models_list_endpoint,
                     headers=headers,
@@ -122,7 +124,7 @@ class SiliconFlowHandler(BaseAPIHandler):
         logger.debug(f"Sending {method} request to {self.provider_name} endpoint: {request_url}")
         
         try:
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 async with session.request(
                     method,
                     request_url,
@@ -394,7 +396,7 @@ class SiliconFlowHandler(BaseAPIHandler):
             # Note: Streaming requests typically shouldn't use tenacity retries in the same way
             # If the connection fails initially, a single retry might be ok, but not on chunks.
             # Consider adding a timeout for the initial connection phase.
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 async with session.post(
                     request_url,
                     headers=self._get_headers(),
@@ -415,23 +417,14 @@ class SiliconFlowHandler(BaseAPIHandler):
                         )
 
                     # Process the stream
-                    async for line in response.content:
-                        if line:
-                            line_str = line.decode('utf-8').strip()
-                            if line_str.startswith("data:"):
-                                line_data = line_str[len("data:"):].strip()
-                                if line_data == "[DONE]":
-                                    logger.info("SiliconFlow stream finished ([DONE] received).")
-                                    yield {"status": "done"} # Signal completion
-                                    break # Exit the loop
-                                try:
-                                    chunk = json.loads(line_data)
-                                    # Yield the chunk directly, assuming it's OpenAI compatible
-                                    yield chunk 
-                                except json.JSONDecodeError:
-                                    logger.warning(f"Failed to decode stream chunk JSON: {line_data}")
-                                    # Optionally yield an error chunk or just skip
-                                    # yield {"warning": "Received invalid JSON chunk"}
+                    # 共享的增量 SSE 解码器：跨 TCP 分块的半行会被拼接，无法解析的事件记录警告后跳过
+                    stream = SSEJsonStream(response.content, self.provider_name)
+                    async for chunk in stream:
+                        # Yield the chunk directly, assuming it's OpenAI compatible
+                        yield chunk
+                    if stream.done:
+                        logger.info("SiliconFlow stream finished ([DONE] received).")
+                        yield {"status": "done"} # Signal completion
 
         except asyncio.TimeoutError:
              logger.error(f"SiliconFlow stream timed out. URL: {request_url}")
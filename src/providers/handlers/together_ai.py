@@ -8,8 +8,10 @@ from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_excep
 
 from src.utils.logging import logger
 from src.providers.base import BaseAPIHandler
+from src.providers.stream_decoder import SSEJsonStream
 from src.utils.error_handler import ConfigError, APIError, APIResponseError
 from src.utils.retry import is_retryable_exception
+from src.providers.resilience import provider_trace_configs
 
 class TogetherAiHandler(BaseAPIHandler):
     """Handles interaction with Together AI API (OpenAI Compatible)."""
@@ -53,7 +55,7 @@ class TogetherAiHandler(BaseAPIHandler):
                 'Content-Type': 'application/json'
             }
             
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 # Together uses a different endpoint for listing models often (or requires specific auth)
                 # Let's try the standard /models first, but be prepared for it to fail or require adjustments
                 # Update: Checking Together AI docs, /models endpoint might not be standard or easily accessible
@@ -93,7 +95,7 @@ class TogetherAiHandler(BaseAPIHandler):
     async def _make_request(self, headers: Dict[str, str], payload: Dict[str, Any]) -> Dict[str, Any]:
         logger.debug(f"Sending request to Together AI endpoint: {self.chat_endpoint}")
         try:
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 async with session.post(
                     self.chat_endpoint,
                     headers=headers,
@@ -177,7 +179,7 @@ class TogetherAiHandler(BaseAPIHandler):
 
         try:
             yield {"choices": [{"delta": {"role": "assistant"}}]}
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 async with session.post(
                     self.chat_endpoint,
                     headers=headers,
@@ -190,22 +192,12 @@ class TogetherAiHandler(BaseAPIHandler):
                         yield {"error": f"API error: HTTP {response.status}"}
                         return
 
-                    async for line in response.content:
-                        if not line:
-                            continue
-                        line_str = line.decode('utf-8').strip()
-                        if not line_str:
-                            continue
-                        if line_str.startswith("data: "):
-                            data_str = line_str[6:].strip()
-                            if data_str == "[DONE]":
-                                logger.info("Together AI Stream chat completed")
-                                break
-                            try:
-                                data = json.loads(data_str)
-                                yield data 
-                            except json.JSONDecodeError as e:
-                                logger.error(f"Failed to parse Together AI stream response: {e}, data: '{data_str}'")
+                    # 共享的增量 SSE 解码器：跨 TCP 分块的半行会被拼接，无法解析的事件记录警告后跳过
+                    stream = SSEJsonStream(response.content, self.provider_name)
+                    async for data in stream:
+                        yield data
+                    if stream.done:
+                        logger.info("Together AI Stream chat completed")
         except Exception as e:
             logger.error(f"Together AI stream chat error: {str(e)}")
             yield {"error": str(e)} 
\ No newline at end of file
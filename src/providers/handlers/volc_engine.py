@@ -11,9 +11,11 @@ import dotenv # Keep dotenv if used by base class or get_current_param
 
 from src.utils.logging import logger
 from src.providers.base import BaseAPIHandler
+from src.providers.stream_decoder import SSEJsonStream
 # Keep common error handlers
 from src.validation.error_handler import ConfigurationError as ConfigError, APIConnectionError, APIResponseError, APIError, APIResponseFormatError, APITimeoutError
 from src.utils.retry import is_retryable_exception
+from src.providers.resilience import provider_trace_configs
 
 class VolcEngineHandler(BaseAPIHandler):
     """Handles interaction with Volc Engine API using standard HTTP requests."""
@@ -108,7 +110,7 @@ class VolcEngineHandler(BaseAPIHandler):
     async def _make_request(self, endpoint_url: str, payload: Optional[Dict[str, Any]], method: str = "POST") -> Dict[str, Any]:
         """Make an HTTP request to the Volc Engine API with retries."""
         try:
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 async with session.request(
                     method,
                     endpoint_url,
@@ -338,7 +340,7 @@ class VolcEngineHandler(BaseAPIHandler):
         logger.info(f"Starting Volc Engine HTTP stream: Model='{target_model}', URL='{request_url}'")
 
         try:
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 async with session.post(
                     request_url,
                     headers=self._get_headers(),
@@ -357,21 +359,14 @@ class VolcEngineHandler(BaseAPIHandler):
                         )
 
                     # Process the stream (assuming Server-Sent Events like OpenAI)
-                    async for line in response.content:
-                        if line:
-                            line_str = line.decode('utf-8').strip()
-                            if line_str.startswith("data:"):
-                                line_data = line_str[len("data:"):].strip()
-                                if line_data == "[DONE]":
-                                    logger.info("Volc Engine HTTP stream finished ([DONE] received).")
-                                    yield {"status": "done"} 
-                                    break 
-                                try:
-                                    chunk = json.loads(line_data)
-                                    # Yield the chunk directly, assuming OpenAI compatible
-                                    yield chunk 
-                                except json.JSONDecodeError:
-                                    logger.warning(f"Failed to decode Volc stream chunk JSON: {line_data}")
+                    # 共享的增量 SSE 解码器：跨 TCP 分块的半行会被拼接，无法解析的事件记录警告后跳过
+                    stream = SSEJsonStream(response.content, self.provider_name)
+                    async for chunk in stream:
+                        # Yield the chunk directly, assuming OpenAI compatible
+                        yield chunk
+                    if stream.done:
+                        logger.info("Volc Engine HTTP stream finished ([DONE] received).")
+                        yield {"status": "done"}
 
         except asyncio.TimeoutError:
              logger.error(f"Volc Engine HTTP stream timed out after {self.request_timeout}s. URL: {request_url}")
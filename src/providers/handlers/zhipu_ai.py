@@ -12,8 +12,10 @@ import asyncio
 
 from src.utils.logging import logger
 from src.providers.base import BaseAPIHandler
+from src.providers.stream_decoder import iter_sse_events
 from src.utils.error_handler import ConfigError, APIError, APIResponseError, APIConnectionError, APIResponseFormatError, APITimeoutError
 from src.utils.retry import is_retryable_exception
+from src.providers.resilience import provider_trace_configs
 
 class ZhipuAIHandler(BaseAPIHandler):
     """Handles interaction with Zhipu AI API."""
@@ -122,7 +124,7 @@ class ZhipuAIHandler(BaseAPIHandler):
         logger.debug(f"Sending {method} request to ZhipuAI endpoint: {request_url}")
         
         try:
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 async with session.request(
                     method,
                     request_url,
@@ -338,7 +340,7 @@ class ZhipuAIHandler(BaseAPIHandler):
             # First return role information
             yield {"choices": [{"delta": {"role": "assistant"}}]}
             
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=provider_trace_configs(self.provider_name)) as session:
                 async with session.post(
                     f"{self.endpoint}/chat/completions",
                     headers=self._get_headers(),
@@ -356,22 +358,15 @@ class ZhipuAIHandler(BaseAPIHandler):
                         )
                     
                     # Process streaming response
-                    async for line in response.content:
-                        if not line:
-                            continue
-                            
-                        line_str = line.decode('utf-8').strip()
-                        if not line_str:
-                            continue
-                            
-                        if line_str.startswith("data: "):
-                            data_str = line_str[6:].strip()
-                            if data_str == "[DONE]":
-                                logger.info("ZhipuAI streaming chat completed")
-                                break
-                                
+                    # 共享的增量 SSE 解码器：跨 TCP 分块的半行会被拼接
+                    async for event in iter_sse_events(response.content):
+                        if event.is_done:
+                            logger.info("ZhipuAI streaming chat completed")
+                            break
+                        data_str = event.text.strip()
+                        if data_str:
                             try:
-                                data = json.loads(data_str)
+                                data = event.json()
                                 
                                 # Check for errors
                                 if "error" in data:
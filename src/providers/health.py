@@ -0,0 +1,346 @@
+"""
+Provider status checks, cached and refreshed in the background.
+
+check_provider_status builds a provider's handler from the current .env (and for
+Ollama also checks that the service answers). ProviderHealthChecker keeps the
+latest result per provider so the settings page reads statuses from memory:
+
+- probes of all configured providers run concurrently (at most
+  provider_health.max_concurrency at a time), each bounded by
+  provider_health.probe_timeout_seconds; .env is read once per batch;
+- concurrent requests for the same provider share one probe;
+- a background task started with the app refreshes every
+  provider_health.interval_seconds; reads probe again only entries older than
+  provider_health.max_age_seconds, or everything with refresh=True;
+- saving settings invalidates the cache; probes started before the save finish
+  for their callers but do not write their results.
+
+Served by GET /api/provider-status (batch) and GET /api/provider-status/{provider_name}.
+"""
+import asyncio
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import aiohttp
+import dotenv
+
+from src.config.api_manager import api_manager
+from src.config.app_config import get_app_config
+from src.providers.factory import get_all_provider_metadata, get_handler, standardize_provider_name
+from src.providers.resilience import provider_limits
+from src.utils.logging import logger
+from src.utils.tracing import span
+
+
+def reload_dotenv() -> None:
+    """Re-read .env into os.environ so handlers see the latest saved settings"""
+    dotenv_path = dotenv.find_dotenv(filename='.env', raise_error_if_not_found=False, usecwd=True)
+    if dotenv_path:
+        dotenv.load_dotenv(dotenv_path=dotenv_path, override=True)
+        logger.debug(f"已从路径读取最新的.env文件: {dotenv_path}")
+
+
+def configured_providers() -> List[str]:
+    """Standard names of the providers configured in .env (same rule as /api/providers)"""
+    names = []
+    for meta in get_all_provider_metadata():
+        standard_name = meta.get('standard_name')
+        if standard_name and api_manager.is_provider_configured(standard_name)[0]:
+            names.append(standard_name)
+    return names
+
+
+def _standard_name(provider_name: str) -> str:
+    try:
+        return standardize_provider_name(provider_name) or provider_name
+    except ValueError:
+        return provider_name
+
+
+async def check_provider_status(provider_name: str, reload_env: bool = True) -> Dict[str, Any]:
+    """
+    Checks the status of a provider.
+    Attempts to instantiate the handler (which reads .env).
+    Success implies basic configuration might be present.
+    Includes a specific online check for Ollama.
+    reload_env=False skips re-reading .env (batch checks read it once up front).
+    """
+    logger.info(f"获取提供商状态: {provider_name}")
+    status = "error" # Default status
+    message = "未知错误"
+    standard_name = "" # Initialize
+    ollama_endpoint = None
+
+    try:
+        # 1. Standardize name first
+        standard_name = standardize_provider_name(provider_name)
+
+        # 2. Attempt to get the handler. This implicitly checks:
+        #    - Provider is known (metadata exists)
+        #    - Handler class can be imported
+        #    - Basic .env config reading works
+        #    - Handler __init__ succeeds
+        logger.info(f"尝试创建提供商 '{standard_name}' 的处理器实例，从 .env 读取最新配置")
+        
+        # 读取.env文件以确保获取最新的配置 (批量检查时由调用方统一读取一次)
+        if reload_env:
+            reload_dotenv()
+        
+        # 对于Ollama，尝试直接读取endpoint配置
+        if standard_name == "ollama_local":
+            ollama_endpoint = os.environ.get("OLLAMA_ENDPOINT") or os.environ.get("OLLAMA_BASE_URL")
+            if not ollama_endpoint:
+                ollama_endpoint = "http://localhost:11434"  # 使用默认值
+                logger.info(f"未找到Ollama端点配置，使用默认值: {ollama_endpoint}")
+        
+        handler = get_handler(standard_name)  # 尝试获取处理器实例
+        if handler:
+            logger.info(f"Provider '{standard_name}' Handler instantiated successfully. Basic config likely present.")
+            status = "ok"  # Initial status if handler creation succeeds
+            message = "基本配置有效且 Handler 实例化成功。"
+        else:
+            status = "error"
+            message = "无法创建处理器实例，请检查配置"
+            logger.warning(f"无法为提供商 '{standard_name}' 创建处理器实例")
+            return {"provider": standard_name, "status": status, "message": message}
+
+        # --- 3. Specific check for Ollama ---
+        if standard_name == "ollama_local":
+            logger.debug("为 Ollama 执行额外的在线检查")
+            # Ensure we have the endpoint
+            if not ollama_endpoint:
+                ollama_endpoint = handler.endpoint if hasattr(handler, 'endpoint') else "http://localhost:11434"
+                logger.debug(f"从处理器获取Ollama端点: {ollama_endpoint}")
+            
+            # 使用处理器的内置方法检查服务状态
+            try:
+                # 直接使用handler的check_service_status方法
+                if hasattr(handler, 'check_service_status'):
+                    status_result = await handler.check_service_status()
+                    if status_result["status"] == "available":
+                        status = "ok"
+                        message = f"Ollama服务在线且可访问：{status_result.get('message', '')}"
+                    else:
+                        status = "error"
+                        message = status_result.get('message', "Ollama服务不可用")
+                    
+                    logger.info(f"Ollama服务状态检查结果: {status} - {message}")
+                    return {"provider": standard_name, "status": status, "message": message}
+                
+                # 备选方案：使用handler的get_available_models方法
+                if hasattr(handler, 'get_available_models'):
+                    models = await handler.get_available_models()
+                    if models and len(models) > 0:
+                        status = "ok"
+                        message = f"Ollama服务在线且可访问，发现 {len(models)} 个模型"
+                    else:
+                        status = "warning"
+                        message = "Ollama服务可能在线，但未发现任何模型"
+                    
+                    logger.info(f"Ollama模型列表检查结果: {status} - {message}")
+                    return {"provider": standard_name, "status": status, "message": message}
+                
+                # 如果前两种方法都不可用，回退到aiohttp直接检查
+                logger.debug("回退到直接HTTP检查Ollama状态")
+                
+                # 定义检查函数
+                async def check_ollama_direct(endpoint_url):
+                    try:
+                        async with aiohttp.ClientSession() as session:
+                            # Use a short timeout
+                            # Check /api/tags or just / for basic reachability
+                            check_url = f"{endpoint_url.rstrip('/')}/api/tags" # More reliable than root
+                            logger.debug(f"正在检查Ollama可达性: {check_url}")
+                            async with session.get(check_url, timeout=3.0) as response:
+                                if response.status == 200:
+                                    try:
+                                        # 尝试解析响应以验证内容
+                                        data = await response.json()
+                                        if 'models' in data:
+                                            models_count = len(data['models'])
+                                            logger.info(f"Ollama服务在 {endpoint_url} 检测活跃，找到 {models_count} 个模型")
+                                            return True, f"Ollama服务在线且可访问，发现 {models_count} 个模型。"
+                                        else:
+                                            logger.info(f"Ollama服务在 {endpoint_url} 检测活跃，但未找到模型列表")
+                                            return True, "Ollama服务在线且可访问，但未找到模型列表。"
+                                    except Exception as json_err:
+                                        logger.warning(f"Ollama响应解析失败: {json_err}")
+                                        return True, "Ollama服务在线但响应格式异常。"
+                                else:
+                                    logger.warning(f"Ollama服务在 {endpoint_url} 响应状态 {response.status} (GET {check_url})")
+                                    return False, f"Ollama服务响应异常 (状态: {response.status})。"
+                    except asyncio.TimeoutError:
+                        logger.warning(f"连接Ollama服务 {endpoint_url} 超时")
+                        return False, "连接Ollama服务超时。请确认Ollama服务已启动并监听正确端口。"
+                    except aiohttp.ClientConnectorError as conn_err:
+                        logger.warning(f"无法连接到Ollama服务 {endpoint_url}: {conn_err}")
+                        return False, f"无法连接到Ollama服务地址 ({conn_err})。请检查Ollama是否运行及端口配置是否正确。"
+                    except Exception as e:
+                        logger.error(f"检查Ollama服务 {endpoint_url} 时发生未知错误: {e}", exc_info=True)
+                        return False, f"检查Ollama服务时出错: {e}"
+                
+                # 运行检查（不需要nest_asyncio，因为我们在异步函数中运行）
+                is_running, running_message = await check_ollama_direct(ollama_endpoint)
+                
+                # 更新状态和消息
+                if is_running:
+                    status = "ok" # Confirm status is ok
+                    message = running_message
+                else:
+                    status = "error" # Service configured but not reachable/responding correctly
+                    message = running_message
+            except ImportError as ie:
+                logger.warning(f"所需模块未安装，无法执行Ollama在线检查: {ie}")
+                status = "warning" # Status is uncertain
+                message += f" (无法执行在线检查，缺少必要模块: {ie})"
+            except Exception as e:
+                logger.error(f"Ollama状态检查时发生意外错误: {e}", exc_info=True)
+                status = "error"
+                message = "无法检查Ollama状态"
+        # --- End Ollama Specific Check ---
+
+        # For other providers, successful handler instantiation is the main check for now.
+
+        return {"provider": standard_name, "status": status, "message": message}
+
+    except ValueError as ve: # Catch errors from get_handler or standardize_provider_name
+        logger.warning(f"获取提供商 '{provider_name}' 状态失败: {ve}")
+        # If standardization failed, standard_name might be empty
+        provider_key = standard_name if standard_name else provider_name
+        return {"provider": provider_key, "status": "error", "message": str(ve)}
+    except FileNotFoundError as fnf_err: # Catch if metadata or .env is missing critically
+        logger.error(f"获取提供商 '{provider_name}' 状态失败 (文件未找到): {fnf_err}")
+        provider_key = standard_name if standard_name else provider_name
+        return {"provider": provider_key, "status": "error", "message": f"配置错误: {fnf_err}"}
+    except Exception as e:
+        logger.exception(f"获取提供商 '{provider_name}' 状态时发生意外错误: {e}")
+        provider_key = standard_name if standard_name else provider_name
+        return {"provider": provider_key, "status": "error", "message": f"检查状态时发生意外错误: {e}"}
+
+
+class ProviderHealthChecker:
+    """Latest status per provider; probes run concurrently with per-probe timeouts"""
+
+    def __init__(self):
+        self._statuses: Dict[str, Dict[str, Any]] = {}
+        self._configured: Optional[List[str]] = None
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # invalidate() 递增；保存设置前开始的探测结果不再写入缓存
+        self._generation = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def probe(self, provider_name: str, timeout: Optional[float] = None, reload_env: bool = True) -> Dict[str, Any]:
+        """Live status of one provider (concurrent callers share one probe); updates the cache"""
+        name = _standard_name(provider_name)
+        task = self._inflight.get(name)
+        if task is None or task.done():
+            task = asyncio.ensure_future(self._probe(name, timeout, reload_env, self._generation))
+            self._inflight[name] = task
+            task.add_done_callback(lambda t, n=name: self._inflight.pop(n, None) if self._inflight.get(n) is t else None)
+        # shield: 一个调用方被取消不影响共享同一探测的其他调用方
+        return dict(await asyncio.shield(task))
+
+    async def _probe(self, name: str, timeout: Optional[float], reload_env: bool, generation: int) -> Dict[str, Any]:
+        timeout = timeout or get_app_config().provider_health.probe_timeout_seconds
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(check_provider_status(name, reload_env=reload_env), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"提供商 '{name}' 状态检查超时 ({timeout:g} 秒)")
+            result = {"provider": name, "status": "error", "message": f"状态检查超时 ({timeout:g} 秒)"}
+        result["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        result["checked_at"] = time.time()
+        if generation == self._generation:
+            self._statuses[name] = result
+        return result
+
+    async def check_all(self, names: Optional[Iterable[str]] = None, timeout: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """Probe the given providers (default: all configured ones) concurrently"""
+        await asyncio.to_thread(reload_dotenv)
+        if names is None:
+            names = await self._configured_providers()
+        names = list(dict.fromkeys(_standard_name(name) for name in names))
+        semaphore = asyncio.Semaphore(get_app_config().provider_health.max_concurrency)
+
+        async def one(name: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.probe(name, timeout, reload_env=False)
+
+        results = await asyncio.gather(*(one(name) for name in names))
+        return dict(zip(names, results))
+
+    async def _configured_providers(self) -> List[str]:
+        """Re-read the configured providers; cached unless settings were saved meanwhile"""
+        generation = self._generation
+        configured = await asyncio.to_thread(configured_providers)
+        if generation == self._generation:
+            self._configured = configured
+        return configured
+
+    def cached(self, provider_name: str) -> Optional[Dict[str, Any]]:
+        """Cached status with its age and the provider's circuit breaker / rate limiter state"""
+        name = _standard_name(provider_name)
+        status = self._statuses.get(name)
+        return None if status is None else self._describe(name, status)
+
+    @staticmethod
+    def _describe(name: str, status: Dict[str, Any]) -> Dict[str, Any]:
+        return {**status, "age_seconds": round(time.time() - status["checked_at"], 1),
+                "resilience": provider_limits.snapshot(name)}
+
+    async def statuses(self, names: Optional[Iterable[str]] = None, refresh: bool = False) -> Dict[str, Dict[str, Any]]:
+        """Statuses of the given providers (default: configured ones); missing or stale entries are probed first"""
+        if names is None:
+            names = self._configured if self._configured is not None else await self._configured_providers()
+        names = list(dict.fromkeys(_standard_name(name) for name in names))
+        max_age = get_app_config().provider_health.max_age_seconds
+        now = time.time()
+        stale = [name for name in names
+                 if refresh or name not in self._statuses or now - self._statuses[name]["checked_at"] > max_age]
+        # 使用探测结果本身，而不是重读缓存：探测期间 invalidate() 会清空缓存且不再写入
+        results = {name: self._statuses[name] for name in names if name not in stale}
+        if stale:
+            results.update(await self.check_all(stale))
+        return {name: self._describe(name, results[name]) for name in names}
+
+    async def status(self, provider_name: str, refresh: bool = False) -> Dict[str, Any]:
+        """Status of one provider from the cache, probed when missing, stale or refresh is set"""
+        return (await self.statuses([provider_name], refresh=refresh))[_standard_name(provider_name)]
+
+    def invalidate(self) -> None:
+        """Drop cached statuses (after settings are saved); probes already running no longer update the cache"""
+        self._generation += 1
+        self._statuses.clear()
+        self._configured = None
+        self._inflight.clear()
+
+    def start(self) -> None:
+        """Start the background refresh (no-op when disabled or already running)"""
+        if not get_app_config().provider_health.enabled or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.create_task(self._run(), name="provider-health-checker")
+        logger.info("Provider health checker started.")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                async with span("provider_health.refresh", root=True):
+                    results = await self.check_all()
+                logger.debug(f"已刷新 {len(results)} 个提供商的状态")
+            except Exception as e:
+                logger.warning(f"后台刷新提供商状态失败: {e}", exc_info=True)
+            await asyncio.sleep(get_app_config().provider_health.interval_seconds)
+
+
+provider_health = ProviderHealthChecker()
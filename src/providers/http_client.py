@@ -0,0 +1,71 @@
+"""
+Shared aiohttp session for provider handlers.
+
+One ClientSession (and so one connection pool) is kept per event loop and reused by
+every request, so concurrent streams share keep-alive connections and the number of
+in-flight requests is bounded by the pool size (http_client.limit in
+config/app_config.yaml) rather than by a thread pool. Timeouts are set per request.
+"""
+import asyncio
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+import aiohttp
+
+from src.config.app_config import get_app_config
+from src.utils.logging import logger
+
+_sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+
+# 当前处理器调用已发出的 HTTP 请求数 (由 src/providers/instrumentation.py 设置)，多于一次即为重试
+current_call_attempts: ContextVar[Optional[List[int]]] = ContextVar("provider_call_attempts", default=None)
+
+
+async def _count_attempt(session, context, params) -> None:
+    attempts = current_call_attempts.get()
+    if attempts is not None:
+        attempts[0] += 1
+
+
+# 统计请求次数的 trace 配置；共享会话和各处理器自建的会话都会挂上
+attempt_trace_config = aiohttp.TraceConfig()
+attempt_trace_config.on_request_start.append(_count_attempt)
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """Return the shared session of the running event loop, creating it on first use"""
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        # 丢弃已关闭事件循环留下的会话
+        for stale in [other for other in _sessions if other.is_closed()]:
+            del _sessions[stale]
+        settings = get_app_config().http_client
+        connector = aiohttp.TCPConnector(
+            limit=settings.limit,
+            limit_per_host=settings.limit_per_host,
+            keepalive_timeout=settings.keepalive_timeout,
+            ttl_dns_cache=settings.dns_cache_ttl or None,
+            use_dns_cache=settings.dns_cache_ttl > 0,
+        )
+        session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=client_timeout(),
+            trace_configs=[attempt_trace_config],
+        )
+        _sessions[loop] = session
+        logger.info(f"Created shared provider HTTP session (limit={settings.limit}, limit_per_host={settings.limit_per_host})")
+    return session
+
+
+def client_timeout(total: Optional[float] = None, sock_read: Optional[float] = None) -> aiohttp.ClientTimeout:
+    """Per-request timeout that keeps the configured connect timeout"""
+    return aiohttp.ClientTimeout(total=total, sock_read=sock_read, sock_connect=get_app_config().http_client.connect_timeout)
+
+
+async def close_http_sessions() -> None:
+    """Close the shared session of the running event loop (called on application shutdown)"""
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
+        logger.info("Closed shared provider HTTP session.")
@@ -0,0 +1,296 @@
+"""
+Latency, time-to-first-token, throughput, error and retry metrics of provider calls.
+
+instrument_method wraps a handler's generate / generate_text / chat /
+stream_chat (installed by BaseAPIHandler.__init_subclass__ outside the
+resilience guard, so time spent waiting for rate-limit budget and calls
+rejected by an open circuit are included) and records, per provider and model:
+
+- provider_requests_total{outcome="success|error|cancelled"} and
+  provider_errors_total{error_type}: exceptions by class name, error chunks or
+  error responses as http_<status> / error_response;
+- provider_request_duration_seconds: whole call (streams: until the last chunk);
+- provider_time_to_first_token_seconds: streams, until the first content chunk;
+- provider_output_tokens_total and provider_output_tokens_per_second: completion
+  tokens as reported (usage.completion_tokens, Ollama eval_count) or estimated
+  from the text, per second of generation (streams: after the first token);
+- provider_retries_total: HTTP attempts beyond the first one made during a call,
+  counted by the attempt trace config on the handlers' aiohttp sessions.
+
+Nested calls (a chat implemented on top of generate) are recorded once, under the
+outer method. Inside a traced request or task each measured call is also recorded as a
+"provider.<method>" span (see src/utils/tracing.py). The metrics are served as Prometheus text by GET /metrics and
+summarised by GET /api/metrics/summary.
+"""
+import functools
+import inspect
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from src.config.app_config import get_app_config
+from src.providers.http_client import current_call_attempts
+from src.providers.resilience import error_status_code, estimate_tokens
+from src.utils.metrics import Histogram, registry
+from src.utils.tracing import activate, deactivate, tracer
+
+TTFT_BUCKETS = (0.05, 0.1, 0.2, 0.35, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0, 20.0)
+TOKENS_PER_SECOND_BUCKETS = (1, 2.5, 5, 10, 20, 30, 40, 50, 75, 100, 150, 200, 300, 500, 1000)
+
+REQUESTS = registry.counter("provider_requests_total", "Provider handler calls by outcome", ("provider", "model", "method", "outcome"))
+ERRORS = registry.counter("provider_errors_total", "Failed provider handler calls by error type", ("provider", "model", "method", "error_type"))
+RETRIES = registry.counter("provider_retries_total", "HTTP attempts beyond the first within one provider call", ("provider", "model", "method"))
+OUTPUT_TOKENS = registry.counter("provider_output_tokens_total", "Completion tokens (reported or estimated)", ("provider", "model"))
+DURATION = registry.histogram("provider_request_duration_seconds", "Duration of provider handler calls", ("provider", "model", "method"))
+TTFT = registry.histogram("provider_time_to_first_token_seconds", "Time from stream start to the first content chunk", ("provider", "model"), TTFT_BUCKETS)
+TOKENS_PER_SECOND = registry.histogram("provider_output_tokens_per_second", "Completion tokens per second of generation", ("provider", "model"), TOKENS_PER_SECOND_BUCKETS)
+
+# 当前调用链中已在计量内的提供商 (嵌套调用只记录最外层)
+_measuring: ContextVar[FrozenSet[str]] = ContextVar("provider_metrics_active", default=frozenset())
+
+
+def _model_label(handler: Any, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> str:
+    model = kwargs.get("model")
+    if model is None and len(args) >= 2 and isinstance(args[1], str):
+        model = args[1]
+    model = model or getattr(handler, "default_model", None) or "default"
+    return str(model)[:100]
+
+
+def _error_type(error: Any) -> str:
+    if isinstance(error, BaseException):
+        return type(error).__name__
+    status = error_status_code(error)
+    return f"http_{status}" if status is not None else "error_response"
+
+
+def _chunk_text(chunk: Dict[str, Any]) -> str:
+    """Generated text of a stream chunk (content and reasoning deltas, or Ollama message content)"""
+    choices = chunk.get("choices")
+    if isinstance(choices, list) and choices and isinstance(choices[0], dict):
+        delta = choices[0].get("delta")
+        if isinstance(delta, dict):
+            return "".join(value for key, value in delta.items()
+                           if key in ("content", "reasoning_content") and isinstance(value, str))
+        return ""
+    message = chunk.get("message")
+    if isinstance(message, dict) and isinstance(message.get("content"), str):
+        return message["content"]
+    return ""
+
+
+def _reported_completion_tokens(payload: Any) -> Optional[int]:
+    if not isinstance(payload, dict):
+        return None
+    usage = payload.get("usage")
+    if isinstance(usage, dict) and isinstance(usage.get("completion_tokens"), int):
+        return usage["completion_tokens"]
+    if isinstance(payload.get("eval_count"), int):
+        return payload["eval_count"]
+    return None
+
+
+def _result_completion_tokens(result: Any) -> int:
+    if isinstance(result, str):
+        return estimate_tokens(result)
+    reported = _reported_completion_tokens(result)
+    if reported is not None:
+        return reported
+    if isinstance(result, dict):
+        choices = result.get("choices")
+        if isinstance(choices, list) and choices and isinstance(choices[0], dict):
+            message = choices[0].get("message")
+            if isinstance(message, dict) and isinstance(message.get("content"), str):
+                return estimate_tokens(message["content"])
+    return 0
+
+
+def _record(provider: str, model: str, method: str, elapsed: float, attempts: int,
+            error: Any = None, cancelled: bool = False) -> None:
+    outcome = "cancelled" if cancelled else ("error" if error is not None else "success")
+    REQUESTS.inc((provider, model, method, outcome))
+    if error is not None:
+        ERRORS.inc((provider, model, method, _error_type(error)))
+    if attempts > 1:
+        RETRIES.inc((provider, model, method), attempts - 1)
+    DURATION.observe((provider, model, method), elapsed)
+
+
+def _record_tokens(provider: str, model: str, tokens: int, seconds: float) -> None:
+    if tokens <= 0:
+        return
+    OUTPUT_TOKENS.inc((provider, model), tokens)
+    if seconds > 0:
+        TOKENS_PER_SECOND.observe((provider, model), tokens / seconds)
+
+
+def _start_span(provider: str, model: str, method: str) -> Any:
+    return tracer.start_span(f"provider.{method}", {"provider": provider, "model": model})
+
+
+def _end_span(span: Any, attempts: int, error: Any = None, tokens: int = 0) -> None:
+    if span is None:
+        return
+    span.set(attempts=attempts, **({"output_tokens": tokens} if tokens else {}))
+    if error is not None and not isinstance(error, BaseException):
+        span.set(error_type=_error_type(error))
+        error = RuntimeError(_error_type(error))
+    tracer.end_span(span, error)
+
+
+def _enter(provider: str, attempts: List[int], span: Any = None) -> Tuple[Any, Any, Any]:
+    return (_measuring.set(_measuring.get() | {provider}), current_call_attempts.set(attempts), activate(span))
+
+
+def _exit(tokens: Tuple[Any, Any, Any]) -> None:
+    deactivate(tokens[2])
+    _measuring.reset(tokens[0])
+    current_call_attempts.reset(tokens[1])
+
+
+def instrument_method(method: Callable) -> Callable:
+    """Wrap a handler coroutine / async generator method with metrics recording"""
+    name = method.__name__
+
+    if inspect.isasyncgenfunction(method):
+        @functools.wraps(method)
+        async def measured_stream(self, *args, **kwargs):
+            provider = self.provider_name
+            if not get_app_config().metrics.enabled or provider in _measuring.get():
+                async for chunk in method(self, *args, **kwargs):
+                    yield chunk
+                return
+            model = _model_label(self, args, kwargs)
+            attempts = [0]
+            span = _start_span(provider, model, name)
+            start = time.perf_counter()
+            first = last = None
+            error, reported, estimated, settled = None, None, 0, False
+            chunks = method(self, *args, **kwargs)
+            try:
+                while True:
+                    tokens = _enter(provider, attempts, span)
+                    try:
+                        chunk = await chunks.__anext__()
+                    except StopAsyncIteration:
+                        break
+                    finally:
+                        _exit(tokens)
+                    if isinstance(chunk, dict):
+                        if chunk.get("error"):
+                            error = error or chunk
+                        else:
+                            text = _chunk_text(chunk)
+                            if text:
+                                last = time.perf_counter()
+                                if first is None:
+                                    first = last
+                                    TTFT.observe((provider, model), first - start)
+                                    if span is not None:
+                                        span.set(ttft_ms=round((first - start) * 1000, 1))
+                                estimated += estimate_tokens(text)
+                            reported = _reported_completion_tokens(chunk) or reported
+                    yield chunk
+            except Exception as exc:
+                settled = True
+                _record(provider, model, name, time.perf_counter() - start, attempts[0], error=exc)
+                _end_span(span, attempts[0], exc)
+                raise
+            except BaseException:
+                settled = True
+                _record(provider, model, name, time.perf_counter() - start, attempts[0], cancelled=True)
+                _end_span(span, attempts[0], RuntimeError("cancelled"))
+                raise
+            finally:
+                await chunks.aclose()
+                if not settled:
+                    _record(provider, model, name, time.perf_counter() - start, attempts[0], error=error)
+                    if first is not None:
+                        _record_tokens(provider, model, reported or estimated, last - first)
+                    _end_span(span, attempts[0], error, (reported or estimated) if first is not None else 0)
+        return measured_stream
+
+    if inspect.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def measured_call(self, *args, **kwargs):
+            provider = self.provider_name
+            if not get_app_config().metrics.enabled or provider in _measuring.get():
+                return await method(self, *args, **kwargs)
+            model = _model_label(self, args, kwargs)
+            attempts = [0]
+            span = _start_span(provider, model, name)
+            start = time.perf_counter()
+            tokens = _enter(provider, attempts, span)
+            try:
+                result = await method(self, *args, **kwargs)
+            except Exception as exc:
+                _record(provider, model, name, time.perf_counter() - start, attempts[0], error=exc)
+                _end_span(span, attempts[0], exc)
+                raise
+            except BaseException:
+                _record(provider, model, name, time.perf_counter() - start, attempts[0], cancelled=True)
+                _end_span(span, attempts[0], RuntimeError("cancelled"))
+                raise
+            finally:
+                _exit(tokens)
+            elapsed = time.perf_counter() - start
+            if isinstance(result, dict) and result.get("error"):
+                _record(provider, model, name, elapsed, attempts[0], error=result)
+                _end_span(span, attempts[0], result)
+            else:
+                completion_tokens = _result_completion_tokens(result)
+                _record(provider, model, name, elapsed, attempts[0])
+                _record_tokens(provider, model, completion_tokens, elapsed)
+                _end_span(span, attempts[0], tokens=completion_tokens)
+            return result
+        return measured_call
+
+    return method
+
+
+def _quantiles_ms(histogram: Histogram, stats) -> Optional[Dict[str, float]]:
+    if not stats:
+        return None
+    return {
+        "avg": round(stats[1] / stats[2] * 1000, 1),
+        **{f"p{int(q * 100)}": round(histogram.quantile(q, stats) * 1000, 1) for q in (0.5, 0.95, 0.99)},
+    }
+
+
+def summary(provider: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Per provider/model aggregates of the recorded metrics (quantiles estimated from histogram buckets)"""
+    keys = sorted({labels[:2] for labels, _ in REQUESTS.series()})
+    if provider:
+        keys = [key for key in keys if key[0] == provider]
+    rows = []
+    for key in keys:
+        counts: Dict[str, float] = {}
+        for labels, value in REQUESTS.series():
+            if labels[:2] == key:
+                counts[labels[3]] = counts.get(labels[3], 0) + value
+        total = sum(counts.values())
+        errors: Dict[str, float] = {}
+        for labels, value in ERRORS.series():
+            if labels[:2] == key:
+                errors[labels[3]] = errors.get(labels[3], 0) + value
+        retries = sum(value for labels, value in RETRIES.series() if labels[:2] == key)
+        tps = TOKENS_PER_SECOND.stats(key)
+        rows.append({
+            "provider": key[0],
+            "model": key[1],
+            "requests": int(total),
+            "successes": int(counts.get("success", 0)),
+            "errors": int(counts.get("error", 0)),
+            "cancelled": int(counts.get("cancelled", 0)),
+            "error_rate": round(counts.get("error", 0) / total, 4) if total else 0.0,
+            "error_types": {error_type: int(value) for error_type, value in sorted(errors.items())},
+            "retries": int(retries),
+            "latency_ms": _quantiles_ms(DURATION, DURATION.merged(lambda labels: labels[:2] == key)),
+            "time_to_first_token_ms": _quantiles_ms(TTFT, TTFT.stats(key)),
+            "output_tokens": int(OUTPUT_TOKENS.value(key)),
+            "tokens_per_second": {
+                "avg": round(tps[1] / tps[2], 1),
+                "p50": round(TOKENS_PER_SECOND.quantile(0.5, tps), 1),
+            } if tps else None,
+        })
+    return rows
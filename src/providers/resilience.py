@@ -0,0 +1,546 @@
+"""
+Per-provider circuit breaker and adaptive rate limiter.
+
+Every call of a handler's generate / generate_text / chat / stream_chat goes
+through guard_method (installed by BaseAPIHandler.__init_subclass__), so the chat
+routes, the provider router, the report service and the task worker all share
+one ProviderState per provider:
+
+- circuit breaker: failure_threshold consecutive failures (connection errors,
+  timeouts, 5xx, error chunks) open the circuit and calls fail immediately with
+  ProviderUnavailableError for open_seconds; then half_open_max_calls probe calls
+  are let through, a successful probe closes the circuit and a failed one opens
+  it again for twice as long (up to max_open_seconds). Client errors (4xx other
+  than 408/429) and configuration errors do not count against the provider.
+- rate limiter: token buckets for requests/min and tokens/min (prompt tokens
+  estimated from the messages plus max_tokens, corrected with the reported usage
+  afterwards). A call waits for budget up to max_wait_seconds, otherwise it fails
+  with ProviderRateLimitedError. A 429 response pauses the provider for its
+  Retry-After (default_retry_after_seconds without the header) and scales the
+  configured rates down by adaptive_decrease; each success restores
+  adaptive_recovery of the rate.
+
+Handlers pass provider_trace_configs(self.provider_name) to their aiohttp
+sessions so Retry-After headers are seen even when the handler only raises the
+status code. The handlers' own retries (tenacity, inside the guard) are HTTP
+attempts of the same admitted call: each attempt beyond the first takes one more
+request from the requests/min budget and is counted as "retries", and
+src/utils/retry.py stops retrying once the circuit is open or a Retry-After
+cooldown is active (provider_limits.allows_retry).
+
+Usage:
+    provider_limits.snapshot("deepseek_ai")   # state shown by /api/provider-status/{provider_name}
+"""
+import asyncio
+import email.utils
+import functools
+import inspect
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+import aiohttp
+
+from src.config.app_config import ProviderLimitsConfig, ProviderRateLimitConfig, get_app_config
+from src.providers.http_client import attempt_trace_config
+from src.utils.error_handler import ConfigError, ProviderRateLimitedError, ProviderUnavailableError
+from src.utils.logging import logger
+from src.utils.sse import content_delta
+from src.validation.error_handler import ConfigurationError
+
+# 经过熔断与限流的处理器方法
+GUARDED_METHODS = ("generate", "generate_text", "chat", "stream_chat")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+_CLIENT_ERROR, _RATE_LIMITED, _FAILURE = "client_error", "rate_limited", "failure"
+
+# 当前调用链中已在保护内的提供商 (chat 内部调用 generate 等嵌套调用不重复计数)
+_active: ContextVar[FrozenSet[str]] = ContextVar("provider_guard_active", default=frozenset())
+# 当前受保护调用的许可 (统计该调用发出的 HTTP 请求次数)
+_permit: ContextVar[Optional["Permit"]] = ContextVar("provider_guard_permit", default=None)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count: about 3 UTF-8 bytes per token (one CJK character, or 3-4 Latin letters)"""
+    return (len(text.encode("utf-8")) + 2) // 3
+
+
+def _message_text(message: Any) -> str:
+    content = message.get("content") if isinstance(message, dict) else getattr(message, "content", None)
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):  # 多模态消息的文本部分
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict) and isinstance(part.get("text"), str))
+    return ""
+
+
+def estimate_request_tokens(args: Tuple[Any, ...], kwargs: Dict[str, Any], default_completion: int) -> Tuple[int, int]:
+    """Estimated prompt tokens of a handler call and the completion tokens it may use"""
+    messages, prompt = kwargs.get("messages"), kwargs.get("prompt")
+    if messages is None and prompt is None and args:
+        if isinstance(args[0], list):
+            messages = args[0]
+        elif isinstance(args[0], str):
+            prompt = args[0]
+    text = prompt if isinstance(prompt, str) else ""
+    if messages:
+        text += "".join(_message_text(message) for message in messages)
+    max_tokens = kwargs.get("max_tokens")
+    return estimate_tokens(text), (max_tokens if isinstance(max_tokens, int) and max_tokens > 0 else default_completion)
+
+
+def reported_tokens(payload: Any) -> Optional[int]:
+    """Total tokens reported in a response or stream chunk (OpenAI usage or Ollama counters)"""
+    if not isinstance(payload, dict):
+        return None
+    usage = payload.get("usage")
+    if isinstance(usage, dict):
+        total = usage.get("total_tokens")
+        if isinstance(total, int):
+            return total
+        counts = [usage.get(key) for key in ("prompt_tokens", "completion_tokens")]
+        if all(isinstance(count, int) for count in counts):
+            return sum(counts)
+    counts = [payload.get(key) for key in ("prompt_eval_count", "eval_count")]
+    if all(isinstance(count, int) for count in counts):
+        return sum(counts)
+    return None
+
+
+def error_status_code(error: Any) -> Optional[int]:
+    if isinstance(error, dict):
+        detail = error.get("error")
+        candidates = [error.get("status_code")]
+        if isinstance(detail, dict):
+            candidates += [detail.get("status_code"), detail.get("code")]
+    else:
+        candidates = [getattr(error, "status_code", None), getattr(error, "status", None)]
+    for value in candidates:
+        if isinstance(value, int):
+            return value
+        if isinstance(value, str) and value.isdigit():
+            return int(value)
+    return None
+
+
+def classify(error: Any) -> str:
+    """Outcome of a failed call (exception or error chunk) for the breaker and limiter"""
+    if isinstance(error, (ConfigurationError, ConfigError)):
+        return _CLIENT_ERROR
+    status = error_status_code(error)
+    if status is None and isinstance(error, dict) and "429" in str(error.get("error", "")):
+        status = 429
+    if status == 429:
+        return _RATE_LIMITED
+    if status is not None and 400 <= status < 500 and status != 408:
+        return _CLIENT_ERROR
+    return _FAILURE
+
+
+class TokenBucket:
+    """Budget refilled continuously at per_minute * factor per minute, holding at most one minute's budget"""
+
+    __slots__ = ("per_minute", "level", "updated")
+
+    def __init__(self, per_minute: float, now: float):
+        self.per_minute = per_minute
+        self.level = per_minute
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float, factor: float) -> float:
+        """Seconds until amount is available (the budget may be overdrawn by earlier reservations)"""
+        rate = self.per_minute * factor / 60
+        self.level = min(self.per_minute, self.level + (now - self.updated) * rate)
+        self.updated = now
+        deficit = amount - self.level
+        return deficit / rate if deficit > 0 else 0.0
+
+    def take(self, amount: float) -> None:
+        self.level -= amount
+
+
+@dataclass
+class Permit:
+    """One admitted call"""
+    probe: bool
+    tokens: int
+    prompt_tokens: int
+    attempts: int = 0
+
+
+class ProviderState:
+    """Circuit breaker, rate limiter and counters of one provider"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.open_period = 0.0
+        self.opened_until = 0.0
+        self.probes = 0
+        self.in_flight = 0
+        self.rate_factor = 1.0
+        self.cooldown_until = 0.0
+        self.retry_after_noted = float("-inf")
+        self.decrease_allowed = 0.0
+        self.requests: Optional[TokenBucket] = None
+        self.tokens: Optional[TokenBucket] = None
+        self.last_error: Optional[str] = None
+        self.counters = {"calls": 0, "successes": 0, "failures": 0, "client_errors": 0, "rate_limited_responses": 0,
+                         "rejected_open": 0, "rejected_rate_limit": 0, "throttled": 0, "throttled_seconds": 0.0, "trips": 0,
+                         "retries": 0}
+
+    def _limits(self, config: ProviderLimitsConfig) -> ProviderRateLimitConfig:
+        return config.providers.get(self.name, config.default)
+
+    def _buckets(self, limits: ProviderRateLimitConfig, now: float) -> None:
+        """Create (or resize after a configuration change) the token buckets"""
+        if not limits.requests_per_minute:
+            self.requests = None
+        elif self.requests is None or self.requests.per_minute != limits.requests_per_minute:
+            self.requests = TokenBucket(limits.requests_per_minute, now)
+        if not limits.tokens_per_minute:
+            self.tokens = None
+        elif self.tokens is None or self.tokens.per_minute != limits.tokens_per_minute:
+            self.tokens = TokenBucket(limits.tokens_per_minute, now)
+
+    def _admit(self, config: ProviderLimitsConfig, now: float) -> bool:
+        """Circuit check; returns True when the call is a half-open probe"""
+        if self.state == OPEN:
+            remaining = self.opened_until - now
+            if remaining > 0:
+                self.counters["rejected_open"] += 1
+                raise ProviderUnavailableError(self.name, remaining)
+            self.state, self.probes = HALF_OPEN, 0
+            logger.info(f"Provider '{self.name}' circuit half-open, letting probe calls through")
+        if self.state == HALF_OPEN:
+            if self.probes >= config.half_open_max_calls:
+                self.counters["rejected_open"] += 1
+                raise ProviderUnavailableError(self.name, 1.0)
+            self.probes += 1
+            return True
+        return False
+
+    async def acquire(self, prompt_tokens: int, completion_tokens: int) -> Permit:
+        """Admit one call: check the circuit, then wait for rate-limit budget"""
+        config = get_app_config().provider_limits
+        tokens = prompt_tokens + completion_tokens
+        now = time.monotonic()
+        probe = self._admit(config, now)
+        self._buckets(self._limits(config), now)
+        wait = max(0.0, self.cooldown_until - now)
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1, now, self.rate_factor))
+        if self.tokens is not None:
+            tokens = min(tokens, int(self.tokens.per_minute))
+            wait = max(wait, self.tokens.wait_time(tokens, now, self.rate_factor))
+        if wait > config.max_wait_seconds:
+            if probe:
+                self.probes -= 1
+            self.counters["rejected_rate_limit"] += 1
+            raise ProviderRateLimitedError(self.name, wait)
+        if self.requests is not None:
+            self.requests.take(1)
+        if self.tokens is not None:
+            self.tokens.take(tokens)
+        permit = Permit(probe, tokens, prompt_tokens)
+        self.in_flight += 1
+        self.counters["calls"] += 1
+        if wait > 0:
+            self.counters["throttled"] += 1
+            self.counters["throttled_seconds"] += wait
+            try:
+                await asyncio.sleep(wait)
+            except BaseException:
+                self.release(permit)
+                raise
+        return permit
+
+    def note_retry(self) -> None:
+        """An HTTP attempt beyond the first within an admitted call: charge it to the requests/min budget"""
+        self.counters["retries"] += 1
+        if self.requests is not None:
+            self.requests.wait_time(0, time.monotonic(), self.rate_factor)  # 刷新余额
+            self.requests.take(1)
+
+    def allows_retry(self) -> bool:
+        """False while the circuit is open or a Retry-After cooldown is active"""
+        now = time.monotonic()
+        return not ((self.state == OPEN and self.opened_until > now) or self.cooldown_until > now)
+
+    def release(self, permit: Permit) -> None:
+        """End of a call whose outcome is not counted (cancelled by the caller)"""
+        self.in_flight -= 1
+        if permit.probe:
+            self.probes -= 1
+
+    def succeeded(self, permit: Permit, used_tokens: Optional[int] = None) -> None:
+        self.release(permit)
+        self.counters["successes"] += 1
+        if used_tokens is not None and self.tokens is not None:
+            self.tokens.take(used_tokens - permit.tokens)
+        self.rate_factor = min(1.0, self.rate_factor + get_app_config().provider_limits.adaptive_recovery)
+        self._close()
+
+    def failed(self, permit: Permit, error: Any) -> None:
+        self.release(permit)
+        outcome = classify(error)
+        if outcome == _CLIENT_ERROR:
+            # 提供商有响应，只是请求本身有问题
+            self.counters["client_errors"] += 1
+            self._close()
+            return
+        if outcome == _RATE_LIMITED:
+            self.counters["rate_limited_responses"] += 1
+            self.note_rate_limited(None)
+            self._close()
+            return
+        config = get_app_config().provider_limits
+        self.counters["failures"] += 1
+        self.consecutive_failures += 1
+        self.last_error = str(error)[:200]
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.consecutive_failures >= config.failure_threshold):
+            self._trip(config)
+
+    def _close(self) -> None:
+        self.consecutive_failures = 0
+        if self.state != CLOSED:
+            self.state = CLOSED
+            self.open_period = 0.0
+            logger.info(f"Provider '{self.name}' circuit closed")
+
+    def _trip(self, config: ProviderLimitsConfig) -> None:
+        now = time.monotonic()
+        if self.state == HALF_OPEN and self.open_period:
+            self.open_period = min(config.max_open_seconds, self.open_period * 2)
+        else:
+            self.open_period = config.open_seconds
+        self.state = OPEN
+        self.opened_until = now + self.open_period
+        self.counters["trips"] += 1
+        logger.warning(f"Provider '{self.name}' circuit opened for {self.open_period:.0f}s after "
+                       f"{self.consecutive_failures} consecutive failures (last: {self.last_error})")
+
+    def note_rate_limited(self, retry_after: Optional[float], from_header: bool = False, decrease: bool = True) -> None:
+        """Pause the provider after a 429 (or 503 with Retry-After) and lower its rates"""
+        config = get_app_config().provider_limits
+        now = time.monotonic()
+        if from_header:
+            self.retry_after_noted = now
+        elif now - self.retry_after_noted < 1.0:
+            return  # 同一响应的 Retry-After 已由 trace 记录
+        delay = config.default_retry_after_seconds if retry_after is None else retry_after
+        self.cooldown_until = max(self.cooldown_until, now + delay)
+        # 同一冷却期内并发请求收到的多个 429 只降一次速率
+        if decrease and now >= self.decrease_allowed:
+            self.rate_factor = max(config.min_rate_factor, self.rate_factor * config.adaptive_decrease)
+            self.decrease_allowed = now + max(delay, 1.0)
+            logger.warning(f"Provider '{self.name}' rate limited: pausing {delay:.1f}s, rate factor now {self.rate_factor:.2f}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        config = get_app_config().provider_limits
+        now = time.monotonic()
+        limits = self._limits(config)
+        self._buckets(limits, now)
+        budget = {}
+        for label, bucket, per_minute in (("requests", self.requests, limits.requests_per_minute),
+                                          ("tokens", self.tokens, limits.tokens_per_minute)):
+            if bucket is not None:
+                bucket.wait_time(0, now, self.rate_factor)  # 刷新余额
+            budget[label] = {
+                "per_minute": per_minute or None,
+                "effective_per_minute": round(per_minute * self.rate_factor, 1) if per_minute else None,
+                "available": round(bucket.level, 1) if bucket is not None else None,
+            }
+        return {
+            "enabled": config.enabled,
+            "circuit": {
+                "state": OPEN if self.state == OPEN and self.opened_until > now else (HALF_OPEN if self.state != CLOSED else CLOSED),
+                "consecutive_failures": self.consecutive_failures,
+                "retry_in_seconds": round(max(0.0, self.opened_until - now), 1) if self.state == OPEN else 0.0,
+                "last_error": self.last_error,
+            },
+            "rate_limit": {
+                **budget,
+                "rate_factor": round(self.rate_factor, 3),
+                "cooldown_seconds": round(max(0.0, self.cooldown_until - now), 1),
+            },
+            "in_flight": self.in_flight,
+            "counters": {key: round(value, 3) if isinstance(value, float) else value for key, value in self.counters.items()},
+        }
+
+
+class ProviderLimits:
+    """ProviderState registry keyed by standard provider name"""
+
+    def __init__(self):
+        self._states: Dict[str, ProviderState] = {}
+
+    def state(self, provider_name: str) -> ProviderState:
+        name = provider_name.strip().lower().replace("-", "_")
+        state = self._states.get(name)
+        if state is None:
+            state = self._states[name] = ProviderState(name)
+        return state
+
+    def snapshot(self, provider_name: str) -> Dict[str, Any]:
+        name = provider_name.strip().lower().replace("-", "_")
+        # 未被调用过的提供商返回初始状态，不为任意名称创建条目
+        return (self._states.get(name) or ProviderState(name)).snapshot()
+
+    def allows_retry(self, provider_name: str) -> bool:
+        """Whether a failed HTTP attempt of this provider may be retried now"""
+        if not get_app_config().provider_limits.enabled:
+            return True
+        name = provider_name.strip().lower().replace("-", "_")
+        state = self._states.get(name)
+        return state is None or state.allows_retry()
+
+    def note_response(self, provider_name: str, status: int, headers: Any) -> None:
+        """Record a 429/503 Retry-After header seen on a provider response"""
+        if status in (429, 503):
+            retry_after = parse_retry_after(headers.get("Retry-After"))
+            if retry_after is not None:
+                self.state(provider_name).note_rate_limited(retry_after, from_header=True, decrease=status == 429)
+
+
+provider_limits = ProviderLimits()
+
+_trace_configs: Dict[str, List[aiohttp.TraceConfig]] = {}
+
+
+def provider_trace_configs(provider_name: str) -> List[aiohttp.TraceConfig]:
+    """aiohttp trace_configs that report Retry-After headers of this provider's responses and count request attempts"""
+    configs = _trace_configs.get(provider_name)
+    if configs is None:
+        async def on_request_start(session, context, params: aiohttp.TraceRequestStartParams) -> None:
+            permit = _permit.get()
+            if permit is not None:
+                permit.attempts += 1
+                if permit.attempts > 1:
+                    provider_limits.state(provider_name).note_retry()
+
+        async def on_request_end(session, context, params: aiohttp.TraceRequestEndParams) -> None:
+            provider_limits.note_response(provider_name, params.response.status, params.response.headers)
+
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(on_request_start)
+        trace.on_request_end.append(on_request_end)
+        configs = _trace_configs[provider_name] = [trace, attempt_trace_config]
+    return configs
+
+
+def _enter(provider_name: str) -> Optional[Any]:
+    """Mark the provider as guarded in this context; None when it already is (nested call)"""
+    active = _active.get()
+    if provider_name in active:
+        return None
+    return _active.set(active | {provider_name})
+
+
+def guard_method(method: Callable) -> Callable:
+    """Wrap a handler coroutine / async generator method with the provider's breaker and limiter"""
+    if inspect.isasyncgenfunction(method):
+        @functools.wraps(method)
+        async def guarded_stream(self, *args, **kwargs):
+            config = get_app_config().provider_limits
+            if not config.enabled or self.provider_name in _active.get():
+                async for chunk in method(self, *args, **kwargs):
+                    yield chunk
+                return
+            state = provider_limits.state(self.provider_name)
+            permit = await state.acquire(*estimate_request_tokens(args, kwargs, config.default_completion_tokens))
+            chunks = method(self, *args, **kwargs)
+            error, used, output_tokens, settled = None, None, 0, False
+            try:
+                while True:
+                    token = _enter(self.provider_name)
+                    permit_token = _permit.set(permit)
+                    try:
+                        chunk = await chunks.__anext__()
+                    except StopAsyncIteration:
+                        break
+                    finally:
+                        _permit.reset(permit_token)
+                        if token is not None:
+                            _active.reset(token)
+                    if isinstance(chunk, dict):
+                        if chunk.get("error") and error is None:
+                            error = chunk
+                        used = reported_tokens(chunk) or used
+                        content = content_delta(chunk)
+                        if content:
+                            output_tokens += estimate_tokens(content)
+                    yield chunk
+            except Exception as exc:
+                settled = True
+                state.failed(permit, exc)
+                raise
+            except BaseException:
+                # 调用方取消或提前关闭流，不计入结果
+                settled = True
+                state.release(permit)
+                raise
+            finally:
+                await chunks.aclose()
+                if not settled:
+                    if error is not None:
+                        state.failed(permit, error)
+                    else:
+                        state.succeeded(permit, used if used is not None else permit.prompt_tokens + output_tokens)
+        guarded_stream.__provider_guarded__ = True
+        return guarded_stream
+
+    if inspect.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def guarded_call(self, *args, **kwargs):
+            config = get_app_config().provider_limits
+            if not config.enabled or self.provider_name in _active.get():
+                return await method(self, *args, **kwargs)
+            state = provider_limits.state(self.provider_name)
+            permit = await state.acquire(*estimate_request_tokens(args, kwargs, config.default_completion_tokens))
+            token = _enter(self.provider_name)
+            permit_token = _permit.set(permit)
+            try:
+                result = await method(self, *args, **kwargs)
+            except Exception as exc:
+                state.failed(permit, exc)
+                raise
+            except BaseException:
+                state.release(permit)
+                raise
+            finally:
+                _permit.reset(permit_token)
+                _active.reset(token)
+            if isinstance(result, dict) and result.get("error"):
+                state.failed(permit, result)
+            else:
+                used = reported_tokens(result)
+                if used is None and isinstance(result, str):
+                    used = permit.prompt_tokens + estimate_tokens(result)
+                state.succeeded(permit, used)
+            return result
+        guarded_call.__provider_guarded__ = True
+        return guarded_call
+
+    return method
@@ -0,0 +1,382 @@
+"""
+Provider routing: ordered failover and hedged requests on top of factory.get_handler.
+
+Without a policy an endpoint calls the requested provider directly, exactly as
+before. With a policy (provider_routing.endpoints.<endpoint> in
+config/app_config.yaml) a call becomes a sequence of attempts over the requested
+provider followed by the configured fallbacks:
+
+- failover: when an attempt fails (exception, error chunk, get_handler returning
+  None or attempt_timeout_seconds passing) and no other attempt is running, the
+  next target starts immediately;
+- hedging: when the running attempt has not answered after the hedge delay (the
+  hedge_percentile latency recently observed for that endpoint/provider/model,
+  hedge_delay_ms until min_samples have been recorded), the next target starts
+  as well and whichever answers first wins.
+
+The losing attempts are cancelled, which closes their HTTP responses. For
+streams, "answering" means producing the first content chunk; chunks received
+before that are buffered per attempt and only the winner's are passed on, so the
+client never sees output from two providers. Once a stream has been committed to
+a winner it is not switched any more.
+
+Usage:
+    result = await provider_router.call("chat", provider, model,
+                                        lambda handler, model: handler.chat(messages=..., model=model))
+    async for chunk in provider_router.stream("chat_stream", provider, model,
+                                              lambda handler, model: handler.stream_chat(messages=..., model=model)):
+        ...
+"""
+import asyncio
+import math
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from src.config.app_config import EndpointRoutingConfig, get_app_config
+from src.providers import factory
+from src.providers.base import BaseAPIHandler
+from src.utils.logging import logger
+from src.validation.error_handler import APIConnectionError, APITimeoutError
+
+# 每个尝试的流与合并循环之间最多缓存的块数 (满时该尝试的上游等待)
+ATTEMPT_QUEUE_SIZE = 256
+
+_CHUNK, _END, _FAILED = "chunk", "end", "failed"
+
+
+@dataclass(frozen=True)
+class RouteTarget:
+    """One provider/model pair of a routed call"""
+    provider: str
+    model: Optional[str] = None
+
+    @property
+    def label(self) -> str:
+        return f"{self.provider}/{self.model or 'default'}"
+
+
+class LatencyTracker:
+    """Recent latencies of finished attempts per (endpoint, provider, model), used to derive hedge delays"""
+
+    def __init__(self):
+        self._samples: Dict[Tuple[str, str, Optional[str]], Deque[float]] = {}
+
+    def record(self, endpoint: str, target: RouteTarget, seconds: float) -> None:
+        window = get_app_config().provider_routing.latency_window
+        key = (endpoint, target.provider, target.model)
+        samples = self._samples.get(key)
+        if samples is None or samples.maxlen != window:
+            samples = self._samples[key] = deque(samples or (), maxlen=window)
+        samples.append(seconds)
+
+    def percentile(self, endpoint: str, target: RouteTarget, q: float) -> Optional[float]:
+        """q-quantile (nearest rank) of the recent latencies, None while fewer than min_samples are known"""
+        samples = self._samples.get((endpoint, target.provider, target.model))
+        if not samples or len(samples) < get_app_config().provider_routing.min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+@dataclass(eq=False)
+class _Attempt:
+    """One running try of a routed call"""
+    target: RouteTarget
+    started: float
+    task: Optional[asyncio.Task] = None
+    queue: Optional[asyncio.Queue] = None
+    getter: Optional[asyncio.Future] = None
+    buffer: List[Any] = field(default_factory=list)
+
+
+def _normalize(provider: str) -> str:
+    return provider.strip().lower().replace("-", "_")
+
+
+def _is_error_chunk(chunk: Any) -> bool:
+    return isinstance(chunk, dict) and bool(chunk.get("error"))
+
+
+def _is_answer(chunk: Any) -> bool:
+    """A chunk that commits a stream: anything except role-only deltas, bare done markers and errors"""
+    if isinstance(chunk, str):
+        return bool(chunk)
+    if not isinstance(chunk, dict) or _is_error_chunk(chunk):
+        return False
+    choices = chunk.get("choices")
+    if isinstance(choices, list) and choices and isinstance(choices[0], dict):
+        choice = choices[0]
+        delta = choice.get("delta")
+        if choice.get("finish_reason"):
+            return True
+        if isinstance(delta, dict):
+            return any(value for key, value in delta.items() if key != "role")
+        return bool(choice.get("message") or choice.get("text"))
+    if set(chunk) <= {"status", "done"}:
+        return False
+    return True
+
+
+class ProviderRouter:
+    """Runs endpoint calls across the requested provider and its configured fallbacks"""
+
+    def __init__(self):
+        self.latency = LatencyTracker()
+        # 被取消的尝试在后台结束，保留引用避免任务被回收
+        self._reaping: Set[asyncio.Task] = set()
+
+    def policy(self, endpoint: str) -> Optional[EndpointRoutingConfig]:
+        """The endpoint's routing policy; None when it has no fallbacks and no hedging"""
+        policy = get_app_config().provider_routing.endpoints.get(endpoint)
+        if policy is None or (not policy.fallbacks and not policy.hedge):
+            return None
+        return policy
+
+    def targets(self, policy: EndpointRoutingConfig, provider: str, model: Optional[str]) -> List[RouteTarget]:
+        targets = [RouteTarget(provider, model)]
+        seen = {(_normalize(provider), model)}
+        for fallback in policy.fallbacks:
+            key = (_normalize(fallback.provider), fallback.model)
+            if key not in seen:
+                seen.add(key)
+                targets.append(RouteTarget(fallback.provider, fallback.model))
+        return targets
+
+    def hedge_delay(self, endpoint: str, policy: EndpointRoutingConfig, target: RouteTarget) -> float:
+        observed = self.latency.percentile(endpoint, target, policy.hedge_percentile)
+        if observed is None:
+            return policy.hedge_delay_ms / 1000
+        return max(observed, policy.min_hedge_delay_ms / 1000)
+
+    def _handler(self, target: RouteTarget, primary: Optional[BaseAPIHandler], index: int) -> BaseAPIHandler:
+        handler = primary if index == 0 and primary is not None else factory.get_handler(target.provider)
+        if handler is None:
+            raise APIConnectionError(provider_name=target.provider, details="no handler available (unknown provider or configuration error)")
+        return handler
+
+    def _cancel(self, attempts: List[_Attempt], reason: str) -> None:
+        tasks = []
+        for attempt in attempts:
+            if attempt.getter is not None and not attempt.getter.done():
+                attempt.getter.cancel()
+            if attempt.task is not None and not attempt.task.done():
+                attempt.task.cancel()
+                tasks.append(attempt.task)
+                logger.info(f"Provider routing: cancelled {attempt.target.label} ({reason})")
+        if tasks:
+            reaper = asyncio.ensure_future(asyncio.gather(*tasks, return_exceptions=True))
+            self._reaping.add(reaper)
+            reaper.add_done_callback(self._reaping.discard)
+
+    def _next_wait(self, endpoint: str, policy: EndpointRoutingConfig, live: List[_Attempt],
+                   remaining: int, now: float) -> Optional[float]:
+        """Seconds until the next hedge or attempt timeout, None to wait without limit"""
+        deadlines = []
+        if policy.hedge and remaining and len(live) == 1:
+            deadlines.append(live[0].started + self.hedge_delay(endpoint, policy, live[0].target))
+        if policy.attempt_timeout_seconds:
+            deadlines.extend(attempt.started + policy.attempt_timeout_seconds for attempt in live)
+        return max(0.0, min(deadlines) - now) if deadlines else None
+
+    # --- 非流式调用 ---
+
+    async def call(
+        self,
+        endpoint: str,
+        provider: str,
+        model: Optional[str],
+        fn: Callable[[BaseAPIHandler, Optional[str]], Awaitable[Any]],
+        handler: Optional[BaseAPIHandler] = None,
+    ) -> Any:
+        """Await fn(handler, model) with failover/hedging; raises the last error when every target failed"""
+        policy = self.policy(endpoint)
+        if policy is None:
+            return await fn(handler or self._handler(RouteTarget(provider, model), None, 1), model)
+
+        targets = self.targets(policy, provider, model)
+        loop = asyncio.get_running_loop()
+        live: List[_Attempt] = []
+        errors: List[Tuple[RouteTarget, BaseException]] = []
+        next_index = 0
+
+        async def run(index: int, target: RouteTarget) -> Any:
+            return await fn(self._handler(target, handler, index), target.model)
+
+        def launch(why: str) -> None:
+            nonlocal next_index
+            target = targets[next_index]
+            attempt = _Attempt(target, loop.time())
+            attempt.task = asyncio.ensure_future(run(next_index, target))
+            next_index += 1
+            live.append(attempt)
+            if why != "requested":
+                logger.info(f"Provider routing [{endpoint}]: starting {target.label} ({why})")
+
+        launch("requested")
+        try:
+            while live:
+                timeout = self._next_wait(endpoint, policy, live, len(targets) - next_index, loop.time())
+                done, _ = await asyncio.wait([a.task for a in live], timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                now = loop.time()
+                for attempt in [a for a in live if a.task in done]:
+                    live.remove(attempt)
+                    error = attempt.task.exception()
+                    if error is None:
+                        # 只记录完成的尝试：被取消的尝试此刻的耗时只是其真实延迟的下限
+                        self.latency.record(endpoint, attempt.target, now - attempt.started)
+                        self._cancel(live, f"{attempt.target.label} answered first")
+                        live.clear()
+                        return attempt.task.result()
+                    errors.append((attempt.target, error))
+                    logger.warning(f"Provider routing [{endpoint}]: {attempt.target.label} failed: {error}")
+                if policy.attempt_timeout_seconds:
+                    for attempt in [a for a in live if now - a.started >= policy.attempt_timeout_seconds]:
+                        live.remove(attempt)
+                        self._cancel([attempt], "attempt timeout")
+                        errors.append((attempt.target, APITimeoutError(
+                            provider_name=attempt.target.provider, timeout_seconds=policy.attempt_timeout_seconds)))
+                if next_index < len(targets):
+                    if not live:
+                        launch("failover")
+                    elif policy.hedge and len(live) == 1 and \
+                            now - live[0].started >= self.hedge_delay(endpoint, policy, live[0].target):
+                        launch(f"hedging {live[0].target.label}")
+        except BaseException:
+            self._cancel(live, "caller cancelled")
+            raise
+        logger.error(f"Provider routing [{endpoint}]: all {len(errors)} targets failed: "
+                     f"{[(t.label, str(e)[:100]) for t, e in errors]}")
+        raise errors[-1][1]
+
+    # --- 流式调用 ---
+
+    async def _pump(self, attempt: _Attempt, chunks: AsyncIterator[Any]) -> None:
+        """Read one attempt's stream into its queue"""
+        try:
+            async for chunk in chunks:
+                await attempt.queue.put((_CHUNK, chunk))
+        except Exception as exc:
+            await attempt.queue.put((_FAILED, exc))
+        else:
+            await attempt.queue.put((_END, None))
+        finally:
+            aclose = getattr(chunks, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    async def stream(
+        self,
+        endpoint: str,
+        provider: str,
+        model: Optional[str],
+        open_stream: Callable[[BaseAPIHandler, Optional[str]], AsyncIterator[Any]],
+        handler: Optional[BaseAPIHandler] = None,
+    ) -> AsyncIterator[Any]:
+        """Stream open_stream(handler, model) with failover/hedging until the first content chunk"""
+        policy = self.policy(endpoint)
+        if policy is None:
+            async for chunk in open_stream(handler or self._handler(RouteTarget(provider, model), None, 1), model):
+                yield chunk
+            return
+
+        targets = self.targets(policy, provider, model)
+        loop = asyncio.get_running_loop()
+        live: List[_Attempt] = []
+        failures: List[Tuple[RouteTarget, Any]] = []
+        next_index = 0
+        winner: Optional[_Attempt] = None
+        winner_ended = False
+
+        def launch(why: str) -> None:
+            nonlocal next_index
+            index, target = next_index, targets[next_index]
+            next_index += 1
+            attempt = _Attempt(target, loop.time(), queue=asyncio.Queue(ATTEMPT_QUEUE_SIZE))
+            live.append(attempt)
+            if why != "requested":
+                logger.info(f"Provider routing [{endpoint}]: starting {target.label} ({why})")
+            try:
+                chunks = open_stream(self._handler(target, handler, index), target.model)
+            except Exception as exc:
+                attempt.queue.put_nowait((_FAILED, exc))
+                return
+            attempt.task = asyncio.ensure_future(self._pump(attempt, chunks))
+
+        launch("requested")
+        try:
+            while winner is None and live:
+                for attempt in live:
+                    if attempt.getter is None:
+                        attempt.getter = asyncio.ensure_future(attempt.queue.get())
+                timeout = self._next_wait(endpoint, policy, live, len(targets) - next_index, loop.time())
+                done, _ = await asyncio.wait([a.getter for a in live], timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                now = loop.time()
+                for attempt in [a for a in live if a.getter in done]:
+                    kind, payload = attempt.getter.result()
+                    attempt.getter = None
+                    if kind == _CHUNK and not _is_error_chunk(payload):
+                        attempt.buffer.append(payload)
+                        if _is_answer(payload):
+                            winner = attempt
+                            break
+                        continue
+                    if kind == _END:
+                        winner, winner_ended = attempt, True
+                        break
+                    # 失败：抛出异常或在回答前产出错误块
+                    live.remove(attempt)
+                    failures.append((attempt.target, payload))
+                    self._cancel([attempt], "failed")
+                    logger.warning(f"Provider routing [{endpoint}]: {attempt.target.label} failed: {str(payload)[:200]}")
+                if winner is not None:
+                    break
+                if policy.attempt_timeout_seconds:
+                    for attempt in [a for a in live if now - a.started >= policy.attempt_timeout_seconds]:
+                        live.remove(attempt)
+                        self._cancel([attempt], "attempt timeout")
+                        failures.append((attempt.target, APITimeoutError(
+                            provider_name=attempt.target.provider, timeout_seconds=policy.attempt_timeout_seconds)))
+                if next_index < len(targets):
+                    if not live:
+                        launch("failover")
+                    elif policy.hedge and len(live) == 1 and \
+                            now - live[0].started >= self.hedge_delay(endpoint, policy, live[0].target):
+                        launch(f"hedging {live[0].target.label}")
+        except BaseException:
+            self._cancel(live, "caller cancelled")
+            raise
+
+        if winner is None:
+            logger.error(f"Provider routing [{endpoint}]: all {len(failures)} targets failed: "
+                         f"{[(t.label, str(e)[:100]) for t, e in failures]}")
+            last = failures[-1][1]
+            if isinstance(last, BaseException):
+                raise last
+            yield last
+            return
+
+        now = loop.time()
+        self.latency.record(endpoint, winner.target, now - winner.started)
+        losers = [a for a in live if a is not winner]
+        self._cancel(losers, f"{winner.target.label} answered first")
+        if winner.target != targets[0]:
+            logger.info(f"Provider routing [{endpoint}]: serving from {winner.target.label} instead of {targets[0].label}")
+
+        try:
+            for chunk in winner.buffer:
+                yield chunk
+            winner.buffer.clear()
+            while not winner_ended:
+                kind, payload = await winner.queue.get()
+                if kind == _CHUNK:
+                    yield payload
+                elif kind == _FAILED:
+                    raise payload
+                else:
+                    winner_ended = True
+        finally:
+            self._cancel([winner], "stream closed")
+
+
+provider_router = ProviderRouter()
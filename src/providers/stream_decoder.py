@@ -0,0 +1,227 @@
+"""
+Incremental decoders for provider streaming responses (SSE and NDJSON lines).
+
+The handlers used to iterate ``response.content`` line by line, which makes
+aiohttp scan and copy the buffer once per line and leaves every handler with its
+own prefix stripping, ``[DONE]`` check and JSON decoding. These decoders read
+each network chunk once (``StreamReader.iter_any()``), split it into lines with
+``bytes.splitlines`` and keep only an unfinished trailing line until the next
+chunk arrives, so a line or event split across TCP reads is reassembled
+correctly. Lines may end in ``\\n``, ``\\r\\n`` or ``\\r``.
+
+SSE events follow the EventSource rules: ``data:`` lines are joined with ``\\n``
+and an event is dispatched on a blank line (or at end of stream); ``event:`` and
+``id:`` are kept, comments (``: ...``) and ``retry:`` are ignored.
+
+JSON is decoded from bytes with orjson when it is installed, otherwise with json.
+
+Usage:
+    stream = SSEJsonStream(response.content, self.provider_name)
+    async for chunk in stream:
+        yield chunk
+    if stream.done:
+        yield {"status": "done"}
+"""
+import json
+from dataclasses import dataclass
+from typing import Any, AsyncIterable, AsyncIterator, List, Optional, Union
+
+from src.utils.logging import logger
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖
+    orjson = None
+
+DONE_MARKER = b"[DONE]"
+
+# 单行允许的最大长度；超过说明对端没有按行输出，停止缓冲避免内存无限增长
+MAX_LINE_BYTES = 16 * 1024 * 1024
+
+
+def loads_json(data: Union[bytes, str]) -> Any:
+    """Decode JSON text; raises ValueError on invalid input (orjson.JSONDecodeError is a ValueError)"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class LineDecoder:
+    """Splits a byte stream into lines, carrying an unfinished line over to the next chunk"""
+
+    __slots__ = ("_tail", "_skip_lf")
+
+    def __init__(self):
+        self._tail = b""
+        # 上一块以 \r 结尾时，下一块开头的 \n 属于同一个 \r\n
+        self._skip_lf = False
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """Return the lines completed by this chunk, without line endings"""
+        if self._skip_lf:
+            self._skip_lf = False
+            if data[:1] == b"\n":
+                data = data[1:]
+        if not data:
+            return []
+        if self._tail:
+            data = self._tail + data
+            self._tail = b""
+        lines = data.splitlines()
+        last = data[-1]
+        if last == 0x0D:  # \r
+            self._skip_lf = True
+        elif last != 0x0A:  # 最后一行未结束
+            self._tail = lines.pop()
+            if len(self._tail) > MAX_LINE_BYTES:
+                raise ValueError(f"Stream line exceeds {MAX_LINE_BYTES} bytes without a line break")
+        return lines
+
+    def flush(self) -> List[bytes]:
+        """Return the unfinished last line at end of stream"""
+        tail, self._tail = self._tail, b""
+        self._skip_lf = False
+        return [tail] if tail else []
+
+
+@dataclass
+class SSEEvent:
+    """One dispatched server-sent event; data holds the joined data lines as bytes"""
+    data: bytes
+    event: Optional[str] = None
+    id: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        return self.data.decode("utf-8", errors="replace")
+
+    @property
+    def is_done(self) -> bool:
+        """OpenAI-style end-of-stream marker (data: [DONE])"""
+        return self.data.strip() == DONE_MARKER
+
+    def json(self) -> Any:
+        return loads_json(self.data)
+
+
+class SSEDecoder:
+    """Incremental SSE parser: feed() raw chunks, get the events they complete"""
+
+    __slots__ = ("_lines", "_data", "_event", "_last_id")
+
+    def __init__(self):
+        self._lines = LineDecoder()
+        self._data: List[bytes] = []
+        self._event: Optional[str] = None
+        self._last_id: Optional[str] = None
+
+    def feed(self, data: bytes) -> List[SSEEvent]:
+        return self._process(self._lines.feed(data))
+
+    def flush(self) -> List[SSEEvent]:
+        """Process the unfinished last line and dispatch a pending event at end of stream"""
+        events = self._process(self._lines.flush())
+        event = self._dispatch()
+        if event is not None:
+            events.append(event)
+        return events
+
+    def _dispatch(self) -> Optional[SSEEvent]:
+        if not self._data:
+            self._event = None
+            return None
+        data = self._data[0] if len(self._data) == 1 else b"\n".join(self._data)
+        event = SSEEvent(data, self._event, self._last_id)
+        self._data = []
+        self._event = None
+        return event
+
+    def _process(self, lines: List[bytes]) -> List[SSEEvent]:
+        events = []
+        for line in lines:
+            if not line:
+                event = self._dispatch()
+                if event is not None:
+                    events.append(event)
+                continue
+            if line[0] == 0x3A:  # ":" 注释 (如 OpenRouter 的 ": OPENROUTER PROCESSING")
+                continue
+            field, _, value = line.partition(b":")
+            if value[:1] == b" ":
+                value = value[1:]
+            if field == b"data":
+                self._data.append(value)
+            elif field == b"event":
+                self._event = value.decode("utf-8", errors="replace")
+            elif field == b"id":
+                self._last_id = value.decode("utf-8", errors="replace")
+            # retry 及未知字段忽略
+        return events
+
+
+async def _iter_chunks(body: Union[AsyncIterable[bytes], Any]) -> AsyncIterator[bytes]:
+    """Raw chunks of an aiohttp StreamReader (as they arrive) or of any async byte iterable"""
+    if hasattr(body, "iter_any"):
+        body = body.iter_any()
+    async for chunk in body:
+        yield chunk
+
+
+async def iter_sse_events(body: Union[AsyncIterable[bytes], Any]) -> AsyncIterator[SSEEvent]:
+    """Decode an SSE response body (aiohttp ``response.content`` or an async byte iterable) into events"""
+    decoder = SSEDecoder()
+    async for chunk in _iter_chunks(body):
+        for event in decoder.feed(chunk):
+            yield event
+    for event in decoder.flush():
+        yield event
+
+
+class SSEJsonStream:
+    """
+    JSON payloads of an OpenAI-compatible SSE stream.
+
+    Iteration stops at ``data: [DONE]`` (``done`` is then True). Undecodable events
+    are logged and skipped. Servers that put several ``data:`` lines in one event
+    without blank lines between them are handled by decoding each line separately.
+    """
+
+    def __init__(self, body: Union[AsyncIterable[bytes], Any], label: str = "stream"):
+        self.body = body
+        self.label = label
+        self.done = False
+
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        async for event in iter_sse_events(self.body):
+            if event.is_done:
+                self.done = True
+                return
+            try:
+                item = event.json()
+            except ValueError as e:
+                if b"\n" not in event.data:
+                    logger.warning(f"Failed to decode {self.label} stream event: {e}, data: {event.data[:100]!r}")
+                    continue
+            else:
+                yield item
+                continue
+            for part in event.data.split(b"\n"):
+                if part.strip() == DONE_MARKER:
+                    self.done = True
+                    return
+                try:
+                    item = loads_json(part)
+                except ValueError as e:
+                    logger.warning(f"Failed to decode {self.label} stream event line: {e}, data: {part[:100]!r}")
+                    continue
+                yield item
+
+
+async def iter_lines(body: Union[AsyncIterable[bytes], Any]) -> AsyncIterator[bytes]:
+    """Complete lines (without line endings) of a response body, e.g. an NDJSON stream such as Ollama's"""
+    decoder = LineDecoder()
+    async for chunk in _iter_chunks(body):
+        for line in decoder.feed(chunk):
+            yield line
+    for line in decoder.flush():
+        yield line
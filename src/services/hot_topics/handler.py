@@ -10,6 +10,8 @@ import json # For Serper API request
 import requests # For making HTTP requests
 from dotenv import load_dotenv
 
+from src.utils.logging import logger
+
 load_dotenv() # Load environment variables from .env file
 
 SERPER_API_KEY = os.getenv("SERPER_API_KEY")
@@ -28,7 +30,7 @@ async def perform_web_search(query: str, site_filter: Optional[str] = None, lang
         A list of dictionaries, where each dictionary represents a search result.
     """
     if not SERPER_API_KEY:
-        print("SERPER_API_KEY not found in environment variables. Please set it in .env")
+        logger.warning("SERPER_API_KEY not found in environment variables. Please set it in .env")
         # Fallback to mock data or raise an error if API key is missing
         return await perform_mock_search(query, site_filter, lang) # Fallback to mock if key is missing
 
@@ -58,7 +60,7 @@ async def perform_web_search(query: str, site_filter: Optional[str] = None, lang
         'Content-Type': 'application/json; charset=utf-8' # Explicitly state charset in header
     }
 
-    print(f"Performing Serper web search for: '{payload_dict['q']}' with gl:'{gl_code}', hl:'{hl_code}'")
+    logger.info("Performing Serper web search for: '%s' with gl:'%s', hl:'%s'", payload_dict['q'], gl_code, hl_code)
 
     formatted_results = []
     try:
@@ -96,23 +98,23 @@ async def perform_web_search(query: str, site_filter: Optional[str] = None, lang
                     # "position": item.get("position") # if you need the rank
                 })
         else:
-            print(f"Serper API Warning: 'organic' results not found in response. Query: {query}")
-            print(f"Serper Response: {search_data}")
+            logger.warning("Serper API Warning: 'organic' results not found in response. Query: %s", query)
+            logger.debug("Serper Response: %s", search_data)
 
 
     except requests.exceptions.Timeout:
-        print(f"Serper API request timed out for query: {query}")
+        logger.warning("Serper API request timed out for query: %s", query)
         return await perform_mock_search(query, site_filter, lang) # Fallback
     except requests.exceptions.HTTPError as e:
-        print(f"Serper API HTTP error for query: {query}: {e}")
+        logger.error("Serper API HTTP error for query: %s: %s", query, e)
         if e.response is not None:
-            # Ensure the error response text is also decoded as UTF-8 before printing
+            # Ensure the error response text is also decoded as UTF-8 before logging
             if e.response.encoding is None or e.response.encoding.lower() not in ['utf-8', 'utf8']:
                 e.response.encoding = 'utf-8'
-            print(f"Serper Response Status: {e.response.status_code}, Body: {e.response.text}")
+            logger.error("Serper Response Status: %s, Body: %s", e.response.status_code, e.response.text)
         return await perform_mock_search(query, site_filter, lang) # Fallback
     except Exception as e:
-        print(f"An error occurred during Serper web search for query {query}: {e}")
+        logger.error("An error occurred during Serper web search for query %s: %s", query, e)
         return await perform_mock_search(query, site_filter, lang) # Fallback to mock on any error
 
     return formatted_results
@@ -122,7 +124,7 @@ async def perform_mock_search(query: str, site_filter: Optional[str] = None, lan
     """ 
     Mock web search function (renamed from previous perform_web_search).
     """
-    print(f"Performing MOCK web search for: '{query}' with site_filter: '{site_filter}', lang: '{lang}'")
+    logger.info("Performing MOCK web search for: '%s' with site_filter: '%s', lang: '%s'", query, site_filter, lang)
     await asyncio.sleep(0.1) # Simulate network delay
     results = []
     if "news.cn" in query or (site_filter and "news.cn" in site_filter):
@@ -195,7 +197,7 @@ async def fetch_from_cn_authoritative_media(site_keywords: List[str]) -> List[Di
     e.g., ["news.cn", "people.com.cn"]
     """
     all_raw_topics = []
-    print(f"Fetching from CN authoritative media using web_search for: {site_keywords}")
+    logger.info("Fetching from CN authoritative media using web_search for: %s", site_keywords)
     for keyword in site_keywords:
         # Formulate a query, e.g., search for recent news on the site
         # Query might be more sophisticated, like "最新 OR 今日 OR 头条 site:domain.com"
@@ -211,7 +213,7 @@ async def fetch_from_cn_authoritative_media(site_keywords: List[str]) -> List[Di
                 res["source_name"] = res.get("source_name", keyword) # Ensure source name is set
             all_raw_topics.extend(search_results)
         except Exception as e:
-            print(f"Error searching for {keyword}: {e}")
+            logger.error("Error searching for %s: %s", keyword, e)
     return all_raw_topics
 
 async def fetch_from_cn_extranet_news(source_names: List[str]) -> List[Dict[str, Any]]:
@@ -220,7 +222,7 @@ async def fetch_from_cn_extranet_news(source_names: List[str]) -> List[Dict[str,
     source_names: List of names for the news sources, e.g., ["BBC Chinese", "Reuters Chinese"]
     """
     all_raw_topics = []
-    print(f"Fetching from CN extranet news using web_search for: {source_names}")
+    logger.info("Fetching from CN extranet news using web_search for: %s", source_names)
     for name in source_names:
         query = f"{name} 最新报道"
         try:
@@ -229,7 +231,7 @@ async def fetch_from_cn_extranet_news(source_names: List[str]) -> List[Dict[str,
                 res["source_name"] = res.get("source_name", name) # Ensure source name
             all_raw_topics.extend(search_results)
         except Exception as e:
-            print(f"Error searching for {name}: {e}")
+            logger.error("Error searching for %s: %s", name, e)
     return all_raw_topics
 
 def process_raw_topic(raw_data: Dict[str, Any], source_type: str) -> HotTopicItem:
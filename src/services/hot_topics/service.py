@@ -8,6 +8,8 @@ from src.services.hot_topics.handler import (
 import asyncio
 import datetime
 
+from src.utils.logging import logger
+
 # Configuration for news sources (ideally this would come from a config file or DB)
 # These keywords will be used by the web_search function in handler.py
 CN_AUTHORITATIVE_SITE_KEYWORDS = ["news.cn", "people.com.cn", "cctv.com"] # Example site keywords
@@ -19,7 +21,7 @@ class HotTopicsService:
         Main service method to get hot topics.
         Orchestrates fetching, processing, and ranking.
         """
-        print(f"[HotTopicsService] Fetching hot topics with request: {request}")
+        logger.info("[HotTopicsService] Fetching hot topics with request: %s", request)
         
         # Fetch raw data using web search via handler functions
         # These handler functions now use perform_web_search internally
@@ -33,46 +35,46 @@ class HotTopicsService:
         raw_extranet_data = results[1] if not isinstance(results[1], Exception) else []
 
         if isinstance(results[0], Exception):
-            print(f"[HotTopicsService] Error fetching from authoritative media: {results[0]}")
+            logger.error("[HotTopicsService] Error fetching from authoritative media: %s", results[0])
         if isinstance(results[1], Exception):
-            print(f"[HotTopicsService] Error fetching from extranet news: {results[1]}")
+            logger.error("[HotTopicsService] Error fetching from extranet news: %s", results[1])
 
         all_hot_topics: List[HotTopicItem] = []
 
-        print(f"[HotTopicsService] Processing {len(raw_authoritative_data)} items from authoritative media.")
+        logger.debug("[HotTopicsService] Processing %d items from authoritative media.", len(raw_authoritative_data))
         for raw_topic_data in raw_authoritative_data:
             # process_raw_topic expects a dict, and search results are already dicts
             # We need to ensure the keys match what process_raw_topic expects, or adapt it.
             # For now, assuming direct compatibility or that process_raw_topic is robust.
             all_hot_topics.append(process_raw_topic(raw_topic_data, source_type="cn_authoritative"))
         
-        print(f"[HotTopicsService] Processing {len(raw_extranet_data)} items from extranet news.")
+        logger.debug("[HotTopicsService] Processing %d items from extranet news.", len(raw_extranet_data))
         for raw_topic_data in raw_extranet_data:
             all_hot_topics.append(process_raw_topic(raw_topic_data, source_type="cn_extranet"))
 
         # 1. LLM Processing Stage (Placeholder - to be implemented)
-        print(f"[HotTopicsService] Current topic count before LLM: {len(all_hot_topics)}")
+        logger.debug("[HotTopicsService] Current topic count before LLM: %d", len(all_hot_topics))
         all_hot_topics = await self.llm_process_topics(all_hot_topics, request)
-        print(f"[HotTopicsService] Placeholder for LLM processing completed. Topics count: {len(all_hot_topics)}")
+        logger.debug("[HotTopicsService] Placeholder for LLM processing completed. Topics count: %d", len(all_hot_topics))
 
         # 2. Deduplication (Placeholder)
         # deduped_topics = self.deduplicate_topics(all_hot_topics)
         # all_hot_topics = deduped_topics
-        # print(f"[HotTopicsService] Placeholder for deduplication. Topics count after: {len(all_hot_topics)}")
+        # logger.debug("[HotTopicsService] Placeholder for deduplication. Topics count after: %d", len(all_hot_topics))
 
         # 3. Filtering by request.categories (Placeholder - LLM should fill categories)
         if request.categories and request.categories:
             # This filtering should happen AFTER LLM populates categories
             # all_hot_topics = [t for t in all_hot_topics if t.categories and any(cat in request.categories for cat in t.categories)]
-            print(f"[HotTopicsService] Placeholder for category filtering: {request.categories}. Topics count: {len(all_hot_topics)}")
+            logger.debug("[HotTopicsService] Placeholder for category filtering: %s. Topics count: %d", request.categories, len(all_hot_topics))
 
         # 4. Sorting (Placeholder - by relevance_score from LLM, then published_at)
         all_hot_topics.sort(key=lambda t: (t.relevance_score or 0, t.published_at or datetime.datetime.min.replace(tzinfo=datetime.timezone.utc)), reverse=True)
-        print(f"[HotTopicsService] Placeholder for sorting. Topics count: {len(all_hot_topics)}")
+        logger.debug("[HotTopicsService] Placeholder for sorting. Topics count: %d", len(all_hot_topics))
 
         # 5. Limit by request.count
         final_topics = all_hot_topics[:request.count]
-        print(f"[HotTopicsService] Limited to {len(final_topics)} topics by request.count.")
+        logger.info("[HotTopicsService] Limited to %d topics by request.count.", len(final_topics))
         return final_topics
 
     async def llm_process_topics(self, topics: List[HotTopicItem], request: HotTopicRequest) -> List[HotTopicItem]:
@@ -85,7 +87,7 @@ class HotTopicsService:
         - Generate 'analysis_summary' if multiple sources cover the same event.
         - Assign 'relevance_score' based on timeliness, importance, content etc.
         """
-        print(f"[HotTopicsService-LLM] LLM processing would happen here for {len(topics)} topics.")
+        logger.debug("[HotTopicsService-LLM] LLM processing would happen here for %d topics.", len(topics))
         # Example: Iterate and enrich topics (this is highly simplified)
         for topic in topics:
             if not topic.summary and topic.raw_content: # If no summary from search, or want LLM to generate
@@ -105,17 +107,17 @@ class HotTopicsService:
     def deduplicate_topics(self, topics: List[HotTopicItem]) -> List[HotTopicItem]:
         """Placeholder for deduplication logic."""
         # Simple deduplication by URL for now, more advanced logic needed
-        print(f"[HotTopicsService] Deduplicating {len(topics)} topics by URL.")
+        logger.debug("[HotTopicsService] Deduplicating %d topics by URL.", len(topics))
         seen_urls = set()
         deduped = []
         for topic in topics:
             if topic.source_url and str(topic.source_url) in seen_urls:
-                print(f"[HotTopicsService] Duplicate found and removed: {topic.source_url}")
+                logger.debug("[HotTopicsService] Duplicate found and removed: %s", topic.source_url)
                 continue
             if topic.source_url:
                 seen_urls.add(str(topic.source_url))
             deduped.append(topic)
-        print(f"[HotTopicsService] Deduplication resulted in {len(deduped)} topics.")
+        logger.debug("[HotTopicsService] Deduplication resulted in %d topics.", len(deduped))
         return deduped
 
 # --- Test Code --- 
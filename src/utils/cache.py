@@ -2,6 +2,7 @@ import os
 import json
 import time
 import hashlib
+import zlib
 from typing import Dict, Any, Optional, Tuple, List
 import logging
 from pathlib import Path
@@ -13,6 +14,10 @@ from sqlalchemy.ext.asyncio import AsyncSession # Import AsyncSession
 from src.database.manager import add_result_record # Import the function to add records
 from sqlalchemy import select
 from src.database.manager import Result # Import the Result model
+from src.database.manager import ResultPayload, add_result_with_payload, is_db_stored
+from src.config.app_config import get_app_config
+from src.database.search_index import index_document, result_search_text, KIND_RESULT
+from src.utils.tracing import traced
 # -----------------------
 
 logger = logging.getLogger(__name__)
@@ -70,6 +75,7 @@ class TextProcessingCache:
         key = hashlib.sha256(serialized.encode('utf-8')).hexdigest()
         return key
     
+    @traced("cache.get")
     def get(self, *args) -> Optional[Dict[str, Any]]:
         """
         从缓存中获取项。
@@ -108,6 +114,7 @@ class TextProcessingCache:
         logger.debug(f"缓存未命中：{key[:8]}")
         return None
     
+    @traced("cache.set")
     def set(self, value: Dict[str, Any], *args) -> None:
         """
         将项添加到缓存。
@@ -431,6 +438,7 @@ def generate_result_id(module_type, result_data):
     return result_id
 
 # Modify function signature to accept db session
+@traced("cache.save_analysis_result")
 async def save_analysis_result(module_type, result_data, db: AsyncSession):
     """
     保存分析结果到指定的模块缓存目录，更新索引，并记录元数据到数据库。
@@ -459,121 +467,195 @@ async def save_analysis_result(module_type, result_data, db: AsyncSession):
         logger.error("生成 result_id 失败")
         return None
 
-    # Get cache directory and file path
-    cache_dir = get_cache_dir(module_type)
-    if not cache_dir:
-        logger.error(f"获取模块 '{module_type}' 的缓存目录失败")
-        return None
-    cache_dir.mkdir(parents=True, exist_ok=True)
-    file_path = cache_dir / f"{result_id}.json"
+    # Build the metadata record (name falls back to "<Type> - <timestamp>")
+    timestamp_dt = datetime.fromisoformat(result_data["timestamp"])
+    provided_name = result_data.get('name')
+    if not provided_name or not str(provided_name).strip():
+        record_name = f"{module_type.capitalize()} - {timestamp_dt.strftime('%Y%m%d_%H%M%S')}"
+        logger.debug(f"No name provided for result {result_id}, generating default: {record_name}")
+    else:
+        record_name = str(provided_name).strip()
+
+    metadata = {
+        'result_id': result_id,
+        'type': module_type,
+        'timestamp': timestamp_dt,
+        'name': record_name,
+        # Prioritize source_info from payload, then fall back
+        'source_info': result_data.get('source_info') or result_data.get('text_summary') or result_data.get('original_filename'),
+        'model_info': f"{result_data.get('provider', 'N/A')}/{result_data.get('model', 'N/A')}" if result_data.get('provider') else None,
+        'tags': None # Placeholder for tags
+    }
+
+    if get_app_config().result_storage == "database":
+        # Payload and metadata are written in one transaction: either both exist or neither does
+        try:
+            data, size = encode_result_payload(result_data)
+            await add_result_with_payload(db, data, PAYLOAD_ENCODING, size, **metadata)
+        except Exception as e:
+            logger.exception(f"保存 {module_type} 分析结果到数据库失败: {e}")
+            return None
+    else:
+        # Get cache directory and file path
+        cache_dir = get_cache_dir(module_type)
+        if not cache_dir:
+            logger.error(f"获取模块 '{module_type}' 的缓存目录失败")
+            return None
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        file_path = cache_dir / f"{result_id}.json"
 
-    file_saved_successfully = False
-    try:
-        # Save JSON file
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(result_data, f, ensure_ascii=False, indent=2)
-        file_saved_successfully = True
-        logger.info(f"成功保存 {module_type} 分析结果文件: {file_path.name}")
+        try:
+            # Save JSON file
+            with open(file_path, 'w', encoding='utf-8') as f:
+                json.dump(result_data, f, ensure_ascii=False, indent=2)
+            logger.info(f"成功保存 {module_type} 分析结果文件: {file_path.name}")
+        except Exception as e:
+            logger.exception(f"保存 {module_type} 分析结果到文件 {file_path} 失败: {e}")
+            return None
 
-        # --- Add record to database --- 
+        # --- Add record to database ---
         try:
-            # Extract metadata from result_data
-            timestamp_dt = datetime.fromisoformat(result_data["timestamp"]) # Use the parsed datetime object
-            
-            # --- Generate default name if not provided --- 
-            provided_name = result_data.get('name')
-            if not provided_name or not str(provided_name).strip():
-                # Use timestamp from the data for consistency
-                timestamp_str = timestamp_dt.strftime('%Y%m%d_%H%M%S') 
-                default_name = f"{module_type.capitalize()} - {timestamp_str}"
-                logger.debug(f"No name provided for result {result_id}, generating default: {default_name}")
-                record_name = default_name
-            else:
-                record_name = str(provided_name).strip()
-            # --------------------------------------------
-            
-            metadata = {
-                'result_id': result_id,
-                'type': module_type,
-                'file_path': str(file_path.relative_to(Path(__file__).resolve().parent.parent.parent)), # Store relative path
-                'timestamp': timestamp_dt,
-                'name': record_name, # Use the determined name
-                # Prioritize source_info from payload, then fall back
-                'source_info': result_data.get('source_info') or result_data.get('text_summary') or result_data.get('original_filename'), 
-                'model_info': f"{result_data.get('provider', 'N/A')}/{result_data.get('model', 'N/A')}" if result_data.get('provider') else None,
-                'tags': None # Placeholder for tags
-            }
+            metadata['file_path'] = str(file_path.relative_to(PROJECT_ROOT_DIR)) # Store relative path
             await add_result_record(db, **metadata)
         except Exception as db_err:
             logger.exception(f"数据库记录失败 for result {result_id}: {db_err}. JSON 文件已保存.")
             # Decide if we should re-raise or just log. Logging for now.
         # ------------------------------
 
-        return result_id
+    # --- Update full-text search index (failure must not fail the save) ---
+    try:
+        await index_document(db, KIND_RESULT, result_id, record_name, result_search_text(result_data))
+        await db.commit()
+    except Exception as index_err:
+        await db.rollback()
+        logger.warning(f"搜索索引更新失败 for result {result_id}: {index_err}")
+
+    return result_id
+
+# --- Database payload encoding ---
+PAYLOAD_ENCODING = "json+zlib"
+
+def encode_result_payload(result_data: Dict[str, Any]) -> Tuple[bytes, int]:
+    """Serializes a result dict to compact JSON and compresses it. Returns (data, uncompressed_size)."""
+    raw = json.dumps(result_data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return zlib.compress(raw, 6), len(raw)
+
+def decode_result_payload(data: bytes, encoding: str) -> Dict[str, Any]:
+    """Inverse of encode_result_payload."""
+    if encoding != PAYLOAD_ENCODING:
+        raise ValueError(f"Unsupported result payload encoding: {encoding}")
+    return json.loads(zlib.decompress(data))
+
+def _read_result_file(record: Result) -> Optional[Dict[str, Any]]:
+    """Reads the JSON file of a file-backed result record."""
+    if not record.file_path:
+        logger.error(f"Result record {record.result_id} found, but file_path is missing.")
+        return None
+
+    # record.file_path is relative to PROJECT_ROOT_DIR
+    absolute_file_path = PROJECT_ROOT_DIR / record.file_path
+    logger.info(f"Attempting to read result file: {absolute_file_path}")
+
+    if not absolute_file_path.is_file():
+        logger.error(f"Result file not found at path: {absolute_file_path}")
+        return None
 
-    except Exception as e:
-        logger.exception(f"保存 {module_type} 分析结果到文件 {file_path} 失败: {e}")
-        # If file saving failed, don't try to add DB record (already handled by structure)
-        # If DB saving failed after file save, the file still exists.
-        # Consider cleanup logic if needed.
+    try:
+        with open(absolute_file_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except json.JSONDecodeError as json_err:
+        logger.error(f"Failed to decode JSON from result file {absolute_file_path}: {json_err}")
+        return None
+    except Exception as read_err:
+        logger.error(f"Failed to read result file {absolute_file_path}: {read_err}", exc_info=True)
         return None
 
 # Refactor get_analysis_result to use the database
+@traced("cache.get_analysis_result")
 async def get_analysis_result(result_id: str, db: AsyncSession) -> Optional[Dict[str, Any]]:
     """
-    Retrieves analysis result content by reading the JSON file specified in the database.
+    Retrieves analysis result content, either from the stored database payload or
+    by reading the JSON file specified in the database.
 
     Args:
         result_id: The unique ID of the result.
         db: SQLAlchemy AsyncSession for database access.
 
     Returns:
-        The parsed JSON content of the result file, or None if not found or error occurs.
+        The parsed JSON content of the result, or None if not found or error occurs.
     """
     if not result_id or not db:
         logger.error("get_analysis_result called with invalid result_id or db session.")
         return None
 
     try:
-        # Query the database for the result record
-        stmt = select(Result).where(Result.result_id == result_id)
-        db_result = await db.execute(stmt)
-        record = db_result.scalar_one_or_none()
-
-        if not record:
+        # One query fetches the record and, for database storage, its payload
+        stmt = (
+            select(Result, ResultPayload.data, ResultPayload.encoding)
+            .outerjoin(ResultPayload, ResultPayload.result_id == Result.result_id)
+            .where(Result.result_id == result_id)
+        )
+        row = (await db.execute(stmt)).first()
+
+        if not row:
             logger.warning(f"Result record with ID '{result_id}' not found in database.")
             return None
+        record, payload_data, payload_encoding = row
 
-        if not record.file_path:
-            logger.error(f"Result record {result_id} found, but file_path is missing.")
-            return None
-
-        # Construct the absolute file path
-        # Assuming record.file_path is relative to PROJECT_ROOT_DIR defined earlier
-        absolute_file_path = PROJECT_ROOT_DIR / record.file_path
-        logger.info(f"Attempting to read result file: {absolute_file_path}")
-
-        if not absolute_file_path.is_file():
-            logger.error(f"Result file not found at path: {absolute_file_path}")
+        if payload_data is not None:
+            try:
+                result_content = decode_result_payload(payload_data, payload_encoding)
+            except Exception as decode_err:
+                logger.error(f"Failed to decode stored payload for result {result_id}: {decode_err}")
+                return None
+        elif is_db_stored(record):
+            logger.error(f"Result record {result_id} is database-backed, but its payload is missing.")
             return None
+        else:
+            result_content = _read_result_file(record)
+            if result_content is None:
+                return None
 
-        # Read and parse the JSON file
-        try:
-            with open(absolute_file_path, 'r', encoding='utf-8') as f:
-                result_content = json.load(f)
-            logger.info(f"Successfully retrieved and parsed result content for {result_id}.")
-            return result_content
-        except json.JSONDecodeError as json_err:
-            logger.error(f"Failed to decode JSON from result file {absolute_file_path}: {json_err}")
-            return None
-        except Exception as read_err:
-            logger.error(f"Failed to read result file {absolute_file_path}: {read_err}", exc_info=True)
-            return None
+        logger.info(f"Successfully retrieved and parsed result content for {result_id}.")
+        return result_content
 
     except Exception as db_err:
         logger.error(f"Database error while retrieving result {result_id}: {db_err}", exc_info=True)
         return None
 
+async def iter_result_exports(db: AsyncSession, result_ids: Optional[List[str]] = None, module_type: Optional[str] = None, batch_size: int = 100):
+    """
+    Yields (record, content) pairs for batch export, newest first.
+    Database-stored payloads are fetched in batches together with their metadata.
+    """
+    offset = 0
+    while True:
+        stmt = (
+            select(Result, ResultPayload.data, ResultPayload.encoding)
+            .outerjoin(ResultPayload, ResultPayload.result_id == Result.result_id)
+            .order_by(Result.timestamp.desc(), Result.id.desc())
+            .offset(offset)
+            .limit(batch_size)
+        )
+        if result_ids:
+            stmt = stmt.where(Result.result_id.in_(result_ids))
+        if module_type:
+            stmt = stmt.where(Result.type == module_type)
+        rows = (await db.execute(stmt)).all()
+        if not rows:
+            break
+        for record, payload_data, payload_encoding in rows:
+            try:
+                if payload_data is not None:
+                    content = decode_result_payload(payload_data, payload_encoding)
+                else:
+                    content = _read_result_file(record)
+            except Exception as e:
+                logger.error(f"Failed to load result {record.result_id} for export: {e}")
+                content = None
+            yield record, content
+        offset += len(rows)
+
 # --- Define get_cache_dir Function --- 
 def get_cache_dir(module_type: str) -> Optional[Path]:
     """Returns the specific cache directory path for a given module type."""
@@ -0,0 +1,299 @@
+# src/utils/content_filter.py
+"""
+敏感词过滤。
+
+词表 (默认 data/sensitive_words.txt，每行一个词，# 开头为注释) 编译为 Aho-Corasick 自动机，
+一次线性扫描即可找出所有 (可重叠的) 命中及其偏移。词表文件修改后会在下一次使用时自动重新编译。
+
+流式场景使用 StreamScanner：自动机状态跨块保留，每个新块只扫描一次，不会重复扫描已收到的内容；
+需要打码时，StreamMasker 只暂存末尾最多 (最长词长 - 1) 个字符，其余内容可立即下发。
+"""
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.config.app_config import ContentFilterConfig, get_app_config
+from src.utils.logging import logger
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+
+
+class ContentBlockedError(Exception):
+    """content_filter.action 为 block 时命中敏感词"""
+
+    def __init__(self, matches: List["FilterMatch"], source: str):
+        self.matches = matches
+        self.source = source
+        super().__init__(f"Sensitive content detected in {source}: {', '.join(sorted({m.word for m in matches}))}")
+
+
+@dataclass(frozen=True)
+class FilterMatch:
+    word: str
+    start: int  # 命中在文本 (或整个流) 中的起始字符偏移
+    end: int    # 结束偏移 (不含)
+
+    def to_dict(self) -> Dict[str, object]:
+        return {"word": self.word, "start": self.start, "end": self.end}
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick 自动机。
+
+    构建时把失败链接折叠进转移表，扫描时每个字符最多两次字典查找 (当前状态、根状态)；
+    处于根状态时用正则跳到下一个可能的词首字符，跳过的部分由 C 实现的正则引擎完成。
+    """
+
+    def __init__(self, words: Iterable[str]):
+        self.words: List[str] = sorted({w for w in words if w})
+        self.max_length = max((len(w) for w in self.words), default=0)
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[Tuple[int, ...]] = [()]
+        for word_id, word in enumerate(self.words):
+            state = 0
+            for ch in word:
+                next_state = goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][ch] = next_state
+                    goto.append({})
+                    outputs.append(())
+                state = next_state
+            outputs[state] = outputs[state] + (word_id,)
+
+        # BFS 计算失败链接，同时把失败状态的转移和输出合并进来。
+        # 根状态的转移不复制到各状态 (否则每个状态都要存一份全部词首字符)，扫描时未命中再查根状态。
+        root = goto[0]
+        fail = [0] * len(goto)
+        delta: List[Dict[str, int]] = [{} for _ in goto]
+        queue = list(root.values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            outputs[state] = outputs[state] + outputs[fail[state]]
+            inherited = delta[fail[state]]
+            for ch, child in goto[state].items():
+                target = inherited.get(ch)
+                fail[child] = target if target is not None else root.get(ch, 0)
+                queue.append(child)
+            delta[state] = {**inherited, **goto[state]} if inherited else goto[state]
+        self._root = root
+        self._delta = delta
+        self._outputs = outputs
+        self._word_lengths = [len(w) for w in self.words]
+        first_chars = "".join(sorted(goto[0]))
+        self._first_char = re.compile(f"[{re.escape(first_chars)}]") if first_chars else None
+
+    def scan(self, text: str, state: int = 0, offset: int = 0) -> Tuple[List[FilterMatch], int]:
+        """从给定状态开始扫描 text，返回 (命中列表, 结束状态)；offset 为 text 首字符的全局偏移"""
+        matches: List[FilterMatch] = []
+        if self._first_char is None:
+            return matches, 0
+        delta, root, outputs = self._delta, self._root, self._outputs
+        words, lengths = self.words, self._word_lengths
+        search = self._first_char.search
+        i, n = 0, len(text)
+        while i < n:
+            if state == 0:
+                found = search(text, i)
+                if found is None:
+                    break
+                i = found.start()
+            ch = text[i]
+            next_state = delta[state].get(ch)
+            state = next_state if next_state is not None else root.get(ch, 0)
+            i += 1
+            if outputs[state]:
+                end = offset + i
+                for word_id in outputs[state]:
+                    matches.append(FilterMatch(words[word_id], end - lengths[word_id], end))
+        return matches, state
+
+
+class StreamScanner:
+    """跨块保持自动机状态的流式扫描器，命中偏移相对于整个流"""
+
+    def __init__(self, automaton: AhoCorasick):
+        self.automaton = automaton
+        self.state = 0
+        self.offset = 0
+
+    def feed(self, chunk: str) -> List[FilterMatch]:
+        matches, self.state = self.automaton.scan(chunk, self.state, self.offset)
+        self.offset += len(chunk)
+        return matches
+
+
+class StreamMasker:
+    """
+    流式打码：返回可以安全下发的文本。
+
+    命中只会在其最后一个字符到达时被发现，因此末尾 (最长词长 - 1) 个字符可能属于尚未完成的命中，
+    先暂存；更早的字符不会再被任何后续命中覆盖，打码后即可下发。
+    """
+
+    def __init__(self, automaton: AhoCorasick, mask_char: str = "*"):
+        self.scanner = StreamScanner(automaton)
+        self.mask_char = mask_char
+        self.holdback = max(automaton.max_length - 1, 0)
+        self.matches: List[FilterMatch] = []
+        self._pending: List[str] = []  # 尚未下发的字符
+        self._pending_start = 0        # _pending[0] 的全局偏移
+
+    def feed(self, chunk: str) -> str:
+        new_matches = self.scanner.feed(chunk)
+        self.matches.extend(new_matches)
+        self._pending.extend(chunk)
+        for match in new_matches:
+            for pos in range(max(match.start, self._pending_start), match.end):
+                self._pending[pos - self._pending_start] = self.mask_char
+        release = len(self._pending) - self.holdback
+        if release <= 0:
+            return ""
+        text = "".join(self._pending[:release])
+        del self._pending[:release]
+        self._pending_start += release
+        return text
+
+    def flush(self) -> str:
+        text = "".join(self._pending)
+        self._pending_start += len(self._pending)
+        self._pending = []
+        return text
+
+
+class StreamOutputFilter:
+    """
+    按配置的 action 处理一条输出流的文本增量：
+
+    - report: 原样返回，命中只记录日志
+    - mask:   返回打码后可下发的部分，流结束时调用 flush() 取回暂存的尾部
+    - block:  命中时抛出 ContentBlockedError，调用方应停止下发
+    """
+
+    def __init__(self, automaton: AhoCorasick, action: str, mask_char: str = "*", label: str = "stream"):
+        self.action = action
+        self.label = label
+        self.matches: List[FilterMatch] = []
+        self._masker = StreamMasker(automaton, mask_char) if action == "mask" else None
+        self._scanner = None if self._masker else StreamScanner(automaton)
+
+    def feed(self, text: str) -> str:
+        if self._masker is not None:
+            before = len(self._masker.matches)
+            released = self._masker.feed(text)
+            new_matches = self._masker.matches[before:]
+        else:
+            released = text
+            new_matches = self._scanner.feed(text)
+        if new_matches:
+            self.matches.extend(new_matches)
+            logger.warning(
+                f"Content filter ({self.action}) matched in {self.label}: "
+                f"{[m.to_dict() for m in new_matches]}"
+            )
+            if self.action == "block":
+                raise ContentBlockedError(new_matches, self.label)
+        return released
+
+    def flush(self) -> str:
+        return self._masker.flush() if self._masker is not None else ""
+
+
+class ContentFilter:
+    """按配置加载词表并在文件变化时重新编译自动机"""
+
+    def __init__(self, config: Optional[ContentFilterConfig] = None):
+        self._config = config
+        self._automaton: Optional[AhoCorasick] = None
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def config(self) -> ContentFilterConfig:
+        return self._config or get_app_config().content_filter
+
+    @property
+    def words_path(self) -> Path:
+        path = Path(self.config.words_file)
+        return path if path.is_absolute() else PROJECT_ROOT / path
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.enabled
+
+    @property
+    def action(self) -> str:
+        return self.config.action
+
+    def _load_words(self, path: Path) -> List[str]:
+        with open(path, "r", encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+    @property
+    def automaton(self) -> AhoCorasick:
+        """当前词表对应的自动机；最多每 reload_check_seconds 秒检查一次文件修改时间"""
+        now = time.monotonic()
+        if self._automaton is not None and now - self._checked_at < self.config.reload_check_seconds:
+            return self._automaton
+        with self._lock:
+            self._checked_at = now
+            path = self.words_path
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                if self._automaton is None:
+                    logger.warning(f"Sensitive word list not found at {path}; content filter has no words.")
+                    self._automaton = AhoCorasick([])
+                return self._automaton
+            if mtime != self._mtime or self._automaton is None:
+                try:
+                    started = time.perf_counter()
+                    self._automaton = AhoCorasick(self._load_words(path))
+                    self._mtime = mtime
+                    logger.info(
+                        f"Compiled sensitive word automaton from {path}: {len(self._automaton.words)} words "
+                        f"in {time.perf_counter() - started:.3f}s"
+                    )
+                except Exception as e:
+                    logger.error(f"Failed to load sensitive word list {path}: {e}", exc_info=True)
+                    if self._automaton is None:
+                        self._automaton = AhoCorasick([])
+            return self._automaton
+
+    def scan(self, text: str) -> List[FilterMatch]:
+        if not text:
+            return []
+        return self.automaton.scan(text)[0]
+
+    def mask(self, text: str) -> Tuple[str, List[FilterMatch]]:
+        """对整段文本打码，返回 (打码后的文本, 命中列表)"""
+        matches = self.scan(text)
+        if not matches:
+            return text, matches
+        chars = list(text)
+        for match in matches:
+            chars[match.start:match.end] = self.config.mask_char * (match.end - match.start)
+        return "".join(chars), matches
+
+    def stream_scanner(self) -> StreamScanner:
+        return StreamScanner(self.automaton)
+
+    def stream_masker(self) -> StreamMasker:
+        return StreamMasker(self.automaton, self.config.mask_char)
+
+    def output_filter(self, label: str = "stream") -> Optional[StreamOutputFilter]:
+        """为一条输出流创建过滤器；过滤关闭时返回 None"""
+        if not self.enabled:
+            return None
+        return StreamOutputFilter(self.automaton, self.action, self.config.mask_char, label)
+
+
+content_filter = ContentFilter()
@@ -60,6 +60,28 @@ class APIResponseError(GlyphMindError):
         self.provider = provider
         self.status_code = status_code
 
+class ProviderUnavailableError(APIError):
+    """提供商熔断中，调用在发出前被拒绝"""
+    def __init__(self, provider_name: str, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(
+            message=f"Provider '{provider_name}' is temporarily unavailable after repeated failures (circuit open)",
+            code=503,
+            detail=f"Retry in {retry_after:.1f}s",
+            provider_name=provider_name,
+        )
+
+class ProviderRateLimitedError(APIError):
+    """提供商的限流额度在允许的等待时间内无法满足"""
+    def __init__(self, provider_name: str, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(
+            message=f"Provider '{provider_name}' rate limit reached",
+            code=429,
+            detail=f"Retry in {retry_after:.1f}s",
+            provider_name=provider_name,
+        )
+
 # ----------------- 处理函数 -----------------
 def handle_error(error: Exception) -> Dict[str, Any]:
     """Handle errors and return appropriate response"""
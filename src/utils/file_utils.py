@@ -1,7 +1,9 @@
 import os
 import logging
 from pathlib import Path
-from typing import Tuple, Optional, Callable
+from typing import Tuple, Optional, Callable, Iterator
+
+from src.utils.tracing import traced
 
 def detect_file_type(filepath: Path) -> str:
     """
@@ -95,6 +97,7 @@ def detect_file_type(filepath: Path) -> str:
     
     return 'unknown'
 
+@traced("file.parse")
 def load_file_content(file_obj, app_logger: logging.Logger, progress_cb: Callable = None) -> str:
     """
     根据文件类型自动加载文件内容。
@@ -201,6 +204,50 @@ def load_file_content(file_obj, app_logger: logging.Logger, progress_cb: Callabl
         app_logger.error(error_msg, exc_info=True)
         return f"错误: {error_msg}"
 
+def iter_file_chunks(filepath: Path, app_logger: logging.Logger) -> Iterator[str]:
+    """
+    按块读取文件文本：PDF 逐页、EPUB 逐章节产出，其他格式一次产出全文。
+
+    各块依次拼接与 load_file_content 的结果一致（PDF 页之间以 "\n"、EPUB 章节之间以 "\n\n" 分隔），
+    便于大文件一边解析一边分析（见 src/core/analyzers/incremental.py）。
+    文件无法读取或缺少解析库时抛出 ValueError。
+    """
+    file_type = detect_file_type(filepath)
+    app_logger.info(f"按块读取文件: {filepath.name} (类型: {file_type})")
+    if file_type == 'pdf':
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            raise ValueError("缺少解析 PDF 所需的库 pypdf。请安装后再试。")
+        separator = ""
+        for page in PdfReader(filepath).pages:
+            text = page.extract_text()
+            if text:
+                yield separator + text
+                separator = "\n"
+    elif file_type == 'epub':
+        try:
+            import ebooklib
+            from ebooklib import epub
+            from bs4 import BeautifulSoup
+        except ImportError:
+            raise ValueError("缺少解析 EPUB 所需的库 ebooklib / beautifulsoup4。请安装后再试。")
+        separator = ""
+        for item in epub.read_epub(filepath).get_items_of_type(ebooklib.ITEM_DOCUMENT):
+            try:
+                text = BeautifulSoup(item.get_body_content(), 'html.parser').get_text(" ", strip=True)
+            except Exception as e:
+                app_logger.warning(f"解析 EPUB 章节时出错: {e}")
+                continue
+            if text:
+                yield separator + text
+                separator = "\n\n"
+    else:
+        content = load_file_content(filepath, app_logger)
+        if content.startswith("错误:"):
+            raise ValueError(content)
+        yield content
+
 def parse_txt_file(filepath: Path, app_logger: logging.Logger) -> Tuple[str, Optional[str]]:
     """解析纯文本文件。返回 (content, error_message)"""
     try:
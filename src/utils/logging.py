@@ -1,81 +1,225 @@
 """
 Logging utility for GlyphMind service.
+
+Records are handed to a QueueHandler and written to the rotating log file by a
+QueueListener on a background thread, so the event loop never waits for disk I/O.
+Level, output format (text or JSON lines) and per-module levels come from
+config/app_config.yaml (logging_level and the logging section).
+
+Analysis pool worker processes (started with WORKER_LOG_ENV set) never open the
+log file: several processes rotating one file lose records, and on Windows the
+rollover fails while another process holds the file. Their records go through a
+multiprocessing queue to the main process, which writes them (see
+start_worker_log_listener / forward_worker_logs).
 """
+import atexit
+import copy
+import json
 import logging
 import os
+import queue
+from datetime import datetime, timezone
 from pathlib import Path
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from src.config.app_config import AppConfig, get_app_config
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# 设置后 (分析进程池的工作进程继承该环境变量) 本进程不写日志文件
+WORKER_LOG_ENV = "GLYPHMIND_LOG_WORKER"
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, source location and exception"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "function": record.funcName,
+            "line": record.lineno,
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler that never blocks the caller.
+
+    The message is rendered and the traceback formatted in the calling thread (the
+    exception object may not outlive it), but the final text/JSON formatting and the
+    file write happen on the listener thread. When the queue is full the record is
+    dropped and counted instead of waiting; the count is logged once there is room again.
+    """
+
+    def __init__(self, log_queue: "queue.Queue"):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self.reported_dropped = 0
+        self._exception_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self._exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def dropped_record(self) -> logging.LogRecord:
+        """Warning about records dropped since the last report"""
+        return logging.makeLogRecord({
+            "name": "glyphmind", "levelno": logging.WARNING, "levelname": "WARNING",
+            "msg": f"Log queue was full, {self.dropped - self.reported_dropped} records dropped (pid {os.getpid()})",
+        })
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            if self.dropped != self.reported_dropped:
+                self.queue.put_nowait(self.dropped_record())
+                self.reported_dropped = self.dropped
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DrainingQueueListener(QueueListener):
+    """QueueListener whose stop marker waits for room, so a full queue is still drained on shutdown"""
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)
+
 
 class Logger:
     """Logger class for GlyphMind service"""
-    
-    def __init__(self):
+
+    def __init__(self, config: AppConfig = None):
         self.log_dir = Path('logs')
+        self.config = config or get_app_config()
+        self.listener = None
+        self.queue_handler = None
+        self.handler = None
         self._setup_logger()
-    
+
     def _setup_logger(self) -> None:
         """Setup logger with file and console handlers"""
+        settings = self.config.logging
         # Create logs directory if it doesn't exist
         self.log_dir.mkdir(exist_ok=True)
-        
+
         # Create logger
         self.logger = logging.getLogger('glyphmind')
-        self.logger.setLevel(logging.DEBUG)
+        self.logger.setLevel(self.config.logging_level.upper())
         self.logger.propagate = False
-        
+
         # Create formatters
-        file_formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
+        if settings.format == "json":
+            file_formatter = JsonFormatter()
+        else:
+            file_formatter = logging.Formatter(TEXT_FORMAT)
         console_formatter = logging.Formatter(
             '%(levelname)s - %(message)s'
         )
-        
+
+        # 工作进程：先不输出，forward_worker_logs() 接上主进程的队列后再转发
+        if os.environ.get(WORKER_LOG_ENV):
+            self._install_handler(logging.NullHandler())
+            return
+
         # Create file handler
         file_handler = RotatingFileHandler(
-            self.log_dir / 'glyphmind.log',
-            maxBytes=10*1024*1024,  # 10MB
-            backupCount=5,
+            self.log_dir / settings.file_name,
+            maxBytes=settings.max_bytes,
+            backupCount=settings.backup_count,
             encoding='utf-8'  # Explicitly set encoding
         )
         file_handler.setLevel(logging.DEBUG)
         file_handler.setFormatter(file_formatter)
-        
+
         # Create console handler
         console_handler = logging.StreamHandler()
         console_handler.setLevel(logging.WARNING)
         # console_handler.setFormatter(console_formatter) # Temporarily disable console handler
-        
+
+        # 文件写入交给后台线程；请求路径只做一次非阻塞入队
+        if settings.async_handlers:
+            self.queue_handler = NonBlockingQueueHandler(queue.Queue(settings.queue_size))
+            self.listener = DrainingQueueListener(self.queue_handler.queue, file_handler, respect_handler_level=True)
+            self.listener.start()
+            atexit.register(self.stop)
+            handler = self.queue_handler
+        else:
+            handler = file_handler
+
         # Add handlers to logger
-        self.logger.addHandler(file_handler)
+        self._install_handler(handler)
         # self.logger.addHandler(console_handler) # Temporarily disable console handler
-    
+
+    def _install_handler(self, handler: logging.Handler) -> None:
+        settings = self.config.logging
+        if self.handler is not None:
+            self.logger.removeHandler(self.handler)
+            logging.getLogger().removeHandler(self.handler)
+        self.logger.addHandler(handler)
+        # 各模块 logging.getLogger(__name__) 的记录经由根日志器写入同一文件
+        if settings.capture_module_loggers:
+            logging.getLogger().addHandler(handler)
+        for name, level in settings.modules.items():
+            logging.getLogger(name).setLevel(level)
+        self.handler = handler
+
+    def stop(self) -> None:
+        """Write out queued records and stop the background writer thread"""
+        if self.listener is None:
+            return
+        listener, self.listener = self.listener, None
+        listener.stop()
+        for handler in listener.handlers:
+            if self.queue_handler.dropped != self.queue_handler.reported_dropped:
+                handler.handle(self.queue_handler.dropped_record())
+            handler.close()
+
     def debug(self, message: str) -> None:
         """Log debug message"""
         self.logger.debug(message)
-    
+
     def info(self, message: str) -> None:
         """Log info message"""
         self.logger.info(message)
-    
+
     def warning(self, message: str) -> None:
         """Log warning message"""
         self.logger.warning(message)
-    
+
     def error(self, message: str, **kwargs) -> None:
         """
         Log error message
-        
+
         Args:
             message: Error message to log
             **kwargs: Additional arguments to pass to logger.error
         """
         self.logger.error(message, **kwargs)
-    
+
     def critical(self, message: str, **kwargs) -> None:
         """
         Log critical message
-        
+
         Args:
             message: Critical message to log
             **kwargs: Additional arguments to pass to logger.critical
@@ -85,7 +229,7 @@ class Logger:
     def exception(self, message: str, **kwargs) -> None:
         """
         Log exception message with stack trace
-        
+
         Args:
             message: Exception message to log
             **kwargs: Additional arguments to pass to logger.exception
@@ -93,6 +237,37 @@ class Logger:
         """
         self.logger.exception(message, **kwargs)
 
-# --- Create and export a configured logger instance --- 
-logger = Logger().logger
-# ---------------------------------------------------- 
\ No newline at end of file
+class _ReplayHandler(logging.Handler):
+    """Hands a worker's record to the logger of the same name in this process"""
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        logging.getLogger(record.name).handle(record)
+        return True
+
+    def emit(self, record: logging.LogRecord) -> None:
+        pass
+
+
+def start_worker_log_listener(context) -> tuple:
+    """
+    Main process: queue for worker records plus the listener thread writing them.
+
+    Sets WORKER_LOG_ENV, so processes spawned from now on forward their records
+    instead of opening the log file. Returns (queue, listener).
+    """
+    os.environ[WORKER_LOG_ENV] = "1"
+    log_queue = context.Queue()
+    listener = QueueListener(log_queue, _ReplayHandler())
+    listener.start()
+    return log_queue, listener
+
+
+def forward_worker_logs(log_queue) -> None:
+    """Worker process: send records to the main process through log_queue"""
+    log_setup._install_handler(QueueHandler(log_queue))
+
+
+# --- Create and export a configured logger instance ---
+log_setup = Logger()
+logger = log_setup.logger
+# ----------------------------------------------------
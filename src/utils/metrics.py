@@ -0,0 +1,173 @@
+"""
+In-process counters and histograms with Prometheus text exposition.
+
+A deliberately small subset of the Prometheus client model (no extra
+dependency): metrics are registered once with fixed label names, series are
+created on first use, and registry.render() produces the text format served by
+GET /metrics. Histograms use cumulative buckets and can estimate quantiles the
+way PromQL's histogram_quantile does, which the JSON summary endpoints use.
+
+Usage:
+    REQUESTS = registry.counter("provider_requests_total", "Provider calls", ("provider", "outcome"))
+    REQUESTS.inc(("deepseek_ai", "success"))
+    LATENCY = registry.histogram("provider_request_duration_seconds", "Call latency", ("provider",), LATENCY_BUCKETS)
+    LATENCY.observe(("deepseek_ai",), 1.8)
+"""
+import math
+import threading
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+Labels = Tuple[str, ...]
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic counter per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Labels = (), amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, labels: Labels = ()) -> float:
+        return self._values.get(labels, 0.0)
+
+    def series(self) -> List[Tuple[Labels, float]]:
+        with self._lock:
+            return list(self._values.items())
+
+    def render(self) -> Iterator[str]:
+        for labels, value in sorted(self.series()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # 每个标签组合: [各桶计数 (非累计), 总和, 样本数]
+        self._series: Dict[Labels, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Labels, value: float) -> None:
+        index = next(i for i, bound in enumerate(self.buckets) if value <= bound)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def labelsets(self) -> List[Labels]:
+        with self._lock:
+            return list(self._series)
+
+    def stats(self, labels: Labels) -> Optional[Tuple[List[int], float, int]]:
+        """(per-bucket counts, sum, count) of one label set"""
+        with self._lock:
+            series = self._series.get(labels)
+            return (list(series[0]), series[1], series[2]) if series is not None else None
+
+    def merged(self, match) -> Optional[Tuple[List[int], float, int]]:
+        """Stats summed over the label sets for which match(labels) is true"""
+        counts, total, n = [0] * len(self.buckets), 0.0, 0
+        with self._lock:
+            for labels, series in self._series.items():
+                if match(labels):
+                    counts = [a + b for a, b in zip(counts, series[0])]
+                    total += series[1]
+                    n += series[2]
+        return (counts, total, n) if n else None
+
+    def quantile(self, q: float, stats: Optional[Tuple[List[int], float, int]]) -> Optional[float]:
+        """Estimate the q-quantile from bucket counts (linear within the bucket, like histogram_quantile)"""
+        if not stats or not stats[2]:
+            return None
+        counts, _, n = stats
+        rank = q * n
+        cumulative = 0
+        for i, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i]
+                if upper == math.inf:
+                    return lower
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-2]
+
+    def render(self) -> Iterator[str]:
+        with self._lock:
+            items = sorted((labels, (list(s[0]), s[1], s[2])) for labels, s in self._series.items())
+        for labels, (counts, total, n) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {n}"
+
+
+class MetricsRegistry:
+    """Named metrics rendered together by GET /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
@@ -4,7 +4,8 @@ Retry utility for GlyphMind service.
 import time
 from functools import wraps
 from typing import Any, Callable, Optional, Type, Union
-from .error_handler import APIError
+from tenacity import RetryCallState
+from .error_handler import APIError, ProviderRateLimitedError, ProviderUnavailableError
 
 def retry(
     exceptions: Union[Type[Exception], tuple[Type[Exception], ...]] = Exception,
@@ -57,22 +58,44 @@ def retry(
         return wrapper
     return decorator
 
-def is_retryable_exception(exception: Exception) -> bool:
+def is_retryable_exception(exception: Union[Exception, RetryCallState]) -> bool:
     """Check if an exception is retryable.
     
+    Handlers pass this function as tenacity's ``retry=`` predicate, so it also
+    accepts a RetryCallState: the failed attempt's exception is checked, and a
+    method of a provider handler is not retried while that provider's circuit
+    is open or a Retry-After cooldown is active (see src/providers/resilience.py).
+    
     Args:
-        exception: The exception to check
+        exception: The exception to check, or tenacity's retry state
         
     Returns:
         bool: True if the exception is retryable, False otherwise
     """
+    provider_name = None
+    if isinstance(exception, RetryCallState):
+        if exception.outcome is None or not exception.outcome.failed:
+            return False
+        if exception.args:
+            provider_name = getattr(exception.args[0], "provider_name", None)
+        exception = exception.outcome.exception()
+
+    # 熔断或限流拒绝的调用立即重试只会继续冲击该提供商
+    if isinstance(exception, (ProviderUnavailableError, ProviderRateLimitedError)):
+        return False
+
     retryable_exceptions = (
         ConnectionError,
         TimeoutError,
         APIError
     )
     
-    return isinstance(exception, retryable_exceptions)
+    if not isinstance(exception, retryable_exceptions):
+        return False
+    if isinstance(provider_name, str):
+        from src.providers.resilience import provider_limits
+        return provider_limits.allows_retry(provider_name)
+    return True
 
 # List of HTTP status codes that should trigger a retry
 RETRY_STATUS_CODES = {
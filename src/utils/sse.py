@@ -0,0 +1,149 @@
+# src/utils/sse.py
+"""
+SSE 帧编码与文本增量合并。
+
+本地模型每秒可产出上千个 token，逐 token 下发意味着每个 token 一次 JSON 序列化和一次写出。
+合并模式下，相邻的纯文本增量块 ({"choices": [{"delta": {"content": ...}}]}) 先缓存，
+缓存达到 max_bytes 字节或最早一块已等待 max_delay_ms 毫秒时合并为一帧下发；
+角色块、统计块、错误块等其他块到达时先下发已缓存的文本，再原样下发，顺序不变。
+
+JSON 编码优先使用 orjson (紧凑格式，非 ASCII 字符不转义)，不可用或无法编码时回退到 json。
+"""
+import asyncio
+import json
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, List, Optional
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖
+    orjson = None
+
+
+def dumps_json(obj: Any) -> str:
+    """序列化为 JSON 文本，非 ASCII 字符原样输出"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj).decode("utf-8")
+        except TypeError:  # orjson.JSONEncodeError，例如非字符串键或超出 64 位的整数
+            pass
+    return json.dumps(obj, ensure_ascii=False)
+
+
+@dataclass
+class CoalesceSettings:
+    """文本增量合并参数"""
+    max_delay_ms: float
+    max_bytes: int
+
+
+def content_delta(chunk: Any) -> Optional[str]:
+    """只含一段文本增量的块返回该文本，其他块 (角色、结束原因、统计、错误等) 返回 None"""
+    if not isinstance(chunk, dict):
+        return None
+    choices = chunk.get("choices")
+    if not isinstance(choices, list) or len(choices) != 1:
+        return None
+    choice = choices[0]
+    if not isinstance(choice, dict) or choice.get("finish_reason"):
+        return None
+    delta = choice.get("delta")
+    if not isinstance(delta, dict) or len(delta) != 1:
+        return None
+    content = delta.get("content")
+    return content if isinstance(content, str) else None
+
+
+def _merged_chunk(template: dict, parts: List[str]) -> dict:
+    """以第一块为模板 (保留 id、model 等字段)，把缓存的文本合并为一个块"""
+    choice = template["choices"][0]
+    return {**template, "choices": [{**choice, "delta": {"content": "".join(parts)}}]}
+
+
+# 上游读取任务与合并循环之间最多缓存的块数 (满时上游等待)
+PUMP_QUEUE_SIZE = 256
+_END = object()
+
+
+class _Raised:
+    """上游抛出的异常，由合并循环重新抛出"""
+    __slots__ = ("exc",)
+
+    def __init__(self, exc: Exception):
+        self.exc = exc
+
+
+async def _pump(iterator: AsyncIterator[Any], queue: asyncio.Queue) -> None:
+    """在独立任务中读取上游，块、异常和结束标记依次放入队列"""
+    try:
+        async for chunk in iterator:
+            await queue.put(chunk)
+    except Exception as exc:
+        await queue.put(_Raised(exc))
+    else:
+        await queue.put(_END)
+
+
+async def coalesce_deltas(chunks: AsyncIterator[Any], settings: CoalesceSettings) -> AsyncIterator[Any]:
+    """
+    合并相邻的文本增量块。
+
+    上游在独立任务中读取并放入队列：同一次网络读取到的一批块可以直接从队列取出，
+    不需要逐块等待；队列为空且有缓存时，以剩余等待时间为超时等待下一块，
+    超时即下发缓存，因此上游停顿时已收到的文本最多延迟 max_delay_ms。
+    """
+    loop = asyncio.get_running_loop()
+    max_delay = settings.max_delay_ms / 1000
+    queue: asyncio.Queue = asyncio.Queue(PUMP_QUEUE_SIZE)
+    pump = asyncio.ensure_future(_pump(chunks.__aiter__(), queue))
+    template: Optional[dict] = None
+    parts: List[str] = []
+    size = 0
+    deadline = 0.0
+
+    try:
+        while True:
+            if template is None:
+                chunk = await queue.get()
+            else:
+                try:
+                    chunk = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    try:
+                        async with asyncio.timeout_at(deadline):
+                            chunk = await queue.get()
+                    except TimeoutError:
+                        # 上游停顿：先下发已缓存的文本
+                        yield _merged_chunk(template, parts)
+                        template, parts, size = None, [], 0
+                        continue
+            if chunk is _END:
+                break
+            if isinstance(chunk, _Raised):
+                # 先下发已收到的文本，再抛出上游异常
+                if template is not None:
+                    yield _merged_chunk(template, parts)
+                    template, parts, size = None, [], 0
+                raise chunk.exc
+
+            content = content_delta(chunk)
+            if content is None:
+                if template is not None:
+                    yield _merged_chunk(template, parts)
+                    template, parts, size = None, [], 0
+                yield chunk
+                continue
+            if template is None:
+                template = chunk
+                deadline = loop.time() + max_delay
+            parts.append(content)
+            size += len(content.encode("utf-8"))
+            if size >= settings.max_bytes or loop.time() >= deadline:
+                yield _merged_chunk(template, parts)
+                template, parts, size = None, [], 0
+
+        if template is not None:
+            yield _merged_chunk(template, parts)
+    finally:
+        if not pump.done():
+            pump.cancel()
@@ -5,6 +5,11 @@ import asyncio
 # Import the manager instance directly
 from src.core.tasks.manager import task_manager
 from src.utils.logging import logger
+from src.utils.ui_state import flush_ui_state
+from src.core.analyzers.engine import analysis_engine
+from src.providers.http_client import close_http_sessions
+from src.providers.health import provider_health
+from src.utils.tracing import shutdown_tracing
 
 # Import worker initialization function
 try:
@@ -42,6 +47,9 @@ async def startup_event():
         else:
              logger.error("TaskManager instance is not available. Cannot initialize DB or start worker.")
 
+        # 后台定期刷新提供商状态 (设置页直接读取缓存)
+        provider_health.start()
+
         # 启动任务清理 (已注释掉，因为 SQLite TaskManager 暂未实现高效清理)
         # await task_manager.start_periodic_cleanup()
         # logger.info("Started periodic task cleanup")
@@ -61,6 +69,16 @@ async def shutdown_event():
             logger.info("Stopping TaskWorker...")
             await task_worker.stop() # Stop using the global instance
             logger.info("TaskWorker stopped.")
+        # 停止后台提供商状态检查
+        await provider_health.stop()
+        # 写入尚未落盘的 UI 状态 (write-behind 缓冲)
+        await flush_ui_state()
+        # 停止分析进程池 (不等待仍在运行的任务)
+        analysis_engine.shutdown(wait=False)
+        # 关闭提供商共享 HTTP 会话 (连接池)
+        await close_http_sessions()
+        # 导出尚未发送到 OpenTelemetry Collector 的追踪
+        shutdown_tracing()
         # REMOVED: No need to explicitly close TaskManager connection anymore
         # else:
         #     if task_manager:
@@ -0,0 +1,77 @@
+# src/utils/stream_trace.py
+"""
+流式响应的采样调试日志。
+
+流式路径每个 token 都会经过 handler 和 chat 路由，逐块写日志 (并提前格式化整个块) 会明显拖慢吞吐。
+这些路径不再逐块记录日志，需要排查时在 config/app_config.yaml 中打开 stream_trace：
+每 sample_every 个块记录一条 DEBUG 日志，内容截断为 max_chars 个字符，只在确实写日志时才格式化。
+
+用法：
+    trace = StreamTrace("ollama stream_chat")
+    for index, chunk in enumerate(stream, 1):
+        if trace.enabled:
+            trace.record(index, "chunk", chunk)
+    trace.finish(index)
+"""
+import json
+import logging
+import time
+from typing import Any, Optional
+
+from src.config.app_config import get_app_config
+from src.utils.logging import logger
+
+
+class _Preview:
+    """日志参数的惰性包装：只有记录真正被输出时才序列化并截断"""
+
+    __slots__ = ("payload", "max_chars")
+
+    def __init__(self, payload: Any, max_chars: int):
+        self.payload = payload
+        self.max_chars = max_chars
+
+    def __str__(self) -> str:
+        payload = self.payload
+        if isinstance(payload, bytes):
+            text = payload.decode("utf-8", errors="replace")
+        elif isinstance(payload, str):
+            text = payload
+        else:
+            try:
+                text = json.dumps(payload, ensure_ascii=False, default=str)
+            except (TypeError, ValueError):
+                text = repr(payload)
+        if len(text) > self.max_chars:
+            return f"{text[:self.max_chars]}... ({len(text)} chars)"
+        return text
+
+
+class StreamTrace:
+    """一次流式响应的采样跟踪；未启用时 enabled 为 False，调用方据此跳过所有逐块工作"""
+
+    __slots__ = ("label", "enabled", "sample_every", "max_chars", "started", "_log")
+
+    def __init__(self, label: str, log: Optional[logging.Logger] = None):
+        config = get_app_config().stream_trace
+        self._log = log or logger
+        self.label = label
+        self.enabled = config.enabled and self._log.isEnabledFor(logging.DEBUG)
+        self.sample_every = config.sample_every
+        self.max_chars = config.max_chars
+        self.started = time.perf_counter() if self.enabled else 0.0
+
+    def record(self, index: int, kind: str, payload: Any) -> None:
+        """记录第 index 个块 (从 1 开始)；按 sample_every 采样"""
+        if self.enabled and (index - 1) % self.sample_every == 0:
+            self._log.debug("[stream-trace] %s #%d %s: %s", self.label, index, kind, _Preview(payload, self.max_chars))
+
+    def finish(self, chunk_count: int) -> None:
+        """流结束时记录块数与速率"""
+        if not self.enabled:
+            return
+        elapsed = time.perf_counter() - self.started
+        rate = chunk_count / elapsed if elapsed > 0 else 0.0
+        self._log.debug(
+            "[stream-trace] %s finished: %d chunks in %.3fs (%.1f chunks/s)", self.label, chunk_count, elapsed, rate
+        )
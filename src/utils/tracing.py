@@ -0,0 +1,459 @@
+"""
+Lightweight request tracing with context-var propagated spans.
+
+A trace starts with a root span (one per /api request, opened by
+TracingMiddleware, and one per background task in TaskWorker._process_task).
+Code running inside it opens child spans with span() / traced(); the current span
+lives in a ContextVar, so it follows awaits and is inherited by tasks created
+inside the request. Outside a trace span() and traced() do nothing, so the
+instrumented helpers (cache, task manager, provider handlers) cost one
+ContextVar lookup when nothing is being traced.
+
+Finished traces are kept in memory (the latest tracing.max_traces) and served as
+span trees by /api/traces. With tracing.otlp_endpoint set they are also sent to
+an OpenTelemetry collector (OTLP/HTTP JSON, e.g. http://localhost:4318/v1/traces)
+from a background thread; trace and span ids use the W3C / OTLP formats and an
+incoming traceparent header continues the caller's trace. Several requests
+carrying the same traceparent each add a server span (a local root, parented to
+the caller's span) to that trace, and each local root exports its finished
+spans when it ends.
+
+Usage:
+    with span("transfer.segment", index=3):
+        ...
+    @traced("transfer.load_template")
+    def load_template(...): ...
+"""
+import asyncio
+import functools
+import json
+import os
+import queue
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from src.config.app_config import get_app_config
+from src.utils.logging import logger
+
+_current: ContextVar[Optional["Span"]] = ContextVar("trace_span", default=None)
+
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+def _attribute_value(value: Any) -> Any:
+    return value if isinstance(value, (str, int, float, bool)) or value is None else str(value)
+
+
+@dataclass(eq=False)
+class Span:
+    """One timed operation of a trace"""
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    name: str
+    start_time: float  # epoch 秒
+    start: float  # perf_counter
+    end: Optional[float] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        return None if self.end is None else (self.end - self.start) * 1000
+
+    def set(self, **attributes: Any) -> None:
+        for key, value in attributes.items():
+            self.attributes[key] = _attribute_value(value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration_ms": round(self.duration_ms, 3) if self.end is not None else None,
+            "status": "error" if self.error else ("ok" if self.end is not None else "running"),
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class _Trace:
+    __slots__ = ("trace_id", "root", "roots", "spans", "dropped", "exported")
+
+    def __init__(self, root: Span):
+        self.trace_id = root.trace_id
+        self.root = root  # 最早的本地根 span
+        self.roots: List[Span] = [root]
+        self.spans: List[Span] = [root]
+        self.dropped = 0
+        self.exported: Set[str] = set()
+
+    def is_root(self, span: Span) -> bool:
+        return any(root is span for root in self.roots)
+
+
+class Tracer:
+    """Creates spans and keeps the most recent traces"""
+
+    def __init__(self):
+        self._traces: "OrderedDict[str, _Trace]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.exporter = OTLPExporter()
+
+    def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None, root: bool = False,
+                   trace_id: Optional[str] = None, parent_id: Optional[str] = None,
+                   parent: Optional[Span] = None) -> Optional[Span]:
+        """
+        New child of the current span; None outside a trace.
+
+        With root set the span is a local root: it starts a new trace, or joins
+        the trace of an incoming trace_id already held in memory as another
+        server span under parent_id.
+        """
+        config = get_app_config().tracing
+        if not config.enabled:
+            return None
+        parent = parent or (None if root else _current.get())
+        if parent is None and not root:
+            return None
+        now = time.perf_counter()
+        span = Span(
+            trace_id=parent.trace_id if parent else (trace_id or _new_id(16)),
+            span_id=_new_id(8),
+            parent_id=parent.span_id if parent else parent_id,
+            name=name,
+            start_time=time.time(),
+            start=now,
+        )
+        if attributes:
+            span.set(**attributes)
+        with self._lock:
+            trace = self._traces.get(span.trace_id)
+            if trace is None:
+                if parent is not None:
+                    return None  # 所属追踪已被淘汰
+                self._traces[span.trace_id] = _Trace(span)
+                while len(self._traces) > config.max_traces:
+                    self._traces.popitem(last=False)
+            elif len(trace.spans) >= config.max_spans_per_trace:
+                trace.dropped += 1
+                return None
+            elif parent is None:
+                if any(s.span_id == span.span_id for s in trace.spans):
+                    return None  # 重复的 span id
+                # 同一 traceparent 的又一个请求：作为该追踪中的另一个服务端 span
+                trace.spans.append(span)
+                trace.roots.append(span)
+                self._traces.move_to_end(span.trace_id)
+            else:
+                trace.spans.append(span)
+        return span
+
+    def end_span(self, span: Span, error: Optional[BaseException] = None) -> None:
+        span.end = time.perf_counter()
+        if error is not None:
+            span.error = f"{type(error).__name__}: {error}"[:300]
+        trace = self._traces.get(span.trace_id)
+        if trace is not None and trace.is_root(span):
+            with self._lock:
+                spans = [s for s in trace.spans if s.end is not None and s.span_id not in trace.exported]
+                trace.exported.update(s.span_id for s in spans)
+            self.exporter.submit(trace, spans)
+
+    def recent(self, limit: int = 50, min_duration_ms: float = 0.0, name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Summaries of the latest traces, newest first"""
+        with self._lock:
+            traces = list(self._traces.values())
+        rows = []
+        for trace in reversed(traces):
+            root = trace.root
+            duration = root.duration_ms
+            if name and name not in root.name:
+                continue
+            if min_duration_ms and (duration is None or duration < min_duration_ms):
+                continue
+            rows.append({
+                "trace_id": trace.trace_id,
+                "name": root.name,
+                "start_time": root.start_time,
+                "duration_ms": round(duration, 3) if duration is not None else None,
+                "status": root.to_dict()["status"],
+                "span_count": len(trace.spans),
+                "error_count": sum(1 for s in trace.spans if s.error),
+            })
+            if len(rows) >= limit:
+                break
+        return rows
+
+    def tree(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        """Span tree of one trace (children ordered by start time)"""
+        with self._lock:
+            trace = self._traces.get(trace_id)
+            spans = list(trace.spans) if trace is not None else None
+        if spans is None:
+            return None
+        nodes = {s.span_id: {**s.to_dict(), "offset_ms": round((s.start - trace.root.start) * 1000, 3), "children": []}
+                 for s in spans}
+        for s in spans:
+            if not trace.is_root(s) and s.parent_id in nodes:
+                nodes[s.parent_id]["children"].append(nodes[s.span_id])
+        return {"trace_id": trace_id, "dropped_spans": trace.dropped, "root": nodes[trace.root.span_id],
+                "roots": [nodes[root.span_id] for root in list(trace.roots)]}
+
+
+class OTLPExporter:
+    """Sends finished traces to an OTLP/HTTP (JSON) collector from a daemon thread"""
+
+    def __init__(self):
+        self._queue: "queue.Queue[Optional[Tuple[_Trace, List[Span]]]]" = queue.Queue(maxsize=1000)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._failing = False
+
+    def submit(self, trace: _Trace, spans: List[Span]) -> None:
+        """Queue finished spans of a trace (those of one local root) for export"""
+        if not spans or not get_app_config().tracing.otlp_endpoint:
+            return
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="otlp-trace-exporter", daemon=True)
+                    self._thread.start()
+        try:
+            self._queue.put_nowait((trace, spans))
+        except queue.Full:
+            pass  # 收集器跟不上时丢弃，不阻塞请求
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Flush queued traces and stop the thread"""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            config = get_app_config().tracing
+            batch, stop = [], False
+            deadline = time.monotonic() + config.export_interval_seconds
+            while len(batch) < 100:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            if batch:
+                self._post(batch, config)
+            if stop:
+                return
+
+    def _post(self, batches: List[Tuple[_Trace, List[Span]]], config) -> None:
+        body = json.dumps(otlp_payload(batches, config.otlp_service_name)).encode("utf-8")
+        request = urllib.request.Request(config.otlp_endpoint, data=body, headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=config.otlp_timeout_seconds) as response:
+                response.read()
+            if self._failing:
+                logger.info("OTLP trace export recovered.")
+            self._failing = False
+        except Exception as e:
+            if not self._failing:  # 连续失败只记录一次
+                logger.warning(f"OTLP trace export to {config.otlp_endpoint} failed: {e}")
+            self._failing = True
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": "" if value is None else str(value)}
+
+
+def otlp_payload(batches: List[Tuple[_Trace, List[Span]]], service_name: str) -> Dict[str, Any]:
+    """ExportTraceServiceRequest (OTLP JSON encoding) for finished spans, grouped by trace"""
+    spans = []
+    for trace, trace_spans in batches:
+        root = trace.root
+        for s in trace_spans:
+            if s.end is None:
+                continue
+            start_ns = int((root.start_time + (s.start - root.start)) * 1e9)
+            otlp_span = {
+                "traceId": s.trace_id,
+                "spanId": s.span_id,
+                "name": s.name,
+                "kind": 2 if trace.is_root(s) else 1,  # SERVER / INTERNAL
+                "startTimeUnixNano": str(start_ns),
+                "endTimeUnixNano": str(start_ns + int((s.end - s.start) * 1e9)),
+                "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in s.attributes.items()],
+                "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+            }
+            if s.parent_id:
+                otlp_span["parentSpanId"] = s.parent_id
+            spans.append(otlp_span)
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+        "scopeSpans": [{"scope": {"name": "glyphmind.tracing"}, "spans": spans}],
+    }]}
+
+
+tracer = Tracer()
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def annotate(**attributes: Any) -> None:
+    """Add attributes to the current span (no-op outside a trace)"""
+    span = _current.get()
+    if span is not None:
+        span.set(**attributes)
+
+
+def activate(span: Optional[Span]) -> Optional[Token]:
+    """Make span current (for spans kept open across async generator steps)"""
+    return _current.set(span) if span is not None else None
+
+
+def deactivate(token: Optional[Token]) -> None:
+    if token is not None:
+        _current.reset(token)
+
+
+def parse_traceparent(value: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """(trace_id, parent span_id) of a W3C traceparent header"""
+    parts = (value or "").strip().split("-")
+    if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+        try:
+            int(parts[1], 16), int(parts[2], 16)
+        except ValueError:
+            return None, None
+        if parts[1] != "0" * 32:
+            return parts[1], parts[2]
+    return None, None
+
+
+class span:
+    """Context manager (sync or async) timing a child span; the span is None outside a trace"""
+
+    __slots__ = ("name", "root", "attributes", "span", "_token")
+
+    def __init__(self, name: str, root: bool = False, **attributes: Any):
+        self.name = name
+        self.root = root
+        self.attributes = attributes
+        self.span: Optional[Span] = None
+        self._token: Optional[Token] = None
+
+    def __enter__(self) -> Optional[Span]:
+        self.span = tracer.start_span(self.name, self.attributes, root=self.root)
+        self._token = activate(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self.span is not None:
+            deactivate(self._token)
+            tracer.end_span(self.span, exc if isinstance(exc, Exception) else None)
+
+    async def __aenter__(self) -> Optional[Span]:
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.__exit__(exc_type, exc, tb)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator recording each call of a function (sync or async) as a child span"""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _current.get() is None:
+                    return await func(*args, **kwargs)
+                with span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TracingMiddleware:
+    """ASGI middleware opening a root span per /api request (ended when the last body chunk is sent)"""
+
+    def __init__(self, app, prefixes: Tuple[str, ...] = ("/api",), exclude: Tuple[str, ...] = ("/api/traces",)):
+        self.app = app
+        self.prefixes = prefixes
+        self.exclude = exclude
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if scope["type"] != "http" or not path.startswith(self.prefixes) or path.startswith(self.exclude) \
+                or not get_app_config().tracing.enabled:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or ())
+        trace_id, parent_id = parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        root = tracer.start_span(f"{scope.get('method', 'GET')} {path}", {"http.method": scope.get("method"), "http.target": path},
+                                 root=True, trace_id=trace_id, parent_id=parent_id)
+        if root is None:
+            await self.app(scope, receive, send)
+            return
+        token = activate(root)
+        ended = False
+
+        async def send_with_trace(message):
+            nonlocal ended
+            if message["type"] == "http.response.start":
+                root.set(**{"http.status_code": message["status"]})
+                message = {**message, "headers": list(message.get("headers") or ()) + [(b"x-trace-id", root.trace_id.encode())]}
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body") and not ended:
+                ended = True
+                tracer.end_span(root)
+
+        try:
+            await self.app(scope, receive, send_with_trace)
+        except Exception as exc:
+            if not ended:
+                ended = True
+                tracer.end_span(root, exc)
+            raise
+        finally:
+            endpoint = scope.get("endpoint")
+            if endpoint is not None:
+                root.set(endpoint=getattr(endpoint, "__qualname__", str(endpoint)))
+            deactivate(token)
+            if not ended:
+                tracer.end_span(root)
+
+
+def shutdown_tracing() -> None:
+    """Flush traces still queued for the OTLP collector (called on shutdown)"""
+    tracer.exporter.shutdown(get_app_config().tracing.otlp_timeout_seconds)
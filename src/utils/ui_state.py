@@ -1,11 +1,24 @@
 # src/utils/ui_state.py
+"""
+页面 UI 状态的存储。
+
+每个页面的状态单独保存为 data/ui_state/<page_key>.json，保存时只更新内存并标记为脏，
+由后台任务在 FLUSH_INTERVAL_SECONDS 内把所有脏页面合并写盘一次 (write-behind)。
+每次写入先写临时文件再 os.replace，保证文件不会出现写了一半的状态。
+应用关闭时调用 flush_ui_state() 把尚未写盘的状态落盘。
+
+旧版的单文件 data/ui_state.json 仍作为只读回退：某页面没有独立文件时从中读取，
+之后保存会写入该页面的独立文件。
+"""
+import asyncio
 import json
-from pathlib import Path
 import logging
-from typing import Dict, Any, Optional
-import asyncio # 使用 asyncio 文件锁
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional, Set
+from urllib.parse import quote
 
-# 确定状态文件路径 (项目根目录/data/ui_state.json)
+# 确定状态文件路径 (项目根目录/data/ui_state/)
 try:
     # __file__ is defined
     PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
@@ -14,107 +27,131 @@ except NameError:
     PROJECT_ROOT = Path.cwd()
 
 DATA_DIR = PROJECT_ROOT / "data"
-UI_STATE_FILE = DATA_DIR / "ui_state.json"
-DATA_DIR.mkdir(parents=True, exist_ok=True) # 确保目录存在
+UI_STATE_DIR = DATA_DIR / "ui_state"
+UI_STATE_FILE = DATA_DIR / "ui_state.json" # 旧版单文件存储，仅用于读取回退
+UI_STATE_DIR.mkdir(parents=True, exist_ok=True) # 确保目录存在
+
+# 两次写盘之间的最短间隔 (秒)，期间的多次保存合并为一次写入
+FLUSH_INTERVAL_SECONDS = 1.0
 
 logger = logging.getLogger(__name__)
 
-# 简单的内存锁，用于防止并发写入问题 (对于简单应用足够)
-# 如果需要更强的跨进程锁，可以考虑 filelock 库
-_lock = asyncio.Lock()
-_cache: Optional[Dict[str, Any]] = None # 简单的内存缓存
-
-async def _load_state_from_file() -> Dict[str, Any]:
-    """从文件加载状态，带缓存"""
-    global _cache
-    if _cache is not None:
-        # 从缓存快速返回
-        # logger.debug("Returning UI state from memory cache.")
-        return _cache.copy()
-
-    async with _lock:
-        # 再次检查缓存，防止在等待锁时其他协程已加载
-        if _cache is not None:
-             # logger.debug("Returning UI state from memory cache (after lock).")
-             return _cache.copy()
-
-        if not UI_STATE_FILE.exists():
-            logger.info(f"UI state file not found at {UI_STATE_FILE}, returning empty state.")
-            _cache = {}
-            return {}
-        try:
-            # 使用 aiofiles 进行异步文件读写
-            import aiofiles
-            async with aiofiles.open(UI_STATE_FILE, mode='r', encoding='utf-8') as f:
-                content = await f.read()
-                if not content: # 文件为空
-                    logger.info(f"UI state file {UI_STATE_FILE} is empty.")
-                    _cache = {}
-                    return {}
-                _cache = json.loads(content)
-                logger.info(f"Loaded UI state from {UI_STATE_FILE}")
-                return _cache.copy()
-        except ImportError:
-             logger.warning("aiofiles library not found. Falling back to sync file I/O for UI state. Consider installing aiofiles for better performance.")
-             # Fallback to sync I/O if aiofiles not installed
-             try:
-                  with open(UI_STATE_FILE, 'r', encoding='utf-8') as f_sync:
-                      content_sync = f_sync.read()
-                      if not content_sync:
-                          _cache = {}
-                          return {}
-                      _cache = json.loads(content_sync)
-                      logger.info(f"Loaded UI state from {UI_STATE_FILE} (sync fallback)")
-                      return _cache.copy()
-             except Exception as sync_e:
-                  logger.error(f"Error loading UI state (sync fallback) from {UI_STATE_FILE}: {sync_e}", exc_info=True)
-                  _cache = {} # Reset cache on error
-                  return {}
-
-        except json.JSONDecodeError:
-            logger.error(f"Error decoding JSON from {UI_STATE_FILE}. Returning empty state.", exc_info=True)
-            _cache = {} # 重置缓存
-            return {}
-        except Exception as e:
-            logger.error(f"Error loading UI state from {UI_STATE_FILE}: {e}", exc_info=True)
-            # 不重置缓存，可能只是临时读取错误
-            return _cache.copy() if _cache is not None else {}
+
+def _write_atomic(path: Path, state: Dict[str, Any]) -> None:
+    """先写临时文件再替换，读者只会看到旧内容或新内容"""
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: Path) -> Optional[Dict[str, Any]]:
+    if not path.exists():
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        return json.loads(content) if content else None
+    except Exception as e:
+        logger.error(f"Error loading UI state from {path}: {e}", exc_info=True)
+        return None
+
+
+class UIStateStore:
+    """按页面缓存 UI 状态，并以防抖方式批量写盘"""
+
+    def __init__(self, state_dir: Path = UI_STATE_DIR, legacy_file: Path = UI_STATE_FILE,
+                 flush_interval: float = FLUSH_INTERVAL_SECONDS):
+        self.state_dir = state_dir
+        self.legacy_file = legacy_file
+        self.flush_interval = flush_interval
+        self._states: Dict[str, Optional[Dict[str, Any]]] = {} # None 表示已确认没有保存过
+        self._dirty: Set[str] = set()
+        self._legacy: Optional[Dict[str, Any]] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._write_lock = asyncio.Lock() # 串行化写盘，避免两个 flush 同时替换同一文件
+
+    def _page_file(self, page_key: str) -> Path:
+        """页面状态文件路径；page_key 来自 URL，编码后避免路径穿越 ('.' 也会被编码)"""
+        return self.state_dir / f"{quote(page_key, safe='-_')}.json"
+
+    async def _load_legacy(self) -> Dict[str, Any]:
+        if self._legacy is None:
+            data = await asyncio.to_thread(_read_json, self.legacy_file)
+            self._legacy = data if isinstance(data, dict) else {}
+        return self._legacy
+
+    async def get(self, page_key: str) -> Optional[Dict[str, Any]]:
+        if page_key not in self._states:
+            state = await asyncio.to_thread(_read_json, self._page_file(page_key))
+            if state is None:
+                state = (await self._load_legacy()).get(page_key)
+            # 读取期间可能已有新的保存，不要覆盖
+            self._states.setdefault(page_key, state)
+        return self._states[page_key]
+
+    def save(self, page_key: str, state: Dict[str, Any]) -> None:
+        """只更新内存并安排一次延迟写盘，不直接触碰磁盘"""
+        self._states[page_key] = state
+        self._dirty.add(page_key)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._delayed_flush())
+
+    async def _delayed_flush(self) -> None:
+        # 写盘期间的新保存与写入失败的页面仍是脏的：任务未结束时 save() 不会另起任务，由这里继续写
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+            if not self._dirty:
+                return
+
+    async def flush(self) -> int:
+        """把所有脏页面写盘，返回写入的页面数"""
+        async with self._write_lock:
+            written = 0
+            for page_key in list(self._dirty):
+                # 先移出脏集合：写盘期间的新保存会重新标记，不会丢失
+                self._dirty.discard(page_key)
+                state = self._states[page_key]
+                try:
+                    await asyncio.to_thread(_write_atomic, self._page_file(page_key), state)
+                    written += 1
+                except Exception as e:
+                    logger.error(f"Error saving UI state for page '{page_key}': {e}", exc_info=True)
+                    self._dirty.add(page_key) # 下次 flush 重试
+            if written:
+                logger.debug(f"Flushed UI state for {written} page(s) to {self.state_dir}")
+            return written
+
+    async def close(self) -> None:
+        """取消待执行的延迟写盘并立即写入剩余状态"""
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        self._flush_task = None
+        written = await self.flush()
+        if written:
+            logger.info(f"Flushed UI state for {written} page(s) on shutdown.")
+
+
+ui_state_store = UIStateStore()
 
 
 async def get_ui_state(page_key: str) -> Optional[Dict[str, Any]]:
     """获取指定页面的 UI 状态"""
-    all_states = await _load_state_from_file()
-    state = all_states.get(page_key)
+    state = await ui_state_store.get(page_key)
     logger.debug(f"Getting UI state for page '{page_key}': {'Found' if state else 'Not Found'}")
     return state
 
 async def save_ui_state(page_key: str, state: Dict[str, Any]) -> bool:
-    """保存指定页面的 UI 状态"""
-    global _cache
-    async with _lock:
-        # 确保先加载最新的状态，避免覆盖其他页面的状态
-        current_all_states = await _load_state_from_file()
-        current_all_states[page_key] = state
-        _cache = current_all_states.copy() # 更新缓存
-
-        try:
-             # 使用 aiofiles 进行异步文件读写
-            import aiofiles
-            async with aiofiles.open(UI_STATE_FILE, mode='w', encoding='utf-8') as f:
-                await f.write(json.dumps(current_all_states, indent=2, ensure_ascii=False))
-            logger.info(f"Saved UI state for page '{page_key}' to {UI_STATE_FILE}")
-            return True
-        except ImportError:
-             logger.warning("aiofiles library not found. Falling back to sync file I/O for UI state saving.")
-             # Fallback to sync I/O
-             try:
-                  with open(UI_STATE_FILE, 'w', encoding='utf-8') as f_sync:
-                      json.dump(current_all_states, f_sync, indent=2, ensure_ascii=False)
-                  logger.info(f"Saved UI state for page '{page_key}' to {UI_STATE_FILE} (sync fallback)")
-                  return True
-             except Exception as sync_e:
-                  logger.error(f"Error saving UI state (sync fallback) to {UI_STATE_FILE}: {sync_e}", exc_info=True)
-                  return False
-        except Exception as e:
-            logger.error(f"Error saving UI state to {UI_STATE_FILE}: {e}", exc_info=True)
-            return False 
\ No newline at end of file
+    """保存指定页面的 UI 状态 (延迟写盘，写入失败会记录日志并在下次 flush 重试)"""
+    ui_state_store.save(page_key, state)
+    logger.debug(f"Queued UI state for page '{page_key}' for write-behind.")
+    return True
+
+async def flush_ui_state() -> None:
+    """应用关闭时调用，确保所有 UI 状态已写盘"""
+    await ui_state_store.close()